@@ -10,6 +10,9 @@ from typing import Dict, List
 from datetime import datetime
 import sys
 
+from session_columns import PROCESSED_DIR, read_columns, to_records
+from session_log import SESSION_LOG, read_session_log
+
 
 class SessionAnalyzer:
     """Analyze recorded EEG session data for brain insights"""
@@ -20,6 +23,13 @@ class SessionAnalyzer:
         self.summary = self._load_json('summary.json')
         self.processed = self._load_json('processed.json')
         self.events = self._load_json('events.json')
+        log_path = self.session_path / SESSION_LOG
+        if self.events is None and log_path.exists():
+            log = read_session_log(str(log_path))
+            self.processed, self.events = self.processed or log['processed'], log['event']
+        columns_path = self.session_path / PROCESSED_DIR
+        if columns_path.is_dir():
+            self.processed = to_records(*read_columns(str(columns_path)))
 
     def _load_json(self, filename: str):
         """Load JSON file from session directory"""
@@ -9,14 +9,23 @@ PHILOSOPHY: Artifacts are psychological signals, not noise!
 - Movement = emotional activation
 
 We extract continuous intensity values (0-1), not binary flags.
+
+Features are extractors in a registry (ARTIFACT_FEATURES names ->
+extract_<name>). Each one reads a FeatureContext holding the window, the IMU
+chunks and the window's SpectralContext. Spectral features therefore share
+one PSD per window instead of each running its own Welch.
 """
 
 import numpy as np
-from typing import Dict, List, Optional, Tuple
-from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from scipy import signal
 import logging
 
+from imu_features import IMUFeatureEngine, IMUFeatures
+from ring_buffer import RingBuffer
+from spectral_context import SpectralContext
+
 logger = logging.getLogger(__name__)
 
 # Artifact types (now features, not errors)
@@ -29,20 +38,34 @@ ARTIFACT_FEATURES = {
 }
 
 
+@dataclass
+class FeatureContext:
+    """Inputs shared by all feature extractors for one window"""
+    eeg: np.ndarray                     # Raw window [n_samples, n_channels]
+    spectral: SpectralContext           # Spectra of the raw window (one PSD)
+    acc: Optional[np.ndarray] = None    # [n_samples, 3] or [x, y, z]
+    gyro: Optional[np.ndarray] = None   # [n_samples, 3] or [x, y, z]
+    imu: Optional[IMUFeatures] = None   # Shared IMU features of the hop
+
+
 class ArtifactDetector:
     """
     Multi-sensor artifact detection for EEG data
     """
 
-    def __init__(self, eeg_sample_rate: int = 256, acc_sample_rate: int = 52, gyro_sample_rate: int = 52):
+    def __init__(self, eeg_sample_rate: int = 256, acc_sample_rate: int = 52, gyro_sample_rate: int = 52,
+                 n_channels: int = 4):
         self.eeg_sample_rate = eeg_sample_rate
         self.acc_sample_rate = acc_sample_rate
         self.gyro_sample_rate = gyro_sample_rate
+        self.n_channels = n_channels
 
-        # Buffers for temporal analysis
-        self.eeg_buffer = deque(maxlen=256)  # 1 second of EEG
-        self.acc_buffer = deque(maxlen=52)  # 1 second of accelerometer
-        self.gyro_buffer = deque(maxlen=52)  # 1 second of gyroscope
+        # Buffers for temporal analysis ([n_channels, n_samples] ring buffers)
+        self.eeg_buffer = RingBuffer(n_channels, eeg_sample_rate)  # 1 second of EEG
+        self.acc_buffer = RingBuffer(3, acc_sample_rate)  # 1 second of accelerometer
+        self.gyro_buffer = RingBuffer(3, gyro_sample_rate)  # 1 second of gyroscope
+        # IMU features when detect_all() is not given the pipeline's shared ones
+        self.imu_engine = IMUFeatureEngine(sample_rate=acc_sample_rate, buffer_seconds=1.0)
 
         # Previous values for change detection
         self.prev_acc_magnitude = 0.0
@@ -54,6 +77,21 @@ class ArtifactDetector:
         self.baseline_samples = 0
         self.baseline_window_size = 256 * 5  # 5 seconds for baseline
 
+        # Feature registry: name -> extractor(FeatureContext) -> 0-1 value
+        self.feature_extractors: Dict[str, Callable[[FeatureContext], float]] = {
+            name: getattr(self, f'extract_{name}') for name in ARTIFACT_FEATURES
+        }
+
+    def register_feature(self, name: str, extractor: Callable[[FeatureContext], float]):
+        """
+        Add (or replace) a feature extractor; its value is included in detect_all()
+
+        Args:
+            name: Feature name (result key)
+            extractor: Callable taking a FeatureContext, returning a float
+        """
+        self.feature_extractors[name] = extractor
+
     def update_eeg(self, eeg_data: np.ndarray):
         """
         Update EEG buffer with new data
@@ -61,19 +99,14 @@ class ArtifactDetector:
         Args:
             eeg_data: EEG samples [n_samples, n_channels] or [n_channels]
         """
-        if len(eeg_data.shape) == 1:
-            # Single sample, add to buffer
-            self.eeg_buffer.append(eeg_data)
-        else:
-            # Multiple samples, add all
-            for sample in eeg_data:
-                self.eeg_buffer.append(sample)
+        # Single sample [n_channels] or chunk [n_samples, n_channels]
+        self.eeg_buffer.extend(eeg_data[..., :self.n_channels])
 
         # Update baseline (running average)
         if self.baseline_samples < self.baseline_window_size:
             self.baseline_samples += len(eeg_data) if len(eeg_data.shape) > 1 else 1
             if len(self.eeg_buffer) > 0:
-                all_samples = np.array(list(self.eeg_buffer))
+                all_samples = self.eeg_buffer.latest()
                 self.eeg_baseline_mean = np.mean(all_samples)
                 self.eeg_baseline_std = np.std(all_samples)
 
@@ -84,11 +117,8 @@ class ArtifactDetector:
         Args:
             acc_data: Accelerometer data [x, y, z] or [n_samples, 3]
         """
-        if len(acc_data.shape) == 1:
-            self.acc_buffer.append(acc_data)
-        else:
-            for sample in acc_data:
-                self.acc_buffer.append(sample)
+        if acc_data.shape[-1] >= 3:
+            self.acc_buffer.extend(acc_data[..., :3])
 
     def update_gyro(self, gyro_data: np.ndarray):
         """
@@ -97,11 +127,8 @@ class ArtifactDetector:
         Args:
             gyro_data: Gyroscope data [x, y, z] or [n_samples, 3]
         """
-        if len(gyro_data.shape) == 1:
-            self.gyro_buffer.append(gyro_data)
-        else:
-            for sample in gyro_data:
-                self.gyro_buffer.append(sample)
+        if gyro_data.shape[-1] >= 3:
+            self.gyro_buffer.extend(gyro_data[..., :3])
 
     def detect_eye_blink(self, eeg_data: np.ndarray, gyro_data: Optional[np.ndarray] = None) -> bool:
         """
@@ -124,7 +151,7 @@ class ArtifactDetector:
             return False
 
         # Get recent EEG data from buffer
-        recent_eeg = np.array(list(self.eeg_buffer))[-64:]  # Last 250ms
+        recent_eeg = self.eeg_buffer.latest(64).T  # Last 250ms [n_samples, n_channels]
         
         # Check frontal channels (AF7=1, AF8=2)
         if recent_eeg.shape[1] >= 3:
@@ -145,7 +172,7 @@ class ArtifactDetector:
                     if 20 <= above_threshold <= 80:  # ~80-320ms at 256Hz
                         # Check gyroscope if available
                         if gyro_data is not None and len(self.gyro_buffer) > 0:
-                            recent_gyro = np.array(list(self.gyro_buffer))[-10:]
+                            recent_gyro = self.gyro_buffer.latest(10).T
                             if recent_gyro.shape[1] >= 3:
                                 gyro_z = np.abs(recent_gyro[:, 2])
                                 # Upward rotation threshold (lowered for better detection)
@@ -176,7 +203,7 @@ class ArtifactDetector:
             # Need multiple samples for frequency analysis
             if len(self.eeg_buffer) < 128:
                 return False
-            eeg_window = np.array(list(self.eeg_buffer))[-128:]
+            eeg_window = self.eeg_buffer.latest(128).T
             # Average across channels
             if eeg_window.shape[1] >= 4:
                 eeg_signal = np.mean(eeg_window, axis=1)
@@ -215,7 +242,7 @@ class ArtifactDetector:
                         if len(acc_data.shape) == 1:
                             acc_magnitude = np.linalg.norm(acc_data)
                         else:
-                            acc_magnitude = np.mean([np.linalg.norm(a) for a in acc_data])
+                            acc_magnitude = np.mean(np.linalg.norm(acc_data, axis=1))
                         # Jaw movement creates small but sustained acceleration
                         if acc_magnitude > 0.5:  # g units
                             return True
@@ -237,8 +264,8 @@ class ArtifactDetector:
         - Correlated changes in all EEG channels
 
         Args:
-            acc_data: Accelerometer data [x, y, z] or None
-            gyro_data: Gyroscope data [x, y, z] or None
+            acc_data: Accelerometer chunk [n_samples, 3] or single sample [x, y, z], or None
+            gyro_data: Gyroscope chunk [n_samples, 3] or single sample [x, y, z], or None
             eeg_data: EEG data for correlation check
 
         Returns:
@@ -258,7 +285,7 @@ class ArtifactDetector:
                     else:
                         acc_magnitude = np.linalg.norm(acc_data) if len(acc_data) > 0 else 0
                 else:
-                    acc_magnitude = np.mean([np.linalg.norm(a) for a in acc_data])
+                    acc_magnitude = np.mean(np.linalg.norm(acc_data, axis=1))
 
                 # Check for sudden change (lowered threshold for better detection)
                 if self.prev_acc_magnitude > 0:
@@ -281,7 +308,7 @@ class ArtifactDetector:
                     else:
                         gyro_magnitude = np.linalg.norm(gyro_data) if len(gyro_data) > 0 else 0
                 else:
-                    gyro_magnitude = np.mean([np.linalg.norm(g) for g in gyro_data])
+                    gyro_magnitude = np.mean(np.linalg.norm(gyro_data, axis=1))
 
                 # Check for sudden rotation (lowered threshold)
                 if self.prev_gyro_magnitude > 0:
@@ -294,30 +321,35 @@ class ArtifactDetector:
 
         # Also check buffer for sustained movement
         if len(self.acc_buffer) > 10:
-            recent_acc = np.array(list(self.acc_buffer))[-10:]
+            recent_acc = self.acc_buffer.latest(10).T
             if recent_acc.shape[1] >= 3:
-                acc_magnitudes = [np.linalg.norm(a) for a in recent_acc]
-                acc_variance = np.var(acc_magnitudes)
+                acc_variance = np.var(np.linalg.norm(recent_acc, axis=1))
                 # High variance indicates movement
                 if acc_variance > 0.1:
                     motion_detected = True
 
         return motion_detected
 
-    def detect_em_interference(self, eeg_data: np.ndarray) -> bool:
+    def detect_em_interference(self, eeg_data: np.ndarray,
+                               spectral: Optional[SpectralContext] = None) -> bool:
         """
         Detect electromagnetic interference (60 Hz powerline noise)
 
         Args:
             eeg_data: EEG data [n_channels] or [n_samples, n_channels]
+            spectral: Spectra of eeg_data, if already computed
 
         Returns:
             True if EM interference detected
         """
+        if spectral is not None:
+            # 60 Hz significantly higher than the surrounding frequencies
+            return spectral.n_samples >= 128 and spectral.line_noise_ratio() > 2
+
         if len(eeg_data.shape) == 1:
             if len(self.eeg_buffer) < 128:
                 return False
-            eeg_window = np.array(list(self.eeg_buffer))[-128:]
+            eeg_window = self.eeg_buffer.latest(128).T
             eeg_signal = np.mean(eeg_window, axis=1) if eeg_window.shape[1] >= 4 else eeg_window[:, 0]
         else:
             eeg_signal = np.mean(eeg_data, axis=1) if eeg_data.shape[1] >= 4 else eeg_data[:, 0]
@@ -423,42 +455,20 @@ class ArtifactDetector:
 
         return False
 
-    def extract_emg_intensity(self, eeg_data: np.ndarray) -> float:
+    def extract_emg_intensity(self, ctx: FeatureContext) -> float:
         """
         Extract EMG intensity as continuous 0-1 value.
         High values = jaw/face muscle activity = stress/talking/emotional activation
         """
-        if len(self.eeg_buffer) < 128:
+        if ctx.spectral.n_samples < 128:
             return 0.0
 
-        eeg_window = np.array(list(self.eeg_buffer))[-128:]
-        if eeg_window.shape[1] >= 4:
-            eeg_signal = np.mean(eeg_window, axis=1)
-        else:
-            eeg_signal = eeg_window[:, 0]
-
-        try:
-            frequencies, psd = signal.welch(
-                eeg_signal,
-                fs=self.eeg_sample_rate,
-                nperseg=min(128, len(eeg_signal)),
-                noverlap=64
-            )
-
-            # EMG power (30-100 Hz)
-            emg_idx = np.logical_and(frequencies >= 30, frequencies <= 100)
-            emg_power = np.trapz(psd[emg_idx], frequencies[emg_idx]) if np.any(emg_idx) else 0
-            total_power = np.trapz(psd, frequencies)
-
-            if total_power > 0:
-                emg_ratio = emg_power / total_power
-                # Map to 0-1 (0.15 ratio = 0.5 intensity, 0.3+ = 1.0)
-                return float(min(1.0, emg_ratio / 0.3))
-        except:
-            pass
-        return 0.0
+        # Share of channel-averaged power in the EMG range (30-100 Hz)
+        emg_ratio = ctx.spectral.emg_ratio((30, 100))
+        # Map to 0-1 (0.15 ratio = 0.5 intensity, 0.3+ = 1.0)
+        return float(min(1.0, emg_ratio / 0.3))
 
-    def extract_forehead_emg(self, eeg_data: np.ndarray) -> float:
+    def extract_forehead_emg(self, ctx: FeatureContext) -> float:
         """
         Extract forehead EMG specifically from AF7/AF8 channels.
         High values = cognitive effort/concentration
@@ -466,7 +476,7 @@ class ArtifactDetector:
         if len(self.eeg_buffer) < 64:
             return 0.0
 
-        recent_eeg = np.array(list(self.eeg_buffer))[-64:]
+        recent_eeg = self.eeg_buffer.latest(64).T
         if recent_eeg.shape[1] < 3:
             return 0.0
 
@@ -477,14 +487,14 @@ class ArtifactDetector:
         # Normalize (50μV = 0.5, 100μV+ = 1.0)
         return float(min(1.0, frontal_power / 100.0))
 
-    def extract_blink_intensity(self, eeg_data: np.ndarray) -> float:
+    def extract_blink_intensity(self, ctx: FeatureContext) -> float:
         """
         Extract blink intensity. High values = overwhelm/fatigue
         """
         if len(self.eeg_buffer) < 64:
             return 0.0
 
-        recent_eeg = np.array(list(self.eeg_buffer))[-64:]
+        recent_eeg = self.eeg_buffer.latest(64).T
         if recent_eeg.shape[1] < 3:
             return 0.0
 
@@ -496,39 +506,27 @@ class ArtifactDetector:
             return float(min(1.0, (frontal_max - 150) / 150.0 + 0.5))
         return 0.0
 
-    def extract_movement_intensity(self, acc_data: Optional[np.ndarray],
-                                    gyro_data: Optional[np.ndarray]) -> float:
+    def extract_movement_intensity(self, ctx: FeatureContext) -> float:
         """
         Extract movement intensity from IMU. High values = emotional activation
         """
         intensity = 0.0
+        imu = ctx.imu
+        if imu is None:
+            return intensity
 
-        if acc_data is not None:
-            try:
-                if len(acc_data.shape) == 1 and len(acc_data) >= 3:
-                    acc_magnitude = np.linalg.norm(acc_data)
-                    # Baseline is ~1g (gravity), movement adds variance
-                    if len(self.acc_buffer) > 10:
-                        recent = np.array(list(self.acc_buffer))[-10:]
-                        if recent.shape[1] >= 3:
-                            variance = np.var([np.linalg.norm(a) for a in recent])
-                            intensity = min(1.0, variance / 0.5)  # 0.5 variance = 1.0
-            except:
-                pass
+        if imu.n_acc > 0 and imu.buffered_acc > 10:
+            # Baseline is ~1g (gravity), movement adds variance to |acc|
+            intensity = min(1.0, imu.acc_magnitude_var / 0.5)  # 0.5 variance = 1.0
 
-        if gyro_data is not None:
-            try:
-                if len(gyro_data.shape) == 1 and len(gyro_data) >= 3:
-                    gyro_magnitude = np.linalg.norm(gyro_data)
-                    # High rotation = movement
-                    gyro_intensity = min(1.0, gyro_magnitude / 500.0)
-                    intensity = max(intensity, gyro_intensity)
-            except:
-                pass
+        if imu.n_gyro > 0:
+            # Mean rotation over the hop - high rotation = movement
+            gyro_intensity = min(1.0, imu.gyro_magnitude_mean / 500.0)
+            intensity = max(intensity, gyro_intensity)
 
         return float(intensity)
 
-    def extract_data_quality(self, eeg_data: np.ndarray) -> float:
+    def extract_data_quality(self, ctx: FeatureContext) -> float:
         """
         Extract data quality score. Only penalize true garbage:
         - Signal clipping (>500μV)
@@ -537,6 +535,7 @@ class ArtifactDetector:
         """
         quality = 1.0
 
+        eeg_data = ctx.eeg
         if len(eeg_data.shape) == 1:
             eeg_data = eeg_data.reshape(1, -1)
 
@@ -552,7 +551,7 @@ class ArtifactDetector:
             quality -= 0.3
 
         # 60Hz interference check
-        if self.detect_em_interference(eeg_data):
+        if self.detect_em_interference(eeg_data, spectral=ctx.spectral):
             quality -= 0.2
 
         return float(max(0.0, quality))
@@ -560,7 +559,9 @@ class ArtifactDetector:
     def detect_all(self, eeg_data: np.ndarray,
                    acc_data: Optional[np.ndarray] = None,
                    gyro_data: Optional[np.ndarray] = None,
-                   is_meditation: bool = False) -> Dict:
+                   is_meditation: bool = False,
+                   spectral: Optional[SpectralContext] = None,
+                   imu: Optional[IMUFeatures] = None) -> Dict:
         """
         Extract all physiological features (continuous 0-1 values).
 
@@ -570,26 +571,45 @@ class ArtifactDetector:
 
         Args:
             eeg_data: EEG data [n_samples, n_channels]
-            acc_data: Accelerometer data [x, y, z] or None
-            gyro_data: Gyroscope data [x, y, z] or None
+            acc_data: Accelerometer chunk [n_samples, 3] or single sample [x, y, z], or None
+            gyro_data: Gyroscope chunk [n_samples, 3] or single sample [x, y, z], or None
             is_meditation: If True, only mark true signal artifacts, not physiological features
+            spectral: Spectra of the raw window (computed here if not given)
+            imu: IMU features of the hop from the pipeline's shared IMUFeatureEngine
+                 (computed from acc_data/gyro_data here if not given)
 
         Returns:
             Features that represent psychological state, NOT errors to discard.
         """
         # Update buffers
         self.update_eeg(eeg_data)
-        if acc_data is not None:
-            self.update_acc(acc_data)
-        if gyro_data is not None:
-            self.update_gyro(gyro_data)
+        if imu is None:
+            # Standalone use: buffer the IMU here (pipelines share one engine instead)
+            if acc_data is not None:
+                self.update_acc(acc_data)
+            if gyro_data is not None:
+                self.update_gyro(gyro_data)
+            imu = self.imu_engine.update(acc_data, gyro_data, timestamp=0.0)
+
+        # One PSD of the window, shared by all spectral features
+        if spectral is None:
+            window = eeg_data.T if eeg_data.ndim == 2 else eeg_data
+            spectral = SpectralContext(window, self.eeg_sample_rate)
+        ctx = FeatureContext(eeg=eeg_data, spectral=spectral, acc=acc_data, gyro=gyro_data, imu=imu)
 
         # Extract continuous features (always track these - they're physiological data)
-        emg_intensity = self.extract_emg_intensity(eeg_data)
-        forehead_emg = self.extract_forehead_emg(eeg_data)
-        blink_intensity = self.extract_blink_intensity(eeg_data)
-        movement_intensity = self.extract_movement_intensity(acc_data, gyro_data)
-        data_quality = self.extract_data_quality(eeg_data)
+        features = {}
+        for name, extractor in self.feature_extractors.items():
+            try:
+                features[name] = float(extractor(ctx))
+            except Exception as e:
+                logger.debug(f"Feature '{name}' failed: {e}")
+                features[name] = 0.0
+
+        emg_intensity = features.get('emg_intensity', 0.0)
+        blink_intensity = features.get('blink_intensity', 0.0)
+        movement_intensity = features.get('movement_intensity', 0.0)
+        data_quality = features.get('data_quality', 1.0)
 
         # Context-aware artifact detection
         # For meditation: only mark as artifact if signal quality is truly poor (clipping, poor contact, 60Hz)
@@ -616,12 +636,8 @@ class ArtifactDetector:
                 artifact_type = 'eye_blink'  # Informational
 
         return {
-            # New continuous features (THE IMPORTANT ONES)
-            'emg_intensity': float(emg_intensity),
-            'forehead_emg': float(forehead_emg),
-            'blink_intensity': float(blink_intensity),
-            'movement_intensity': float(movement_intensity),
-            'data_quality': float(data_quality),
+            # New continuous features (THE IMPORTANT ONES) - every registered extractor
+            **features,
             # Legacy (backward compatibility) - only for truly bad data
             'has_artifact': bool(has_artifact),
             'artifact_type': str(artifact_type),
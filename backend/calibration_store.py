@@ -0,0 +1,197 @@
+"""
+Calibration Store
+Per-user/device cache of fitted ICA and signal baselines for warm starts
+
+Every connection used to start with 30 seconds of ICA calibration and cold
+smoothing histories. The store saves the fitted ICA (MNE's -ica.fif format)
+and a small JSON baseline: per-channel amplitude, band powers, and cognitive
+load/stress. Both are keyed by user (pipeline session) and device. On the
+next connect the cached ICA is checked against a few seconds of fresh data
+(validate_calibration). If it still fits, it is used right away; otherwise
+the normal calibration continues.
+"""
+
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import mne
+from mne.preprocessing import ICA, read_ica
+
+logger = logging.getLogger(__name__)
+
+# Warm-start validation
+VALIDATION_SECONDS = 5             # Fresh data the cached calibration is checked against
+MAX_AMPLITUDE_RATIO = 2.5          # Allowed per-channel RMS change vs the baseline (either way)
+MAX_SOURCE_CORRELATION = 0.4       # ICA sources of a still-valid model stay near-uncorrelated
+MAX_CALIBRATION_AGE_DAYS = 30
+
+
+@dataclass
+class CalibrationBaseline:
+    """Signal baselines saved with a calibration"""
+    channel_rms: List[float]                                   # Filtered EEG RMS per channel (μV)
+    band_powers: Dict[str, float] = field(default_factory=dict)  # Smoothed band powers (%)
+    cognitive_load: Optional[float] = None
+    stress: Optional[float] = None
+    exclude: List[int] = field(default_factory=list)           # ICA artifact components
+    device_name: Optional[str] = None
+    saved_at: float = 0.0
+
+
+@dataclass
+class CachedCalibration:
+    """A calibration loaded from disk"""
+    key: str
+    ica: ICA
+    baseline: CalibrationBaseline
+
+
+def validate_calibration(cached: CachedCalibration, data: np.ndarray,
+                         info: mne.Info) -> Tuple[bool, str]:
+    """
+    Check a cached calibration against fresh filtered EEG
+
+    Args:
+        cached: Calibration loaded from the store
+        data: Fresh filtered EEG [n_channels, n_samples] (a few seconds)
+        info: MNE info of the pipeline
+
+    Returns:
+        (valid, reason)
+    """
+    baseline_rms = np.asarray(cached.baseline.channel_rms, dtype=np.float64)
+    if baseline_rms.shape[0] != data.shape[0]:
+        return False, "channel count changed"
+
+    age_days = (time.time() - cached.baseline.saved_at) / 86400
+    if age_days > MAX_CALIBRATION_AGE_DAYS:
+        return False, f"calibration is {age_days:.0f} days old"
+
+    # Electrode contact: amplitudes must be in the same range
+    rms = np.sqrt(np.mean(data ** 2, axis=1))
+    ratio = (rms + 1e-6) / (baseline_rms + 1e-6)
+    if np.any(ratio > MAX_AMPLITUDE_RATIO) or np.any(ratio < 1 / MAX_AMPLITUDE_RATIO):
+        return False, f"channel amplitudes changed (ratios {np.round(ratio, 2).tolist()})"
+
+    # Mixing: the cached unmixing must still separate the signal into
+    # (near) uncorrelated sources
+    try:
+        raw = mne.io.RawArray(data, info, verbose=False)
+        sources = cached.ica.get_sources(raw).get_data()
+    except Exception as e:
+        return False, f"could not apply cached ICA: {e}"
+    if sources.shape[0] > 1:
+        corr = np.corrcoef(sources)
+        off_diagonal = np.abs(corr[~np.eye(corr.shape[0], dtype=bool)])
+        max_corr = float(np.nanmax(off_diagonal))
+        if not np.isfinite(max_corr) or max_corr > MAX_SOURCE_CORRELATION:
+            return False, f"ICA sources correlated (max |r| = {max_corr:.2f})"
+
+    return True, "ok"
+
+
+class CalibrationStore:
+    """
+    Disk cache of ICA models and baselines keyed by user and device
+    """
+
+    def __init__(self, cache_dir: str = "calibration"):
+        """
+        Args:
+            cache_dir: Directory for cached calibrations
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key_for(user: str, device: Optional[str] = None) -> str:
+        """Cache key for a user (pipeline session) and device"""
+        parts = [user] + ([device] if device else [])
+        return re.sub(r'[^A-Za-z0-9_.-]+', '-', "__".join(parts)).strip('-')
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        # MNE requires ICA file names to end in -ica.fif
+        return self.cache_dir / f"{key}-ica.fif", self.cache_dir / f"{key}.json"
+
+    def save(self, key: str, ica: ICA, baseline: CalibrationBaseline) -> bool:
+        """
+        Save (or replace) a calibration
+
+        Args:
+            key: Cache key (see key_for)
+            ica: Fitted ICA
+            baseline: Baselines measured with it
+
+        Returns:
+            True if saved
+        """
+        ica_path, meta_path = self._paths(key)
+        try:
+            ica.save(ica_path, overwrite=True, verbose=False)
+            self._write_baseline(meta_path, baseline)
+            logger.info(f"Saved calibration '{key}'")
+            return True
+        except Exception as e:
+            logger.error(f"Error saving calibration '{key}': {e}")
+            return False
+
+    def update_baseline(self, key: str, baseline: CalibrationBaseline) -> bool:
+        """Replace only the baselines of an existing calibration"""
+        ica_path, meta_path = self._paths(key)
+        if not ica_path.exists():
+            return False
+        try:
+            self._write_baseline(meta_path, baseline)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving baseline '{key}': {e}")
+            return False
+
+    @staticmethod
+    def _write_baseline(meta_path: Path, baseline: CalibrationBaseline):
+        baseline.saved_at = time.time()
+        # Write-then-rename so a crash never leaves half a JSON file
+        tmp_path = meta_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(asdict(baseline), f, indent=2)
+        os.replace(tmp_path, meta_path)
+
+    def load(self, key: str) -> Optional[CachedCalibration]:
+        """
+        Load a calibration
+
+        Returns:
+            CachedCalibration or None if there is none (or it is unreadable)
+        """
+        ica_path, meta_path = self._paths(key)
+        if not ica_path.exists() or not meta_path.exists():
+            return None
+        try:
+            with open(meta_path, 'r') as f:
+                baseline = CalibrationBaseline(**json.load(f))
+            ica = read_ica(ica_path, verbose=False)
+            ica.exclude = list(baseline.exclude)
+            return CachedCalibration(key=key, ica=ica, baseline=baseline)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable calibration '{key}': {e}")
+            return None
+
+    def delete(self, key: str) -> bool:
+        """Delete a calibration. Returns False if it did not exist."""
+        deleted = False
+        for path in self._paths(key):
+            if path.exists():
+                path.unlink()
+                deleted = True
+        return deleted
+
+    def list_keys(self) -> List[str]:
+        """Keys of all cached calibrations"""
+        return sorted(p.name[:-len('-ica.fif')] for p in self.cache_dir.glob('*-ica.fif'))
@@ -0,0 +1,383 @@
+"""
+WebSocket Connection Manager
+Tracks the WebSocket clients subscribed to one pipeline session and fans out messages
+
+Each client picks a protocol when it connects (see ws_protocol): 'json' text
+messages or 'binary' float32 frames. A broadcast encodes each message at
+most once per protocol, whatever the number of clients. It then only
+appends the encoded parts to each client's bounded outbound queue, so it
+never waits on the network. A writer task per client drains its queue:
+
+- high-rate messages (eeg_data, eeg_raw) are dropped oldest-first when a
+  queue is full (eeg_raw carries sequence numbers, so clients see the gap)
+- a client whose queue is full of messages that must not be dropped, or
+  whose oldest queued message is older than CLIENT_MAX_LAG_SECONDS, is
+  disconnected (it can reconnect and resync)
+- per-client queue depth, lag, sent and dropped counts are kept for get_stats()
+
+Clients may subscribe to topics with per-topic rates and channel subsets
+(see ws_topics). Messages are then split into topic messages once, decimated
+per subscription and encoded once per (protocol, topic, channel subset).
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from fastapi import WebSocket
+
+from ws_protocol import BinaryEncoder, EncodedMessage, PROTOCOL_BINARY, PROTOCOL_JSON, dumps
+from ws_topics import Subscription, TopicRouter, for_subscription, parse_subscriptions
+
+logger = logging.getLogger(__name__)
+
+
+def convert_numpy(obj):
+    """Convert numpy types to Python native types for JSON serialization"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.bool_):
+        return bool(obj)
+    elif isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, dict):
+        return {k: convert_numpy(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [convert_numpy(item) for item in obj]
+    return obj
+
+
+CLIENT_QUEUE_SIZE = 256          # Messages queued per client
+CLIENT_MAX_LAG_SECONDS = 5.0     # Disconnect when the oldest queued message is older
+DROPPABLE_TYPES = {'eeg_data', 'eeg_raw'}  # High-rate messages dropped oldest-first when a queue is full
+LEGACY_TYPES = {'eeg_data', 'band_powers'}  # Messages clients without subscriptions receive
+LAG_CLOSE_CODE = 1013            # WebSocket close code "try again later"
+GOING_AWAY_CLOSE_CODE = 1001     # WebSocket close code "going away" (pipeline session removed)
+
+Parts = List[Union[str, bytes]]
+
+
+class ClientConnection:
+    """
+    One subscribed client: bounded outbound queue drained by a writer task
+    """
+
+    def __init__(self, websocket: WebSocket, protocol: str = PROTOCOL_JSON,
+                 max_queue: int = CLIENT_QUEUE_SIZE, max_lag: float = CLIENT_MAX_LAG_SECONDS):
+        """
+        Args:
+            websocket: Accepted WebSocket
+            protocol: 'json' or 'binary'
+            max_queue: Messages queued before dropping / disconnecting
+            max_lag: Seconds the oldest queued message may wait before disconnecting
+        """
+        self.websocket = websocket
+        self.protocol = protocol
+        self.max_queue = max_queue
+        self.max_lag = max_lag
+        self.queue: Deque[Tuple[float, bool, Parts]] = deque()  # (enqueued at, droppable, parts)
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.last_lag = 0.0
+        self.max_observed_lag = 0.0
+        self.closing: Optional[str] = None   # Reason once the client is being disconnected
+        self.writer_task: Optional[asyncio.Task] = None
+        self.subscriptions: Optional[Dict[str, Subscription]] = None  # None = all messages (legacy)
+        self._states: Dict[str, str] = {}  # Last binary state text sent per message type
+        self._ready = asyncio.Event()
+
+    @property
+    def lag(self) -> float:
+        """Age of the oldest queued message (seconds)"""
+        return time.monotonic() - self.queue[0][0] if self.queue else 0.0
+
+    def enqueue_message(self, encoded: EncodedMessage, droppable: bool = False) -> bool:
+        """
+        Queue one encoded message, preceded by its state if that changed for this client
+
+        Returns:
+            False if the client fell too far behind and should be disconnected
+        """
+        parts = encoded.parts
+        if encoded.state is not None and self._states.get(encoded.state_key) != encoded.state:
+            self._states[encoded.state_key] = encoded.state
+            parts = [encoded.state, *parts]
+            droppable = False  # Later frames rely on this state
+        return self.enqueue(parts, droppable)
+
+    def enqueue(self, parts: Parts, droppable: bool = False) -> bool:
+        """
+        Queue one message's parts (never blocks)
+
+        Returns:
+            False if the client fell too far behind and should be disconnected
+        """
+        if self.closing:
+            return False
+        if self.queue and self.lag > self.max_lag:
+            self.closing = f"lagging {self.lag:.1f}s"
+            return False
+        if len(self.queue) >= self.max_queue:
+            if not self._drop_oldest():
+                self.closing = f"queue full ({len(self.queue)})"
+                return False
+        self.queue.append((time.monotonic(), droppable, parts))
+        self._ready.set()
+        return True
+
+    def _drop_oldest(self) -> bool:
+        """Drop the oldest droppable message; False if none is queued"""
+        for i, (_, droppable, _) in enumerate(self.queue):
+            if droppable:
+                del self.queue[i]
+                self.dropped += 1
+                return True
+        return False
+
+    async def run(self):
+        """Writer loop: send queued messages in order until the connection fails"""
+        while True:
+            if not self.queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            enqueued_at, _, parts = self.queue.popleft()
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_observed_lag = max(self.max_observed_lag, self.last_lag)
+            for part in parts:
+                if isinstance(part, bytes):
+                    await self.websocket.send_bytes(part)
+                else:
+                    await self.websocket.send_text(part)
+            self.sent += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            'protocol': self.protocol,
+            'topics': ({topic: sub.describe() for topic, sub in self.subscriptions.items()}
+                       if self.subscriptions is not None else 'all'),
+            'queue_depth': len(self.queue),
+            'lag_ms': round(self.lag * 1000, 1),
+            'last_send_lag_ms': round(self.last_lag * 1000, 1),
+            'max_send_lag_ms': round(self.max_observed_lag * 1000, 1),
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'connected_for': round(time.time() - self.connected_at, 1),
+        }
+
+
+class ConnectionManager:
+    """Manages WebSocket connections"""
+
+    def __init__(self, name: str = "default", max_queue: int = CLIENT_QUEUE_SIZE,
+                 max_lag: float = CLIENT_MAX_LAG_SECONDS):
+        """
+        Args:
+            name: Pipeline session the connections are subscribed to (for logging)
+            max_queue: Outbound queue size per client
+            max_lag: Seconds a client may fall behind before it is disconnected
+        """
+        self.name = name
+        self.max_queue = max_queue
+        self.max_lag = max_lag
+        self.clients: Dict[WebSocket, ClientConnection] = {}
+        self.encoder = BinaryEncoder()
+        self.router = TopicRouter()
+        self.lagged_disconnects = 0
+
+    @property
+    def active_connections(self) -> List[WebSocket]:
+        return list(self.clients)
+
+    async def connect(self, websocket: WebSocket, protocol: str = PROTOCOL_JSON):
+        """
+        Accept a client and start its writer
+
+        Args:
+            protocol: 'json' or 'binary' (binary clients get the schemas and current state first)
+        """
+        await websocket.accept()
+        client = ClientConnection(websocket, protocol, self.max_queue, self.max_lag)
+        if protocol == PROTOCOL_BINARY:
+            # Queued ahead of any broadcast, so the client never sees a frame before its schema
+            client.enqueue([dumps(self.encoder.hello())])
+        self.clients[websocket] = client
+        client.writer_task = asyncio.create_task(self._write(client))
+        logger.info(f"Client connected to '{self.name}' ({protocol}). Total: {len(self.clients)}")
+
+    async def _write(self, client: ClientConnection):
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Send to client failed on '{self.name}': {e}")
+            self.disconnect(client.websocket)
+
+    def disconnect(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        if client.writer_task is not None and client.writer_task is not asyncio.current_task():
+            client.writer_task.cancel()
+        logger.info(f"Client disconnected from '{self.name}'. Total: {len(self.clients)}")
+
+    def _drop_lagging(self, client: ClientConnection):
+        """Disconnect a client that cannot keep up (it may reconnect and resync)"""
+        self.lagged_disconnects += 1
+        logger.warning(f"Disconnecting client from '{self.name}': {client.closing}")
+        self.disconnect(client.websocket)
+        asyncio.create_task(self._close(client.websocket))
+
+    async def close_all(self, code: int = GOING_AWAY_CLOSE_CODE):
+        """Disconnect and close every client (the session is going away)"""
+        websockets = list(self.clients)
+        for websocket in websockets:
+            self.disconnect(websocket)
+        await asyncio.gather(*(self._close(websocket, code) for websocket in websockets))
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = LAG_CLOSE_CODE):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    def send(self, websocket: WebSocket, message: dict):
+        """Queue a message to one client in its protocol (in order with its broadcasts)"""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        encoded = self._encode(message, client.protocol, {}, None)
+        if not client.enqueue_message(encoded):
+            self._drop_lagging(client)
+
+    def subscribe(self, websocket: WebSocket, topics) -> Dict:
+        """
+        Add or update topic subscriptions of a client (switches it to topic mode)
+
+        Args:
+            topics: {topic: {max_rate, channels}} or a list of topics (see ws_topics)
+
+        Returns:
+            Effective subscriptions {topic: options}
+
+        Raises:
+            ValueError: Unknown topic or invalid options
+        """
+        client = self._client(websocket)
+        subscriptions = parse_subscriptions(topics)
+        client.subscriptions = {**(client.subscriptions or {}), **subscriptions}
+        return self._describe_subscriptions(client)
+
+    def unsubscribe(self, websocket: WebSocket, topics) -> Dict:
+        """Remove topics of a client (it stays in topic mode); returns the effective subscriptions"""
+        client = self._client(websocket)
+        client.subscriptions = {
+            topic: sub for topic, sub in (client.subscriptions or {}).items() if topic not in set(topics or [])
+        }
+        return self._describe_subscriptions(client)
+
+    def _client(self, websocket: WebSocket) -> ClientConnection:
+        client = self.clients.get(websocket)
+        if client is None:
+            raise ValueError("Client is not connected")
+        return client
+
+    def subscriptions(self, topic: str) -> List[Subscription]:
+        """Subscriptions of all clients to topic"""
+        return [client.subscriptions[topic] for client in self.clients.values()
+                if client.subscriptions is not None and topic in client.subscriptions]
+
+    def subscription_of(self, websocket: WebSocket, topic: str) -> Optional[Subscription]:
+        client = self.clients.get(websocket)
+        if client is None or client.subscriptions is None:
+            return None
+        return client.subscriptions.get(topic)
+
+    def has_subscribers(self, topic: str) -> bool:
+        """True if any client subscribed to topic"""
+        return any(client.subscriptions is not None and topic in client.subscriptions
+                   for client in self.clients.values())
+
+    @staticmethod
+    def _describe_subscriptions(client: ClientConnection) -> Dict:
+        return {topic: sub.describe() for topic, sub in client.subscriptions.items()}
+
+    def _encode(self, message: dict, protocol: str, cache: Dict, key) -> EncodedMessage:
+        """Encode message for protocol once per broadcast (cache keyed by variant)"""
+        cache_key = (protocol, key)
+        encoded = cache.get(cache_key)
+        if encoded is None:
+            json_key = (PROTOCOL_JSON, key)
+            if protocol == PROTOCOL_JSON:
+                encoded = EncodedMessage([dumps(convert_numpy(message))])
+            else:
+                def to_json(part: dict) -> str:
+                    if part is message and json_key in cache:
+                        return cache[json_key].parts[0]
+                    return dumps(convert_numpy(part))
+                encoded = self.encoder.encode(message, to_json)
+            cache[cache_key] = encoded
+        return encoded
+
+    async def broadcast(self, message: dict):
+        """Queue message for all connected clients (encoded once, never waits on sends)"""
+        topic_clients = [c for c in self.clients.values() if c.subscriptions is not None]
+        try:
+            # band_powers ticks are always routed, so events compare consecutive ticks
+            routed = (self.router.route(message)
+                      if topic_clients or message.get('type') == 'band_powers' else [])
+        except Exception as e:
+            logger.error(f"Error routing message: {e}", exc_info=True)
+            routed = []
+        if not self.clients:
+            return
+
+        droppable = message.get('type') in DROPPABLE_TYPES
+        cache: Dict = {}
+        lagging = []
+        try:
+            for client in self.clients.values():
+                if client.subscriptions is None:
+                    if message.get('type') not in LEGACY_TYPES:
+                        continue
+                    queued = [(self._encode(message, client.protocol, cache, 'all'), droppable)]
+                else:
+                    queued = []
+                    for topic, topic_message in routed:
+                        sub = client.subscriptions.get(topic)
+                        if (sub is None or not sub.accepts(topic_message)
+                                or not sub.due(topic_message.get('timestamp') or 0.0)):
+                            continue
+                        if sub.channels is not None or sub.format is not None:
+                            variant = (topic, id(topic_message), sub.channels, sub.format)
+                            if (client.protocol, variant) not in cache:
+                                topic_message = for_subscription(topic_message, sub)
+                        else:
+                            variant = (topic, id(topic_message))
+                        queued.append((self._encode(topic_message, client.protocol, cache, variant),
+                                       topic_message.get('type') in DROPPABLE_TYPES))
+                for encoded, can_drop in queued:
+                    if not client.enqueue_message(encoded, can_drop):
+                        lagging.append(client)
+                        break
+        except Exception as e:
+            logger.error(f"Error encoding message: {e}", exc_info=True)
+
+        for client in lagging:
+            self._drop_lagging(client)
+
+    def get_stats(self) -> Dict:
+        """Fan-out metrics: per-client queue depth, lag and drops"""
+        return {
+            'clients': len(self.clients),
+            'lagged_disconnects': self.lagged_disconnects,
+            'per_client': [client.get_stats() for client in self.clients.values()],
+        }
@@ -304,6 +304,8 @@ class CopilotSession:
             'theta': brain_state.get('theta', 0.0),
             'delta': brain_state.get('delta', 0.0),
             'emg_intensity': brain_state.get('emg_intensity', 0.0),
+            'hrv_rmssd': brain_state.get('hrv_rmssd', 0.0),
+            'lf_hf_ratio': brain_state.get('lf_hf_ratio', 0.0),
             'timestamp': time.time()
         })
 
@@ -346,7 +348,8 @@ class CopilotSession:
         # Calculate median for each metric
         baseline = {}
         metrics = ['stress', 'cognitive_load', 'hr', 'emotion_arousal',
-                  'alpha', 'beta', 'gamma', 'theta', 'delta', 'emg_intensity']
+                  'alpha', 'beta', 'gamma', 'theta', 'delta', 'emg_intensity',
+                  'hrv_rmssd', 'lf_hf_ratio']
 
         for metric in metrics:
             values = [state[metric] for state in self.brain_state_history]
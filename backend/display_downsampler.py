@@ -0,0 +1,265 @@
+"""
+Display Downsampler
+Incremental min/max and LTTB waveform decimation for display clients
+
+A waveform display needs a few hundred points per channel across its
+width, not 256 samples per second. A client subscribes to the display
+topic with its pixel width and time span (see ws_topics). One
+WaveformDownsampler per distinct (mode, width, span) cuts the EEG stream
+into buckets of span / width seconds and emits each bucket once, when it
+completes:
+
+- minmax: min and max of every channel in the bucket (an envelope that
+  never hides spikes)
+- lttb:   Largest-Triangle-Three-Buckets, the sample of every channel that
+  forms the largest triangle with the previously selected point and the
+  next bucket's average. A bucket is emitted once the next one completes.
+
+The buckets covering the last span are kept in a ring buffer, so a client
+that subscribes later gets the full span at once and then only new
+buckets. That is span / bucket_seconds buckets, which differs from width
+when the bucket size is rounded or held at DISPLAY_MIN_BUCKET_SAMPLES.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import logging
+import math
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+DISPLAY_MODES = ('minmax', 'lttb')
+DISPLAY_MAX_WIDTH = 4000         # Buckets per span
+DISPLAY_MAX_SPAN = 10.0          # Seconds (EEG ring buffer length, used for priming)
+DISPLAY_MIN_BUCKET_SAMPLES = 2   # Below this the raw stream is cheaper
+
+
+@dataclass(frozen=True)
+class DisplayConfig:
+    """Requested display geometry"""
+    mode: str = 'minmax'
+    width: int = 600      # Buckets (pixels) across the span
+    span: float = 5.0     # Seconds shown
+
+    @property
+    def key(self) -> str:
+        return f"{self.mode}:{self.width}:{self.span:g}"
+
+    def bucket_samples(self, sample_rate: float) -> int:
+        return max(DISPLAY_MIN_BUCKET_SAMPLES, int(round(self.span * sample_rate / self.width)))
+
+    def n_buckets(self, sample_rate: float) -> int:
+        """Buckets of bucket_samples covering the span (width only sets the bucket size)"""
+        return max(1, int(math.ceil(self.span * sample_rate / self.bucket_samples(sample_rate))))
+
+    @classmethod
+    def parse(cls, options: Dict) -> 'DisplayConfig':
+        """
+        Validate display subscription options
+
+        Raises:
+            ValueError: Invalid mode, width or span
+        """
+        mode = options.get('mode', cls.mode)
+        if mode not in DISPLAY_MODES:
+            raise ValueError(f"mode must be one of {DISPLAY_MODES}")
+        width = int(options.get('width', cls.width))
+        if not 1 <= width <= DISPLAY_MAX_WIDTH:
+            raise ValueError(f"width must be 1-{DISPLAY_MAX_WIDTH}")
+        span = float(options.get('span', cls.span))
+        if not 0 < span <= DISPLAY_MAX_SPAN:
+            raise ValueError(f"span must be in (0, {DISPLAY_MAX_SPAN:g}] seconds")
+        return cls(mode=mode, width=width, span=span)
+
+
+class WaveformDownsampler:
+    """
+    Incremental bucket decimation of one display geometry
+
+    Buckets are rows [time, ch0 a, ch0 b, ch1 a, ch1 b, ...]: for minmax
+    time is the bucket start and (a, b) = (min, max); for lttb (a, b) =
+    (time, value) of the selected sample.
+    """
+
+    def __init__(self, config: DisplayConfig, sample_rate: float = 256, n_channels: int = 4):
+        """
+        Args:
+            config: Display geometry
+            sample_rate: EEG sample rate (Hz)
+            n_channels: EEG channels
+        """
+        self.config = config
+        self.sample_rate = sample_rate
+        self.n_channels = n_channels
+        self.bucket_samples = config.bucket_samples(sample_rate)
+        self.bucket_seconds = self.bucket_samples / sample_rate
+        self.history = RingBuffer(1 + 2 * n_channels, config.n_buckets(sample_rate))
+        self.seq = 0
+
+        self._pending = np.zeros((0, n_channels))
+        self._pending_times = np.zeros(0)
+        # LTTB: last selected point per channel and the bucket awaiting its successor
+        self._selected: Optional[np.ndarray] = None      # [n_channels, 2] (time, value)
+        self._held: Optional[np.ndarray] = None          # [bucket_samples, n_channels]
+        self._held_times: Optional[np.ndarray] = None
+
+    def push(self, samples: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        """
+        Add samples and return the buckets they complete
+
+        Args:
+            samples: [n_samples, n_channels] EEG chunk
+            timestamps: [n_samples] LSL timestamps
+
+        Returns:
+            New bucket rows [k, 1 + 2 * n_channels] (also appended to history)
+        """
+        samples = np.concatenate([self._pending, samples[:, :self.n_channels]])
+        times = np.concatenate([self._pending_times, timestamps])
+        n_buckets = samples.shape[0] // self.bucket_samples
+        used = n_buckets * self.bucket_samples
+        self._pending, self._pending_times = samples[used:], times[used:]
+        if n_buckets == 0:
+            return np.zeros((0, self.history.n_channels))
+
+        buckets = samples[:used].reshape(n_buckets, self.bucket_samples, self.n_channels)
+        bucket_times = times[:used].reshape(n_buckets, self.bucket_samples)
+        if self.config.mode == 'minmax':
+            rows = np.empty((n_buckets, self.history.n_channels))
+            rows[:, 0] = bucket_times[:, 0]
+            rows[:, 1::2] = buckets.min(axis=1)
+            rows[:, 2::2] = buckets.max(axis=1)
+        else:
+            rows = self._lttb(buckets, bucket_times)
+
+        if rows.shape[0]:
+            self.history.extend(rows)
+        return rows
+
+    def _lttb(self, buckets: np.ndarray, bucket_times: np.ndarray) -> np.ndarray:
+        """Select one point per channel for every held bucket whose successor completed"""
+        rows = []
+        for values, times in zip(buckets, bucket_times):
+            if self._held is None:
+                if self._selected is None:
+                    # The first point of the stream anchors the first triangle
+                    self._selected = np.column_stack((np.full(self.n_channels, times[0]), values[0]))
+                self._held, self._held_times = values, times
+                continue
+
+            # Triangle (previous selection, candidate, next bucket average), all channels at once
+            avg_time = times.mean()
+            avg_value = values.mean(axis=0)
+            prev_time = self._selected[:, 0]
+            prev_value = self._selected[:, 1]
+            candidate_dt = self._held_times[:, None] - prev_time
+            area = np.abs((prev_time - avg_time) * (self._held - prev_value)
+                          + candidate_dt * (avg_value - prev_value))
+            pick = np.argmax(area, axis=0)
+            channels = np.arange(self.n_channels)
+            self._selected = np.column_stack((self._held_times[pick], self._held[pick, channels]))
+
+            row = np.empty(self.history.n_channels)
+            row[0] = self._held_times[0]
+            row[1:] = self._selected.ravel()
+            rows.append(row)
+            self._held, self._held_times = values, times
+        return np.array(rows) if rows else np.zeros((0, self.history.n_channels))
+
+    def message(self, rows: np.ndarray, history: bool = False) -> Dict:
+        """
+        display message for bucket rows
+
+        data holds n_buckets x n_channels pairs, interleaved: (min, max) for
+        minmax, (seconds after timestamp, value) for lttb. Bucket i of minmax
+        starts at timestamp + i * bucket_seconds.
+        """
+        timestamp = float(rows[0, 0]) if rows.shape[0] else 0.0
+        pairs = rows[:, 1:].reshape(rows.shape[0], self.n_channels, 2).copy()
+        if self.config.mode == 'lttb':
+            pairs[..., 0] -= timestamp
+        message = {
+            'type': 'display',
+            'config': self.config.key,
+            'mode': self.config.mode,
+            'history': history,
+            'seq': self.seq,
+            'timestamp': timestamp,
+            'bucket_seconds': self.bucket_seconds,
+            'n_buckets': int(rows.shape[0]),
+            'n_channels': self.n_channels,
+            'data': pairs.astype(np.float32).ravel(),
+        }
+        if not history:
+            self.seq += 1
+        return message
+
+    def backfill(self) -> Optional[Dict]:
+        """The kept span as one display message (history=True), or None if empty"""
+        if len(self.history) == 0:
+            return None
+        return self.message(self.history.latest().T, history=True)
+
+
+class DisplayStreams:
+    """
+    WaveformDownsamplers of one pipeline session, one per subscribed geometry
+    """
+
+    def __init__(self, sample_rate: float = 256, n_channels: int = 4):
+        """
+        Args:
+            sample_rate: EEG sample rate (Hz)
+            n_channels: EEG channels
+        """
+        self.sample_rate = sample_rate
+        self.n_channels = n_channels
+        self.downsamplers: Dict[str, WaveformDownsampler] = {}
+
+    def ensure(self, config: DisplayConfig, values: Optional[np.ndarray] = None,
+               timestamps: Optional[np.ndarray] = None) -> WaveformDownsampler:
+        """
+        Downsampler for config, created and primed on first use
+
+        Args:
+            values: Recent EEG [n_channels, n] to prime a new downsampler with (e.g. the ring buffer)
+            timestamps: [n] timestamps of values
+        """
+        downsampler = self.downsamplers.get(config.key)
+        if downsampler is None:
+            downsampler = WaveformDownsampler(config, self.sample_rate, self.n_channels)
+            if values is not None and timestamps is not None and len(timestamps):
+                n = min(len(timestamps), int(config.span * self.sample_rate))
+                downsampler.push(np.asarray(values)[:, -n:].T, np.asarray(timestamps)[-n:])
+            self.downsamplers[config.key] = downsampler
+        return downsampler
+
+    def push(self, samples: np.ndarray, timestamps: np.ndarray, active: Iterable[str]) -> List[Dict]:
+        """
+        Feed a chunk to every downsampler still subscribed
+
+        Args:
+            samples: [n_samples, n_channels] EEG chunk
+            timestamps: [n_samples] LSL timestamps
+            active: Config keys some client subscribes to (others are dropped)
+
+        Returns:
+            display messages with the new buckets
+        """
+        active = set(active)
+        for key in list(self.downsamplers):
+            if key not in active:
+                del self.downsamplers[key]
+        messages = []
+        for downsampler in self.downsamplers.values():
+            rows = downsampler.push(samples, timestamps)
+            if rows.shape[0]:
+                messages.append(downsampler.message(rows))
+        return messages
+
+    def clear(self):
+        self.downsamplers.clear()
@@ -132,6 +132,9 @@ class FusionEngine:
             'brain_state': brain_state.get('brain_state', 'unknown'),
             'signal_quality': brain_state.get('signal_quality', 0.0),
             'emg_intensity': brain_state.get('emg_intensity', 0.0),
+            'hrv_rmssd': brain_state.get('hrv_rmssd', 0.0),
+            'lf_hf_ratio': brain_state.get('lf_hf_ratio', 0.0),
+            'autonomic_balance': brain_state.get('autonomic_balance', 'unknown'),
 
             # Fusion insights
             'incongruence': incongruence,
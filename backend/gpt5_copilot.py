@@ -246,6 +246,7 @@ User just said: "{latest['text']}"
 - Stress level: {latest['brain_stress']:.2f} (baseline: {latest.get('brain_baseline', {}).get('stress', 0):.2f})
 - Cognitive load: {latest['cognitive_load']:.2f} (baseline: {latest.get('brain_baseline', {}).get('cognitive_load', 0):.2f})
 - Heart rate: {latest['hr']} bpm (baseline: {latest.get('brain_baseline', {}).get('hr', 70):.0f} bpm)
+- Autonomic balance: {latest.get('autonomic_balance', 'unknown')} (LF/HF: {latest.get('lf_hf_ratio', 0):.2f}, baseline: {latest.get('brain_baseline', {}).get('lf_hf_ratio', 0):.2f}; RMSSD: {latest.get('hrv_rmssd', 0):.0f} ms) - sympathetic = fight/flight arousal, parasympathetic = rest/recovery
 - Emotional arousal: {latest['arousal']:.2f} (baseline: {latest.get('brain_baseline', {}).get('emotion_arousal', 0):.2f})
 
 **Detailed EEG band powers (CURRENT vs BASELINE):**
@@ -2,262 +2,465 @@
 Heart Rate Variability (HRV) Calculator
 Calculates HRV metrics from PPG (photoplethysmography) data
 
-FIXED: Using scipy.signal.find_peaks for robust peak detection
+Beats are detected incrementally as PPG arrives. Each new chunk is
+bandpass-filtered once (0.5-4 Hz, filter state carried over), and
+scipy.signal.find_peaks only searches the last few seconds of filtered
+signal. A peak is accepted once it can no longer be displaced by a higher
+neighbour. RR intervals are kept in a ring buffer with running sums, so
+heart rate, RMSSD and SDNN are updated in O(1) per beat. Metric reads return
+a cached result that only changes when a beat arrives or ages out.
+
+Frequency-domain and nonlinear metrics (LF/HF from a Lomb-Scargle periodogram
+of the uneven RR series, pNN50, Poincare SD1/SD2) are too expensive for every
+read. update_extended_metrics() computes them over a longer sliding RR window
+on a background worker every few seconds (see extended_due), and reads merge
+the cached result.
 """
 
 import numpy as np
-from scipy import signal
-from typing import List, Optional, Dict
+import threading
 from collections import deque
+from scipy import signal
+from typing import Deque, List, Optional, Dict
 import logging
 
+from ring_buffer import RingBuffer
+from streaming_filter import StreamingFilter
+
 logger = logging.getLogger(__name__)
 
+# Beat detection
+PPG_BAND = (0.5, 4.0)          # Hz, 30-240 BPM
+PEAK_SEARCH_SECONDS = 3.0      # Filtered PPG searched for new peaks
+MIN_BEAT_INTERVAL = 0.4        # Seconds between beats (150 BPM max)
+AMPLITUDE_TIME_CONSTANT = 5.0  # Seconds, running amplitude used to normalize the PPG
+MIN_DETECTION_SECONDS = 3.0    # PPG needed before the first peak search
+
+# RR intervals
+MIN_RR_MS = 400                # Valid RR interval: 400-2000ms (30-150 bpm)
+MAX_RR_MS = 2000
+HRV_WINDOW_SECONDS = 30.0      # Beats that metrics are computed over
+MAX_BEATS = 512                # RR ring capacity (> 2 min at 150 BPM)
+
+# Extended (frequency-domain + nonlinear) metrics
+HRV_EXTENDED_INTERVAL = 5.0         # Seconds between background updates
+HRV_EXTENDED_WINDOW_SECONDS = 120.0 # Sliding RR window they are computed over
+HRV_SPECTRAL_MIN_SECONDS = 60.0     # RR span needed for LF/HF (LF reaches down to 0.04 Hz)
+LF_BAND = (0.04, 0.15)              # Hz, sympathetic + parasympathetic
+HF_BAND = (0.15, 0.40)              # Hz, parasympathetic (respiratory)
+LOMB_FREQUENCIES = np.linspace(0.01, 0.5, 256)
+
+EXTENDED_METRICS_DEFAULT = {
+    'hrv_pnn50': 0.0,     # % of successive RR differences > 50 ms
+    'hrv_sd1': 0.0,       # Poincare SD1 (ms), short-term variability
+    'hrv_sd2': 0.0,       # Poincare SD2 (ms), long-term variability
+    'hrv_lf': 0.0,        # LF power (ms^2)
+    'hrv_hf': 0.0,        # HF power (ms^2)
+    'hrv_lf_hf': 0.0,     # LF/HF ratio (sympathovagal balance)
+    'hrv_lf_nu': 0.0,     # LF in normalized units (LF / (LF + HF) * 100)
+    'extended_valid': False,
+    'spectral_valid': False,
+}
+
+
+def compute_extended_hrv(beat_times: np.ndarray, rr_ms: np.ndarray) -> Dict:
+    """
+    Frequency-domain and nonlinear HRV metrics of an RR series
+
+    Args:
+        beat_times: Beat timestamps (s) of each RR interval, ascending (uneven)
+        rr_ms: RR intervals (ms)
+
+    Returns:
+        Dict with the EXTENDED_METRICS_DEFAULT keys
+    """
+    metrics = dict(EXTENDED_METRICS_DEFAULT)
+    if len(rr_ms) < 3:
+        return metrics
+
+    # Nonlinear / successive-difference metrics
+    diffs = np.diff(rr_ms)
+    sdnn = np.std(rr_ms)
+    sd1 = np.sqrt(0.5) * np.std(diffs)
+    metrics['hrv_pnn50'] = float(np.mean(np.abs(diffs) > 50) * 100)
+    metrics['hrv_sd1'] = float(sd1)
+    metrics['hrv_sd2'] = float(np.sqrt(max(0.0, 2 * sdnn ** 2 - sd1 ** 2)))
+    metrics['extended_valid'] = True
+
+    if beat_times[-1] - beat_times[0] < HRV_SPECTRAL_MIN_SECONDS:
+        return metrics
+
+    # Lomb-Scargle handles the uneven beat times directly (no resampling)
+    detrended = signal.detrend(rr_ms)
+    power = signal.lombscargle(beat_times - beat_times[0], detrended, 2 * np.pi * LOMB_FREQUENCIES)
+    # Scale to a one-sided PSD (ms^2/Hz) whose integral is the RR variance
+    psd = power * 2 * (beat_times[-1] - beat_times[0]) / len(rr_ms)
+
+    def band_power(low: float, high: float) -> float:
+        idx = np.logical_and(LOMB_FREQUENCIES >= low, LOMB_FREQUENCIES <= high)
+        return float(np.trapz(psd[idx], LOMB_FREQUENCIES[idx]))
+
+    lf = band_power(*LF_BAND)
+    hf = band_power(*HF_BAND)
+    metrics['hrv_lf'] = lf
+    metrics['hrv_hf'] = hf
+    metrics['hrv_lf_hf'] = float(lf / hf) if hf > 0 else 0.0
+    metrics['hrv_lf_nu'] = float(lf / (lf + hf) * 100) if lf + hf > 0 else 0.0
+    metrics['spectral_valid'] = hf > 0
+    return metrics
+
+
+def autonomic_balance(metrics: Dict) -> str:
+    """
+    Coarse sympathovagal balance from LF/HF
+
+    Returns:
+        'sympathetic', 'balanced', 'parasympathetic' or 'unknown'
+    """
+    if not metrics.get('spectral_valid', False):
+        return 'unknown'
+    ratio = metrics.get('hrv_lf_hf', 0.0)
+    if ratio > 2.0:
+        return 'sympathetic'
+    if ratio < 0.5:
+        return 'parasympathetic'
+    return 'balanced'
+
 
 class HRVCalculator:
     """
     Calculate HRV metrics from PPG sensor data
     """
 
-    def __init__(self, sample_rate: int = 64):
+    def __init__(self, sample_rate: int = 64, extended_interval: float = HRV_EXTENDED_INTERVAL):
+        """
+        Args:
+            sample_rate: Nominal PPG sample rate (Hz), adapted to the actual rate
+            extended_interval: Seconds between extended metric updates (0 disables)
+        """
         self.sample_rate = sample_rate
         # Muse PPG is actually ~64 samples/sec but via LSL often comes slower
         # Use large buffer to accommodate various rates
-        self.ppg_buffer = deque(maxlen=2000)  # ~30+ seconds at any rate
-        self.peak_times: List[float] = []
+        # Channel 0: infrared value, channel 1: LSL timestamp
+        self.ppg_buffer = RingBuffer(2, 2000)  # ~30+ seconds at any rate
+        self.peak_times: Deque[float] = deque(maxlen=MAX_BEATS)
         self.last_peak_time: Optional[float] = None
         self.last_valid_heart_rate: float = 0.0  # Cache last valid heart rate
-
-    def update_ppg(self, ppg_data: np.ndarray, timestamp: float):
+        # PPG is written from the event loop while metrics may be read in an analysis worker
+        self._buffer_lock = threading.Lock()
+
+        # Streaming beat detector
+        self._filter: Optional[StreamingFilter] = None
+        self._search: Optional[RingBuffer] = None  # Normalized filtered PPG + timestamps
+        self._power = 0.0                          # Running mean square of the filtered PPG
+        self._design_filter(sample_rate)
+
+        # RR intervals (ms) of the last HRV_WINDOW_SECONDS with running sums
+        # Channel 0: beat timestamp, channel 1: RR interval (ms)
+        self.rr_buffer = RingBuffer(2, MAX_BEATS)
+        self._rr_count = 0        # Intervals in the window (newest entries of rr_buffer)
+        self._rr_sum = 0.0
+        self._rr_sum_sq = 0.0
+        self._rr_diff_sum_sq = 0.0  # Squared successive differences
+        self._outliers = 0
+        self._metrics: Optional[Dict] = None  # Cached get_current_metrics() result
+
+        # Extended metrics, refreshed in the background (see extended_due)
+        self.extended_interval = extended_interval
+        self._extended: Dict = dict(EXTENDED_METRICS_DEFAULT)
+        self._extended_time: Optional[float] = None  # PPG time of the last update
+        self._last_ppg_time: Optional[float] = None
+
+    def _design_filter(self, sample_rate: float):
+        """(Re)create the PPG bandpass and peak search buffer for a sample rate"""
+        # Bandpass only if the sample rate is high enough (Nyquist > 4 Hz means fs > 8 Hz)
+        if sample_rate >= 10:
+            self._filter = StreamingFilter(1, sample_rate, l_freq=PPG_BAND[0], h_freq=PPG_BAND[1],
+                                           order=2, notch_freq=None)
+        else:
+            # Low sample rate - just use the normalized signal (already smooth)
+            logger.debug(f"PPG sample rate too low for bandpass filter: {sample_rate} Hz")
+            self._filter = None
+        self._search = RingBuffer(2, max(8, int(np.ceil(sample_rate * PEAK_SEARCH_SECONDS))))
+        self._power = 0.0
+
+    def update_ppg(self, ppg_data: np.ndarray, timestamp):
         """
-        Update PPG buffer with new data
+        Update PPG buffer with new data and detect new beats
 
         Args:
-            ppg_data: PPG data [ambient, infrared, red] or single value
-            timestamp: Timestamp of the data
+            ppg_data: PPG chunk [n_samples, 3] (ambient, infrared, red),
+                      a single sample [ambient, infrared, red], or a single value
+            timestamp: Per-sample timestamps [n_samples] for a chunk, or a single timestamp
         """
         try:
-            # Handle different input formats
-            if isinstance(ppg_data, (int, float)):
-                # Single value
-                infrared = float(ppg_data)
-            elif len(ppg_data.shape) == 0:
-                # Scalar numpy array
-                infrared = float(ppg_data.item())
-            elif len(ppg_data) == 1:
-                # Single element array
-                infrared = float(ppg_data[0])
+            ppg_data = np.asarray(ppg_data, dtype=np.float64)
+
+            if ppg_data.ndim == 2:
+                # Full chunk at the native 64 Hz rate - one vectorized write
+                if ppg_data.shape[0] == 0:
+                    return
+                column = 1 if ppg_data.shape[1] >= 2 else 0  # Infrared, first channel as fallback
+                values = ppg_data[:, column]
+                timestamps = np.asarray(timestamp, dtype=np.float64).reshape(-1)
+                if len(timestamps) != ppg_data.shape[0]:
+                    return  # Misaligned chunk
             else:
-                # Multiple channels, use infrared (index 1) or red (index 2) as fallback
-                if len(ppg_data) >= 2:
-                    infrared = float(ppg_data[1])
-                elif len(ppg_data) >= 1:
+                # Handle single-sample formats
+                if ppg_data.ndim == 0:
+                    # Scalar
+                    infrared = float(ppg_data.item())
+                elif len(ppg_data) == 1:
+                    # Single element array
                     infrared = float(ppg_data[0])
+                elif len(ppg_data) >= 2:
+                    # Multiple channels, use infrared (index 1)
+                    infrared = float(ppg_data[1])
                 else:
                     return  # Invalid data
-            
-            self.ppg_buffer.append((infrared, timestamp))
+                values = np.array([infrared])
+                timestamps = np.array([float(timestamp)])
+
+            with self._buffer_lock:
+                self.ppg_buffer.extend(np.column_stack((values, timestamps)))
+                self._process_samples(values, timestamps)
         except Exception as e:
             # Silently handle errors to avoid spam
-            pass
+            logger.debug(f"Error updating PPG: {e}")
+
+    def _check_sample_rate(self):
+        """Switch to the actual PPG rate if LSL delivers a different one"""
+        if len(self.ppg_buffer) <= 10:
+            return
+        timestamps = self.ppg_buffer.latest()[1]
+        duration = timestamps[-1] - timestamps[0]
+        if duration < MIN_DETECTION_SECONDS:
+            return
+        actual_rate = len(timestamps) / duration
+        if abs(actual_rate - self.sample_rate) > 10:
+            # Sample rate mismatch - use actual rate
+            self.sample_rate = int(actual_rate)
+            logger.info(f"PPG actual sample rate: {actual_rate:.1f} Hz")
+            self._design_filter(self.sample_rate)
+
+    def _process_samples(self, values: np.ndarray, timestamps: np.ndarray):
+        """Filter new PPG samples and accept newly confirmed beats (caller holds the lock)"""
+        self._check_sample_rate()
+
+        # Filter only the new samples (state carried over from the previous chunk)
+        if self._filter is not None:
+            filtered = self._filter.process(values.reshape(-1, 1))[:, 0]
+        else:
+            filtered = values - np.mean(self.ppg_buffer.latest()[0])
+
+        # Normalize by the running amplitude so prominence thresholds are scale-free
+        weight = min(1.0, len(filtered) / (self.sample_rate * AMPLITUDE_TIME_CONSTANT))
+        chunk_power = float(np.mean(filtered ** 2))
+        self._power = chunk_power if self._power == 0 else (1 - weight) * self._power + weight * chunk_power
+        std_val = np.sqrt(self._power)
+        normalized = filtered / std_val if std_val > 0 else filtered
+        self._search.extend(np.column_stack((normalized, timestamps)))
+
+        # Need some history before the first search (filter settling)
+        ppg_timestamps = self.ppg_buffer.latest()[1]
+        if ppg_timestamps[-1] - ppg_timestamps[0] >= MIN_DETECTION_SECONDS:
+            for beat_time in self._find_new_beats():
+                self._add_beat(beat_time)
+
+        self._last_ppg_time = float(timestamps[-1])
+        self._expire_beats(self._last_ppg_time)
+
+    def _find_new_beats(self) -> List[float]:
+        """Confirmed peaks in the search window newer than the last accepted beat"""
+        window = self._search.latest()
+        search = window[0]
+        times = window[1]
+        # Minimum distance: 0.4s (150 BPM max)
+        min_distance_samples = max(1, int(self.sample_rate * MIN_BEAT_INTERVAL))
+        # A peak is final once a full minimum distance of samples follows it
+        confirmed_end = len(search) - min_distance_samples
+
+        def search_peaks(prominence: float) -> List[float]:
+            peak_indices, _ = signal.find_peaks(search, distance=min_distance_samples,
+                                                prominence=prominence)
+            beats = []
+            last = self.last_peak_time
+            for idx in peak_indices:
+                t = float(times[idx])
+                if idx >= confirmed_end:
+                    break
+                if last is not None and t - last < MIN_BEAT_INTERVAL:
+                    continue
+                beats.append(t)
+                last = t
+            return beats
+
+        # Require some prominence to avoid noise
+        beats = search_peaks(0.3)
+        if not beats and (self.last_peak_time is None
+                          or times[-1] - self.last_peak_time > MAX_RR_MS / 1000):
+            # No beat for too long - try with lower prominence
+            beats = search_peaks(0.1)
+        return beats
+
+    def _add_beat(self, beat_time: float):
+        """Record a beat and update the RR running sums"""
+        previous = self.last_peak_time
+        self.last_peak_time = beat_time
+        self.peak_times.append(beat_time)
+        self._metrics = None
+        if previous is None:
+            return
+
+        rr_ms = (beat_time - previous) * 1000  # Convert to milliseconds
+        if not MIN_RR_MS <= rr_ms <= MAX_RR_MS:
+            self._outliers += 1
+            # Only log occasionally to avoid spam
+            if self._outliers <= 3:
+                logger.debug(f"Outlier RR: {rr_ms:.0f}ms")
+            return
+
+        if self._rr_count > 0:
+            previous_rr = self.rr_buffer.last()[1]
+            self._rr_diff_sum_sq += (rr_ms - previous_rr) ** 2
+        if self._rr_count == self.rr_buffer.capacity:
+            self._evict_oldest()
+        self.rr_buffer.append(np.array([beat_time, rr_ms]))
+        self._rr_count += 1
+        self._rr_sum += rr_ms
+        self._rr_sum_sq += rr_ms ** 2
+        self._metrics = None
+
+    def _evict_oldest(self):
+        """Drop the oldest RR interval of the window from the running sums"""
+        oldest = self.rr_buffer.latest(self._rr_count)[1, :2]
+        self._rr_sum -= oldest[0]
+        self._rr_sum_sq -= oldest[0] ** 2
+        if self._rr_count >= 2:
+            self._rr_diff_sum_sq -= (oldest[1] - oldest[0]) ** 2
+        self._rr_count -= 1
+        if self._rr_count == 0:
+            # Reset exactly (no floating point residue)
+            self._rr_sum = self._rr_sum_sq = self._rr_diff_sum_sq = 0.0
+        self._metrics = None
+
+    def _expire_beats(self, now: float):
+        """Drop RR intervals older than HRV_WINDOW_SECONDS"""
+        while self._rr_count > 0 and now - self.rr_buffer.latest(self._rr_count)[0, 0] > HRV_WINDOW_SECONDS:
+            self._evict_oldest()
+
+    def extended_due(self) -> bool:
+        """True (once per interval of PPG time) when extended metrics should be refreshed"""
+        if self.extended_interval <= 0 or self._last_ppg_time is None or self._rr_count < 3:
+            return False
+        if self._extended_time is not None and self._last_ppg_time - self._extended_time < self.extended_interval:
+            return False
+        self._extended_time = self._last_ppg_time
+        return True
+
+    def update_extended_metrics(self) -> Dict:
+        """
+        Recompute LF/HF, pNN50 and SD1/SD2 over the sliding RR window
+
+        Runs on a background worker; only the RR snapshot is taken under the lock.
+
+        Returns:
+            The new extended metrics
+        """
+        with self._buffer_lock:
+            if self._last_ppg_time is None:
+                return dict(self._extended)
+            beats = self.rr_buffer.latest()
+            recent = beats[0] >= self._last_ppg_time - HRV_EXTENDED_WINDOW_SECONDS
+            beat_times = beats[0, recent].copy()
+            rr_ms = beats[1, recent].copy()
+
+        extended = compute_extended_hrv(beat_times, rr_ms)
+        with self._buffer_lock:
+            self._extended = extended
+        return dict(extended)
 
     def detect_peaks(self) -> List[float]:
         """
-        Detect peaks in PPG signal (heartbeats) using scipy.signal.find_peaks
+        Heartbeats of the HRV window (detected incrementally in update_ppg)
 
         Returns:
-            List of timestamps where peaks were detected
+            List of beat timestamps, oldest first
         """
-        if len(self.ppg_buffer) < 10:  # Need some data
-            return []
-
-        # Check if we have at least 3 seconds of data based on timestamps
-        timestamps_check = [item[1] for item in self.ppg_buffer]
-        duration = timestamps_check[-1] - timestamps_check[0]
-        if duration < 3.0:  # Need at least 3 seconds for reliable detection
-            return []
-
-        # Extract infrared channel values and timestamps
-        values = np.array([item[0] for item in self.ppg_buffer])
-        timestamps = np.array([item[1] for item in self.ppg_buffer])
-
-        if len(values) < 5:  # Need minimum samples
-            return []
-
-        # Calculate actual sample rate from timestamps
-        if len(timestamps) > 10:
-            actual_duration = timestamps[-1] - timestamps[0]
-            if actual_duration > 0:
-                actual_rate = len(timestamps) / actual_duration
-                if abs(actual_rate - self.sample_rate) > 10:
-                    # Sample rate mismatch - use actual rate
-                    self.sample_rate = int(actual_rate)
-                    logger.info(f"PPG actual sample rate: {actual_rate:.1f} Hz")
-
-        # Normalize signal (remove DC offset and scale)
-        values_normalized = values - np.mean(values)
-        std_val = np.std(values_normalized)
-
-        # Debug: log signal characteristics
-        if len(self.ppg_buffer) % 200 == 0:
-            logger.info(f"PPG signal: mean={np.mean(values):.0f}, std={std_val:.1f}, min={np.min(values):.0f}, max={np.max(values):.0f}")
-        if std_val > 0:
-            values_normalized = values_normalized / std_val
-
-        # Apply bandpass filter for PPG (0.5-4 Hz = 30-240 BPM)
-        # But only if sample rate is high enough (Nyquist > 4 Hz means fs > 8 Hz)
-        try:
-            if self.sample_rate >= 10:
-                sos = signal.butter(
-                    N=2,
-                    Wn=[0.5, 4],  # 0.5-4 Hz
-                    btype='bandpass',
-                    fs=self.sample_rate,
-                    output='sos'
-                )
-                filtered = signal.sosfilt(sos, values_normalized)
-            else:
-                # Low sample rate - just use normalized signal (already smooth)
-                logger.debug(f"PPG sample rate too low for bandpass filter: {self.sample_rate} Hz")
-                filtered = values_normalized
-        except Exception as e:
-            logger.debug(f"Filter error: {e}")
-            filtered = values_normalized
-
-        # Use scipy.signal.find_peaks with physiologically reasonable constraints
-        # Minimum distance: 0.4s (150 BPM max), Maximum distance: 2s (30 BPM min)
-        min_distance_samples = max(1, int(self.sample_rate * 0.4))  # ~150 BPM max, min 1
-
-        # Find peaks using scipy (much more robust)
-        peak_indices, properties = signal.find_peaks(
-            filtered,
-            distance=min_distance_samples,
-            prominence=0.3,  # Require some prominence to avoid noise
-            height=None  # Don't filter by height
-        )
-
-        if len(peak_indices) < 2:
-            # Try with lower prominence
-            peak_indices, _ = signal.find_peaks(
-                filtered,
-                distance=min_distance_samples,
-                prominence=0.1,
-            )
-
-        # Convert indices to timestamps
-        peak_timestamps = []
-        for idx in peak_indices:
-            if 0 <= idx < len(timestamps):
-                peak_timestamps.append(timestamps[idx])
-        
-        # Update peak_times for partial data fallback
-        self.peak_times = peak_timestamps
-
-        # Debug: log peak detection results periodically
-        if len(self.ppg_buffer) % 200 == 0:
-            logger.info(f"Peak detection: found {len(peak_indices)} peaks, sample_rate={self.sample_rate}, buffer_size={len(self.ppg_buffer)}")
-            if len(filtered) > 0:
-                logger.info(f"Filtered signal: min={np.min(filtered):.3f}, max={np.max(filtered):.3f}")
-
-        return peak_timestamps
+        with self._buffer_lock:
+            if self.last_peak_time is None:
+                return []
+            start = self.last_peak_time - HRV_WINDOW_SECONDS
+            return [t for t in self.peak_times if t >= start]
 
     def calculate_hrv(self) -> Dict:
         """
-        Calculate HRV metrics from detected peaks
+        Calculate HRV metrics from the RR running sums
 
         Returns:
             Dictionary with HRV metrics
         """
-        # Debug: log buffer state periodically
-        if len(self.ppg_buffer) > 0 and len(self.ppg_buffer) % 100 == 0:
-            values = [item[0] for item in list(self.ppg_buffer)[-10:]]
-            logger.info(f"HRV buffer: {len(self.ppg_buffer)} samples, recent values: {values[:3]}")
-
-        peaks = self.detect_peaks()
-
-        if len(peaks) < 3:  # Need at least 3 peaks for 2 RR intervals
-            return {
-                'heart_rate': 0,
-                'hrv_rmssd': 0,
-                'hrv_sdnn': 0,
-                'rr_intervals': [],
-                'valid': False,
-                'debug': {'peaks_found': len(peaks), 'buffer_size': len(self.ppg_buffer), 'reason': 'insufficient_peaks'}
-            }
-
-        # Calculate RR intervals (time between peaks)
-        # Peaks are timestamps in seconds, convert to milliseconds
-        rr_intervals = []
-        outliers = 0
-        for i in range(1, len(peaks)):
-            rr_seconds = peaks[i] - peaks[i-1]
-            rr_ms = rr_seconds * 1000  # Convert to milliseconds
-            # Valid RR interval: 400-2000ms (30-150 bpm)
-            if 400 <= rr_ms <= 2000:
-                rr_intervals.append(rr_ms)
-            else:
-                outliers += 1
-                # Only log occasionally to avoid spam
-                if outliers <= 3:
-                    logger.debug(f"Outlier RR: {rr_ms:.0f}ms")
-
-        if len(rr_intervals) < 2:
+        n = self._rr_count
+        if n < 2:
             return {
                 'heart_rate': 0,
                 'hrv_rmssd': 0,
                 'hrv_sdnn': 0,
                 'rr_intervals': [],
                 'valid': False,
-                'debug': {'peaks_found': len(peaks), 'valid_rr': len(rr_intervals), 'outliers': outliers}
+                'debug': {'peaks_found': len(self.peak_times), 'valid_rr': n, 'outliers': self._outliers,
+                          'buffer_size': len(self.ppg_buffer), 'reason': 'insufficient_peaks'}
             }
 
         # Calculate heart rate (bpm)
-        avg_rr = np.mean(rr_intervals)
+        avg_rr = self._rr_sum / n
         heart_rate = 60000 / avg_rr if avg_rr > 0 else 0
 
-        # Calculate RMSSD (Root Mean Square of Successive Differences)
-        # This is a measure of short-term HRV
+        # RMSSD (Root Mean Square of Successive Differences) - short-term HRV
         # RMSSD should typically be 20-100ms for healthy adults at rest
-        successive_diffs = np.diff(rr_intervals)
-        rmssd = np.sqrt(np.mean(successive_diffs ** 2))
+        rmssd = np.sqrt(max(0.0, self._rr_diff_sum_sq) / (n - 1))
 
-        # Calculate SDNN (Standard Deviation of NN intervals)
-        # This is a measure of overall HRV
-        sdnn = np.std(rr_intervals)
+        # SDNN (Standard Deviation of NN intervals) - overall HRV
+        sdnn = np.sqrt(max(0.0, self._rr_sum_sq / n - avg_rr ** 2))
 
         # Sanity check - if RMSSD is way too high, something is wrong
-        # Only log occasionally to avoid spam
-        if rmssd > 200 and len(self.ppg_buffer) % 500 == 0:
-            logger.warning(f"RMSSD unusually high: {rmssd:.1f}ms - low PPG sample rate may cause inaccurate HRV")
-            logger.debug(f"RR intervals: {rr_intervals}")
+        if rmssd > 200:
+            logger.debug(f"RMSSD unusually high: {rmssd:.1f}ms - low PPG sample rate may cause inaccurate HRV")
 
         # Cache the valid heart rate
         self.last_valid_heart_rate = float(heart_rate)
-        
+
+        recent = self.rr_buffer.latest(min(n, 10))[1]
         return {
             'heart_rate': float(heart_rate),
             'hrv_rmssd': float(rmssd),
             'hrv_sdnn': float(sdnn),
-            'rr_intervals': [float(rr) for rr in rr_intervals[-10:]],  # Last 10 intervals
+            'rr_intervals': [float(rr) for rr in recent],  # Last 10 intervals
             'valid': True,
-            'debug': {'peaks_found': len(peaks), 'valid_rr': len(rr_intervals), 'avg_rr_ms': avg_rr}
+            'debug': {'peaks_found': len(self.peak_times), 'valid_rr': n, 'avg_rr_ms': avg_rr}
         }
 
     def get_current_metrics(self) -> Dict:
         """
-        Get current HRV metrics (called periodically)
+        Get current HRV metrics (cached until a beat arrives or ages out)
 
         Returns:
-            Dictionary with current HRV metrics
+            Dictionary with current HRV metrics (caller may modify it)
         """
+        with self._buffer_lock:
+            if self._metrics is None:
+                self._metrics = self._compute_metrics()
+            return {**self._metrics, **self._extended}
+
+    def _compute_metrics(self) -> Dict:
         metrics = self.calculate_hrv()
-        
+
         # If not fully valid but we have a cached heart rate, use it (better than showing 0)
         if not metrics.get('valid', False) and self.last_valid_heart_rate > 0:
             metrics['heart_rate'] = self.last_valid_heart_rate
             metrics['valid'] = True  # Allow display
             metrics['cached'] = True  # Mark as cached/estimated
-        
+
         # If we have some peaks but not enough for full validation, try to estimate
         elif not metrics.get('valid', False) and len(self.peak_times) >= 2:
             # Calculate basic heart rate from last two peaks
@@ -269,6 +472,5 @@ class HRVCalculator:
                     metrics['valid'] = True  # Mark as valid for display
                     metrics['partial'] = True  # But mark as partial data
                     self.last_valid_heart_rate = float(heart_rate)
-        
-        return metrics
 
+        return metrics
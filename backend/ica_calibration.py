@@ -0,0 +1,255 @@
+"""
+ICA Calibration
+Decides when a pipeline's ICA is fitted or refitted, and on which data
+
+The fit itself runs on a dedicated worker (see fit_ica_in_background
+in main.py), so the event loop keeps streaming while MNE works. The previous
+model keeps cleaning windows until the new one is swapped in. This class
+tracks the sliding buffer of filtered EEG that fits use, plus the status
+shown in the frontend's ica_status:
+
+    calibrating -> fitting -> ready -> (recalibrating ->) refitting -> ready
+
+When a cached calibration exists (see calibration_store), it is validated
+against the first few seconds of data and used if it still fits (warm start).
+The normal calibration keeps collecting meanwhile in case it is rejected.
+
+A refit is scheduled every `refit_seconds`. One is also triggered early when
+the rolling signal confidence drops, which usually means headband contact
+has changed. In that case fresh data is collected first, so the new model
+only sees the new contact.
+"""
+
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+import logging
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+logger = logging.getLogger(__name__)
+
+ICA_CALIBRATION_SECONDS = 30     # Data used for each fit
+ICA_REFIT_SECONDS = 600          # Scheduled refit interval (0 = never)
+ICA_REFIT_MIN_INTERVAL = 120     # Minimum time between refits
+ICA_REFIT_MIN_CONFIDENCE = 40    # Refit when rolling signal confidence drops below this...
+ICA_QUALITY_WINDOW_SECONDS = 15  # ...averaged over this long
+ICA_RESELECT_SECONDS = 60        # Re-choose artifact components on recent data this often
+ICA_VALIDATION_SECONDS = 5       # Fresh data a cached calibration is validated against
+
+
+class ICACalibration:
+    """
+    ICA fit scheduling and status for one pipeline session
+    """
+
+    def __init__(self, n_channels: int = 4, sample_rate: int = 256,
+                 calibration_seconds: float = ICA_CALIBRATION_SECONDS,
+                 refit_seconds: float = ICA_REFIT_SECONDS,
+                 min_refit_interval: float = ICA_REFIT_MIN_INTERVAL,
+                 min_confidence: float = ICA_REFIT_MIN_CONFIDENCE,
+                 quality_window_seconds: float = ICA_QUALITY_WINDOW_SECONDS,
+                 reselect_seconds: float = ICA_RESELECT_SECONDS,
+                 validation_seconds: float = ICA_VALIDATION_SECONDS):
+        """
+        Args:
+            n_channels: EEG channels
+            sample_rate: EEG sample rate (Hz)
+            calibration_seconds: Length of data each fit uses
+            refit_seconds: Scheduled refit interval (0 disables)
+            min_refit_interval: Minimum time between refits (seconds)
+            min_confidence: Rolling confidence that triggers a quality refit (0 disables)
+            quality_window_seconds: Span the rolling confidence is averaged over
+            reselect_seconds: Interval for re-choosing artifact components (0 disables)
+            validation_seconds: Data collected before validating a cached calibration
+        """
+        self.sample_rate = sample_rate
+        self.calibration_seconds = calibration_seconds
+        self.refit_seconds = refit_seconds
+        self.min_refit_interval = min_refit_interval
+        self.min_confidence = min_confidence
+        self.quality_window_seconds = quality_window_seconds
+        self.reselect_seconds = reselect_seconds
+
+        # Sliding buffer of the most recent filtered EEG (always filling)
+        self.target_samples = int(calibration_seconds * sample_rate)
+        self.validation_samples = min(self.target_samples, int(validation_seconds * sample_rate))
+        self.buffer = RingBuffer(n_channels, self.target_samples)
+        self.reset()
+
+    def reset(self):
+        """Forget the model status and collected data (e.g. on reconnect)"""
+        self.buffer.clear()
+        self.state = 'calibrating'
+        self.fitted = False
+        self.samples_collected = 0        # Since collection (re)started
+        self.fit_count = 0
+        self.fit_reason: Optional[str] = None
+        self.last_fit_time: Optional[float] = None        # LSL time of the last fit attempt
+        self.last_fit_duration = 0.0                        # Seconds the last fit took
+        self.components_time: Optional[float] = None      # LSL time components were chosen
+        self.warm_start: Optional[str] = None  # None, 'pending', 'validating', 'restored', 'rejected'
+        self._fit_started_at = 0.0
+        self._quality: Deque[Tuple[float, float]] = deque()  # (timestamp, confidence)
+
+    @property
+    def is_fitting(self) -> bool:
+        """True while a fit runs in the background"""
+        return self.state in ('fitting', 'refitting')
+
+    @property
+    def progress(self) -> int:
+        """Data collection progress (0-100) of the pending fit"""
+        if self.state in ('calibrating', 'recalibrating'):
+            return min(100, int(self.samples_collected * 100 / self.target_samples))
+        return 100
+
+    def add_samples(self, samples: np.ndarray):
+        """
+        Append newly arrived filtered EEG
+
+        Args:
+            samples: [n_samples, n_channels] chunk
+        """
+        if samples.shape[0] == 0:
+            return
+        self.buffer.extend(samples)
+        self.samples_collected += samples.shape[0]
+
+    def observe_quality(self, timestamp: float, confidence: float):
+        """
+        Track signal confidence of analysed windows (quality-triggered refits)
+
+        Args:
+            timestamp: Window timestamp (LSL clock)
+            confidence: Signal confidence 0-100
+        """
+        self._quality.append((timestamp, confidence))
+        while self._quality and timestamp - self._quality[0][0] > self.quality_window_seconds:
+            self._quality.popleft()
+
+        if not self.fitted or self.state != 'ready' or self.min_confidence <= 0:
+            return
+        if self._quality[-1][0] - self._quality[0][0] < self.quality_window_seconds * 0.9:
+            return  # Not enough history yet
+        if self.last_fit_time is not None and timestamp - self.last_fit_time < self.min_refit_interval:
+            return
+
+        mean_confidence = sum(c for _, c in self._quality) / len(self._quality)
+        if mean_confidence < self.min_confidence:
+            # Contact likely changed - collect fresh data before refitting
+            logger.info(f"ICA: signal confidence {mean_confidence:.0f} < {self.min_confidence} - recalibrating")
+            self.state = 'recalibrating'
+            self.samples_collected = 0
+            self._quality.clear()
+
+    def fit_due(self, timestamp: float) -> Optional[str]:
+        """
+        Reason a fit should start now, or None
+
+        Args:
+            timestamp: Current LSL time
+        """
+        if self.is_fitting or self.samples_collected < self.target_samples:
+            return None
+        if self.warm_start == 'validating':
+            return None
+        if self.state == 'calibrating':
+            return 'initial'
+        if self.state == 'recalibrating':
+            return 'quality'
+        if (self.refit_seconds > 0 and self.last_fit_time is not None
+                and timestamp - self.last_fit_time >= max(self.refit_seconds, self.min_refit_interval)):
+            return 'scheduled'
+        return None
+
+    def start_fit(self, reason: str) -> np.ndarray:
+        """
+        Mark a fit as in flight and return its data
+
+        Returns:
+            Owned copy of the calibration data [n_channels, n_samples]
+        """
+        self.state = 'refitting' if self.fitted else 'fitting'
+        self.fit_reason = reason
+        self._fit_started_at = time.perf_counter()
+        return self.buffer.latest(self.target_samples).copy()
+
+    def finish_fit(self, success: bool, timestamp: float):
+        """
+        Record the outcome of a background fit
+
+        Args:
+            success: Whether the new model was swapped in
+            timestamp: LSL time of the newest sample the fit used
+        """
+        self.last_fit_duration = time.perf_counter() - self._fit_started_at
+        self.last_fit_time = timestamp
+        if success:
+            self.fitted = True
+            self.fit_count += 1
+            self.components_time = timestamp
+            self.state = 'ready'
+            self._quality.clear()
+        elif self.fitted:
+            self.state = 'ready'  # Keep the previous model, retry after min_refit_interval
+        else:
+            # Retry the initial fit on fresh data
+            self.state = 'calibrating'
+            self.samples_collected = 0
+
+    def expect_warm_start(self):
+        """A cached calibration is available - validate it once data arrives"""
+        if not self.fitted:
+            self.warm_start = 'pending'
+
+    def validation_due(self) -> bool:
+        """True (once) when enough fresh data is collected to validate the cached calibration"""
+        if self.warm_start != 'pending' or self.fitted or self.samples_collected < self.validation_samples:
+            return False
+        self.warm_start = 'validating'
+        return True
+
+    def validation_data(self) -> np.ndarray:
+        """Owned copy of the freshest data for validation [n_channels, n_samples]"""
+        return self.buffer.latest(self.validation_samples).copy()
+
+    def finish_validation(self, valid: bool, timestamp: float):
+        """
+        Record the outcome of validating a cached calibration
+
+        Args:
+            valid: Whether the cached model was swapped in
+            timestamp: Current LSL time
+        """
+        if valid and not self.fitted:
+            self.fitted = True
+            self.state = 'ready'
+            self.fit_reason = 'restored'
+            self.last_fit_time = timestamp
+            self.components_time = timestamp
+            self.warm_start = 'restored'
+        else:
+            self.warm_start = 'rejected'  # Calibration continues normally
+
+    def reselect_due(self, timestamp: float) -> bool:
+        """True when artifact components should be re-chosen on recent data"""
+        if not self.fitted or self.is_fitting or self.reselect_seconds <= 0:
+            return False
+        if self.components_time is None or timestamp - self.components_time < self.reselect_seconds:
+            return False
+        self.components_time = timestamp
+        return True
+
+    def get_status(self) -> Dict:
+        """Status for the frontend (ica_status)"""
+        return {
+            'fitted': bool(self.fitted),
+            'progress': int(self.progress),
+            'state': self.state,
+            'fit_count': int(self.fit_count),
+            'reason': self.fit_reason,
+            'warm_start': self.warm_start,
+        }
@@ -0,0 +1,236 @@
+"""
+IMU Feature Engine
+One pass over ACC/GYRO per analysis hop, shared by every IMU consumer
+
+TalkingDetector, ArtifactDetector and the posture interpretation each kept
+their own IMU buffers and recomputed overlapping features. Those included
+magnitudes via per-sample np.linalg.norm loops, a Welch PSD of gyro Y, and
+pitch/roll re-averaged from a list every second. IMUFeatureEngine ingests the
+full-rate chunks of each hop into ring buffers and computes, vectorized:
+
+- ACC/GYRO magnitudes and variances (movement, jaw micro-movement)
+- the gyro Y spectrum once: speech rhythm (2-5 Hz) and breathing (0.2-0.5 Hz) shares
+- orientation (pitch/roll) from a complementary filter, with running
+  posture mean/std over the posture window
+
+The result is an IMUFeatures snapshot that all consumers read.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+import logging
+
+import numpy as np
+from scipy import signal
+
+from ring_buffer import RingBuffer
+from state_smoother import RunningWindow
+
+logger = logging.getLogger(__name__)
+
+IMU_SAMPLE_RATE = 52            # Muse 2 ACC/GYRO rate (Hz)
+IMU_BUFFER_SECONDS = 3.0        # History for variances and the rhythm spectrum
+ACC_MOTION_SAMPLES = 10         # Recent ACC samples for the magnitude variance (movement)
+SPEECH_BAND = (2.0, 5.0)        # Hz, syllable rate
+BREATHING_BAND = (0.2, 0.5)     # Hz, 12-30 breaths per minute
+RHYTHM_REFERENCE_BAND = (0.1, 10.0)  # Hz, power the breathing score is relative to
+COMPLEMENTARY_ALPHA = 0.98      # Gyro weight of the orientation filter (per sample)
+MIN_GRAVITY = 0.5               # g, below this the ACC vector is not a usable gravity reference
+POSTURE_WINDOW = 60             # Hops in the running posture statistics
+
+
+@dataclass
+class IMUFeatures:
+    """IMU features of one analysis hop (shared by all consumers)"""
+    timestamp: float
+    n_acc: int = 0                          # New samples this hop
+    n_gyro: int = 0
+    buffered_acc: int = 0                   # Samples in the history buffers
+    buffered_gyro: int = 0
+    acc_latest: Optional[np.ndarray] = None   # Newest ACC sample [x, y, z] (g)
+    gyro_latest: Optional[np.ndarray] = None  # Newest GYRO sample [x, y, z] (deg/s)
+    acc_magnitude_var: float = 0.0          # Variance of |acc| over the last ACC_MOTION_SAMPLES
+    acc_axis_var: float = 0.0               # Mean per-axis ACC variance over the buffer
+    gyro_magnitude_mean: float = 0.0        # Mean |gyro| over this hop
+    gyro_y_var: float = 0.0                 # Variance of gyro Y (jaw) over the buffer
+    speech_rhythm: float = 0.0              # Share of gyro Y power at 2-5 Hz (0-1)
+    breathing_score: float = 0.0            # Breathing-dominated gyro Y rhythm (0-1)
+    pitch: Optional[float] = None           # Orientation at the end of the hop (degrees)
+    roll: Optional[float] = None
+    posture: Optional[Dict] = None          # {'pitch', 'roll', 'pitch_std', 'roll_std', 'count'}
+
+
+class IMUFeatureEngine:
+    """
+    Buffers ACC/GYRO chunks and computes IMUFeatures once per hop
+    """
+
+    def __init__(self, sample_rate: int = IMU_SAMPLE_RATE,
+                 buffer_seconds: float = IMU_BUFFER_SECONDS,
+                 posture_window: int = POSTURE_WINDOW):
+        """
+        Args:
+            sample_rate: ACC/GYRO sample rate (Hz)
+            buffer_seconds: History kept for variances and the rhythm spectrum
+            posture_window: Hops averaged for posture (pitch/roll mean and std)
+        """
+        self.sample_rate = sample_rate
+        capacity = int(sample_rate * buffer_seconds)
+        self.acc_buffer = RingBuffer(3, capacity)
+        self.gyro_buffer = RingBuffer(3, capacity)
+        self.posture_window = posture_window
+        self._posture = RunningWindow(2, posture_window)
+        self._orientation: Optional[np.ndarray] = None  # Filter state [pitch, roll] (degrees)
+        self.latest: Optional[IMUFeatures] = None
+
+    def reset(self):
+        """Forget buffered samples, orientation and posture history"""
+        self.acc_buffer.clear()
+        self.gyro_buffer.clear()
+        self._posture = RunningWindow(2, self.posture_window)
+        self._orientation = None
+        self.latest = None
+
+    @staticmethod
+    def _as_chunk(data: Optional[np.ndarray]) -> np.ndarray:
+        """[n, 3] float chunk (single samples and extra columns allowed)"""
+        if data is None:
+            return np.zeros((0, 3))
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim == 1:
+            data = data.reshape(1, -1)
+        if data.ndim != 2 or data.shape[1] < 3:
+            return np.zeros((0, 3))
+        return data[:, :3]
+
+    def update(self, acc: Optional[np.ndarray], gyro: Optional[np.ndarray],
+               timestamp: float) -> IMUFeatures:
+        """
+        Ingest the hop's new samples and compute its features
+
+        Args:
+            acc: ACC samples since the previous hop [n, 3] (g), a single sample, or None
+            gyro: GYRO samples since the previous hop [n, 3] (deg/s), a single sample, or None
+            timestamp: Hop timestamp (LSL clock)
+
+        Returns:
+            IMUFeatures (also kept as self.latest)
+        """
+        acc = self._as_chunk(acc)
+        gyro = self._as_chunk(gyro)
+        if acc.shape[0] > 0:
+            self.acc_buffer.extend(acc)
+        if gyro.shape[0] > 0:
+            self.gyro_buffer.extend(gyro)
+
+        features = IMUFeatures(
+            timestamp=float(timestamp),
+            n_acc=acc.shape[0],
+            n_gyro=gyro.shape[0],
+            buffered_acc=len(self.acc_buffer),
+            buffered_gyro=len(self.gyro_buffer),
+            acc_latest=self.acc_buffer.last().copy() if len(self.acc_buffer) else None,
+            gyro_latest=self.gyro_buffer.last().copy() if len(self.gyro_buffer) else None,
+        )
+
+        if gyro.shape[0] > 0:
+            features.gyro_magnitude_mean = float(np.mean(np.linalg.norm(gyro, axis=1)))
+
+        if len(self.acc_buffer) > ACC_MOTION_SAMPLES:
+            recent = self.acc_buffer.latest(ACC_MOTION_SAMPLES)
+            features.acc_magnitude_var = float(np.var(np.linalg.norm(recent, axis=0)))
+        if len(self.acc_buffer) >= self.sample_rate:
+            features.acc_axis_var = float(np.mean(np.var(self.acc_buffer.latest(), axis=1)))
+
+        if len(self.gyro_buffer) > 0:
+            gyro_y = self.gyro_buffer.latest()[1]
+            features.gyro_y_var = float(np.var(gyro_y))
+            if len(gyro_y) >= self.sample_rate:
+                features.speech_rhythm, features.breathing_score = self._rhythm(gyro_y)
+
+        self._update_orientation(acc, gyro, features)
+        self.latest = features
+        return features
+
+    def _rhythm(self, gyro_y: np.ndarray):
+        """Speech-rhythm share and breathing score from one gyro Y spectrum"""
+        try:
+            frequencies, psd = signal.welch(gyro_y, fs=self.sample_rate,
+                                            nperseg=min(2 * self.sample_rate, len(gyro_y)))
+        except Exception as e:
+            logger.debug(f"Error in rhythm spectrum: {e}")
+            return 0.0, 0.0
+
+        def power(band) -> float:
+            return float(np.sum(psd[(frequencies >= band[0]) & (frequencies <= band[1])]))
+
+        total = float(np.sum(psd))
+        speech_ratio = power(SPEECH_BAND) / total if total > 0 else 0.0
+
+        # Breathing: slow rhythm dominant and little speech activity
+        reference = power(RHYTHM_REFERENCE_BAND)
+        breathing_score = 0.0
+        if reference > 0:
+            breathing_ratio = power(BREATHING_BAND) / reference
+            speech_share = power(SPEECH_BAND) / reference
+            if speech_share < 0.1:  # Very little speech activity
+                breathing_score = min(1.0, breathing_ratio * 2.0)
+            else:
+                breathing_score = max(0.0, breathing_ratio - speech_share)
+        return speech_ratio, breathing_score
+
+    def _update_orientation(self, acc: np.ndarray, gyro: np.ndarray, features: IMUFeatures):
+        """Complementary filter over the hop's samples (vectorized as a first-order IIR)"""
+        if acc.shape[0] == 0:
+            if self._orientation is not None:
+                features.pitch, features.roll = (float(v) for v in self._orientation)
+            features.posture = self._posture_stats()
+            return
+
+        magnitude = np.linalg.norm(acc, axis=1)
+        valid = magnitude > MIN_GRAVITY
+        if not np.any(valid):
+            features.posture = self._posture_stats()
+            return
+        acc = acc[valid]
+        magnitude = magnitude[valid]
+        # Gravity-vector angles (degrees): pitch forward/backward, roll left/right
+        acc_angles = np.degrees(np.column_stack((
+            np.arcsin(np.clip(-acc[:, 0] / magnitude, -1, 1)),
+            np.arcsin(np.clip(acc[:, 1] / magnitude, -1, 1)),
+        )))
+
+        # Angular rates (deg/s) for pitch (about y) and roll (about x), paired with
+        # the newest ACC samples; missing gyro samples fall back to ACC only
+        rates = np.zeros_like(acc_angles)
+        n_pairs = min(gyro.shape[0], acc_angles.shape[0])
+        if n_pairs > 0:
+            rates[-n_pairs:] = gyro[-n_pairs:][:, [1, 0]]
+
+        alpha = COMPLEMENTARY_ALPHA
+        dt = 1.0 / self.sample_rate
+        # angle[n] = alpha * (angle[n-1] + rate[n] * dt) + (1 - alpha) * acc_angle[n]
+        drive = alpha * rates * dt + (1 - alpha) * acc_angles
+        start = self._orientation if self._orientation is not None else acc_angles[0]
+        orientation, _ = signal.lfilter([1.0], [1.0, -alpha], drive, axis=0,
+                                        zi=(alpha * start).reshape(1, 2))
+        self._orientation = orientation[-1].copy()
+        features.pitch, features.roll = (float(v) for v in self._orientation)
+
+        # Posture: mean orientation of this hop into the running window
+        self._posture.add(np.mean(orientation, axis=0))
+        features.posture = self._posture_stats()
+
+    def _posture_stats(self) -> Optional[Dict]:
+        """Running posture mean/std over the posture window (O(1))"""
+        if len(self._posture) == 0:
+            return None
+        mean = self._posture.mean()
+        std = self._posture.std()
+        return {
+            'pitch': float(mean[0]),
+            'roll': float(mean[1]),
+            'pitch_std': float(std[0]),
+            'roll_std': float(std[1]),
+            'count': len(self._posture),
+        }
@@ -4,10 +4,13 @@ FastAPI server with WebSocket for real-time EEG streaming
 """
 
 import asyncio
+import functools
 import logging
+import os
 import numpy as np
 import time
 from collections import deque
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,15 +18,17 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import json
 
-from muse_stream import MuseStreamer
-from signal_processor import SignalProcessor, get_brain_state
-from artifact_detector import ArtifactDetector
-from hrv_calculator import HRVCalculator
-from mne_processor import MNEProcessor
+from muse_stream import SensorChunk
+from signal_processor import get_brain_state
+from hrv_calculator import HRVCalculator, autonomic_balance
 from state_smoother import StateSmoother
 from mental_state_interpreter import MentalStateInterpreter
 from session_recorder import session_recorder
-from talking_detector import TalkingDetector
+from window_analysis import AnalysisExecutor, AnalysisStages, AnalysisWindow, WindowFeatures
+from pipeline_session import PipelineSession, PipelineRegistry, PipelineLimitError, DEFAULT_SESSION
+from calibration_store import CalibrationStore, validate_calibration
+from ws_protocol import PROTOCOL_JSON, PROTOCOLS
+from ws_topics import for_subscription, select_channels
 try:
     from conversation_analyzer.backend.routes import router as conversation_router
     HAS_CONVERSATION_ANALYZER = True
@@ -60,157 +65,121 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global instances
-muse_streamer = MuseStreamer()
-signal_processor = SignalProcessor()  # Keep for band power calculation
-mne_processor = MNEProcessor()  # MNE-based artifact removal
-artifact_detector = ArtifactDetector()
-hrv_calculator = HRVCalculator()
-state_smoother = StateSmoother(window_size=10)  # 10-second smoothing for better responsiveness to cognitive changes
-mental_state_interpreter = MentalStateInterpreter()
-talking_detector = TalkingDetector()  # Gyroscope-based talking detection
+# Analysis window / hop (counted in EEG samples against the LSL clock)
+# Defaults give strict 1 Hz processing; e.g. hop 0.25 gives a 1 s window every 250 ms
+EEG_SAMPLE_RATE = 256
+ANALYSIS_WINDOW_SECONDS = 1.0
+ANALYSIS_HOP_SECONDS = 1.0
+
+# Window analysis runs in a worker pool so the event loop never stalls on DSP
+# One lane per headset keeps its windows in order; workers are shared
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+analysis_executor = AnalysisExecutor(max_workers=ANALYSIS_WORKERS)
+
+# ICA fits take seconds - they get their own worker so windows never wait behind them
+ica_executor = AnalysisExecutor(max_workers=1, name="ica-fit")
+
+# Fitted ICA + baselines per user/device, for warm starts on the next connect
+CALIBRATION_DIR = os.getenv("CALIBRATION_DIR", "calibration")
+calibration_store = CalibrationStore(CALIBRATION_DIR)
+
+# Pipeline sessions (one per headset), keyed by device or user id
+# The "default" session records through the global session_recorder
+pipeline_registry = PipelineRegistry(
+    analysis_executor,
+    default_recorder=session_recorder,
+    sample_rate=EEG_SAMPLE_RATE,
+    window_seconds=ANALYSIS_WINDOW_SECONDS,
+    hop_seconds=ANALYSIS_HOP_SECONDS
+)
 
-# Cognitive metrics smoothing (shorter window for responsiveness)
-from collections import deque
-cognitive_load_history = deque(maxlen=8)  # 8-second window for cognitive load
-stress_history = deque(maxlen=8)  # 8-second window for stress
+# Global instances (stateless, shared by all sessions)
+mental_state_interpreter = MentalStateInterpreter()
 
-# AI Co-Pilot instance
+# AI Co-Pilot instance (one per server, fed by one pipeline session)
 copilot_session: Optional[CopilotSession] = None
-copilot_brain_state: Optional[dict] = None  # Latest brain state for copilot
+copilot_pipeline_key: str = DEFAULT_SESSION
 
-# Posture smoothing buffer with state locking
-posture_history: deque = deque(maxlen=60)  # 60 seconds of posture data
-posture_current_status: Optional[str] = None
-posture_change_time: float = 0.0
 POSTURE_MIN_DURATION: float = 10.0  # Minimum 10 seconds before posture status can change
 
 # Stream monitoring
-_last_data_received = 0.0  # Timestamp of last data received
 STREAM_TIMEOUT = 5.0  # Consider stream dead if no data for 5 seconds
 
-# ICA fitting state
-ica_fitted = False
-ica_fit_buffer = []  # Buffer for initial ICA fitting
-ica_fit_progress = 0  # Progress percentage (0-100)
-
-# Buffer to accumulate samples for processing
-# We'll process every 1 second (256 samples)
-BUFFER_SIZE = 256
-eeg_buffer = {
-    0: deque(maxlen=BUFFER_SIZE),  # TP9
-    1: deque(maxlen=BUFFER_SIZE),  # AF7
-    2: deque(maxlen=BUFFER_SIZE),  # AF8
-    3: deque(maxlen=BUFFER_SIZE),  # TP10
-}
-
 # Throttle EEG data sends to frontend (20 Hz instead of 256 Hz)
-_last_eeg_send_time = 0.0
 EEG_SEND_INTERVAL = 0.05  # 50ms = 20 Hz
 
 
-def get_session_context() -> Dict[str, bool]:
+def get_pipeline(session: str = DEFAULT_SESSION, device_id: Optional[str] = None,
+                 create: bool = False) -> PipelineSession:
+    """
+    Resolve the pipeline session for a request
+
+    Only connecting a headset or starting a recording creates a session
+    (create=True); other endpoints look it up, so a stray ?session= key
+    cannot allocate one. The "default" session always exists.
+
+    Raises:
+        HTTPException: 400 if the session key is invalid, 404 if the session
+                       does not exist, 503 if the session limit is reached
+    """
+    try:
+        if create or session == DEFAULT_SESSION:
+            return pipeline_registry.get_or_create(session, device_id=device_id)
+    except PipelineLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    pipeline = pipeline_registry.get(session)
+    if pipeline is None:
+        raise HTTPException(status_code=404, detail=f"Pipeline session not found: {session}")
+    return pipeline
+
+
+def get_session_context(session: PipelineSession) -> Dict[str, bool]:
     """
     Get current session context (meditation vs conversation)
-    
+
+    Args:
+        session: Pipeline session whose recording tags are checked
+
     Returns:
         Dict with 'is_meditation' and 'is_conversation' flags
     """
-    if not session_recorder.is_recording or not session_recorder.current_session:
+    recorder = session.recorder
+    current = recorder.current_session  # May be cleared by a stop running in a thread
+    if not recorder.is_recording or current is None:
         return {'is_meditation': False, 'is_conversation': False}
-    
-    tags = session_recorder.current_session.tags or []
+
+    tags = current.tags or []
     is_meditation = 'meditation' in [t.lower() for t in tags]
     is_conversation = 'conversation' in [t.lower() for t in tags] or 'chat' in [t.lower() for t in tags]
-    
+
     return {
         'is_meditation': is_meditation,
         'is_conversation': is_conversation
     }
 
 
-class ConnectionManager:
-    """Manages WebSocket connections"""
-
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-        logger.info(f"Client connected. Total: {len(self.active_connections)}")
-
-    def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-        logger.info(f"Client disconnected. Total: {len(self.active_connections)}")
-
-    async def broadcast(self, message: dict):
-        """Send message to all connected clients"""
-        import numpy as np
-        
-        # Convert numpy types to Python native types for JSON serialization
-        def convert_numpy(obj):
-            if isinstance(obj, np.integer):
-                return int(obj)
-            elif isinstance(obj, np.floating):
-                return float(obj)
-            elif isinstance(obj, np.bool_):
-                return bool(obj)
-            elif isinstance(obj, np.ndarray):
-                return obj.tolist()
-            elif isinstance(obj, dict):
-                return {k: convert_numpy(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_numpy(item) for item in obj]
-            return obj
-        
-        try:
-            json_message = convert_numpy(message)
-        except Exception as e:
-            logger.error(f"Error converting message to JSON: {e}", exc_info=True)
-            return
-        
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(json_message)
-            except Exception as e:
-                logger.error(f"Error sending to client: {e}", exc_info=True)
-                disconnected.append(connection)
-
-        # Remove disconnected clients
-        for connection in disconnected:
-            if connection in self.active_connections:
-                self.active_connections.remove(connection)
-
-
-manager = ConnectionManager()
-
-
-async def process_sensor_data(eeg_samples: np.ndarray, eeg_timestamp: float,
-                              ppg_data: Optional[np.ndarray] = None,
-                              acc_data: Optional[np.ndarray] = None,
-                              gyro_data: Optional[np.ndarray] = None):
+async def process_sensor_data(session: PipelineSession, chunk: SensorChunk):
     """
     Process incoming sensor data from all sources and broadcast to clients
 
     Args:
-        eeg_samples: EEG samples [n_samples, n_channels]
-        eeg_timestamp: LSL timestamp for EEG
-        ppg_data: PPG data [ambient, infrared, red] or None
-        acc_data: Accelerometer data [x, y, z] or None
-        gyro_data: Gyroscope data [x, y, z] or None
+        session: Pipeline session the chunk belongs to
+        chunk: SensorChunk with full-rate EEG [n, ch] plus every PPG, ACC and GYRO
+               sample pulled alongside it, each with per-sample LSL timestamps
     """
     try:
+        eeg_samples = chunk.eeg
         # Validate input
         if eeg_samples is None or eeg_samples.shape[0] == 0:
             logger.warning("Received empty EEG samples, skipping...")
             return
+        eeg_timestamp = chunk.first_timestamp
+        ppg_data = chunk.ppg
         
         # Update stream monitoring (use current time, not LSL timestamp)
-        global _last_data_received
-        _last_data_received = time.time()
+        session.last_data_received = time.time()
         
         # Update HRV calculator with PPG data (PPG comes at 64 Hz)
         if ppg_data is not None:
@@ -221,9 +190,16 @@ async def process_sensor_data(eeg_samples: np.ndarray, eeg_timestamp: float,
                 process_sensor_data._ppg_log_counter += 1
                 
                 if process_sensor_data._ppg_log_counter % 500 == 0:
-                    logger.info(f"PPG data received: shape={ppg_data.shape if hasattr(ppg_data, 'shape') else type(ppg_data)}, data={ppg_data}")
+                    logger.info(f"PPG data received: shape={ppg_data.shape}, last={ppg_data[-1]}")
                 
-                hrv_calculator.update_ppg(ppg_data, eeg_timestamp)
+                session.hrv_calculator.update_ppg(ppg_data, chunk.ppg_timestamps)
+
+                # LF/HF and Poincare metrics every few seconds on a worker (never on this path)
+                if ((session.hrv_task is None or session.hrv_task.done())
+                        and session.hrv_calculator.extended_due()):
+                    session.hrv_task = asyncio.create_task(
+                        analysis_executor.run(session.hrv_calculator.update_extended_metrics)
+                    )
             except Exception as e:
                 logger.warning(f"Error updating PPG: {e}", exc_info=True)
         else:
@@ -233,16 +209,46 @@ async def process_sensor_data(eeg_samples: np.ndarray, eeg_timestamp: float,
             if process_sensor_data._ppg_log_counter % 1000 == 0:
                 logger.warning("PPG data is None - check if Muse PPG stream is connected")
 
-        # Add EEG samples to buffers
-        for i in range(eeg_samples.shape[0]):
-            for ch in range(min(4, eeg_samples.shape[1])):  # Handle variable channel count
-                if ch < len(eeg_buffer):
-                    eeg_buffer[ch].append(eeg_samples[i, ch])
+        # Add every stream to its timestamped ring buffer (one vectorized write per chunk)
+        # Extra columns (e.g. Right AUX) are dropped
+        session.sensor_buffers.ingest('eeg', eeg_samples, chunk.eeg_timestamps)
+        session.sensor_buffers.ingest('ppg', chunk.ppg, chunk.ppg_timestamps)
+        session.sensor_buffers.ingest('acc', chunk.acc, chunk.acc_timestamps)
+        session.sensor_buffers.ingest('gyro', chunk.gyro, chunk.gyro_timestamps)
+
+        # Full-rate raw recording (queued here, written to memory-mapped files by the session log thread)
+        if session.recorder.is_recording:
+            session.recorder.add_raw_chunk('eeg', eeg_samples, chunk.eeg_timestamps)
+            session.recorder.add_raw_chunk('ppg', chunk.ppg, chunk.ppg_timestamps)
+            session.recorder.add_raw_chunk('acc', chunk.acc, chunk.acc_timestamps)
+            session.recorder.add_raw_chunk('gyro', chunk.gyro, chunk.gyro_timestamps)
+
+        # Sliding ICA calibration buffer (filtered EEG, every sample once)
+        if eeg_samples.shape[0] > 0:
+            session.ica_calibration.add_samples(
+                session.sensor_buffers.eeg_filtered.latest(eeg_samples.shape[0]).T
+            )
+
+        # Downsampled waveforms, one stream per subscribed display geometry
+        display_configs = {sub.display.key: sub.display for sub in session.manager.subscriptions('display')}
+        if display_configs:
+            for config in display_configs.values():
+                session.display_streams.ensure(config)
+            for message in session.display_streams.push(eeg_samples, chunk.eeg_timestamps, display_configs):
+                await session.manager.broadcast(message)
+        elif session.display_streams.downsamplers:
+            session.display_streams.clear()
+
+        # Full-rate EEG in fixed-size batches, only while someone subscribes to it
+        if session.manager.has_subscribers('eeg_raw'):
+            for batch in session.raw_batcher.push(eeg_samples, chunk.eeg_timestamps):
+                await session.manager.broadcast(batch)
+        else:
+            session.raw_batcher.reset()
 
     # Send raw data (last sample from each channel)
         # Throttle to ~20 Hz (every 50ms) to avoid overwhelming the frontend
         # We still process all samples for band power calculation
-        global _last_eeg_send_time
         if eeg_samples.shape[0] > 0:
             last_sample = eeg_samples[-1, :]
             # Ensure we only send 4 channels
@@ -250,11 +256,11 @@ async def process_sensor_data(eeg_samples: np.ndarray, eeg_timestamp: float,
             
             # Only send if enough time has passed (throttle to ~20 Hz)
             current_time = eeg_timestamp
-            if current_time - _last_eeg_send_time >= EEG_SEND_INTERVAL:
-                _last_eeg_send_time = current_time
+            if current_time - session.last_eeg_send_time >= EEG_SEND_INTERVAL:
+                session.last_eeg_send_time = current_time
                 
-                # Get HRV metrics (updated every second)
-                hrv_metrics = hrv_calculator.get_current_metrics()
+                # HRV metrics (cached, only recomputed when a new beat arrives)
+                hrv_metrics = session.hrv_calculator.get_current_metrics()
                 
                 # Include HRV in EEG data if we have any heart rate value
                 eeg_broadcast = {
@@ -269,447 +275,527 @@ async def process_sensor_data(eeg_samples: np.ndarray, eeg_timestamp: float,
                     eeg_broadcast['hrv_rmssd'] = float(hrv_metrics.get('hrv_rmssd', 0))
                     eeg_broadcast['hrv_sdnn'] = float(hrv_metrics.get('hrv_sdnn', 0))
                 
-                await manager.broadcast(eeg_broadcast)
+                await session.manager.broadcast(eeg_broadcast)
 
-        # Process band powers every BUFFER_SIZE samples (1 second)
-        if len(eeg_buffer[0]) >= BUFFER_SIZE:
+        # Process band powers once per hop (counted in samples, not per chunk)
+        window_timestamp = session.window_scheduler.push(eeg_samples.shape[0], eeg_timestamp)
+        if window_timestamp is not None and len(session.eeg_buffer) >= session.window_size:
             try:
                 # Get session context early for use throughout processing
-                session_context = get_session_context()
+                session_context = get_session_context(session)
 
                 # Prepare data for MNE processing [n_channels, n_samples]
-                eeg_for_mne = np.array([list(eeg_buffer[ch]) for ch in range(4)])  # [4, 256]
-                
-                # Detect bad channels (extreme values = poor contact)
-                bad_channels = artifact_detector.detect_bad_channels(eeg_for_mne.T, threshold=200)  # 200μV threshold
-                
+                # Owned copy - the analysis worker reads it while the buffers keep filling
+                eeg_for_mne = session.eeg_buffer.latest(session.window_size).copy()  # [4, 256]
+                # Same samples, bandpass/notch filtered on arrival (no per-window refiltering)
+                eeg_filtered = session.sensor_buffers.eeg_filtered.latest(session.window_size).copy()
+
+                # Every ACC/GYRO sample that arrived since the previous window (native 52 Hz)
+                acc_window, _ = session.sensor_buffers.take_new('acc')
+                gyro_window, _ = session.sensor_buffers.take_new('gyro')
+                acc_latest = session.sensor_buffers.latest_sample('acc')
+                gyro_latest = session.sensor_buffers.latest_sample('gyro')
+
                 # Log channel amplitudes periodically for diagnostics
                 if not hasattr(process_sensor_data, '_channel_log_counter'):
                     process_sensor_data._channel_log_counter = 0
                 process_sensor_data._channel_log_counter += 1
-                
-                if process_sensor_data._channel_log_counter % 60 == 0:  # Every 60 seconds
+
+                if process_sensor_data._channel_log_counter % session.window_scheduler.seconds_to_windows(60) == 0:  # Every 60 seconds
                     channel_amplitudes = np.max(np.abs(eeg_for_mne), axis=1)  # Max abs value per channel
                     channel_names = ['TP9', 'AF7', 'AF8', 'TP10']
                     logger.info(f"Channel amplitudes (max abs): {dict(zip(channel_names, [f'{a:.1f}μV' for a in channel_amplitudes]))}")
                     if np.max(channel_amplitudes) > 150:
                         logger.warning(f"High channel amplitude detected! Max: {np.max(channel_amplitudes):.1f}μV at {channel_names[np.argmax(channel_amplitudes)]}")
-                
-                # Exclude bad channels from averaging
-                good_channels = [ch for ch in range(4) if ch not in bad_channels]
-                if len(good_channels) == 0:
-                    # All channels bad - use all but mark as artifact
-                    good_channels = list(range(4))
-                    logger.warning("All channels have extreme values - using all channels but marking as artifact")
-                elif len(bad_channels) > 0:
-                    logger.warning(f"Bad channels detected: {bad_channels} (TP9={0 in bad_channels}, AF7={1 in bad_channels}, AF8={2 in bad_channels}, TP10={3 in bad_channels})")
-                
-                # Average across good channels only
-                avg_signal = np.mean([list(eeg_buffer[ch]) for ch in good_channels], axis=0)
-                
-                # Fit ICA on first 30 seconds of data
-                global ica_fitted, ica_fit_buffer, ica_fit_progress
-                if not ica_fitted:
-                    # We're already in the block where buffer is full, so add to ICA buffer
-                    ica_fit_buffer.append(eeg_for_mne.copy())
-                    ica_fit_progress = min(100, int((len(ica_fit_buffer) / 30) * 100))
-                    
-                    # Log progress every 5 seconds
-                    if len(ica_fit_buffer) % 5 == 0:
-                        logger.info(f"ICA calibration: {ica_fit_progress}% ({len(ica_fit_buffer)}/30 seconds)")
-                    
-                    if len(ica_fit_buffer) >= 30:  # 30 seconds
-                        try:
-                            # Concatenate and fit ICA
-                            ica_data = np.concatenate(ica_fit_buffer, axis=1)
-                            logger.info(f"Fitting ICA with {ica_data.shape[1]} samples ({ica_data.shape[1]/256:.1f} seconds)...")
-                            mne_processor.fit_ica(ica_data, n_components=3)
-                            ica_fitted = True
-                            ica_fit_progress = 100
-                            logger.info("✅ ICA fitted - ready for artifact removal")
-                            ica_fit_buffer = []  # Clear buffer
-                        except Exception as e:
-                            logger.error(f"Error fitting ICA: {e}", exc_info=True)
-                            # Reset and try again
-                            ica_fit_buffer = []
-                            ica_fit_progress = 0
-                
-                # Process with MNE (applies filters + ICA if fitted)
-                try:
-                    mne_result = mne_processor.process_window(eeg_for_mne, apply_ica=ica_fitted)
-                except Exception as e:
-                    logger.error(f"Error in MNE processing: {e}", exc_info=True)
-                    # Fallback to basic processing without MNE
-                    avg_signal = np.mean([list(eeg_buffer[ch]) for ch in range(4)], axis=0)
-                    result = signal_processor.process_window(avg_signal)
-                    mne_result = {
-                        'filtered_data': [avg_signal.tolist()],
-                        'quality': {'confidence': 50, 'snr': 0, 'bad_channels': []},
-                        'has_artifact': True
-                    }
-                    # Continue processing with fallback
-                
-                # Get cleaned data for band power calculation
-                try:
-                    cleaned_data = np.array(mne_result['filtered_data']).T  # Back to [n_channels, n_samples]
-                    if cleaned_data.shape[0] > 0 and cleaned_data.shape[1] > 0:
-                        avg_cleaned = np.mean(cleaned_data, axis=0)  # Average across channels
-                    else:
-                        # Fallback to original signal
-                        avg_cleaned = avg_signal
-                    
-                    # Calculate band powers from cleaned signal (using good channels only)
-                    result = signal_processor.process_window(avg_cleaned)
-                    
-                    # If we excluded bad channels, note it in the result
-                    if len(bad_channels) > 0:
-                        logger.debug(f"Excluded {len(bad_channels)} bad channel(s) from averaging: {bad_channels}")
-                except Exception as e:
-                    logger.error(f"Error processing cleaned data: {e}", exc_info=True)
-                    # Fallback to basic processing
-                    result = signal_processor.process_window(avg_signal)
-                    mne_result = {
-                        'quality': {'confidence': 30, 'snr': 0, 'bad_channels': []},
-                        'has_artifact': True
-                    }
-                
-                # Use MNE quality metrics
-                signal_quality_score = mne_result['quality']['confidence']
-
-                # Get session context for is_meditation flag
-                is_meditation = session_context.get('is_meditation', False)
-
-                # Check artifact detector for consistency (with context-aware handling)
-                artifact_result = artifact_detector.detect_all(
-                    eeg_for_mne.T,  # [n_samples, n_channels]
-                    acc_data,
-                    gyro_data,
-                    is_meditation=is_meditation
-                )
-                
-                # Combine artifact detection: MNE + artifact detector + bad channels
-                has_artifact = (
-                    mne_result['has_artifact'] or 
-                    signal_quality_score < 50 or 
-                    artifact_result.get('has_artifact', False) or
-                    len(bad_channels) > 0  # Bad channels = artifact
-                )
-                
-                # Determine brain state (context-aware: for meditation, use band powers directly)
-                # For meditation: ignore artifact classification, use band powers
-                # For conversation: use artifact-aware classification
-                if is_meditation:
-                    # Meditation: Always use band powers, ignore artifact classification
-                    raw_brain_state = get_brain_state(result['band_powers'], is_meditation=True)
-                elif not has_artifact and signal_quality_score > 50:
-                    # Conversation: Standard artifact-aware classification
-                    raw_brain_state = get_brain_state(result['band_powers'], is_meditation=False)
-                else:
-                    raw_brain_state = 'artifact_detected' if has_artifact else 'low_confidence'
-                
-                # Add to smoothing buffer
-                try:
-                    state_smoother.add_sample(
-                        result['band_powers'],
-                        signal_quality_score,
-                        raw_brain_state,
-                        has_artifact
+
+                # Fit ICA in the background once enough data is collected (and refit
+                # on schedule or when quality drops); windows keep flowing meanwhile
+                calibration = session.ica_calibration
+                if calibration.state == 'calibrating' and calibration.samples_collected % (5 * EEG_SAMPLE_RATE) < session.window_scheduler.hop_size:
+                    logger.info(f"ICA calibration: {calibration.progress}% ({calibration.samples_collected / EEG_SAMPLE_RATE:.0f}/{calibration.calibration_seconds} seconds)")
+                fit_reason = calibration.fit_due(window_timestamp)
+                if calibration.validation_due() and session.cached_calibration is not None:
+                    # Warm start: check the cached calibration against fresh data
+                    session.ica_fit_task = asyncio.create_task(
+                        validate_warm_start(session, calibration.validation_data(), window_timestamp)
                     )
-                    
-                    # Get smoothed values
-                    smoothed_band_powers = state_smoother.get_smoothed_band_powers() or result['band_powers']
-                    smoothed_quality = state_smoother.get_smoothed_signal_quality()
-                    smoothed_brain_state = state_smoother.get_smoothed_brain_state()
-                    artifact_ratio = state_smoother.get_artifact_ratio()
-                    
-                    # Always use smoothed brain state (it has built-in stability checks)
-                    brain_state = smoothed_brain_state
-                    
-                    # Only recalculate if we have a stable, clean signal
-                    if state_smoother.is_stable() and artifact_ratio < 0.3 and smoothed_quality > 60:
-                        # Recalculate from smoothed band powers for better accuracy
-                        if smoothed_brain_state not in ['artifact_detected', 'low_confidence', 'unknown', 'mixed']:
-                            recalculated_state = get_brain_state(smoothed_band_powers, is_meditation=is_meditation)
-                            # Only use recalculated if it's more specific than current
-                            if recalculated_state != 'mixed':
-                                brain_state = recalculated_state
-                    
-                    # Update has_artifact based on artifact ratio
-                    has_artifact = artifact_ratio > 0.5  # More than 50% of samples have artifacts
-                    
-                    # Update previous band powers for change detection
-                    state_smoother.update_previous_band_powers(smoothed_band_powers)
-                except Exception as e:
-                    logger.error(f"Error in state smoothing: {e}", exc_info=True)
-                    # Use raw values if smoothing fails
-                    smoothed_band_powers = result['band_powers']
-                    smoothed_quality = signal_quality_score
-                    brain_state = raw_brain_state
-                    artifact_ratio = 0.0
-
-                # Get HRV metrics (calculate every second)
-                try:
-                    hrv_metrics = hrv_calculator.get_current_metrics()
-                    # Log HRV status periodically for debugging
-                    if not hasattr(process_sensor_data, '_hrv_log_counter'):
-                        process_sensor_data._hrv_log_counter = 0
-                    process_sensor_data._hrv_log_counter += 1
-                    
-                    if process_sensor_data._hrv_log_counter % 60 == 0:  # Every 60 seconds
-                        logger.info(f"HRV metrics: valid={hrv_metrics.get('valid', False)}, heart_rate={hrv_metrics.get('heart_rate', 0):.1f}, buffer_size={len(hrv_calculator.ppg_buffer)}, peaks={len(hrv_calculator.peak_times)}")
-                    
-                    # If not valid but we have a heart rate, use it
-                    if not hrv_metrics.get('valid', False) and hrv_metrics.get('heart_rate', 0) > 0:
-                        # Allow showing heart rate even if not fully valid (partial data is better than nothing)
-                        hrv_metrics['valid'] = True
-                except Exception as e:
-                    logger.warning(f"Error calculating HRV: {e}", exc_info=True)
-                    hrv_metrics = {'heart_rate': 0, 'hrv_rmssd': 0, 'hrv_sdnn': 0, 'valid': False}
-                
-                # Interpret HRV
-                hrv_interpretation = mental_state_interpreter.interpret_hrv(
-                    hrv_metrics.get('hrv_rmssd', 0),
-                    hrv_metrics.get('hrv_sdnn', 0),
-                    hrv_metrics.get('heart_rate', 0)
-                )
-                
-                # Interpret posture with smoothing and state locking
-                global posture_history, posture_current_status, posture_change_time
-                
-                # Log ACC/GYRO data periodically for debugging
-                if not hasattr(process_sensor_data, '_acc_log_counter'):
-                    process_sensor_data._acc_log_counter = 0
-                process_sensor_data._acc_log_counter += 1
-                
-                if process_sensor_data._acc_log_counter % 500 == 0:
-                    logger.info(f"ACC data: {acc_data is not None}, GYRO data: {gyro_data is not None}, posture_history size: {len(posture_history)}")
-                
-                # Always try to get posture data (don't skip if acc_data is None - use history)
-                if acc_data is not None and len(acc_data) >= 3:
-                    # Calculate current posture
-                    x, y, z = acc_data[0], acc_data[1], acc_data[2]
-                    magnitude = np.sqrt(x**2 + y**2 + z**2)
-                    if magnitude > 0.5:
-                        x_norm = x / magnitude
-                        y_norm = y / magnitude
-                        pitch = np.arcsin(-x_norm) * 180 / np.pi
-                        roll = np.arcsin(y_norm) * 180 / np.pi
-                        posture_history.append({'pitch': pitch, 'roll': roll, 'timestamp': eeg_timestamp})
-                
-                # Get raw posture interpretation (will use history if acc_data is None)
-                raw_posture = mental_state_interpreter.interpret_posture(
-                    gyro_data, acc_data, list(posture_history)
+                elif fit_reason is not None:
+                    ica_data = calibration.start_fit(fit_reason)
+                    session.ica_fit_task = asyncio.create_task(
+                        fit_ica_in_background(session, ica_data, window_timestamp)
+                    )
+                elif calibration.reselect_due(window_timestamp):
+                    # Re-choose the artifact components on recent data
+                    recent = session.sensor_buffers.eeg_filtered.latest().copy()
+                    session.ica_reselect_task = asyncio.create_task(
+                        ica_executor.run(session.mne_processor.select_components, recent)
+                    )
+
+                # Hand the window to the analysis worker; finish_window() runs with the
+                # features on the event loop, in window order
+                window = AnalysisWindow(
+                    timestamp=float(window_timestamp),
+                    eeg=eeg_for_mne,
+                    eeg_filtered=eeg_filtered,
+                    acc=acc_window.copy() if acc_window.shape[0] > 0 else None,
+                    gyro=gyro_window.copy() if gyro_window.shape[0] > 0 else None,
+                    acc_latest=acc_latest.copy() if acc_latest is not None else None,
+                    gyro_latest=gyro_latest.copy() if gyro_latest is not None else None,
+                    apply_ica=session.ica_fitted,
+                    is_meditation=session_context.get('is_meditation', False)
                 )
-                
-                # Apply state locking (similar to brain state)
-                current_time = time.time()
-                new_status = raw_posture.get('status', 'Analyzing...')
-                
-                # Never show "No posture data" once we have any history - show "Analyzing..." instead
-                if new_status == 'No posture data' and len(posture_history) > 0:
-                    new_status = 'Analyzing...'
-                    raw_posture['status'] = 'Analyzing...'
-                    raw_posture['meaning'] = 'Calibrating posture detection...'
-                
-                if posture_current_status is None:
-                    # First reading - wait for more data before showing
-                    if len(posture_history) >= 5:
-                        posture_current_status = new_status
-                        posture_change_time = current_time
-                        posture_interpretation = raw_posture
-                    else:
-                        # Not enough data yet - show analyzing
-                        posture_interpretation = {
-                            'status': 'Analyzing...',
-                            'meaning': 'Calibrating posture detection...',
-                            'recommendation': ''
-                        }
-                elif new_status != posture_current_status:
-                    # Status changed - check if enough time has passed
-                    time_since_change = current_time - posture_change_time
-                    if time_since_change >= POSTURE_MIN_DURATION:
-                        # Enough time passed - allow change
-                        posture_current_status = new_status
-                        posture_change_time = current_time
-                        posture_interpretation = raw_posture
-                    else:
-                        # Not enough time - keep current status but update values
-                        posture_interpretation = raw_posture.copy()
-                        posture_interpretation['status'] = posture_current_status
-                else:
-                    # Same status - update values
-                    posture_interpretation = raw_posture
-                
-                # Interpret band changes
-                previous_band_powers = state_smoother.get_previous_band_powers()
-                band_change_interpretation = mental_state_interpreter.interpret_band_changes(
-                    smoothed_band_powers,
-                    previous_band_powers
+                stages = AnalysisStages(
+                    signal_processor=session.signal_processor,
+                    mne_processor=session.mne_processor,
+                    artifact_detector=session.artifact_detector,
+                    hrv_calculator=session.hrv_calculator,
+                    talking_detector=session.talking_detector,
+                    imu_engine=session.imu_engine
                 )
-                
-                # Skip comprehensive state - it's redundant with current state
-                comprehensive_state = None
+                session.analysis_lane.submit(window, stages, on_result=functools.partial(finish_window, session))
+            except Exception as e:
+                logger.error(f"Error scheduling window analysis: {e}", exc_info=True)
+    except Exception as e:
+        logger.error(f"Error in process_sensor_data: {e}", exc_info=True)
+        import traceback
+        logger.debug(f"Full traceback: {traceback.format_exc()}")
+        # Don't let processing errors stop the stream - just log and continue
 
-                # Get session context for context-aware processing
-                session_context = get_session_context()
-                is_meditation = session_context.get('is_meditation', False)
-                
-                # Detect talking using gyroscope (with context-aware threshold)
-                talking_result = talking_detector.update(gyro_data, acc_data, eeg_timestamp, is_meditation=is_meditation)
-                is_talking = talking_result.get('is_talking', False)
-
-                # If talking detected, mark as talking artifact but KEEP brain activity data
-                # This allows us to analyze brain activity during speech later
-                if is_talking:
-                    # Add event to session if recording
-                    if session_recorder.is_recording and not getattr(talking_detector, '_last_talking_event', False):
-                        session_recorder.add_event('talking', 'Talking detected', {
-                            'confidence': talking_result.get('confidence', 0),
-                            'duration': talking_result.get('duration', 0)
-                        })
-                        talking_detector._last_talking_event = True
-                elif getattr(talking_detector, '_last_talking_event', False):
-                    if session_recorder.is_recording:
-                        session_recorder.add_event('talking_stopped', 'Talking stopped', {
-                            'duration': talking_result.get('duration', 0)
-                        })
-                    talking_detector._last_talking_event = False
-
-                # Update AI Co-Pilot brain state (every second)
-                global copilot_brain_state
-
-                # Extract band powers with bounds checking
-                beta = max(0.0, min(100.0, smoothed_band_powers.get('beta', 0)))
-                gamma = max(0.0, min(100.0, smoothed_band_powers.get('gamma', 0)))
-                alpha = max(0.0, min(100.0, smoothed_band_powers.get('alpha', 0)))
-                theta = max(0.0, min(100.0, smoothed_band_powers.get('theta', 0)))
-                delta = max(0.0, min(100.0, smoothed_band_powers.get('delta', 0)))
-
-                # Calculate raw cognitive load from EEG
-                raw_cognitive_load = min(max((beta + gamma) / 200.0, 0.0), 1.0)
-                cognitive_load_history.append(raw_cognitive_load)
-                smoothed_cognitive_load = float(np.mean(cognitive_load_history))  # 8-second average
-
-                # Calculate stress from beta waves + heart rate
-                # Stress = 60% beta waves + 40% heart rate deviation from resting (70 bpm)
-                beta_stress = beta / 100.0  # 0-1
-                hr = hrv_metrics.get('heart_rate', 70)
-                hr_stress = min(max((hr - 70) / 50.0, 0.0), 1.0)  # Normalized: 70=0%, 120+=100%
-                raw_stress = min(max(0.6 * beta_stress + 0.4 * hr_stress, 0.0), 1.0)
-                stress_history.append(raw_stress)
-                smoothed_stress = float(np.mean(stress_history))  # 8-second average
-
-                copilot_brain_state = {
-                    'stress': smoothed_stress,  # Smoothed stress with HR component
-                    'cognitive_load': smoothed_cognitive_load,  # Smoothed cognitive load
-                    'hr': int(max(40, min(200, hr))),  # Realistic HR range
-                    'emotion_arousal': float(min(max(gamma / 100.0, 0.0), 1.0)),  # Clamped to 0-1
-                    'beta': float(beta),
-                    'alpha': float(alpha),
-                    'theta': float(theta),
-                    'gamma': float(gamma),
-                    'delta': float(delta),
-                    'brain_state': str(brain_state),
-                    'signal_quality': float(smoothed_quality),
-                    'emg_intensity': float(min(max(artifact_result.get('emg_intensity', 0.0), 0.0), 1.0))  # Clamped to 0-1
+
+async def fit_ica_in_background(session: PipelineSession, ica_data: np.ndarray, timestamp: float):
+    """
+    Fit ICA on the ICA worker and swap the new model in
+
+    Windows keep being cleaned with the previous model (or not at all during
+    the first calibration) until the fit completes.
+
+    Args:
+        session: Pipeline session to fit for
+        ica_data: Calibration data [n_channels, n_samples] (filtered)
+        timestamp: LSL time of the newest calibration sample
+    """
+    calibration = session.ica_calibration
+    logger.info(f"Fitting ICA ({calibration.fit_reason}) with {ica_data.shape[1]} samples ({ica_data.shape[1]/EEG_SAMPLE_RATE:.1f} seconds) in background...")
+    success = False
+    try:
+        success = await ica_executor.run(session.mne_processor.fit_ica, ica_data, 3)
+    except Exception as e:
+        logger.error(f"Error fitting ICA: {e}", exc_info=True)
+    calibration.finish_fit(bool(success), timestamp)
+    if success:
+        logger.info(f"✅ ICA fitted in {calibration.last_fit_duration:.1f}s - ready for artifact removal")
+        session.channel_rms = np.sqrt(np.mean(ica_data ** 2, axis=1))
+        await save_calibration(session)
+
+
+async def validate_warm_start(session: PipelineSession, data: np.ndarray, timestamp: float):
+    """
+    Use the cached calibration if it still matches fresh data
+
+    Args:
+        session: Pipeline session with a cached_calibration
+        data: Fresh filtered EEG [n_channels, n_samples]
+        timestamp: LSL time of the newest sample
+    """
+    cached = session.cached_calibration
+    session.cached_calibration = None
+    valid, reason = False, "no cached calibration"
+    if cached is not None:
+        try:
+            valid, reason = await ica_executor.run(validate_calibration, cached, data, session.mne_processor.info)
+        except Exception as e:
+            valid, reason = False, str(e)
+
+    if valid:
+        session.mne_processor.load_ica(cached.ica, cached.baseline.exclude)
+        session.apply_baseline(cached.baseline)
+        logger.info(f"✅ Warm start for '{session.key}': cached ICA and baselines restored ({cached.key})")
+    else:
+        logger.info(f"Cached calibration rejected for '{session.key}' ({reason}) - calibrating from scratch")
+    session.ica_calibration.finish_validation(valid, timestamp)
+
+
+async def save_calibration(session: PipelineSession, baseline_only: bool = False):
+    """
+    Save the session's ICA and baselines to the calibration cache (off the event loop)
+
+    Args:
+        session: Pipeline session
+        baseline_only: Only refresh the baselines of the cached calibration
+    """
+    baseline = session.snapshot_baseline()
+    ica = session.mne_processor.ica
+    if session.calibration_key is None or baseline is None or ica is None:
+        return
+    try:
+        if baseline_only:
+            await ica_executor.run(calibration_store.update_baseline, session.calibration_key, baseline)
+        else:
+            await ica_executor.run(calibration_store.save, session.calibration_key, ica, baseline)
+    except Exception as e:
+        logger.error(f"Error saving calibration: {e}", exc_info=True)
+
+
+async def finish_window(session: PipelineSession, features: WindowFeatures):
+    """
+    Finish an analysed window on the event loop: smoothing, interpretation,
+    copilot update, session recording and broadcast
+
+    Args:
+        session: Pipeline session the window belongs to
+        features: WindowFeatures produced by analyze_window() in a worker
+    """
+    window = features.window
+    window_timestamp = window.timestamp
+    is_meditation = window.is_meditation
+    bad_channels = features.bad_channels
+    mne_result = features.mne_result
+    result = features.result
+    artifact_result = features.artifact_result
+    hrv_metrics = features.hrv_metrics
+    talking_result = features.talking_result
+    acc_data = window.acc_latest
+    gyro_data = window.gyro_latest
+
+    try:
+        if len(bad_channels) == window.eeg.shape[0]:
+            logger.warning("All channels have extreme values - using all channels but marking as artifact")
+        elif len(bad_channels) > 0:
+            logger.warning(f"Bad channels detected: {bad_channels} (TP9={0 in bad_channels}, AF7={1 in bad_channels}, AF8={2 in bad_channels}, TP10={3 in bad_channels})")
+
+        # Use MNE quality metrics
+        signal_quality_score = mne_result['quality']['confidence']
+        session.ica_calibration.observe_quality(window_timestamp, signal_quality_score)
+
+        # Combine artifact detection: MNE + artifact detector + bad channels
+        has_artifact = (
+            mne_result['has_artifact'] or
+            signal_quality_score < 50 or
+            artifact_result.get('has_artifact', False) or
+            len(bad_channels) > 0  # Bad channels = artifact
+        )
+
+        # Determine brain state (context-aware: for meditation, use band powers directly)
+        # For meditation: ignore artifact classification, use band powers
+        # For conversation: use artifact-aware classification
+        if is_meditation:
+            # Meditation: Always use band powers, ignore artifact classification
+            raw_brain_state = get_brain_state(result['band_powers'], is_meditation=True)
+        elif not has_artifact and signal_quality_score > 50:
+            # Conversation: Standard artifact-aware classification
+            raw_brain_state = get_brain_state(result['band_powers'], is_meditation=False)
+        else:
+            raw_brain_state = 'artifact_detected' if has_artifact else 'low_confidence'
+
+        # Add to smoothing buffer
+        try:
+            session.state_smoother.add_sample(
+                result['band_powers'],
+                signal_quality_score,
+                raw_brain_state,
+                has_artifact,
+                timestamp=float(window_timestamp)
+            )
+
+            # Get smoothed values
+            smoothed_band_powers = session.state_smoother.get_smoothed_band_powers() or result['band_powers']
+            smoothed_quality = session.state_smoother.get_smoothed_signal_quality()
+            smoothed_brain_state = session.state_smoother.get_smoothed_brain_state()
+            artifact_ratio = session.state_smoother.get_artifact_ratio()
+
+            # Always use smoothed brain state (it has built-in stability checks)
+            brain_state = smoothed_brain_state
+
+            # Only recalculate if we have a stable, clean signal
+            if session.state_smoother.is_stable() and artifact_ratio < 0.3 and smoothed_quality > 60:
+                # Recalculate from smoothed band powers for better accuracy
+                if smoothed_brain_state not in ['artifact_detected', 'low_confidence', 'unknown', 'mixed']:
+                    recalculated_state = get_brain_state(smoothed_band_powers, is_meditation=is_meditation)
+                    # Only use recalculated if it's more specific than current
+                    if recalculated_state != 'mixed':
+                        brain_state = recalculated_state
+
+            # Update has_artifact based on artifact ratio
+            has_artifact = artifact_ratio > 0.5  # More than 50% of samples have artifacts
+
+            # Update previous band powers for change detection
+            session.state_smoother.update_previous_band_powers(smoothed_band_powers)
+        except Exception as e:
+            logger.error(f"Error in state smoothing: {e}", exc_info=True)
+            # Use raw values if smoothing fails
+            smoothed_band_powers = result['band_powers']
+            smoothed_quality = signal_quality_score
+            brain_state = raw_brain_state
+            artifact_ratio = 0.0
+
+        # HRV metrics (calculated by the analysis worker)
+        try:
+            # Log HRV status periodically for debugging
+            if not hasattr(finish_window, '_hrv_log_counter'):
+                finish_window._hrv_log_counter = 0
+            finish_window._hrv_log_counter += 1
+
+            if finish_window._hrv_log_counter % session.window_scheduler.seconds_to_windows(60) == 0:  # Every 60 seconds
+                logger.info(f"HRV metrics: valid={hrv_metrics.get('valid', False)}, heart_rate={hrv_metrics.get('heart_rate', 0):.1f}, buffer_size={len(session.hrv_calculator.ppg_buffer)}, peaks={len(session.hrv_calculator.peak_times)}")
+
+            # If not valid but we have a heart rate, use it
+            if not hrv_metrics.get('valid', False) and hrv_metrics.get('heart_rate', 0) > 0:
+                # Allow showing heart rate even if not fully valid (partial data is better than nothing)
+                hrv_metrics['valid'] = True
+        except Exception as e:
+            logger.warning(f"Error reading HRV metrics: {e}", exc_info=True)
+            hrv_metrics = {'heart_rate': 0, 'hrv_rmssd': 0, 'hrv_sdnn': 0, 'valid': False}
+
+        # Interpret HRV
+        hrv_interpretation = mental_state_interpreter.interpret_hrv(
+            hrv_metrics.get('hrv_rmssd', 0),
+            hrv_metrics.get('hrv_sdnn', 0),
+            hrv_metrics.get('heart_rate', 0)
+        )
+
+        # Interpret posture with smoothing and state locking
+
+        posture_stats = features.imu.posture if features.imu is not None else None
+        posture_count = posture_stats['count'] if posture_stats else 0
+
+        # Log ACC/GYRO data periodically for debugging
+        if not hasattr(finish_window, '_acc_log_counter'):
+            finish_window._acc_log_counter = 0
+        finish_window._acc_log_counter += 1
+
+        if finish_window._acc_log_counter % 500 == 0:
+            logger.info(f"ACC data: {acc_data is not None}, GYRO data: {gyro_data is not None}, posture samples: {posture_count}")
+
+        # Get raw posture interpretation from the running posture statistics
+        # (complementary-filter orientation, averaged by the IMU engine)
+        raw_posture = mental_state_interpreter.interpret_posture(
+            gyro_data, acc_data, posture_stats=posture_stats
+        )
+
+        # Apply state locking (similar to brain state)
+        current_time = time.time()
+        new_status = raw_posture.get('status', 'Analyzing...')
+
+        # Never show "No posture data" once we have any history - show "Analyzing..." instead
+        if new_status == 'No posture data' and posture_count > 0:
+            new_status = 'Analyzing...'
+            raw_posture['status'] = 'Analyzing...'
+            raw_posture['meaning'] = 'Calibrating posture detection...'
+
+        if session.posture_current_status is None:
+            # First reading - wait for more data before showing
+            if posture_count >= 5:
+                session.posture_current_status = new_status
+                session.posture_change_time = current_time
+                posture_interpretation = raw_posture
+            else:
+                # Not enough data yet - show analyzing
+                posture_interpretation = {
+                    'status': 'Analyzing...',
+                    'meaning': 'Calibrating posture detection...',
+                    'recommendation': ''
                 }
+        elif new_status != session.posture_current_status:
+            # Status changed - check if enough time has passed
+            time_since_change = current_time - session.posture_change_time
+            if time_since_change >= POSTURE_MIN_DURATION:
+                # Enough time passed - allow change
+                session.posture_current_status = new_status
+                session.posture_change_time = current_time
+                posture_interpretation = raw_posture
+            else:
+                # Not enough time - keep current status but update values
+                posture_interpretation = raw_posture.copy()
+                posture_interpretation['status'] = session.posture_current_status
+        else:
+            # Same status - update values
+            posture_interpretation = raw_posture
+
+        # Interpret band changes
+        previous_band_powers = session.state_smoother.get_previous_band_powers()
+        band_change_interpretation = mental_state_interpreter.interpret_band_changes(
+            smoothed_band_powers,
+            previous_band_powers
+        )
 
-                # Update copilot if active (with null-safety)
-                if copilot_session and copilot_session.is_active:
-                    try:
-                        copilot_session.update_brain_state(copilot_brain_state)
-                    except Exception as e:
-                        logger.warning(f"Failed to update copilot brain state: {e}")
-
-                # Record session data
-                if session_recorder.is_recording:
-                    # Record processed sample (1/second)
-                    # Convert numpy types to Python native for JSON serialization
-                    session_recorder.add_processed_sample(
-                        timestamp=float(eeg_timestamp),
-                        band_powers={k: float(v) for k, v in smoothed_band_powers.items()},
-                        brain_state=str(brain_state),
-                        signal_quality=float(smoothed_quality),
-                        heart_rate=float(hrv_metrics.get('heart_rate', 0)) if hrv_metrics.get('heart_rate', 0) > 0 else 0.0,  # Save if > 0, even if partial
-                        hrv_rmssd=float(hrv_metrics.get('hrv_rmssd', 0)) if hrv_metrics.get('valid', False) else 0.0,
-                        # NEW: Artifact features (continuous 0-1)
-                        emg_intensity=float(artifact_result.get('emg_intensity', 0.0)),
-                        forehead_emg=float(artifact_result.get('forehead_emg', 0.0)),
-                        blink_intensity=float(artifact_result.get('blink_intensity', 0.0)),
-                        movement_intensity=float(artifact_result.get('movement_intensity', 0.0)),
-                        data_quality=float(artifact_result.get('data_quality', 1.0)),
-                        # Legacy
-                        has_artifact=bool(has_artifact),
-                        artifact_type=str(artifact_result.get('artifact_type', 'clean')),
-                        acc_data=[float(x) for x in acc_data.tolist()] if acc_data is not None else None,
-                        gyro_data=[float(x) for x in gyro_data.tolist()] if gyro_data is not None else None,
-                        is_talking=bool(is_talking)
-                    )
+        # Skip comprehensive state - it's redundant with current state
+        comprehensive_state = None
+
+        # Talking detection (gyroscope, context-aware threshold) from the analysis worker
+        is_talking = talking_result.get('is_talking', False)
+
+        # If talking detected, mark as talking artifact but KEEP brain activity data
+        # This allows us to analyze brain activity during speech later
+        if is_talking:
+            # Add event to session if recording
+            if session.recorder.is_recording and not getattr(session.talking_detector, '_last_talking_event', False):
+                session.recorder.add_event('talking', 'Talking detected', {
+                    'confidence': talking_result.get('confidence', 0),
+                    'duration': talking_result.get('duration', 0)
+                })
+                session.talking_detector._last_talking_event = True
+        elif getattr(session.talking_detector, '_last_talking_event', False):
+            if session.recorder.is_recording:
+                session.recorder.add_event('talking_stopped', 'Talking stopped', {
+                    'duration': talking_result.get('duration', 0)
+                })
+            session.talking_detector._last_talking_event = False
+
+        # Update AI Co-Pilot brain state (every second)
+
+        # Extract band powers with bounds checking
+        beta = max(0.0, min(100.0, smoothed_band_powers.get('beta', 0)))
+        gamma = max(0.0, min(100.0, smoothed_band_powers.get('gamma', 0)))
+        alpha = max(0.0, min(100.0, smoothed_band_powers.get('alpha', 0)))
+        theta = max(0.0, min(100.0, smoothed_band_powers.get('theta', 0)))
+        delta = max(0.0, min(100.0, smoothed_band_powers.get('delta', 0)))
+
+        # Calculate raw cognitive load from EEG
+        raw_cognitive_load = min(max((beta + gamma) / 200.0, 0.0), 1.0)
+        session.cognitive_load_history.append(raw_cognitive_load)
+        smoothed_cognitive_load = float(np.mean(session.cognitive_load_history))  # 8-second average
+
+        # Calculate stress from beta waves + heart rate
+        # Stress = 60% beta waves + 40% heart rate deviation from resting (70 bpm)
+        beta_stress = beta / 100.0  # 0-1
+        hr = hrv_metrics.get('heart_rate', 70)
+        hr_stress = min(max((hr - 70) / 50.0, 0.0), 1.0)  # Normalized: 70=0%, 120+=100%
+        raw_stress = min(max(0.6 * beta_stress + 0.4 * hr_stress, 0.0), 1.0)
+        session.stress_history.append(raw_stress)
+        smoothed_stress = float(np.mean(session.stress_history))  # 8-second average
+
+        session.copilot_brain_state = {
+            'stress': smoothed_stress,  # Smoothed stress with HR component
+            'cognitive_load': smoothed_cognitive_load,  # Smoothed cognitive load
+            'hr': int(max(40, min(200, hr))),  # Realistic HR range
+            'emotion_arousal': float(min(max(gamma / 100.0, 0.0), 1.0)),  # Clamped to 0-1
+            'beta': float(beta),
+            'alpha': float(alpha),
+            'theta': float(theta),
+            'gamma': float(gamma),
+            'delta': float(delta),
+            'brain_state': str(brain_state),
+            'signal_quality': float(smoothed_quality),
+            'emg_intensity': float(min(max(artifact_result.get('emg_intensity', 0.0), 0.0), 1.0)),  # Clamped to 0-1
+            # Autonomic balance (HRV)
+            'hrv_rmssd': float(hrv_metrics.get('hrv_rmssd', 0)) if hrv_metrics.get('valid', False) else 0.0,
+            'lf_hf_ratio': float(hrv_metrics.get('hrv_lf_hf', 0.0)),
+            'autonomic_balance': autonomic_balance(hrv_metrics),
+        }
 
-                # Broadcast band powers with smoothed values
-                try:
-                    broadcast_data = {
-            'type': 'band_powers',
-                        'timestamp': float(eeg_timestamp),
-                        'band_powers': {k: float(v) for k, v in smoothed_band_powers.items()},  # Ensure all floats
-                        'brain_state': str(brain_state),
-                        'has_artifact': bool(has_artifact),  # Explicitly convert to Python bool
-                        'artifact_type': str(artifact_result.get('artifact_type', 'poor_contact' if len(bad_channels) > 0 else 'low_quality') if has_artifact else 'clean'),
-                        'bad_channels': [int(ch) for ch in bad_channels],  # List of bad channel indices
-                        'artifact_details': {
-                            'bad_channels': [int(ch) for ch in bad_channels],
-                            'channel_names': ['TP9', 'AF7', 'AF8', 'TP10'],
-                            'poor_contact': len(bad_channels) > 0,
-                            **{k: bool(v) for k, v in artifact_result.items() if k != 'artifact_type' and k != 'has_artifact'}
-                        },
-            'signal_quality': {
-                            'mean': float(result.get('mean', 0)),
-                            'std': float(result.get('std', 0)),
-                            'snr': float(mne_result.get('quality', {}).get('snr', 0)),
-                            'confidence': float(smoothed_quality),  # Use smoothed quality
-                            'bad_channels': [int(ch) for ch in mne_result.get('quality', {}).get('bad_channels', [])],
-                            'stability': bool(state_smoother.is_stable() if hasattr(state_smoother, 'is_stable') else False),
-                            'artifact_ratio': float(artifact_ratio),
-                        },
-                        'ica_status': {
-                            'fitted': bool(ica_fitted),  # Explicitly convert
-                            'progress': int(ica_fit_progress),
-                        },
-                        # Send heart rate even if partial/cached (better than 0)
-                        'heart_rate': float(hrv_metrics.get('heart_rate', 0)) if hrv_metrics.get('heart_rate', 0) > 0 else 0,
-                        'hrv_rmssd': float(hrv_metrics.get('hrv_rmssd', 0)) if hrv_metrics.get('valid', False) else 0,
-                        'hrv_sdnn': float(hrv_metrics.get('hrv_sdnn', 0)) if hrv_metrics.get('valid', False) else 0,
-                        # Mental state interpretations
-                        'hrv_interpretation': hrv_interpretation,
-                        'posture_interpretation': posture_interpretation,
-                        'band_change_interpretation': band_change_interpretation,
-                        # Talking detection
-                        'is_talking': bool(is_talking),
-                        'talking_confidence': float(talking_result.get('confidence', 0)),
-                        'talking_duration': float(talking_result.get('duration', 0)),
-                        # Session recording status
-                        'is_recording': bool(session_recorder.is_recording),
-                        'session_id': session_recorder.current_session.session_id if session_recorder.current_session else None,
-                    }
-                    
-                    # Log for debugging (less verbose)
-                    if hasattr(state_smoother, 'band_power_history') and len(state_smoother.band_power_history) % 5 == 0:
-                        logger.debug(f"State: {brain_state}, Quality: {smoothed_quality:.1f}, Artifacts: {artifact_ratio:.1%}")
-                    
-                    await manager.broadcast(broadcast_data)
-                except Exception as e:
-                    logger.error(f"Error broadcasting data: {e}", exc_info=True)
-                    # Don't let broadcast errors stop the stream
+        # Update copilot if active and fed by this pipeline (with null-safety)
+        if copilot_session and copilot_session.is_active and session.key == copilot_pipeline_key:
+            try:
+                copilot_session.update_brain_state(session.copilot_brain_state)
             except Exception as e:
-                logger.error(f"Error processing band powers: {e}", exc_info=True)
-                # Continue streaming even if processing fails
-                import traceback
-                logger.debug(f"Traceback: {traceback.format_exc()}")
+                logger.warning(f"Failed to update copilot brain state: {e}")
+
+        # Record session data
+        if session.recorder.is_recording:
+            # Record processed sample (once per analysis window)
+            # Convert numpy types to Python native for JSON serialization
+            session.recorder.add_processed_sample(
+                timestamp=float(window_timestamp),
+                band_powers={k: float(v) for k, v in smoothed_band_powers.items()},
+                brain_state=str(brain_state),
+                signal_quality=float(smoothed_quality),
+                heart_rate=float(hrv_metrics.get('heart_rate', 0)) if hrv_metrics.get('heart_rate', 0) > 0 else 0.0,  # Save if > 0, even if partial
+                hrv_rmssd=float(hrv_metrics.get('hrv_rmssd', 0)) if hrv_metrics.get('valid', False) else 0.0,
+                hrv_sdnn=float(hrv_metrics.get('hrv_sdnn', 0)) if hrv_metrics.get('valid', False) else 0.0,
+                hrv_pnn50=float(hrv_metrics.get('hrv_pnn50', 0.0)),
+                hrv_sd1=float(hrv_metrics.get('hrv_sd1', 0.0)),
+                hrv_sd2=float(hrv_metrics.get('hrv_sd2', 0.0)),
+                hrv_lf=float(hrv_metrics.get('hrv_lf', 0.0)),
+                hrv_hf=float(hrv_metrics.get('hrv_hf', 0.0)),
+                hrv_lf_hf=float(hrv_metrics.get('hrv_lf_hf', 0.0)),
+                # NEW: Artifact features (continuous 0-1)
+                emg_intensity=float(artifact_result.get('emg_intensity', 0.0)),
+                forehead_emg=float(artifact_result.get('forehead_emg', 0.0)),
+                blink_intensity=float(artifact_result.get('blink_intensity', 0.0)),
+                movement_intensity=float(artifact_result.get('movement_intensity', 0.0)),
+                data_quality=float(artifact_result.get('data_quality', 1.0)),
+                # Legacy
+                has_artifact=bool(has_artifact),
+                artifact_type=str(artifact_result.get('artifact_type', 'clean')),
+                acc_data=[float(x) for x in acc_data.tolist()] if acc_data is not None else None,
+                gyro_data=[float(x) for x in gyro_data.tolist()] if gyro_data is not None else None,
+                is_talking=bool(is_talking)
+            )
+
+        # Broadcast band powers with smoothed values
+        try:
+            broadcast_data = {
+    'type': 'band_powers',
+                'timestamp': float(window_timestamp),
+                'band_powers': {k: float(v) for k, v in smoothed_band_powers.items()},  # Ensure all floats
+                'brain_state': str(brain_state),
+                'has_artifact': bool(has_artifact),  # Explicitly convert to Python bool
+                'artifact_type': str(artifact_result.get('artifact_type', 'poor_contact' if len(bad_channels) > 0 else 'low_quality') if has_artifact else 'clean'),
+                'bad_channels': [int(ch) for ch in bad_channels],  # List of bad channel indices
+                'artifact_details': {
+                    'bad_channels': [int(ch) for ch in bad_channels],
+                    'channel_names': ['TP9', 'AF7', 'AF8', 'TP10'],
+                    'poor_contact': len(bad_channels) > 0,
+                    **{k: bool(v) for k, v in artifact_result.items() if k != 'artifact_type' and k != 'has_artifact'}
+                },
+    'signal_quality': {
+                    'mean': float(result.get('mean', 0)),
+                    'std': float(result.get('std', 0)),
+                    'snr': float(mne_result.get('quality', {}).get('snr', 0)),
+                    'confidence': float(smoothed_quality),  # Use smoothed quality
+                    'bad_channels': [int(ch) for ch in mne_result.get('quality', {}).get('bad_channels', [])],
+                    'stability': bool(session.state_smoother.is_stable()),
+                    'artifact_ratio': float(artifact_ratio),
+                },
+                'ica_status': session.ica_calibration.get_status(),
+                # Send heart rate even if partial/cached (better than 0)
+                'heart_rate': float(hrv_metrics.get('heart_rate', 0)) if hrv_metrics.get('heart_rate', 0) > 0 else 0,
+                'hrv_rmssd': float(hrv_metrics.get('hrv_rmssd', 0)) if hrv_metrics.get('valid', False) else 0,
+                'hrv_sdnn': float(hrv_metrics.get('hrv_sdnn', 0)) if hrv_metrics.get('valid', False) else 0,
+                # Extended HRV (refreshed every few seconds in the background)
+                'hrv_extended': {
+                    'pnn50': float(hrv_metrics.get('hrv_pnn50', 0.0)),
+                    'sd1': float(hrv_metrics.get('hrv_sd1', 0.0)),
+                    'sd2': float(hrv_metrics.get('hrv_sd2', 0.0)),
+                    'lf': float(hrv_metrics.get('hrv_lf', 0.0)),
+                    'hf': float(hrv_metrics.get('hrv_hf', 0.0)),
+                    'lf_hf': float(hrv_metrics.get('hrv_lf_hf', 0.0)),
+                    'lf_nu': float(hrv_metrics.get('hrv_lf_nu', 0.0)),
+                    'spectral_valid': bool(hrv_metrics.get('spectral_valid', False)),
+                    'autonomic_balance': autonomic_balance(hrv_metrics),
+                },
+                # Mental state interpretations
+                'hrv_interpretation': hrv_interpretation,
+                'posture_interpretation': posture_interpretation,
+                'band_change_interpretation': band_change_interpretation,
+                # Talking detection
+                'is_talking': bool(is_talking),
+                'talking_confidence': float(talking_result.get('confidence', 0)),
+                'talking_duration': float(talking_result.get('duration', 0)),
+                # Session recording status
+                'is_recording': bool(session.recorder.is_recording),
+                # One read: stop_session may clear current_session from its thread
+                'session_id': getattr(session.recorder.current_session, 'session_id', None),
+            }
+
+            # Log for debugging (less verbose)
+            if session.state_smoother.sample_count % 5 == 0:
+                logger.debug(f"State: {brain_state}, Quality: {smoothed_quality:.1f}, Artifacts: {artifact_ratio:.1%}")
+
+            await session.manager.broadcast(broadcast_data)
+
+            # Spectrogram column of this hop (kept for REST even without subscribers)
+            column = session.spectrogram.add(features.spectra, window_timestamp)
+            if column is not None and session.manager.has_subscribers('spectrogram'):
+                await session.manager.broadcast(column)
+        except Exception as e:
+            logger.error(f"Error broadcasting data: {e}", exc_info=True)
+            # Don't let broadcast errors stop the stream
     except Exception as e:
-        logger.error(f"Error in process_sensor_data: {e}", exc_info=True)
+        logger.error(f"Error processing band powers: {e}", exc_info=True)
+        # Continue streaming even if processing fails
         import traceback
-        logger.debug(f"Full traceback: {traceback.format_exc()}")
-        # Don't let processing errors stop the stream - just log and continue
+        logger.debug(f"Traceback: {traceback.format_exc()}")
 
 
 @app.get("/")
@@ -725,21 +811,77 @@ async def root() -> Dict[str, str]:
 
 
 @app.get("/api/device-info")
-async def get_device_info() -> Dict[str, Any]:
+async def get_device_info(session: str = DEFAULT_SESSION) -> Dict[str, Any]:
     """
-    Get information about connected Muse device
+    Get information about the Muse device of a pipeline session
     """
-    info = muse_streamer.get_device_info()
+    pipeline = get_pipeline(session)
+    info = pipeline.streamer.get_device_info()
+    info['session'] = pipeline.key
+    info['analysis'] = {**pipeline.window_scheduler.get_stats(), 'executor': pipeline.analysis_lane.get_stats()}
+    info['fanout'] = pipeline.manager.get_stats()
     return info
 
 
+@app.get("/api/spectrogram")
+async def get_spectrogram(session: str = DEFAULT_SESSION, seconds: Optional[float] = None,
+                          channels: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Rolling spectrogram of a pipeline session (per-channel PSD of each analysis hop, in dB)
+
+    Args:
+        seconds: Time span (default: the whole buffer, 5 minutes)
+        channels: Comma-separated channel indices (default: all)
+    """
+    pipeline = get_pipeline(session)
+    selected = None
+    if channels:
+        try:
+            selected = [int(ch) for ch in channels.split(',')]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="channels must be comma-separated indices")
+        if any(ch < 0 or ch >= pipeline.spectrogram.n_channels for ch in selected):
+            raise HTTPException(status_code=400, detail="channel index out of range")
+    if seconds is not None and seconds <= 0:
+        raise HTTPException(status_code=400, detail="seconds must be positive")
+    return {'session': pipeline.key, **pipeline.spectrogram.query(seconds, selected)}
+
+
+@app.get("/api/pipelines")
+async def list_pipelines() -> Dict[str, Any]:
+    """
+    List pipeline sessions (one per headset)
+    """
+    return {
+        "sessions": pipeline_registry.list_info(),
+        "analysis_workers": analysis_executor.max_workers,
+    }
+
+
+@app.delete("/api/pipelines/{session}")
+async def remove_pipeline(session: str) -> Dict[str, str]:
+    """
+    Stop a pipeline session and release its device
+    """
+    if not await pipeline_registry.remove(session):
+        raise HTTPException(status_code=404, detail=f"Pipeline session not found: {session}")
+    return {"status": "removed", "session": session}
+
+
 @app.post("/api/connect")
-async def connect_muse() -> Dict[str, Any]:
+async def connect_muse(session: str = DEFAULT_SESSION, device_id: Optional[str] = None) -> Dict[str, Any]:
     """
-    Connect to Muse device via LSL
+    Connect a pipeline session to its Muse device via LSL
+
+    Args:
+        session: Pipeline session key (device or user id), default "default"
+        device_id: Only use LSL streams whose source_id/name contains this
+                   (needed with several headsets on one network)
     """
+    pipeline = get_pipeline(session, device_id=device_id, create=True)
+    muse_streamer = pipeline.streamer
     try:
-        logger.info("Received /api/connect request")
+        logger.info(f"Received /api/connect request for session '{pipeline.key}'")
         # Stop any existing stream first
         if muse_streamer.is_streaming:
             logger.info("Stopping existing stream before reconnecting...")
@@ -752,45 +894,51 @@ async def connect_muse() -> Dict[str, Any]:
 
         if success:
             # Reset ICA state on new connection
-            global ica_fitted, ica_fit_buffer, ica_fit_progress, state_smoother, hrv_calculator
-            ica_fitted = False
-            ica_fit_buffer = []
-            ica_fit_progress = 0
+            pipeline.reset_ica_calibration()
             
-            # Reset EEG buffers
-            for ch in range(4):
-                eeg_buffer[ch].clear()
+            # Reset EEG buffers and window schedule
+            pipeline.clear_buffers()
             
             # Reset state smoother
-            state_smoother = StateSmoother(window_size=30)  # 30 seconds for stability
-            global posture_history
-            posture_history = deque(maxlen=30)
+            pipeline.state_smoother = StateSmoother(window_size=pipeline.window_scheduler.seconds_to_windows(30))  # 30 seconds for stability
+            pipeline.imu_engine.reset()
+            pipeline.raw_batcher.reset()
             
             # Reset HRV calculator
-            hrv_calculator = HRVCalculator()
+            pipeline.hrv_calculator = HRVCalculator()
             
             # Reset send time and stream monitoring
-            global _last_eeg_send_time, _last_data_received
-            _last_eeg_send_time = 0.0
-            _last_data_received = 0.0
+            pipeline.last_eeg_send_time = 0.0
+            pipeline.last_data_received = 0.0
             
-            logger.info("✅ All state reset for new connection - ICA will calibrate")
+            # Look for a cached calibration of this user + device (validated on the first seconds of data)
+            pipeline.device_name = muse_streamer.get_device_info().get('name')
+            pipeline.calibration_key = calibration_store.key_for(pipeline.key, device_id or pipeline.device_name)
+            pipeline.cached_calibration = await ica_executor.run(calibration_store.load, pipeline.calibration_key)
+            if pipeline.cached_calibration is not None:
+                pipeline.ica_calibration.expect_warm_start()
+                logger.info(f"✅ All state reset for new connection - validating cached calibration '{pipeline.calibration_key}'")
+            else:
+                logger.info("✅ All state reset for new connection - ICA will calibrate")
             
             # Start streaming in background with multi-sensor callback
             # Use create_task to run in background - it will continue even if errors occur
             async def start_stream():
                 try:
-                    await muse_streamer.stream_data(process_sensor_data)
+                    await muse_streamer.stream_data(functools.partial(process_sensor_data, pipeline))
                 except Exception as e:
                     logger.error(f"Stream function exited: {e}", exc_info=True)
                     import traceback
                     logger.error(f"Traceback: {traceback.format_exc()}")
             
             stream_task = asyncio.create_task(start_stream())
+            pipeline.stream_task = stream_task
             logger.info(f"Stream task created: {stream_task}")
             
             # Add error handler to task (non-blocking)
             def handle_stream_error(task):
+                if task.cancelled():
+                    return
                 try:
                     task.result()  # This will raise if task failed
                     logger.info("Stream task completed normally")
@@ -804,28 +952,32 @@ async def connect_muse() -> Dict[str, Any]:
                     
             stream_task.add_done_callback(handle_stream_error)
             
-            # Start monitoring task to detect if stream stops
+            # Start monitoring task to detect if stream stops (one per session)
             async def monitor_stream():
                 while True:
                     await asyncio.sleep(2.0)  # Check every 2 seconds
-                    if _last_data_received > 0:
-                        time_since_data = time.time() - _last_data_received
+                    if pipeline.last_data_received > 0:
+                        time_since_data = time.time() - pipeline.last_data_received
                         if time_since_data > STREAM_TIMEOUT and muse_streamer.is_streaming:
-                            logger.warning(f"⚠️ Stream appears stopped - no data for {time_since_data:.1f}s (is_streaming={muse_streamer.is_streaming})")
+                            logger.warning(f"⚠️ Stream '{pipeline.key}' appears stopped - no data for {time_since_data:.1f}s (is_streaming={muse_streamer.is_streaming})")
                             # Don't auto-restart, just log
                     elif muse_streamer.is_streaming:
                         # Stream started but no data received yet
                         pass
             
-            asyncio.create_task(monitor_stream())
+            if pipeline.monitor_task is not None and not pipeline.monitor_task.done():
+                pipeline.monitor_task.cancel()
+            pipeline.monitor_task = asyncio.create_task(monitor_stream())
 
             return {
                 "status": "connected",
+                "session": pipeline.key,
                 "device_info": muse_streamer.get_device_info()
             }
         else:
             return {
                 "status": "error",
+                "session": pipeline.key,
                 "message": "Failed to connect to Muse. Make sure 'muselsl stream' is running."
             }
 
@@ -840,36 +992,89 @@ async def connect_muse() -> Dict[str, Any]:
 
 
 @app.post("/api/disconnect")
-async def disconnect_muse() -> Dict[str, str]:
+async def disconnect_muse(session: str = DEFAULT_SESSION) -> Dict[str, str]:
     """
-    Disconnect from Muse device
+    Disconnect a pipeline session from its Muse device
     """
-    muse_streamer.disconnect()
+    pipeline = get_pipeline(session)
+    pipeline.streamer.disconnect()
+
+    # Keep this session's baselines for the next warm start
+    if pipeline.ica_fitted:
+        await save_calibration(pipeline, baseline_only=True)
 
     # Reset all state
-    global ica_fitted, ica_fit_buffer, ica_fit_progress, state_smoother
-    ica_fitted = False
-    ica_fit_buffer = []
-    ica_fit_progress = 0
+    pipeline.reset_ica_calibration()
 
     # Clear buffers
-    for ch in range(4):
-        eeg_buffer[ch].clear()
+    pipeline.clear_buffers()
     
     # Reset state smoother
-    state_smoother = StateSmoother(window_size=5)
+    pipeline.state_smoother = StateSmoother(window_size=pipeline.window_scheduler.seconds_to_windows(5))
     
-    logger.info("Disconnected - all state cleared")
+    logger.info(f"Disconnected '{pipeline.key}' - all state cleared")
+
+    return {"status": "disconnected", "session": pipeline.key}
 
-    return {"status": "disconnected"}
+
+@app.delete("/api/calibration")
+async def delete_calibration(session: str = DEFAULT_SESSION) -> Dict[str, Any]:
+    """
+    Forget the cached calibration of a session's user/device and recalibrate ICA
+    """
+    pipeline = get_pipeline(session)
+    key = pipeline.calibration_key or calibration_store.key_for(pipeline.key)
+    deleted = calibration_store.delete(key)
+    pipeline.reset_ica_calibration()
+    return {"status": "deleted" if deleted else "not_found", "session": pipeline.key, "key": key}
+
+
+def send_display_backfill(pipeline: PipelineSession, websocket: WebSocket):
+    """Send a new display subscriber the full span it asked for (later messages add new buckets)"""
+    subscription = pipeline.manager.subscription_of(websocket, 'display')
+    if subscription is None:
+        return
+    # A new geometry is primed from the EEG ring buffer
+    values, timestamps = pipeline.sensor_buffers.eeg.latest()
+    downsampler = pipeline.display_streams.ensure(subscription.display, values, timestamps)
+    backfill = downsampler.backfill()
+    if backfill is not None:
+        pipeline.manager.send(websocket, select_channels(backfill, subscription.channels))
+
+
+def send_spectrogram_backfill(pipeline: PipelineSession, websocket: WebSocket):
+    """Send a new spectrogram subscriber the buffered columns (later messages add one column each)"""
+    subscription = pipeline.manager.subscription_of(websocket, 'spectrogram')
+    if subscription is None:
+        return
+    backfill = pipeline.spectrogram.backfill()
+    if backfill is not None:
+        pipeline.manager.send(websocket, for_subscription(backfill, subscription))
 
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, session: str = DEFAULT_SESSION,
+                             protocol: str = PROTOCOL_JSON):
     """
     WebSocket endpoint for real-time EEG data streaming
+
+    Clients subscribe to one pipeline session via /ws?session=<key> (default "default")
+    and choose the encoding via &protocol=json|binary (see ws_protocol).
+
+    Commands (JSON text):
+        {"type": "ping"} -> {"type": "pong"}
+        {"type": "subscribe", "topics": {...}} / {"type": "unsubscribe", "topics": [...]}
+            -> {"type": "subscribed", "topics": {...}} (see ws_topics)
     """
-    await manager.connect(websocket)
+    if protocol not in PROTOCOLS:
+        await websocket.close(code=1008)
+        return
+    pipeline = pipeline_registry.get_or_create(session) if session == DEFAULT_SESSION else pipeline_registry.get(session)
+    if pipeline is None:
+        await websocket.close(code=1008)  # Unknown session: connect the headset first
+        return
+    manager = pipeline.manager
+    await manager.connect(websocket, protocol=protocol)
 
     try:
         # Keep connection alive and listen for client messages
@@ -882,9 +1087,23 @@ async def websocket_endpoint(websocket: WebSocket):
                 command = json.loads(data)
                 logger.info(f"Received command: {command}")
 
-                # Handle commands if needed
-                if command.get('type') == 'ping':
-                    await websocket.send_json({'type': 'pong'})
+                # Replies go through the client's queue (in order with broadcasts)
+                command_type = command.get('type')
+                if command_type == 'ping':
+                    manager.send(websocket, {'type': 'pong'})
+                elif command_type in ('subscribe', 'unsubscribe'):
+                    try:
+                        if command_type == 'subscribe':
+                            topics = manager.subscribe(websocket, command.get('topics'))
+                        else:
+                            topics = manager.unsubscribe(websocket, command.get('topics'))
+                        manager.send(websocket, {'type': 'subscribed', 'topics': topics})
+                        if command_type == 'subscribe' and 'display' in (command.get('topics') or {}):
+                            send_display_backfill(pipeline, websocket)
+                        if command_type == 'subscribe' and 'spectrogram' in (command.get('topics') or {}):
+                            send_spectrogram_backfill(pipeline, websocket)
+                    except (ValueError, TypeError) as e:
+                        manager.send(websocket, {'type': 'error', 'command': command_type, 'message': str(e)})
 
             except json.JSONDecodeError:
                 logger.warning(f"Invalid JSON: {data}")
@@ -899,14 +1118,16 @@ async def websocket_endpoint(websocket: WebSocket):
 # =============================================================================
 
 @app.post("/api/session/start")
-async def start_session(notes: str = "", tags: str = "") -> Dict[str, str]:
+async def start_session(notes: str = "", tags: str = "", session: str = DEFAULT_SESSION) -> Dict[str, str]:
     """
     Start recording a new session
 
     Args:
         notes: Optional session notes
         tags: Comma-separated tags
+        session: Pipeline session (headset) to record
     """
+    session_recorder = get_pipeline(session, create=True).recorder
     try:
         # Input validation
         if len(notes) > 10000:
@@ -915,6 +1136,9 @@ async def start_session(notes: str = "", tags: str = "") -> Dict[str, str]:
             raise HTTPException(status_code=400, detail="Tags too long (max 1KB)")
 
         tag_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else []
+        if session_recorder.is_recording:
+            # Off the event loop, like /api/session/stop (start_session would stop it inline)
+            await asyncio.to_thread(session_recorder.stop_session)
         session_id = session_recorder.start_session(notes=notes, tags=tag_list)
         return {
             "status": "recording",
@@ -927,12 +1151,14 @@ async def start_session(notes: str = "", tags: str = "") -> Dict[str, str]:
 
 
 @app.post("/api/session/stop")
-async def stop_session() -> Dict[str, str]:
+async def stop_session(session: str = DEFAULT_SESSION) -> Dict[str, str]:
     """
     Stop current recording session and save data
     """
+    session_recorder = get_pipeline(session).recorder
     try:
-        session_path = session_recorder.stop_session()
+        # Off the event loop: drains the session log and fsyncs its footer
+        session_path = await asyncio.to_thread(session_recorder.stop_session)
         if session_path:
             return {
                 "status": "stopped",
@@ -947,18 +1173,19 @@ async def stop_session() -> Dict[str, str]:
 
 
 @app.get("/api/session/status")
-async def get_session_status() -> Dict[str, Any]:
+async def get_session_status(session: str = DEFAULT_SESSION) -> Dict[str, Any]:
     """
     Get current recording status
     """
-    return session_recorder.get_session_status()
+    return get_pipeline(session).recorder.get_session_status()
 
 
 @app.post("/api/session/marker")
-async def add_session_marker(label: str, notes: str = "") -> Dict[str, str]:
+async def add_session_marker(label: str, notes: str = "", session: str = DEFAULT_SESSION) -> Dict[str, str]:
     """
     Add a marker to current session (e.g., "started talking", "eyes closed")
     """
+    session_recorder = get_pipeline(session).recorder
     if not session_recorder.is_recording:
         return {"status": "error", "message": "No active recording session"}
 
@@ -967,12 +1194,49 @@ async def add_session_marker(label: str, notes: str = "") -> Dict[str, str]:
 
 
 @app.get("/api/sessions")
-async def list_sessions() -> Dict[str, List]:
+async def list_sessions(tags: Optional[str] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, min_duration: Optional[float] = None,
+                        max_duration: Optional[float] = None, sort: str = "start_time",
+                        order: str = "desc", limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    List saved sessions, one page at a time (from the session catalog)
+
+    Args:
+        tags: Comma-separated tags a session must all carry
+        date_from: Sessions started on or after this ISO date/datetime
+        date_to: Sessions started on or before this ISO date (or before this datetime)
+        min_duration, max_duration: Duration bounds in seconds
+        sort: start_time, duration, name, artifact_ratio, heart_rate or signal_quality
+        order: asc or desc
+        limit: Page size (max 500)
+        cursor: next_cursor of the previous page
     """
-    List all saved sessions
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    try:
+        started_after = datetime.fromisoformat(date_from).isoformat() if date_from else None
+        started_before = None
+        if date_to:
+            end = datetime.fromisoformat(date_to)
+            # A plain date includes that whole day
+            started_before = (end + timedelta(days=1) if len(date_to) == 10 else end).isoformat()
+        tag_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else None
+        return session_recorder.query_sessions(
+            tags=tag_list, started_after=started_after, started_before=started_before,
+            min_duration=min_duration, max_duration=max_duration, sort=sort,
+            descending=order == "desc", limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/sessions/reindex")
+async def reindex_sessions() -> Dict[str, Any]:
+    """
+    Rebuild the session catalog from the session folders on disk
     """
-    sessions = session_recorder.list_sessions()
-    return {"sessions": sessions}
+    count = await asyncio.to_thread(session_recorder.reindex_sessions)
+    return {"status": "ok", "sessions": count}
 
 
 @app.get("/api/sessions/{session_id}")
@@ -1028,14 +1292,15 @@ async def update_session(session_id: str, notes: str = None, tags: str = None, n
 # =============================================================================
 
 @app.post("/api/copilot/start")
-async def start_copilot() -> Dict[str, str]:
+async def start_copilot(session: str = DEFAULT_SESSION) -> Dict[str, str]:
     """
     Start AI Co-Pilot session
 
     This will initialize the copilot and begin audio recording/transcription.
-    Brain state updates will be fed automatically from the EEG processing.
+    Brain state updates will be fed automatically from the EEG processing
+    of the given pipeline session.
     """
-    global copilot_session
+    global copilot_session, copilot_pipeline_key
 
     try:
         # Check if copilot dependencies are available
@@ -1043,7 +1308,8 @@ async def start_copilot() -> Dict[str, str]:
             raise HTTPException(status_code=503, detail="Copilot dependencies not installed. Install requirements_copilot.txt")
 
         # Check if Muse is connected
-        if not muse_streamer.is_streaming:
+        pipeline = get_pipeline(session)
+        if not pipeline.streamer.is_streaming:
             raise HTTPException(status_code=400, detail="Muse device not connected. Please connect EEG first.")
 
         # Check if already running
@@ -1055,7 +1321,8 @@ async def start_copilot() -> Dict[str, str]:
             logger.info("Initializing AI Co-Pilot...")
             copilot_session = CopilotSession()
 
-        logger.info("AI Co-Pilot session start requested")
+        copilot_pipeline_key = pipeline.key
+        logger.info(f"AI Co-Pilot session start requested (brain state from '{pipeline.key}')")
 
         return {
             "status": "ready",
@@ -194,7 +194,8 @@ class MentalStateInterpreter:
 
     @staticmethod
     def interpret_posture(gyro_data: Optional[np.ndarray], acc_data: Optional[np.ndarray], 
-                         posture_history: Optional[list] = None) -> Dict[str, str]:
+                         posture_history: Optional[list] = None,
+                         posture_stats: Optional[Dict] = None) -> Dict[str, str]:
         """
         Interpret posture from gyroscope and accelerometer data with smoothing
         
@@ -202,6 +203,9 @@ class MentalStateInterpreter:
             gyro_data: Gyroscope data [x, y, z] in deg/s
             acc_data: Accelerometer data [x, y, z] in g
             posture_history: List of recent posture readings for smoothing
+            posture_stats: Running posture mean/std ({'pitch', 'roll', 'pitch_std',
+                           'roll_std', 'count'}, see IMUFeatureEngine); used instead of
+                           averaging posture_history
         
         Returns:
             Dictionary with posture interpretation
@@ -226,72 +230,73 @@ class MentalStateInterpreter:
                     'roll': 0
                 }
         
-        # Use smoothed values from history if available (need more samples for stability)
-        if posture_history and len(posture_history) > 15:  # Need 15+ samples (15 seconds)
+        # Use smoothed values if available (need more samples for stability)
+        smoothed = None
+        if posture_stats and posture_stats.get('count', 0) > 15:  # Need 15+ samples (15 seconds)
+            smoothed = (posture_stats['pitch'], posture_stats['roll'],
+                        posture_stats['pitch_std'], posture_stats['roll_std'])
+        elif posture_history and len(posture_history) > 15:
             # Average recent pitch and roll values
             pitches = [p.get('pitch', 0) for p in posture_history if p.get('pitch') is not None]
             rolls = [p.get('roll', 0) for p in posture_history if p.get('roll') is not None]
-            
             if pitches and rolls:
-                avg_pitch = np.mean(pitches)
-                avg_roll = np.mean(rolls)
-                
-                # Calculate variance - if high, user is moving
-                pitch_std = np.std(pitches)
-                roll_std = np.std(rolls)
-                
-                # If high variance, user is moving around
-                if pitch_std > 10 or roll_std > 10:
-                    return {
-                        'status': 'Unstable',
-                        'meaning': 'Posture is changing frequently',
-                        'recommendation': 'Try to maintain a steady position',
-                        'pitch': float(avg_pitch),
-                        'roll': float(avg_roll)
-                    }
-                
-                # Use averaged values for interpretation (stricter thresholds)
-                if abs(avg_pitch) < 10 and abs(avg_roll) < 10:
-                    return {
-                        'status': 'Good',
-                        'meaning': 'Head is upright and balanced',
-                        'recommendation': 'Maintain this posture',
-                        'pitch': float(avg_pitch),
-                        'roll': float(avg_roll)
-                    }
-                elif abs(avg_pitch) > 20:  # Lower threshold for detection
-                    if avg_pitch > 0:
-                        return {
-                            'status': 'Forward tilt',
-                            'meaning': 'Head tilted forward (looking down)',
-                            'recommendation': 'Raise your head to reduce neck strain',
-                            'pitch': float(avg_pitch),
-                            'roll': float(avg_roll)
-                        }
-                    else:
-                        return {
-                            'status': 'Backward tilt',
-                            'meaning': 'Head tilted backward',
-                            'recommendation': 'Adjust to neutral position',
-                            'pitch': float(avg_pitch),
-                            'roll': float(avg_roll)
-                        }
-                elif abs(avg_roll) > 15:  # Lower threshold
+                smoothed = (np.mean(pitches), np.mean(rolls), np.std(pitches), np.std(rolls))
+
+        if smoothed is not None:
+            avg_pitch, avg_roll, pitch_std, roll_std = smoothed
+
+            # If high variance, user is moving around
+            if pitch_std > 10 or roll_std > 10:
+                return {
+                    'status': 'Unstable',
+                    'meaning': 'Posture is changing frequently',
+                    'recommendation': 'Try to maintain a steady position',
+                    'pitch': float(avg_pitch),
+                    'roll': float(avg_roll)
+                }
+            
+            # Use averaged values for interpretation (stricter thresholds)
+            if abs(avg_pitch) < 10 and abs(avg_roll) < 10:
+                return {
+                    'status': 'Good',
+                    'meaning': 'Head is upright and balanced',
+                    'recommendation': 'Maintain this posture',
+                    'pitch': float(avg_pitch),
+                    'roll': float(avg_roll)
+                }
+            elif abs(avg_pitch) > 20:  # Lower threshold for detection
+                if avg_pitch > 0:
                     return {
-                        'status': 'Side tilt',
-                        'meaning': 'Head tilted to one side',
-                        'recommendation': 'Straighten your head',
+                        'status': 'Forward tilt',
+                        'meaning': 'Head tilted forward (looking down)',
+                        'recommendation': 'Raise your head to reduce neck strain',
                         'pitch': float(avg_pitch),
                         'roll': float(avg_roll)
                     }
                 else:
                     return {
-                        'status': 'Slight tilt',
-                        'meaning': f'Head slightly tilted (pitch: {avg_pitch:.0f}°, roll: {avg_roll:.0f}°)',
-                        'recommendation': 'Minor adjustment recommended',
+                        'status': 'Backward tilt',
+                        'meaning': 'Head tilted backward',
+                        'recommendation': 'Adjust to neutral position',
                         'pitch': float(avg_pitch),
                         'roll': float(avg_roll)
                     }
+            elif abs(avg_roll) > 15:  # Lower threshold
+                return {
+                    'status': 'Side tilt',
+                    'meaning': 'Head tilted to one side',
+                    'recommendation': 'Straighten your head',
+                    'pitch': float(avg_pitch),
+                    'roll': float(avg_roll)
+                }
+            else:
+                return {
+                    'status': 'Slight tilt',
+                    'meaning': f'Head slightly tilted (pitch: {avg_pitch:.0f}°, roll: {avg_roll:.0f}°)',
+                    'recommendation': 'Minor adjustment recommended',
+                    'pitch': float(avg_pitch),
+                    'roll': float(avg_roll)
+                }
         
         # Use accelerometer for static posture (gravity vector)
         if acc_data is not None and len(acc_data) >= 3:
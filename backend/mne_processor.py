@@ -4,12 +4,13 @@ Uses ICA and ASR for production-grade artifact removal
 """
 
 import numpy as np
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import mne
 from mne.preprocessing import ICA, create_eog_epochs
-from mne.filter import filter_data, notch_filter
 import logging
 
+from streaming_filter import design_eeg_filter, filter_block
+
 logger = logging.getLogger(__name__)
 
 # Muse 2 channel names and positions
@@ -27,6 +28,12 @@ class MNEProcessor:
         self.ica: Optional[ICA] = None
         self.ica_fitted = False
         self.bad_channels = []
+
+        # Fitted ICA exported as one linear map: cleaned = A @ data + b
+        # (None when no component is excluded). Swapped as a single tuple so
+        # workers never see a half-updated pair
+        self.ica_exclude: List[int] = []
+        self.ica_projection: Optional[Tuple[np.ndarray, np.ndarray]] = None
         
         # Create MNE info object
         self.info = mne.create_info(
@@ -35,9 +42,15 @@ class MNEProcessor:
             ch_types='eeg'
         )
 
+        # Bandpass (0.5-50 Hz) + 60 Hz notch, designed once per sample rate
+        self.filter_sos = design_eeg_filter(sample_rate)
+
     def apply_filters(self, data: np.ndarray) -> np.ndarray:
         """
-        Apply bandpass and notch filters using MNE
+        Apply bandpass and notch filters to a standalone block
+
+        Live windows arrive already filtered (see process_window's `filtered`),
+        so this is only the fallback for one-off blocks.
         
         Args:
             data: EEG data [n_channels, n_samples] or [n_samples, n_channels]
@@ -53,52 +66,151 @@ class MNEProcessor:
             if data.shape[1] == 4:
                 data = data.T
         
-        # Bandpass filter (0.5-50 Hz)
-        filtered = filter_data(
-            data,
-            sfreq=self.sample_rate,
-            l_freq=0.5,
-            h_freq=50.0,
-            method='fir',
-            phase='zero-double'
-        )
-        
-        # Notch filter (60 Hz) - Use scipy for shorter signals
-        from scipy import signal as scipy_signal
-        b, a = scipy_signal.iirnotch(w0=60, Q=30, fs=self.sample_rate)
-        sos = scipy_signal.tf2sos(b, a)
-        filtered = scipy_signal.sosfilt(sos, filtered)
-        
-        return filtered
+        # Bandpass (0.5-50 Hz) + notch (60 Hz) cascade, started in steady state
+        return filter_block(self.filter_sos, data, axis=-1)
 
-    def fit_ica(self, data: np.ndarray, n_components: int = 3):
+    def fit_ica(self, data: np.ndarray, n_components: int = 3) -> bool:
         """
         Fit ICA for artifact removal
+
+        The new model (with its artifact components, chosen once on the
+        calibration data) is built aside and swapped in at the end, so this
+        can run in a worker thread while windows are still being cleaned with
+        the previous model. On failure the previous model stays in use.
         
         Args:
             data: EEG data [n_channels, n_samples]
             n_components: Number of ICA components (max 3 for 4 channels)
+
+        Returns:
+            True if the new model is in use
         """
         try:
             # Create RawArray for MNE
-            raw = mne.io.RawArray(data, self.info)
+            raw = mne.io.RawArray(data, self.info, verbose=False)
             
             # Fit ICA
-            self.ica = ICA(n_components=min(n_components, data.shape[0] - 1), random_state=97)
-            self.ica.fit(raw)
-            self.ica_fitted = True
-            logger.info(f"ICA fitted with {self.ica.n_components_} components")
+            ica = ICA(n_components=min(n_components, data.shape[0] - 1), random_state=97)
+            ica.fit(raw, verbose=False)
+            exclude = self._find_artifact_components(ica, raw)
+            self.load_ica(ica, exclude)
+            logger.info(f"ICA fitted with {ica.n_components_} components, removing {exclude}")
+            return True
         except Exception as e:
             logger.error(f"Error fitting ICA: {e}")
-            self.ica = None
+            return False
+
+    def load_ica(self, ica: ICA, exclude: List[int]):
+        """
+        Swap in a fitted ICA (new fit or restored from the calibration cache)
+
+        Args:
+            ica: Fitted ICA
+            exclude: Artifact components to remove
+        """
+        exclude = sorted(set(int(i) for i in exclude))
+        projection = self._build_projection(ica, exclude) if exclude else None
+        ica.exclude = exclude
+        # apply_ica only reads the projection tuple, so the swap is atomic for workers
+        self.ica = ica
+        self.ica_exclude = exclude
+        self.ica_projection = projection
+        self.ica_fitted = True
+
+    def select_components(self, data: np.ndarray) -> List[int]:
+        """
+        Re-choose the artifact components on recent data and rebuild the projection
+
+        Safe to call from a worker thread; windows pick up the new projection
+        atomically. Ignored if the model is replaced meanwhile.
+
+        Args:
+            data: Filtered EEG data [n_channels, n_samples] (several seconds)
+
+        Returns:
+            Excluded component indices
+        """
+        ica = self.ica
+        if ica is None:
+            return []
+
+        raw = mne.io.RawArray(data, self.info, verbose=False)
+        exclude = self._find_artifact_components(ica, raw)
+        projection = self._build_projection(ica, exclude) if exclude else None
+        if self.ica is not ica:
+            return exclude  # A refit swapped in a new model meanwhile
+
+        if exclude != self.ica_exclude:
+            logger.info(f"ICA removing {len(exclude)} artifact components: {exclude}")
+        self.ica_exclude = exclude
+        self.ica_projection = projection  # None = nothing to remove
+        return exclude
+
+    @staticmethod
+    def _find_artifact_components(ica: ICA, raw: mne.io.BaseRaw) -> List[int]:
+        """EOG (eye blink) and muscle components of a fitted ICA"""
+        exclude = []
+        # Detect EOG artifacts (eye blinks) - handle gracefully if no EOG channel
+        try:
+            eog_inds, scores = ica.find_bads_eog(raw, threshold=1.5, verbose=False)
+            if eog_inds:
+                exclude.extend(eog_inds)
+        except Exception as e:
+            logger.debug(f"Could not detect EOG artifacts (no EOG channel): {e}")
+
+        # Detect muscle artifacts
+        try:
+            muscle_inds, _ = ica.find_bads_muscle(raw, threshold=0.3, verbose=False)
+            if muscle_inds:
+                exclude.extend(muscle_inds)
+        except Exception as e:
+            logger.debug(f"Could not detect muscle artifacts: {e}")
+
+        return sorted(set(int(i) for i in exclude))
+
+    @staticmethod
+    def _build_projection(ica: ICA, exclude: List[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Export ica.apply(exclude=...) as cleaned = A @ data + b
+
+        Same steps as MNE's ICA.apply (standardise, remove PCA mean, unmix,
+        zero excluded sources, remix, restore), folded into one matrix:
+        A = S P S^-1 and b = S (m - P m), where S holds the pre-whitener
+        scales, m the PCA mean and P the component projection.
+        """
+        n_components = ica.n_components_
+        pca_components = ica.pca_components_
+        n_pca = ica.n_pca_components or pca_components.shape[0]
+        pca_components = pca_components[:n_pca]
+
+        unmixing = np.eye(n_pca)
+        unmixing[:n_components, :n_components] = ica.unmixing_matrix_
+        unmixing = unmixing @ pca_components
+        mixing = np.eye(n_pca)
+        mixing[:n_components, :n_components] = ica.mixing_matrix_
+        mixing = pca_components.T @ mixing
+
+        # Keep all but the excluded components, plus the PCA residuals
+        keep = np.setdiff1d(np.arange(n_components), exclude)
+        keep = np.concatenate((keep, np.arange(n_components, n_pca)))
+        proj = mixing[:, keep] @ unmixing[keep, :]
+
+        scale = np.asarray(ica.pre_whitener_, dtype=np.float64).ravel()
+        matrix = scale[:, None] * proj / scale[None, :]
+        if ica.pca_mean_ is not None:
+            offset = scale * (ica.pca_mean_ - proj @ ica.pca_mean_)
+        else:
+            offset = np.zeros(len(scale))
+        return matrix, offset
 
     def apply_ica(self, data: np.ndarray, exclude_components: Optional[list] = None) -> np.ndarray:
         """
-        Apply ICA to remove artifacts
+        Apply ICA to remove artifacts (one small matrix multiply)
         
         Args:
             data: EEG data [n_channels, n_samples]
-            exclude_components: List of component indices to exclude (auto-detect if None)
+            exclude_components: List of component indices to exclude
+                                (default: the components chosen by select_components)
             
         Returns:
             Cleaned data
@@ -107,40 +219,17 @@ class MNEProcessor:
             return data
         
         try:
-            # Create RawArray
-            raw = mne.io.RawArray(data, self.info)
-            
-            # Auto-detect artifact components if not specified
-            if exclude_components is None:
-                exclude_components = []
-                # Detect EOG artifacts (eye blinks) - handle gracefully if no EOG channel
-                try:
-                    eog_inds, scores = self.ica.find_bads_eog(raw, threshold=1.5)
-                    if eog_inds:
-                        exclude_components.extend(eog_inds)
-                except Exception as e:
-                    logger.debug(f"Could not detect EOG artifacts (no EOG channel): {e}")
-                
-                # Detect muscle artifacts
-                try:
-                    muscle_inds, _ = self.ica.find_bads_muscle(raw, threshold=0.3)
-                    if muscle_inds:
-                        exclude_components.extend(muscle_inds)
-                except Exception as e:
-                    logger.debug(f"Could not detect muscle artifacts: {e}")
-                
-                exclude_components = list(set(exclude_components))
-                
-                if exclude_components:
-                    logger.debug(f"ICA removing {len(exclude_components)} artifact components: {exclude_components}")
-            
-            # Apply ICA
-            if exclude_components:
-                self.ica.exclude = exclude_components
-                raw_clean = self.ica.apply(raw, exclude=self.ica.exclude)
-                return raw_clean.get_data()
+            if exclude_components is not None:
+                if not exclude_components:
+                    return data
+                matrix, offset = self._build_projection(self.ica, sorted(set(exclude_components)))
             else:
-                return data
+                projection = self.ica_projection
+                if projection is None:
+                    return data
+                matrix, offset = projection
+
+            return matrix @ data + offset[:, None]
                 
         except Exception as e:
             logger.error(f"Error applying ICA: {e}")
@@ -201,13 +290,16 @@ class MNEProcessor:
         
         return quality
 
-    def process_window(self, data: np.ndarray, apply_ica: bool = True) -> Dict:
+    def process_window(self, data: np.ndarray, apply_ica: bool = True,
+                       filtered: Optional[np.ndarray] = None) -> Dict:
         """
         Process a window of EEG data with MNE
         
         Args:
             data: Raw EEG data [n_samples] or [n_samples, n_channels]
             apply_ica: Whether to apply ICA artifact removal
+            filtered: Same window already filtered by the streaming filter
+                      [n_channels, n_samples]; skips apply_filters()
             
         Returns:
             Dictionary with processed data and metrics
@@ -223,8 +315,9 @@ class MNEProcessor:
             # [n_samples, n_channels], transpose
             data = data.T
         
-        # Apply filters
-        filtered = self.apply_filters(data)
+        # Apply filters (unless the window was filtered on arrival)
+        if filtered is None or filtered.shape != data.shape:
+            filtered = self.apply_filters(data)
         
         # Apply ICA if fitted
         if apply_ica and self.ica_fitted:
@@ -1,24 +1,203 @@
 """
 Muse EEG Streaming Module
 Uses muselsl to connect to Muse device and stream EEG data
+
+Two acquisition modes:
+- Thread (default): a background thread blocks on the LSL inlets and hands
+  timestamped chunks to the asyncio side through a bounded queue, so slow
+  processing or WebSocket sends never delay acquisition
+- Poll (legacy): the event loop polls the inlets every 10 ms
 """
 
 import asyncio
+import threading
+import time
 import numpy as np
-from typing import Optional, Callable, Dict
-from pylsl import StreamInlet, resolve_byprop
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional, Callable, Dict, List
+from pylsl import StreamInlet, resolve_byprop, resolve_bypred
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Auxiliary streams and the max samples pulled per call (~1 s at native rate)
+AUX_STREAMS = {'ppg': 64, 'acc': 52, 'gyro': 52}
+
+
+@dataclass
+class SensorChunk:
+    """
+    One EEG chunk plus every auxiliary sample pulled alongside it
+
+    All streams are full chunks at their native rate with per-sample LSL
+    timestamps (PPG 64 Hz, ACC/GYRO 52 Hz) - nothing is decimated.
+    """
+    eeg: np.ndarray                               # [n_samples, n_channels]
+    eeg_timestamps: np.ndarray                    # [n_samples] LSL timestamps
+    ppg: Optional[np.ndarray] = None              # [n, 3] ambient, infrared, red
+    ppg_timestamps: Optional[np.ndarray] = None
+    acc: Optional[np.ndarray] = None              # [n, 3] x, y, z (g)
+    acc_timestamps: Optional[np.ndarray] = None
+    gyro: Optional[np.ndarray] = None             # [n, 3] x, y, z (deg/s)
+    gyro_timestamps: Optional[np.ndarray] = None
+    received_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def first_timestamp(self) -> float:
+        return float(self.eeg_timestamps[0]) if len(self.eeg_timestamps) else 0.0
+
+
+def merge_chunks(chunks: List[SensorChunk]) -> SensorChunk:
+    """
+    Merge consecutive chunks into one batch (every stream concatenated, no samples lost)
+    """
+    if len(chunks) == 1:
+        return chunks[0]
+
+    merged = SensorChunk(
+        eeg=np.concatenate([c.eeg for c in chunks], axis=0),
+        eeg_timestamps=np.concatenate([c.eeg_timestamps for c in chunks]),
+        received_at=chunks[-1].received_at
+    )
+    for name in AUX_STREAMS:
+        parts = [c for c in chunks if getattr(c, name) is not None]
+        if parts:
+            setattr(merged, name, np.concatenate([getattr(c, name) for c in parts], axis=0))
+            setattr(merged, f"{name}_timestamps", np.concatenate([getattr(c, f"{name}_timestamps") for c in parts]))
+    return merged
+
+
+class AcquisitionThread(threading.Thread):
+    """
+    Background thread that blocks on the LSL inlets and queues timestamped chunks
+
+    Handoff to asyncio is a bounded deque (append/popleft are atomic, so no lock
+    is needed) plus an asyncio.Event set via call_soon_threadsafe. When the
+    consumer falls behind, the oldest chunks are dropped and counted.
+    """
+
+    def __init__(self, streamer: 'MuseStreamer', loop: asyncio.AbstractEventLoop,
+                 wakeup: asyncio.Event, max_queue_chunks: int = 512, pull_timeout: float = 0.2):
+        """
+        Args:
+            streamer: Connected MuseStreamer whose inlets are read
+            loop: Event loop of the consumer
+            wakeup: Event set whenever new chunks are queued
+            max_queue_chunks: Queue bound (~12 samples per chunk, 512 chunks = ~24 s of EEG)
+            pull_timeout: Blocking timeout for the EEG pull (seconds)
+        """
+        super().__init__(name="lsl-acquisition", daemon=True)
+        self.streamer = streamer
+        self.loop = loop
+        self.wakeup = wakeup
+        self.pull_timeout = pull_timeout
+        self.queue: deque = deque(maxlen=max_queue_chunks)
+        self._stop_event = threading.Event()
+
+        # Counters (written by the acquisition thread, read by anyone)
+        self.chunks_acquired = 0
+        self.samples_acquired = 0
+        self.dropped_chunks = 0
+        self.max_queue_depth = 0
+        self.pull_errors = 0
+        self.last_data_time = time.monotonic()
+
+    def stop(self):
+        """Ask the thread to exit after the current pull"""
+        self._stop_event.set()
+
+    def seconds_since_data(self) -> float:
+        """Seconds since the last EEG chunk arrived"""
+        return time.monotonic() - self.last_data_time
+
+    def drain(self) -> List[SensorChunk]:
+        """Pop every queued chunk (called from the event loop)"""
+        chunks = []
+        while True:
+            try:
+                chunks.append(self.queue.popleft())
+            except IndexError:
+                break
+        return chunks
+
+    def get_stats(self) -> Dict:
+        """Queue depth and drop counters"""
+        return {
+            'mode': 'thread',
+            'alive': self.is_alive(),
+            'queue_depth': len(self.queue),
+            'max_queue_depth': self.max_queue_depth,
+            'queue_capacity': self.queue.maxlen,
+            'chunks_acquired': self.chunks_acquired,
+            'samples_acquired': self.samples_acquired,
+            'dropped_chunks': self.dropped_chunks,
+            'pull_errors': self.pull_errors,
+            'seconds_since_data': round(self.seconds_since_data(), 3),
+        }
+
+    def run(self):
+        logger.info("LSL acquisition thread started")
+        while not self._stop_event.is_set():
+            eeg_inlet = self.streamer.eeg_inlet
+            if eeg_inlet is None:
+                break
+
+            try:
+                # Block until EEG arrives (bounded so stop() is honoured)
+                eeg_chunk, eeg_timestamps = eeg_inlet.pull_chunk(timeout=self.pull_timeout, max_samples=64)
+            except Exception as e:
+                self.pull_errors += 1
+                if self.pull_errors <= 5:
+                    logger.error(f"Error pulling EEG in acquisition thread: {e}")
+                time.sleep(0.1)
+                continue
+
+            if not eeg_chunk:
+                continue
+
+            chunk = SensorChunk(
+                eeg=np.asarray(eeg_chunk, dtype=np.float64),
+                eeg_timestamps=np.asarray(eeg_timestamps, dtype=np.float64)
+            )
+            self.streamer._pull_auxiliary(chunk)
+
+            if len(self.queue) == self.queue.maxlen:
+                # deque(maxlen) drops the oldest chunk on append
+                self.dropped_chunks += 1
+                if self.dropped_chunks == 1 or self.dropped_chunks % 100 == 0:
+                    logger.warning(f"Acquisition queue full - dropped {self.dropped_chunks} chunk(s) so far")
+            self.queue.append(chunk)
+
+            self.chunks_acquired += 1
+            self.samples_acquired += chunk.eeg.shape[0]
+            self.last_data_time = time.monotonic()
+            self.max_queue_depth = max(self.max_queue_depth, len(self.queue))
+
+            try:
+                self.loop.call_soon_threadsafe(self.wakeup.set)
+            except RuntimeError:
+                # Event loop closed - nothing left to feed
+                break
+
+        logger.info("LSL acquisition thread stopped")
+
+
 class MuseStreamer:
     """
     Handles connection to Muse device via LSL (Lab Streaming Layer)
     Supports multiple sensor streams: EEG, PPG, ACC, GYRO
     """
 
-    def __init__(self):
+    def __init__(self, device_id: Optional[str] = None):
+        """
+        Args:
+            device_id: Only connect to LSL streams whose source_id or name contains this
+                       (e.g. the headset's MAC address) - needed when several Muse
+                       headsets stream on the same network. None picks the first stream.
+        """
+        self.device_id = device_id
         self.eeg_inlet: Optional[StreamInlet] = None
         self.ppg_inlet: Optional[StreamInlet] = None
         self.acc_inlet: Optional[StreamInlet] = None
@@ -26,6 +205,15 @@ class MuseStreamer:
         self.is_streaming = False
         self.eeg_sample_rate = 256  # Muse 2 sampling rate
         self.n_channels = 4  # TP9, AF7, AF8, TP10
+        self.acquisition_thread: Optional[AcquisitionThread] = None
+
+    def _resolve(self, stream_type: str, timeout: float):
+        """Resolve LSL streams of a type, restricted to this streamer's device if set"""
+        if not self.device_id:
+            return resolve_byprop('type', stream_type, timeout=timeout)
+        device = self.device_id.replace("'", "")
+        predicate = f"type='{stream_type}' and (contains(source_id,'{device}') or contains(name,'{device}'))"
+        return resolve_bypred(predicate, timeout=timeout)
 
     def connect(self, timeout: float = 10.0) -> bool:
         """
@@ -41,7 +229,7 @@ class MuseStreamer:
             logger.info("Searching for Muse streams...")
 
             # Connect to EEG stream (required)
-            eeg_streams = resolve_byprop('type', 'EEG', timeout=timeout)
+            eeg_streams = self._resolve('EEG', timeout)
             if not eeg_streams:
                 logger.error("No EEG stream found. Make sure muselsl is running.")
                 logger.error("Run: muselsl stream --ppg --acc --gyro")
@@ -54,7 +242,7 @@ class MuseStreamer:
 
             # Try to connect to PPG stream (optional)
             try:
-                ppg_streams = resolve_byprop('type', 'PPG', timeout=2.0)
+                ppg_streams = self._resolve('PPG', 2.0)
                 if ppg_streams:
                     self.ppg_inlet = StreamInlet(ppg_streams[0], max_chunklen=6)
                     ppg_info = self.ppg_inlet.info()
@@ -64,7 +252,7 @@ class MuseStreamer:
 
             # Try to connect to ACC stream (optional)
             try:
-                acc_streams = resolve_byprop('type', 'ACC', timeout=2.0)
+                acc_streams = self._resolve('ACC', 2.0)
                 if acc_streams:
                     self.acc_inlet = StreamInlet(acc_streams[0], max_chunklen=1)
                     acc_info = self.acc_inlet.info()
@@ -74,7 +262,7 @@ class MuseStreamer:
 
             # Try to connect to GYRO stream (optional)
             try:
-                gyro_streams = resolve_byprop('type', 'GYRO', timeout=2.0)
+                gyro_streams = self._resolve('GYRO', 2.0)
                 if gyro_streams:
                     self.gyro_inlet = StreamInlet(gyro_streams[0], max_chunklen=1)
                     gyro_info = self.gyro_inlet.info()
@@ -93,6 +281,7 @@ class MuseStreamer:
         Disconnect from all Muse streams
         """
         self.is_streaming = False
+        self._stop_acquisition_thread()
         if self.eeg_inlet:
             self.eeg_inlet.close_stream()
             self.eeg_inlet = None
@@ -107,19 +296,64 @@ class MuseStreamer:
             self.gyro_inlet = None
         logger.info("Disconnected from all Muse streams")
 
-    async def stream_data(self, callback: Callable, auto_reconnect: bool = True, max_reconnect_attempts: int = 5):
+    def _pull_auxiliary(self, chunk: SensorChunk):
+        """
+        Non-blocking pull of every available PPG, ACC and GYRO sample into chunk
+
+        Args:
+            chunk: SensorChunk whose auxiliary fields are filled (left None if unavailable)
+        """
+        for name, max_samples in AUX_STREAMS.items():
+            inlet = getattr(self, f"{name}_inlet")
+            if inlet is None:
+                continue
+            try:
+                samples, timestamps = inlet.pull_chunk(timeout=0.0, max_samples=max_samples)
+                if samples and len(samples) > 0:
+                    setattr(chunk, name, np.asarray(samples, dtype=np.float64))
+                    setattr(chunk, f"{name}_timestamps", np.asarray(timestamps, dtype=np.float64))
+            except Exception as e:
+                logger.debug(f"Error pulling {name.upper()}: {e}")
+
+    def _stop_acquisition_thread(self):
+        """Stop and join the acquisition thread if it is running"""
+        thread = self.acquisition_thread
+        if thread is None:
+            return
+        thread.stop()
+        if thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+        self.acquisition_thread = None
+
+    def get_acquisition_stats(self) -> Dict:
+        """
+        Acquisition queue statistics (queue depth, drops, throughput)
+        """
+        if self.acquisition_thread is None:
+            return {'mode': 'poll' if self.is_streaming else 'idle'}
+        return self.acquisition_thread.get_stats()
+
+    async def stream_data(self, callback: Callable, auto_reconnect: bool = True, max_reconnect_attempts: int = 5,
+                          use_acquisition_thread: bool = True):
         """
         Stream data from all available sensors asynchronously with auto-reconnect
 
         Args:
-            callback: Function to call with sensor data
-                     Receives (eeg_samples, eeg_timestamp, ppg_data, acc_data, gyro_data)
+            callback: Coroutine called with each SensorChunk (full-rate EEG, PPG, ACC, GYRO
+                      with per-sample LSL timestamps)
             auto_reconnect: If True, automatically reconnect when stream is lost (default: True)
             max_reconnect_attempts: Maximum number of reconnection attempts (default: 5)
+            use_acquisition_thread: If True, acquire in a background thread and consume
+                                    queued chunks in batches (default). If False, poll
+                                    the inlets from the event loop (legacy mode).
         """
         if not self.eeg_inlet:
             raise RuntimeError("Not connected to Muse. Call connect() first.")
 
+        if use_acquisition_thread:
+            await self._stream_threaded(callback, auto_reconnect, max_reconnect_attempts)
+            return
+
         self.is_streaming = True
         logger.info("Starting multi-sensor stream with auto-reconnect...")
 
@@ -138,57 +372,31 @@ class MuseStreamer:
                     try:
                         # Pull EEG data (primary stream)
                         eeg_chunk, eeg_timestamps = self.eeg_inlet.pull_chunk(timeout=0.0, max_samples=12)
-                        eeg_samples = None
-                        eeg_timestamp = 0.0
+                        chunk = None
 
                         if eeg_chunk:
-                            eeg_samples = np.array(eeg_chunk)
-                            eeg_timestamp = eeg_timestamps[0] if eeg_timestamps else 0.0
+                            chunk = SensorChunk(
+                                eeg=np.asarray(eeg_chunk, dtype=np.float64),
+                                eeg_timestamps=np.asarray(eeg_timestamps, dtype=np.float64)
+                            )
                             chunks_processed += 1
                             no_data_count = 0  # Reset no-data counter
                             last_data_time = asyncio.get_event_loop().time()
 
                             if chunks_processed % 100 == 0:  # Log every 100 chunks (~4 seconds)
-                                logger.info(f"✅ EEG Stream active: processed {chunks_processed} chunks, shape: {eeg_samples.shape}")
-
-                        # Pull PPG data (if available)
-                        ppg_data = None
-                        if self.ppg_inlet:
-                            try:
-                                ppg_chunk, ppg_timestamps = self.ppg_inlet.pull_chunk(timeout=0.0, max_samples=6)
-                                if ppg_chunk and len(ppg_chunk) > 0:
-                                    ppg_data = np.array(ppg_chunk[-1])  # Last sample [ambient, infrared, red]
-                                    if chunks_processed % 100 == 0:
-                                        logger.info(f"PPG data received: {ppg_data}")
-                            except Exception as e:
-                                logger.debug(f"Error pulling PPG: {e}")
-                        elif chunks_processed % 5000 == 0:  # Only log every 5000 chunks (~20s) instead of every 500
-                            logger.debug("PPG inlet not connected")
-
-                        # Pull ACC data (if available)
-                        acc_data = None
-                        if self.acc_inlet:
-                            try:
-                                acc_chunk, _ = self.acc_inlet.pull_chunk(timeout=0.0, max_samples=1)
-                                if acc_chunk and len(acc_chunk) > 0:
-                                    acc_data = np.array(acc_chunk[-1])  # [x, y, z]
-                            except Exception as e:
-                                logger.debug(f"Error pulling ACC: {e}")
+                                logger.info(f"✅ EEG Stream active: processed {chunks_processed} chunks, shape: {chunk.eeg.shape}")
 
-                        # Pull GYRO data (if available)
-                        gyro_data = None
-                        if self.gyro_inlet:
-                            try:
-                                gyro_chunk, _ = self.gyro_inlet.pull_chunk(timeout=0.0, max_samples=1)
-                                if gyro_chunk and len(gyro_chunk) > 0:
-                                    gyro_data = np.array(gyro_chunk[-1])  # [x, y, z]
-                            except Exception as e:
-                                logger.debug(f"Error pulling GYRO: {e}")
+                            # Pull every pending PPG, ACC and GYRO sample alongside the EEG chunk
+                            self._pull_auxiliary(chunk)
+                            if chunk.ppg is not None and chunks_processed % 100 == 0:
+                                logger.info(f"PPG data received: {chunk.ppg.shape[0]} samples")
+                            elif not self.ppg_inlet and chunks_processed % 5000 == 0:  # Only log every 5000 chunks (~20s) instead of every 500
+                                logger.debug("PPG inlet not connected")
 
                         # Call callback with all sensor data
-                        if eeg_samples is not None:
+                        if chunk is not None:
                             try:
-                                await callback(eeg_samples, eeg_timestamp, ppg_data, acc_data, gyro_data)
+                                await callback(chunk)
                                 consecutive_errors = 0  # Reset error counter on success
                             except Exception as e:
                                 consecutive_errors += 1
@@ -287,6 +495,95 @@ class MuseStreamer:
         else:
             logger.info(f"✅ Multi-sensor stream stopped gracefully")
 
+    async def _stream_threaded(self, callback: Callable, auto_reconnect: bool, max_reconnect_attempts: int):
+        """
+        Consume chunks queued by the acquisition thread in batches
+
+        Args:
+            callback: Same callback as stream_data
+            auto_reconnect: Reconnect when no data arrives for 5 seconds
+            max_reconnect_attempts: Maximum number of reconnection attempts
+        """
+        self.is_streaming = True
+        logger.info("Starting multi-sensor stream (acquisition thread) with auto-reconnect...")
+
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        reconnect_attempts = 0
+        stream_timeout = 5.0  # No data for 5 seconds = stream lost
+
+        while self.is_streaming and reconnect_attempts <= max_reconnect_attempts:
+            self.acquisition_thread = AcquisitionThread(self, loop, wakeup)
+            self.acquisition_thread.start()
+            thread = self.acquisition_thread
+            consecutive_errors = 0
+            batches_processed = 0
+            stream_lost = False
+
+            try:
+                while self.is_streaming:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), timeout=1.0)
+                    except asyncio.TimeoutError:
+                        pass
+                    wakeup.clear()
+
+                    chunks = thread.drain()
+                    if not chunks:
+                        if thread.seconds_since_data() > stream_timeout or not thread.is_alive():
+                            logger.warning(f"⚠️  No data received for {thread.seconds_since_data():.1f}s - LSL stream may have disconnected")
+                            stream_lost = True
+                            break
+                        continue
+
+                    batch = merge_chunks(chunks)
+                    batches_processed += 1
+                    if batches_processed % 100 == 0:
+                        logger.info(f"✅ EEG Stream active: {thread.chunks_acquired} chunks acquired, "
+                                    f"batch of {len(chunks)}, queue depth {len(thread.queue)}, dropped {thread.dropped_chunks}")
+
+                    try:
+                        await callback(batch)
+                        consecutive_errors = 0
+                    except Exception as e:
+                        consecutive_errors += 1
+                        logger.error(f"Error in callback (error #{consecutive_errors}): {e}", exc_info=True)
+                        if consecutive_errors >= 10:
+                            logger.error(f"Too many callback errors ({consecutive_errors}), but continuing stream...")
+            finally:
+                thread.stop()
+
+            if not (self.is_streaming and stream_lost):
+                break
+            if not auto_reconnect:
+                logger.error("Auto-reconnect disabled, stopping stream")
+                self.is_streaming = False
+                break
+
+            reconnect_attempts += 1
+            logger.info(f"🔄 Reconnection attempt {reconnect_attempts}/{max_reconnect_attempts}...")
+            self.disconnect()
+            self.is_streaming = True  # disconnect() clears the flag
+            await asyncio.sleep(2.0)
+            if not self.is_streaming:
+                # Stopped by the user while waiting
+                break
+
+            if self.connect(timeout=10.0):
+                logger.info("✅ Reconnected successfully! Resuming stream...")
+                reconnect_attempts = 0
+            else:
+                logger.error(f"❌ Reconnection attempt {reconnect_attempts} failed")
+                if reconnect_attempts >= max_reconnect_attempts:
+                    logger.error("Max reconnection attempts reached, stopping stream")
+                    self.is_streaming = False
+                else:
+                    logger.info("Retrying in 5 seconds...")
+                    await asyncio.sleep(5.0)
+
+        self._stop_acquisition_thread()
+        logger.info("✅ Multi-sensor stream stopped")
+
     def get_device_info(self) -> Dict:
         """
         Get information about the connected Muse device and available streams
@@ -301,6 +598,7 @@ class MuseStreamer:
 
         info = {
             'connected': True,
+            'device_id': self.device_id,
             'name': eeg_info.name(),
             'type': eeg_info.type(),
             'channel_count': eeg_info.channel_count(),
@@ -311,7 +609,8 @@ class MuseStreamer:
                 'ppg': self.ppg_inlet is not None,
                 'acc': self.acc_inlet is not None,
                 'gyro': self.gyro_inlet is not None,
-            }
+            },
+            'acquisition': self.get_acquisition_stats(),
         }
 
         return info
@@ -0,0 +1,309 @@
+"""
+Pipeline Sessions
+One PipelineSession per headset: streamer, buffers, detectors, smoother, ICA
+state, recorder and WebSocket subscribers
+
+Everything that used to be a module global in main.py lives on the session,
+so one server process can run several Muse headsets side by side. The
+PipelineRegistry hands out sessions keyed by device or user id; the
+"default" session keeps the single-headset setup working unchanged.
+"""
+
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+
+from muse_stream import MuseStreamer
+from signal_processor import SignalProcessor
+from artifact_detector import ArtifactDetector
+from hrv_calculator import HRVCalculator
+from mne_processor import MNEProcessor
+from state_smoother import StateSmoother
+from talking_detector import TalkingDetector
+from imu_features import IMUFeatureEngine
+from session_recorder import SessionRecorder
+from window_scheduler import WindowScheduler
+from sensor_buffers import SensorBufferSet
+from ring_buffer import RingBuffer
+from ica_calibration import ICACalibration
+from calibration_store import CachedCalibration, CalibrationBaseline
+from window_analysis import AnalysisExecutor, AnalysisLane
+from connection_manager import ConnectionManager
+from ws_topics import RawEEGBatcher
+from display_downsampler import DisplayStreams
+from spectrogram import Spectrogram
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SESSION = "default"
+SESSION_KEY_PATTERN = re.compile(r'^[A-Za-z0-9:_\-.]{1,64}$')
+MAX_PIPELINE_SESSIONS = 16  # Each session holds a streamer, sensor buffers, detectors and a recorder
+
+
+class PipelineSession:
+    """
+    Complete real-time pipeline state for one headset
+    """
+
+    def __init__(self, key: str, executor: AnalysisExecutor,
+                 device_id: Optional[str] = None,
+                 recorder: Optional[SessionRecorder] = None,
+                 sample_rate: int = 256,
+                 window_seconds: float = 1.0,
+                 hop_seconds: float = 1.0):
+        """
+        Args:
+            key: Registry key (device or user id)
+            executor: Shared analysis worker pool
+            device_id: LSL device filter for the streamer (None = first Muse found)
+            recorder: Session recorder to use (default: a new one tagged with the key)
+            sample_rate: EEG sample rate (Hz)
+            window_seconds: Analysis window length (seconds)
+            hop_seconds: Time between analysis windows (seconds)
+        """
+        self.key = key
+        self.device_id = device_id
+        self.created_at = time.time()
+
+        # Acquisition, recording and subscribers
+        self.streamer = MuseStreamer(device_id=device_id)
+        self.recorder = recorder if recorder is not None else SessionRecorder(device_id=key)
+        self.manager = ConnectionManager(name=key)
+        self.stream_task: Optional[asyncio.Task] = None
+        self.monitor_task: Optional[asyncio.Task] = None
+
+        # Windowing and buffers
+        self.window_scheduler = WindowScheduler(
+            sample_rate=sample_rate,
+            window_seconds=window_seconds,
+            hop_seconds=hop_seconds
+        )
+        self.sensor_buffers = SensorBufferSet(buffer_seconds=10.0)
+        self.analysis_lane = AnalysisLane(executor, name=key)
+
+        # Processors and detectors
+        self.signal_processor = SignalProcessor()
+        self.mne_processor = MNEProcessor()
+        self.artifact_detector = ArtifactDetector()
+        self.hrv_calculator = HRVCalculator()
+        self.talking_detector = TalkingDetector()
+        # ACC/GYRO features computed once per hop for artifacts, talking and posture
+        self.imu_engine = IMUFeatureEngine(posture_window=self.window_scheduler.seconds_to_windows(60))
+        self.state_smoother = StateSmoother(window_size=self.window_scheduler.seconds_to_windows(10))
+
+        # Cognitive metrics smoothing (shorter window for responsiveness)
+        self.cognitive_load_history = deque(maxlen=self.window_scheduler.seconds_to_windows(8))
+        self.stress_history = deque(maxlen=self.window_scheduler.seconds_to_windows(8))
+        self.copilot_brain_state: Optional[dict] = None  # Latest brain state for copilot
+
+        # Posture state locking (running posture statistics live in imu_engine)
+        self.posture_current_status: Optional[str] = None
+        self.posture_change_time: float = 0.0
+
+        # ICA fitting state (fits run in the background on the analysis executor)
+        self.ica_calibration = ICACalibration(sample_rate=sample_rate)
+        self.ica_fit_task: Optional[asyncio.Task] = None
+        self.ica_reselect_task: Optional[asyncio.Task] = None
+
+        # Background refresh of the extended (LF/HF, Poincare) HRV metrics
+        self.hrv_task: Optional[asyncio.Task] = None
+
+        # Calibration cache (set on connect): key, candidate for a warm start,
+        # and the per-channel amplitude baseline of the model in use
+        self.device_name: Optional[str] = None
+        self.calibration_key: Optional[str] = None
+        self.cached_calibration: Optional[CachedCalibration] = None
+        self.channel_rms: Optional[np.ndarray] = None
+
+        # Stream monitoring and frontend send throttling
+        self.last_data_received = 0.0
+        self.last_eeg_send_time = 0.0
+        self.raw_batcher = RawEEGBatcher(sample_rate=sample_rate)  # eeg_raw topic (every sample)
+        self.display_streams = DisplayStreams(sample_rate=sample_rate)  # display topic (per geometry)
+        self.spectrogram = Spectrogram(hop_seconds=hop_seconds)  # Rolling PSD columns of the analysis hops
+
+    @property
+    def eeg_buffer(self) -> RingBuffer:
+        """EEG samples [n_channels, n] of the shared sensor buffers"""
+        return self.sensor_buffers.eeg.values
+
+    @property
+    def window_size(self) -> int:
+        """Analysis window length in EEG samples"""
+        return self.window_scheduler.window_size
+
+    @property
+    def ica_fitted(self) -> bool:
+        """True once an ICA model is cleaning windows"""
+        return self.ica_calibration.fitted
+
+    def reset_ica_calibration(self):
+        """Forget the ICA calibration so it restarts from scratch"""
+        for task in (self.ica_fit_task, self.ica_reselect_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self.ica_fit_task = None
+        self.ica_reselect_task = None
+        self.ica_calibration.reset()
+        self.cached_calibration = None
+        self.channel_rms = None
+
+    def snapshot_baseline(self) -> Optional[CalibrationBaseline]:
+        """Current baselines to save with the calibration (None before the first fit)"""
+        if self.channel_rms is None:
+            return None
+        band_powers = self.state_smoother.get_smoothed_band_powers() or {}
+        return CalibrationBaseline(
+            channel_rms=[float(v) for v in self.channel_rms],
+            band_powers={k: float(v) for k, v in band_powers.items()},
+            cognitive_load=float(np.mean(self.cognitive_load_history)) if self.cognitive_load_history else None,
+            stress=float(np.mean(self.stress_history)) if self.stress_history else None,
+            exclude=list(self.mne_processor.ica_exclude),
+            device_name=self.device_name
+        )
+
+    def apply_baseline(self, baseline: CalibrationBaseline):
+        """Warm-start the smoothing histories from a saved baseline"""
+        self.channel_rms = np.asarray(baseline.channel_rms, dtype=np.float64)
+        if baseline.band_powers:
+            self.state_smoother.seed(baseline.band_powers, count=self.state_smoother.window_size // 2)
+        for history, value in ((self.cognitive_load_history, baseline.cognitive_load),
+                               (self.stress_history, baseline.stress)):
+            if value is not None:
+                history.extend([value] * (history.maxlen // 2))
+
+    def clear_buffers(self):
+        """Drop buffered samples, the window schedule and queued analysis windows"""
+        self.sensor_buffers.clear()
+        self.window_scheduler.reset()
+        self.analysis_lane.reset()
+        self.display_streams.clear()
+        self.spectrogram.clear()
+
+    async def stop(self):
+        """Stop streaming and background tasks, close the WebSocket clients and
+        stop and save the recording (in a thread: it drains the session log)"""
+        self.streamer.disconnect()
+        self.analysis_lane.close()
+        for task in (self.stream_task, self.monitor_task, self.ica_fit_task, self.ica_reselect_task,
+                     self.hrv_task):
+            if task is not None and not task.done():
+                task.cancel()
+        self.stream_task = None
+        self.monitor_task = None
+        self.hrv_task = None
+        await self.manager.close_all()
+        if self.recorder.is_recording:
+            await asyncio.to_thread(self.recorder.stop_session)
+
+    def get_info(self) -> Dict:
+        """Summary for listing sessions"""
+        return {
+            'session': self.key,
+            'device_id': self.device_id,
+            'connected': self.streamer.eeg_inlet is not None,
+            'streaming': self.streamer.is_streaming,
+            'clients': len(self.manager.active_connections),
+            'is_recording': self.recorder.is_recording,
+            'recording_id': getattr(self.recorder.current_session, 'session_id', None),  # One read (see stop_session)
+            'ica_status': self.ica_calibration.get_status(),
+            'created_at': self.created_at,
+        }
+
+
+class PipelineLimitError(Exception):
+    """Raised when a new pipeline session would exceed the registry's cap"""
+
+
+class PipelineRegistry:
+    """
+    Pipeline sessions keyed by device or user id
+    """
+
+    def __init__(self, executor: AnalysisExecutor, default_recorder: Optional[SessionRecorder] = None,
+                 sample_rate: int = 256, window_seconds: float = 1.0, hop_seconds: float = 1.0,
+                 max_sessions: int = MAX_PIPELINE_SESSIONS):
+        """
+        Args:
+            executor: Analysis worker pool shared by all sessions
+            default_recorder: Recorder of the "default" session (keeps existing session endpoints working)
+            sample_rate: EEG sample rate (Hz)
+            window_seconds: Analysis window length (seconds)
+            hop_seconds: Time between analysis windows (seconds)
+            max_sessions: Sessions kept at once (each holds a streamer, buffers and a recorder)
+        """
+        self.executor = executor
+        self.max_sessions = max_sessions
+        self.default_recorder = default_recorder
+        self.sample_rate = sample_rate
+        self.window_seconds = window_seconds
+        self.hop_seconds = hop_seconds
+        self.sessions: Dict[str, PipelineSession] = {}
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.sessions
+
+    def get(self, key: str = DEFAULT_SESSION) -> Optional[PipelineSession]:
+        """Existing session or None"""
+        return self.sessions.get(key)
+
+    def get_or_create(self, key: str = DEFAULT_SESSION, device_id: Optional[str] = None) -> PipelineSession:
+        """
+        Get a session, creating it on first use
+
+        Args:
+            key: Session key (letters, digits, ':', '_', '-', '.'; max 64 chars)
+            device_id: LSL device filter; updates an idle session's streamer
+
+        Raises:
+            ValueError: If the key is invalid
+            PipelineLimitError: If creating it would exceed max_sessions
+        """
+        if not SESSION_KEY_PATTERN.match(key or ""):
+            raise ValueError(f"Invalid session key: {key!r}")
+
+        session = self.sessions.get(key)
+        if session is None:
+            if len(self.sessions) >= self.max_sessions:
+                raise PipelineLimitError(f"Too many pipeline sessions (max {self.max_sessions})")
+            recorder = self.default_recorder if key == DEFAULT_SESSION else None
+            session = PipelineSession(
+                key,
+                self.executor,
+                device_id=device_id,
+                recorder=recorder,
+                sample_rate=self.sample_rate,
+                window_seconds=self.window_seconds,
+                hop_seconds=self.hop_seconds
+            )
+            self.sessions[key] = session
+            logger.info(f"Created pipeline session '{key}' (device: {device_id or 'any'})")
+        elif device_id and device_id != session.device_id and not session.streamer.is_streaming:
+            session.device_id = device_id
+            session.streamer.device_id = device_id
+
+        return session
+
+    async def remove(self, key: str) -> bool:
+        """Stop and forget a session. Returns False if it did not exist."""
+        session = self.sessions.pop(key, None)
+        if session is None:
+            return False
+        await session.stop()
+        logger.info(f"Removed pipeline session '{key}'")
+        return True
+
+    def all(self) -> List[PipelineSession]:
+        return list(self.sessions.values())
+
+    def list_info(self) -> List[Dict]:
+        """Summaries of all sessions"""
+        return [session.get_info() for session in self.sessions.values()]
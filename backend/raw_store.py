@@ -0,0 +1,217 @@
+"""
+Raw Store
+Full-rate EEG, PPG, ACC and GYRO recording in memory-mapped files
+
+Raw data lets improved pipelines be re-run offline, so it has to be cheap
+enough to leave on for every session. Each stream is a pair of flat files
+in <session>/raw/:
+
+    <stream>.f32         float32 samples [n_samples, n_channels], row-major
+    <stream>.ts.f64      float64 LSL timestamp per sample
+    header.json          channels, rates, dtypes and sample counts
+
+Both files are preallocated (grow_seconds at the stream's native rate) and
+written through np.memmap. A full file grows by another grow_seconds, and
+both are truncated to the samples written at close. Chunks arrive whole
+from the ingest path through the session log writer thread (see
+session_log), which owns the maps. It copies every chunk with one slice
+assignment and flushes them and rewrites the header at each fsync, so at
+most a few seconds are lost on a crash. read_raw() also recovers the
+samples written after the last header update.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+
+import numpy as np
+
+from sensor_buffers import STREAM_CONFIG
+
+logger = logging.getLogger(__name__)
+
+RAW_DIR = "raw"
+HEADER_FILE = "header.json"
+FORMAT_VERSION = 1
+RAW_GROW_SECONDS = 600.0  # Preallocation step per stream (10 minutes: 2.4 MB of EEG)
+SAMPLE_DTYPE = np.dtype('<f4')
+TIMESTAMP_DTYPE = np.dtype('<f8')
+
+
+class RawStream:
+    """
+    Growable memory-mapped sample and timestamp files of one stream
+    """
+
+    def __init__(self, path: str, name: str, n_channels: int, sample_rate: float,
+                 grow_seconds: float = RAW_GROW_SECONDS):
+        """
+        Args:
+            path: Directory of the raw store
+            name: Stream name (file prefix)
+            n_channels: Channels kept (extra columns such as Right AUX are dropped)
+            sample_rate: Native rate (Hz), sizes the preallocation
+            grow_seconds: Preallocation step
+        """
+        self.name = name
+        self.n_channels = n_channels
+        self.sample_rate = sample_rate
+        self.grow_samples = max(1, int(grow_seconds * sample_rate))
+        self.samples_path = os.path.join(path, f"{name}.f32")
+        self.timestamps_path = os.path.join(path, f"{name}.ts.f64")
+        self.n_samples = 0
+        self.capacity = 0
+        self._samples: Optional[np.memmap] = None
+        self._timestamps: Optional[np.memmap] = None
+        self._grow(self.grow_samples)
+
+    def _grow(self, capacity: int):
+        """Extend both files to capacity samples and map them again"""
+        self.flush()
+        self._samples = self._timestamps = None
+        for file_path, row_bytes in ((self.samples_path, SAMPLE_DTYPE.itemsize * self.n_channels),
+                                     (self.timestamps_path, TIMESTAMP_DTYPE.itemsize)):
+            with open(file_path, 'ab') as f:
+                f.truncate(capacity * row_bytes)
+        self._samples = np.memmap(self.samples_path, dtype=SAMPLE_DTYPE, mode='r+',
+                                  shape=(capacity, self.n_channels))
+        self._timestamps = np.memmap(self.timestamps_path, dtype=TIMESTAMP_DTYPE, mode='r+', shape=(capacity,))
+        self.capacity = capacity
+
+    def write(self, samples: np.ndarray, timestamps: np.ndarray):
+        """
+        Append one chunk
+
+        Args:
+            samples: [n, >= n_channels] samples
+            timestamps: [n] LSL timestamps
+        """
+        n = len(timestamps)
+        if n == 0:
+            return
+        if self.n_samples + n > self.capacity:
+            self._grow(max(self.capacity + self.grow_samples, self.n_samples + n))
+        self._samples[self.n_samples:self.n_samples + n] = np.asarray(samples)[:, :self.n_channels]
+        self._timestamps[self.n_samples:self.n_samples + n] = timestamps
+        self.n_samples += n
+
+    def flush(self):
+        if self._samples is not None:
+            self._samples.flush()
+            self._timestamps.flush()
+
+    def close(self):
+        """Flush, unmap and cut the preallocated tail"""
+        self.flush()
+        self._samples = self._timestamps = None
+        for file_path, row_bytes in ((self.samples_path, SAMPLE_DTYPE.itemsize * self.n_channels),
+                                     (self.timestamps_path, TIMESTAMP_DTYPE.itemsize)):
+            with open(file_path, 'r+b') as f:
+                f.truncate(self.n_samples * row_bytes)
+        self.capacity = self.n_samples
+
+    def describe(self) -> Dict:
+        return {
+            'n_channels': self.n_channels,
+            'channels': STREAM_CONFIG.get(self.name, {}).get('channels'),
+            'sample_rate': self.sample_rate,
+            'n_samples': self.n_samples,
+            'dtype': SAMPLE_DTYPE.str,
+            'timestamp_dtype': TIMESTAMP_DTYPE.str,
+        }
+
+
+class RawStore:
+    """
+    Raw recording of all Muse streams (a session log store for 'raw' records)
+
+    Records are {'stream': name, 'samples': [n, ch], 'timestamps': [n]}.
+    """
+
+    def __init__(self, path: str, streams: Optional[Dict[str, Dict]] = None,
+                 grow_seconds: float = RAW_GROW_SECONDS):
+        """
+        Args:
+            path: Directory to create (e.g. <session>/raw)
+            streams: name -> {'n_channels', 'sample_rate'} (default: STREAM_CONFIG)
+            grow_seconds: Preallocation step per stream
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.streams = {
+            name: RawStream(path, name, cfg['n_channels'], cfg['sample_rate'], grow_seconds)
+            for name, cfg in (streams or STREAM_CONFIG).items()
+        }
+        self._write_header()
+
+    def append(self, records: List[Dict]):
+        for record in records:
+            stream = self.streams.get(record['stream'])
+            if stream is None:
+                logger.warning(f"Unknown raw stream skipped: {record['stream']}")
+                continue
+            stream.write(record['samples'], record['timestamps'])
+
+    def fsync(self):
+        for stream in self.streams.values():
+            stream.flush()
+        self._write_header()
+
+    def close(self):
+        for stream in self.streams.values():
+            stream.close()
+        self._write_header()
+
+    def _write_header(self):
+        header = {
+            'format': 'raw',
+            'version': FORMAT_VERSION,
+            'streams': {name: stream.describe() for name, stream in self.streams.items()},
+        }
+        tmp_path = os.path.join(self.path, f"{HEADER_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, HEADER_FILE))
+
+
+def read_raw(path: str) -> Tuple[Dict, Dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """
+    Memory-map a raw store
+
+    Args:
+        path: Directory written by RawStore
+
+    Returns:
+        (header, {stream: ([n_samples, n_channels] float32, [n_samples] float64 timestamps)})
+        as read-only maps. For a recording that did not close cleanly, samples
+        written after the last header update are included (up to the last
+        non-zero timestamp of the preallocated file).
+    """
+    with open(os.path.join(path, HEADER_FILE), 'r') as f:
+        header = json.load(f)
+
+    streams = {}
+    for name, spec in header['streams'].items():
+        n_channels = spec['n_channels']
+        samples_path = os.path.join(path, f"{name}.f32")
+        timestamps_path = os.path.join(path, f"{name}.ts.f64")
+        dtype, timestamp_dtype = np.dtype(spec['dtype']), np.dtype(spec['timestamp_dtype'])
+        capacity = min(os.path.getsize(timestamps_path) // timestamp_dtype.itemsize,
+                       os.path.getsize(samples_path) // (dtype.itemsize * n_channels))
+        if capacity == 0:
+            streams[name] = (np.zeros((0, n_channels), dtype=dtype), np.zeros(0, dtype=timestamp_dtype))
+            continue
+
+        timestamps = np.memmap(timestamps_path, dtype=timestamp_dtype, mode='r', shape=(capacity,))
+        n_samples = min(spec['n_samples'], capacity)
+        if capacity > n_samples:
+            written = np.flatnonzero(timestamps[n_samples:])
+            if len(written):
+                n_samples += int(written[-1]) + 1
+        spec['n_samples'] = n_samples
+        samples = np.memmap(samples_path, dtype=dtype, mode='r', shape=(capacity, n_channels))
+        streams[name] = (samples[:n_samples], timestamps[:n_samples])
+    return header, streams
@@ -0,0 +1,208 @@
+"""
+Ring Buffer Module
+Preallocated multi-channel float ring buffer for the real-time hot path
+
+Replaces per-sample deque appends: whole chunks are written with a couple of
+vectorized slice assignments, and the most recent window is returned as a
+zero-copy view that is contiguous along the time axis.
+
+Layout trick: every sample is stored twice, at position p and p + capacity,
+so the latest N samples always sit in one contiguous slice of the backing
+array - no wrap-around handling or concatenation when reading.
+"""
+
+import numpy as np
+from typing import Optional
+
+
+class RingBuffer:
+    """
+    Fixed-capacity multi-channel ring buffer ([n_channels, n_samples] layout)
+    """
+
+    def __init__(self, n_channels: int, capacity: int, dtype=np.float64):
+        """
+        Args:
+            n_channels: Number of channels (e.g. 4 for Muse EEG, 3 for ACC/GYRO)
+            capacity: Maximum number of samples kept per channel
+            dtype: Storage dtype (default float64)
+        """
+        if n_channels <= 0 or capacity <= 0:
+            raise ValueError("n_channels and capacity must be positive")
+
+        self.n_channels = n_channels
+        self.capacity = capacity
+        self._data = np.zeros((n_channels, 2 * capacity), dtype=dtype)
+        self._head = 0   # Next write position in [0, capacity)
+        self._count = 0  # Number of valid samples
+        self.total_written = 0  # Samples written since creation/clear
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def is_full(self) -> bool:
+        return self._count == self.capacity
+
+    def _as_chunk(self, samples: np.ndarray) -> np.ndarray:
+        """Normalise input to [n_channels, n_samples]"""
+        samples = np.asarray(samples, dtype=self._data.dtype)
+        if samples.ndim == 0:
+            samples = samples.reshape(1, 1)
+        elif samples.ndim == 1:
+            if self.n_channels == 1:
+                # Series of samples for a single channel
+                samples = samples.reshape(1, -1)
+            else:
+                # One sample across all channels
+                samples = samples.reshape(-1, 1)
+        else:
+            # LSL chunks arrive as [n_samples, n_channels]
+            samples = samples.T
+
+        if samples.shape[0] != self.n_channels:
+            raise ValueError(f"Expected {self.n_channels} channels, got {samples.shape[0]}")
+        return samples
+
+    def extend(self, samples: np.ndarray):
+        """
+        Append samples
+
+        Args:
+            samples: [n_samples, n_channels] chunk, a single [n_channels] sample,
+                     or a 1D series when n_channels == 1
+        """
+        chunk = self._as_chunk(samples)
+        n = chunk.shape[1]
+        if n == 0:
+            return
+
+        self.total_written += n
+
+        # Only the newest `capacity` samples can survive
+        if n > self.capacity:
+            chunk = chunk[:, -self.capacity:]
+            self._head = (self._head + n - self.capacity) % self.capacity
+            n = self.capacity
+
+        cap = self.capacity
+        first = min(n, cap - self._head)
+        self._data[:, self._head:self._head + first] = chunk[:, :first]
+        self._data[:, self._head + cap:self._head + cap + first] = chunk[:, :first]
+
+        rest = n - first
+        if rest > 0:
+            self._data[:, :rest] = chunk[:, first:]
+            self._data[:, cap:cap + rest] = chunk[:, first:]
+
+        self._head = (self._head + n) % cap
+        self._count = min(cap, self._count + n)
+
+    def append(self, sample: np.ndarray):
+        """Append a single sample (alias of extend for readability)"""
+        self.extend(sample)
+
+    def latest(self, n: Optional[int] = None) -> np.ndarray:
+        """
+        Get the most recent samples as a zero-copy view
+
+        The view is only valid until the next write - copy it if it has to
+        outlive the current processing step.
+
+        Args:
+            n: Number of samples (default: all valid samples)
+
+        Returns:
+            [n_channels, n] view, oldest sample first
+        """
+        if n is None or n > self._count:
+            n = self._count
+        end = self._head + self.capacity
+        return self._data[:, end - n:end]
+
+    def last(self) -> Optional[np.ndarray]:
+        """Most recent sample [n_channels], or None if empty"""
+        if self._count == 0:
+            return None
+        return self._data[:, self._head + self.capacity - 1]
+
+    def clear(self):
+        """Drop all samples (storage is kept)"""
+        self._head = 0
+        self._count = 0
+        self.total_written = 0
+
+
+class TimestampedRingBuffer:
+    """
+    Ring buffer of multi-channel samples with a parallel per-sample timestamp column
+    """
+
+    def __init__(self, n_channels: int, capacity: int, dtype=np.float64):
+        """
+        Args:
+            n_channels: Number of channels per sample
+            capacity: Maximum number of samples kept
+            dtype: Storage dtype for the sample values (timestamps are always float64)
+        """
+        self.values = RingBuffer(n_channels, capacity, dtype=dtype)
+        self.timestamps = RingBuffer(1, capacity, dtype=np.float64)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    @property
+    def n_channels(self) -> int:
+        return self.values.n_channels
+
+    @property
+    def capacity(self) -> int:
+        return self.values.capacity
+
+    def extend(self, samples: np.ndarray, timestamps: np.ndarray):
+        """
+        Append samples with their timestamps
+
+        Args:
+            samples: [n_samples, n_channels] chunk
+            timestamps: [n_samples] timestamps (LSL clock)
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64).reshape(-1)
+        if timestamps.shape[0] == 0:
+            return
+        self.values.extend(samples)
+        self.timestamps.extend(timestamps)
+
+    def latest(self, n: Optional[int] = None):
+        """
+        Most recent samples as zero-copy views
+
+        Returns:
+            Tuple ([n_channels, n] values, [n] timestamps)
+        """
+        return self.values.latest(n), self.timestamps.latest(n)[0]
+
+    def last_timestamp(self) -> Optional[float]:
+        """Timestamp of the newest sample, or None if empty"""
+        if len(self) == 0:
+            return None
+        return float(self.timestamps.last()[0])
+
+    def window(self, t_start: float, t_end: float):
+        """
+        Samples with t_start < timestamp <= t_end (zero-copy views)
+
+        Assumes timestamps are non-decreasing, which holds for a single LSL inlet.
+
+        Returns:
+            Tuple ([n_channels, n] values, [n] timestamps)
+        """
+        values, timestamps = self.latest()
+        lo = int(np.searchsorted(timestamps, t_start, side='right'))
+        hi = int(np.searchsorted(timestamps, t_end, side='right'))
+        return values[:, lo:hi], timestamps[lo:hi]
+
+    def clear(self):
+        """Drop all samples"""
+        self.values.clear()
+        self.timestamps.clear()
@@ -0,0 +1,142 @@
+"""
+Multi-Rate Sensor Buffers
+Per-stream timestamped ring buffers for EEG, PPG, ACC and GYRO
+
+Each Muse stream runs at its own native rate (EEG 256 Hz, PPG 64 Hz,
+ACC/GYRO 52 Hz). Every sample is kept with its LSL timestamp so consumers
+can ask for "everything that happened in this analysis window" across all
+streams, instead of seeing one decimated sample per poll.
+
+EEG is also filtered once on arrival (StreamingFilter) into a parallel ring
+buffer, so analysis windows read filtered samples without refiltering.
+"""
+
+import numpy as np
+from typing import Dict, Optional, Tuple
+import logging
+
+from ring_buffer import RingBuffer, TimestampedRingBuffer
+from streaming_filter import StreamingFilter
+
+logger = logging.getLogger(__name__)
+
+# Native Muse 2 stream layouts
+STREAM_CONFIG = {
+    'eeg': {'n_channels': 4, 'sample_rate': 256, 'channels': ['TP9', 'AF7', 'AF8', 'TP10']},
+    'ppg': {'n_channels': 3, 'sample_rate': 64, 'channels': ['ambient', 'infrared', 'red']},
+    'acc': {'n_channels': 3, 'sample_rate': 52, 'channels': ['x', 'y', 'z']},    # g
+    'gyro': {'n_channels': 3, 'sample_rate': 52, 'channels': ['x', 'y', 'z']},   # deg/s
+}
+
+
+class SensorBufferSet:
+    """
+    Timestamped ring buffers for all Muse streams with a time-window alignment API
+    """
+
+    def __init__(self, buffer_seconds: float = 10.0):
+        """
+        Args:
+            buffer_seconds: History kept per stream (seconds)
+        """
+        self.buffer_seconds = buffer_seconds
+        self.streams: Dict[str, TimestampedRingBuffer] = {
+            name: TimestampedRingBuffer(
+                cfg['n_channels'],
+                int(np.ceil(buffer_seconds * cfg['sample_rate']))
+            )
+            for name, cfg in STREAM_CONFIG.items()
+        }
+        # Per-stream read cursors for take_new() (in total samples written)
+        self._cursors: Dict[str, int] = {name: 0 for name in STREAM_CONFIG}
+
+        # Bandpass + notch filtered EEG, sample-aligned with the raw EEG buffer
+        eeg_cfg = STREAM_CONFIG['eeg']
+        self.eeg_filter = StreamingFilter(eeg_cfg['n_channels'], eeg_cfg['sample_rate'])
+        self.eeg_filtered = RingBuffer(eeg_cfg['n_channels'], self.streams['eeg'].capacity)
+
+    def __getitem__(self, name: str) -> TimestampedRingBuffer:
+        return self.streams[name]
+
+    @property
+    def eeg(self) -> TimestampedRingBuffer:
+        return self.streams['eeg']
+
+    def ingest(self, name: str, samples: Optional[np.ndarray], timestamps: Optional[np.ndarray]):
+        """
+        Append a full chunk for one stream
+
+        Args:
+            name: Stream name ('eeg', 'ppg', 'acc', 'gyro')
+            samples: [n_samples, n_channels] chunk (extra channels are dropped) or None
+            timestamps: [n_samples] LSL timestamps or None
+        """
+        if samples is None or timestamps is None:
+            return
+        samples = np.asarray(samples)
+        if samples.ndim != 2 or samples.shape[0] == 0:
+            return
+
+        buffer = self.streams[name]
+        if samples.shape[1] < buffer.n_channels:
+            logger.debug(f"Skipping {name} chunk with {samples.shape[1]} channels")
+            return
+        if len(timestamps) != samples.shape[0]:
+            logger.debug(f"Skipping {name} chunk: {len(timestamps)} timestamps for {samples.shape[0]} samples")
+            return
+
+        samples = samples[:, :buffer.n_channels]
+        buffer.extend(samples, timestamps)
+        if name == 'eeg':
+            # Only the new samples are filtered; state carries over from the last chunk
+            self.eeg_filtered.extend(self.eeg_filter.process(samples))
+
+    def window(self, t_start: float, t_end: float) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Samples of every stream with t_start < timestamp <= t_end
+
+        Args:
+            t_start: Window start (exclusive, LSL clock)
+            t_end: Window end (inclusive, LSL clock)
+
+        Returns:
+            Dict stream name -> ([n_samples, n_channels] samples, [n_samples] timestamps).
+            Arrays are zero-copy views, valid until the next ingest.
+        """
+        result = {}
+        for name, buffer in self.streams.items():
+            values, timestamps = buffer.window(t_start, t_end)
+            result[name] = (values.T, timestamps)
+        return result
+
+    def take_new(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Samples of one stream ingested since the previous take_new() call
+
+        Unlike window(), this cannot miss samples whose timestamps fall before
+        an already-processed window but arrive late (e.g. IMU lagging EEG).
+
+        Returns:
+            ([n_samples, n_channels] samples, [n_samples] timestamps) as zero-copy views
+        """
+        buffer = self.streams[name]
+        total = buffer.values.total_written
+        n_new = min(total - self._cursors[name], len(buffer))
+        self._cursors[name] = total
+        values, timestamps = buffer.latest(n_new)
+        return values.T, timestamps
+
+    def latest_sample(self, name: str) -> Optional[np.ndarray]:
+        """Newest sample of a stream [n_channels], or None if empty"""
+        buffer = self.streams[name]
+        if len(buffer) == 0:
+            return None
+        return buffer.values.last()
+
+    def clear(self):
+        """Drop all buffered samples"""
+        for buffer in self.streams.values():
+            buffer.clear()
+        self._cursors = {name: 0 for name in STREAM_CONFIG}
+        self.eeg_filtered.clear()
+        self.eeg_filter.reset()
@@ -0,0 +1,305 @@
+"""
+Session Catalog
+SQLite index of recorded sessions for listing, filtering and pagination
+
+Listing sessions used to scan the sessions directory and parse every
+metadata.json on each request. The catalog (<sessions>/catalog.sqlite3,
+stdlib sqlite3) keeps one row per session with its metadata and summary
+statistics (duration, dominant state, mean band powers, artifact ratio,
+HR), plus a tag table. SessionRecorder updates it on start, stop and
+metadata edits. rebuild() recreates it from the files on disk, which
+remain the source of truth.
+
+query() filters by tags, start date and duration, sorts on an indexed
+column and pages with a cursor (keyset on the sort value and session id).
+A page costs an index range scan, whatever the number of sessions.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+import base64
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "catalog.sqlite3"
+SCHEMA_VERSION = 1
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+BANDS = ('delta', 'theta', 'alpha', 'beta', 'gamma')
+
+# Sort key -> (column, value used for NULLs so keyset comparisons stay total)
+SORT_COLUMNS = {
+    'start_time': ('start_time', "''"),
+    'duration': ('duration_seconds', '-1'),
+    'name': ('name', "''"),
+    'artifact_ratio': ('artifact_ratio', '-1'),
+    'heart_rate': ('heart_rate', '-1'),
+    'signal_quality': ('signal_quality', '-1'),
+}
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    name TEXT,
+    notes TEXT,
+    device_id TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    duration_seconds REAL,
+    status TEXT,
+    total_samples INTEGER,
+    dominant_state TEXT,
+    {', '.join(f'{band} REAL' for band in BANDS)},
+    artifact_ratio REAL,
+    talking_ratio REAL,
+    heart_rate REAL,
+    signal_quality REAL,
+    metadata TEXT NOT NULL,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS session_tags (
+    session_id TEXT NOT NULL REFERENCES sessions(session_id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (session_id, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_tags_tag ON session_tags(tag, session_id);
+{''.join(
+    f"CREATE INDEX IF NOT EXISTS idx_sessions_{key} ON sessions(COALESCE({column}, {null}), session_id);"
+    for key, (column, null) in SORT_COLUMNS.items())}
+"""
+
+
+def _encode_cursor(sort_value, session_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, session_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[Any, str]:
+    try:
+        sort_value, session_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, str(session_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+class SessionCatalog:
+    """
+    SQLite index of the sessions in one sessions directory
+    """
+
+    def __init__(self, sessions_dir: str):
+        """
+        Args:
+            sessions_dir: Directory holding the session folders (the catalog file goes there too)
+        """
+        self.sessions_dir = sessions_dir
+        self.path = os.path.join(sessions_dir, CATALOG_FILE)
+        os.makedirs(sessions_dir, exist_ok=True)
+        is_new = not os.path.exists(self.path)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode = WAL")  # Readers never wait for a writer
+            version = db.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, SCHEMA_VERSION):
+                db.executescript("DROP TABLE IF EXISTS session_tags; DROP TABLE IF EXISTS sessions;")
+                is_new = True
+            db.executescript(_SCHEMA)
+            db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        if is_new:
+            # First use (or an upgrade): index the sessions already on disk
+            self.rebuild()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """One short-lived connection and transaction per call (recorders of several
+        pipeline sessions share the catalog, from the event loop and worker threads)"""
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA foreign_keys = ON")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def upsert(self, metadata: Dict, summary: Optional[Dict] = None, status: Optional[str] = None):
+        """
+        Add or update one session
+
+        Args:
+            metadata: metadata.json contents (session_id required)
+            summary: summary.json contents (None keeps the stored statistics)
+            status: 'recording', 'complete' or 'interrupted' (None: keeps the stored status;
+                    a new row's is derived from end_time)
+        """
+        with self._connect() as db:
+            self._upsert(db, metadata, summary, status)
+
+    @staticmethod
+    def _upsert(db: sqlite3.Connection, metadata: Dict, summary: Optional[Dict], status: Optional[str]):
+        session_id = metadata['session_id']
+        keep_status = status is None  # e.g. a metadata edit, possibly by another pipeline's recorder
+        if status is None:
+            status = 'complete' if metadata.get('end_time') else 'interrupted'
+        row = {
+            'session_id': session_id,
+            'name': metadata.get('name'),
+            'notes': metadata.get('notes'),
+            'device_id': metadata.get('device_id'),
+            'start_time': metadata.get('start_time'),
+            'end_time': metadata.get('end_time'),
+            'duration_seconds': metadata.get('duration_seconds'),
+            'status': status,
+            'metadata': json.dumps(metadata),
+            'updated_at': time.time(),
+        }
+        if summary is not None:
+            band_powers = summary.get('average_band_powers', {})
+            row.update({
+                'total_samples': summary.get('total_samples'),
+                'dominant_state': summary.get('dominant_state'),
+                **{band: band_powers.get(band) for band in BANDS},
+                'artifact_ratio': summary.get('artifact_ratio'),
+                'talking_ratio': summary.get('talking_ratio'),
+                'heart_rate': summary.get('heart_rate', {}).get('mean'),
+                'signal_quality': summary.get('signal_quality', {}).get('mean'),
+            })
+        columns = list(row)
+        updates = ', '.join(f"{column} = excluded.{column}" for column in columns
+                            if column != 'session_id' and not (keep_status and column == 'status'))
+        db.execute(
+            f"INSERT INTO sessions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT(session_id) DO UPDATE SET {updates}",
+            [row[column] for column in columns],
+        )
+        db.execute("DELETE FROM session_tags WHERE session_id = ?", (session_id,))
+        db.executemany("INSERT OR IGNORE INTO session_tags (session_id, tag) VALUES (?, ?)",
+                       [(session_id, str(tag)) for tag in metadata.get('tags') or []])
+
+    def delete(self, session_id: str):
+        with self._connect() as db:
+            db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def rebuild(self) -> int:
+        """
+        Re-index every session folder on disk (metadata.json and summary.json)
+
+        Indexed sessions keep their status (a session being recorded stays
+        'recording'); sessions new to the catalog get it from end_time.
+
+        Returns:
+            Number of sessions indexed
+        """
+        start = time.perf_counter()
+        indexed = 0
+        with self._connect() as db:  # One transaction: readers see the old or the new index
+            statuses = dict(db.execute("SELECT session_id, status FROM sessions").fetchall())
+            db.execute("DELETE FROM sessions")
+            for entry in os.scandir(self.sessions_dir):
+                metadata_path = os.path.join(entry.path, "metadata.json")
+                if not entry.is_dir() or not os.path.exists(metadata_path):
+                    continue
+                try:
+                    with open(metadata_path, 'r') as f:
+                        metadata = json.load(f)
+                    summary = None
+                    summary_path = os.path.join(entry.path, "summary.json")
+                    if os.path.exists(summary_path):
+                        with open(summary_path, 'r') as f:
+                            summary = json.load(f)
+                    metadata.setdefault('session_id', entry.name)
+                    self._upsert(db, metadata, summary or {}, statuses.get(metadata['session_id']))
+                    indexed += 1
+                except (OSError, ValueError, AttributeError) as e:
+                    logger.error(f"Error indexing session {entry.name}: {e}")
+        logger.info(f"Session catalog rebuilt: {indexed} session(s) in {time.perf_counter() - start:.2f}s")
+        return indexed
+
+    def query(self, tags: Optional[Sequence[str]] = None, started_after: Optional[str] = None,
+              started_before: Optional[str] = None, min_duration: Optional[float] = None,
+              max_duration: Optional[float] = None, sort: str = 'start_time', descending: bool = True,
+              limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of sessions
+
+        Args:
+            tags: Sessions carrying all of these tags
+            started_after: ISO start time lower bound (inclusive)
+            started_before: ISO start time upper bound (exclusive)
+            min_duration, max_duration: Duration bounds (seconds, inclusive)
+            sort: One of SORT_COLUMNS
+            descending: Sort order
+            limit: Page size (1-MAX_PAGE_SIZE)
+            cursor: next_cursor of the previous page
+
+        Returns:
+            {'sessions': [metadata + 'stats'], 'next_cursor': str or None}
+
+        Raises:
+            ValueError: Unknown sort key or invalid cursor
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {tuple(SORT_COLUMNS)}")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        column, null = SORT_COLUMNS[sort]
+        sort_expr = f"COALESCE({column}, {null})"
+
+        where, params = [], []
+        if tags:
+            tags = sorted(set(tags))
+            where.append(f"session_id IN (SELECT session_id FROM session_tags WHERE tag IN "
+                         f"({', '.join('?' * len(tags))}) GROUP BY session_id HAVING COUNT(*) = ?)")
+            params.extend([*tags, len(tags)])
+        if started_after:
+            where.append("start_time >= ?")
+            params.append(started_after)
+        if started_before:
+            where.append("start_time < ?")
+            params.append(started_before)
+        if min_duration is not None:
+            where.append("duration_seconds >= ?")
+            params.append(min_duration)
+        if max_duration is not None:
+            where.append("duration_seconds <= ?")
+            params.append(max_duration)
+        if cursor:
+            sort_value, session_id = _decode_cursor(cursor)
+            op = '<' if descending else '>'
+            where.append(f"({sort_expr} {op} ? OR ({sort_expr} = ? AND session_id {op} ?))")
+            params.extend([sort_value, sort_value, session_id])
+
+        direction = 'DESC' if descending else 'ASC'
+        sql = (f"SELECT *, {sort_expr} AS sort_value FROM sessions"
+               f"{' WHERE ' + ' AND '.join(where) if where else ''}"
+               f" ORDER BY {sort_expr} {direction}, session_id {direction} LIMIT ?")
+        with self._connect() as db:
+            rows = db.execute(sql, [*params, limit + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1]['sort_value'], rows[-1]['session_id'])
+        return {'sessions': [self._entry(row) for row in rows], 'next_cursor': next_cursor}
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict:
+        """Stored metadata plus the catalog statistics"""
+        entry = json.loads(row['metadata'])
+        entry['stats'] = {
+            'status': row['status'],
+            'total_samples': row['total_samples'],
+            'dominant_state': row['dominant_state'],
+            'average_band_powers': {band: row[band] for band in BANDS if row[band] is not None},
+            'artifact_ratio': row['artifact_ratio'],
+            'talking_ratio': row['talking_ratio'],
+            'heart_rate': row['heart_rate'],
+            'signal_quality': row['signal_quality'],
+        }
+        return entry
+
+    def count(self) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
@@ -0,0 +1,311 @@
+"""
+Session Columns
+Columnar binary storage of a recording's processed samples
+
+processed.json repeats every key of every sample as pretty-printed text and
+has to be parsed in full before anything can be shown. The columnar format
+stores one fixed-dtype array per field instead, in <session>/processed/:
+
+    header.json          format version, row count, column dtypes,
+                         dictionaries and constants (small)
+    <column>.bin         little-endian values, one per row (np.memmap-able)
+
+- timestamps and local times, band powers, quality, HR/HRV, the EMG/blink/
+  movement features and ACC/GYRO are float arrays (NaN = missing)
+- brain_state and artifact_type are dictionary-encoded uint8 codes (code
+  255 is reserved for values past the dictionary limit, read back as 'other')
+- a column holding a single value for the whole session is stored as a
+  constant in the header, with no data file
+
+Rows are appended by the session log writer thread (see session_log), so a
+recording is readable while it runs and after a crash: the row count is
+then the shortest column file. read_columns() memory-maps the files, and
+to_records() rebuilds the ProcessedSample dicts of processed.json.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROCESSED_DIR = "processed"
+HEADER_FILE = "header.json"
+FORMAT_VERSION = 1
+OTHER_CODE = 255      # uint8 code of values that did not fit the dictionary
+OTHER_VALUE = 'other'
+MAX_DICTIONARY = OTHER_CODE  # Dictionary entries (codes 0-254)
+
+# (column, dtype, record path). A path 'name.key' reads a dict entry, 'name.0' a list element.
+# local_time is stored as seconds after the header's local_time_origin.
+PROCESSED_COLUMNS: Tuple[Tuple[str, str, str], ...] = (
+    ('timestamp', '<f8', 'timestamp'),
+    ('local_time', '<f4', 'local_time'),
+    *((f'band_{band}', '<f4', f'band_powers.{band}') for band in ('delta', 'theta', 'alpha', 'beta', 'gamma')),
+    ('signal_quality', '<f4', 'signal_quality'),
+    *((name, '<f4', name) for name in (
+        'heart_rate', 'hrv_rmssd', 'hrv_sdnn', 'hrv_pnn50', 'hrv_sd1', 'hrv_sd2', 'hrv_lf', 'hrv_hf', 'hrv_lf_hf',
+        'emg_intensity', 'forehead_emg', 'blink_intensity', 'movement_intensity', 'data_quality')),
+    ('has_artifact', 'u1', 'has_artifact'),
+    ('is_talking', 'u1', 'is_talking'),
+    ('brain_state', 'u1', 'brain_state'),
+    ('artifact_type', 'u1', 'artifact_type'),
+    *((f'acc_{axis}', '<f4', f'acc_data.{i}') for i, axis in enumerate('xyz')),
+    *((f'gyro_{axis}', '<f4', f'gyro_data.{i}') for i, axis in enumerate('xyz')),
+)
+DICTIONARY_COLUMNS = {'brain_state', 'artifact_type'}
+BOOL_COLUMNS = {'has_artifact', 'is_talking'}
+VECTOR_FIELDS = {'acc_data': 3, 'gyro_data': 3}  # List fields (None when all NaN)
+
+
+def _lookup(record: Dict, path: str):
+    head, _, tail = path.partition('.')
+    value = record.get(head)
+    if not tail or value is None:
+        return value
+    if isinstance(value, dict):
+        return value.get(tail)
+    index = int(tail)
+    return value[index] if index < len(value) else None
+
+
+def _epoch(local_time) -> float:
+    if isinstance(local_time, str):
+        return datetime.fromisoformat(local_time).timestamp()
+    return float(local_time) if local_time is not None else np.nan
+
+
+class ColumnarWriter:
+    """
+    Appends processed sample rows to a columnar directory
+    """
+
+    def __init__(self, path: str, columns: Tuple[Tuple[str, str, str], ...] = PROCESSED_COLUMNS):
+        """
+        Args:
+            path: Directory to create (e.g. <session>/processed)
+            columns: (column, dtype, record path) layout
+        """
+        self.path = path
+        self.columns = columns
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f"{name}.bin"), 'ab') for name, _, _ in columns}
+        self.dictionaries: Dict[str, List[str]] = {name: [] for name in DICTIONARY_COLUMNS}
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in DICTIONARY_COLUMNS}
+        self.local_time_origin: Optional[float] = None
+        self.n_rows = 0
+
+    def _code(self, column: str, value) -> int:
+        value = str(value)
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            if len(codes) >= MAX_DICTIONARY:
+                logger.error(f"Too many distinct {column} values - '{value}' stored as '{OTHER_VALUE}'")
+                return OTHER_CODE
+            code = codes[value] = len(codes)
+            self.dictionaries[column].append(value)
+        return code
+
+    def append(self, records: List[Dict]):
+        """
+        Append rows
+
+        Args:
+            records: ProcessedSample dicts (asdict)
+        """
+        if not records:
+            return
+        dictionary_sizes = {name: len(values) for name, values in self.dictionaries.items()}
+        if self.local_time_origin is None:
+            self.local_time_origin = float(int(_epoch(records[0].get('local_time'))))
+
+        for name, dtype, path in self.columns:
+            values = [_lookup(record, path) for record in records]
+            if name in DICTIONARY_COLUMNS:
+                column = np.array([self._code(name, v) for v in values], dtype=dtype)
+            elif name == 'local_time':
+                column = np.array([_epoch(v) - self.local_time_origin for v in values], dtype=dtype)
+            elif name in BOOL_COLUMNS:
+                column = np.array([bool(v) for v in values], dtype=dtype)
+            else:
+                column = np.array([np.nan if v is None else v for v in values], dtype=dtype)
+            self._files[name].write(column.tobytes())
+        self.n_rows += len(records)
+
+        # The first rows and new dictionary values have to reach the header for the data to be readable
+        if self.n_rows == len(records) or any(len(self.dictionaries[name]) != size
+                                              for name, size in dictionary_sizes.items()):
+            self._flush()
+            self._write_header()
+
+    def _flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def fsync(self):
+        self._flush()
+        for f in self._files.values():
+            os.fsync(f.fileno())
+
+    def _write_header(self, constants: Optional[Dict[str, Any]] = None):
+        constants = constants or {}
+        header = {
+            'format': 'columnar',
+            'version': FORMAT_VERSION,
+            'n_rows': self.n_rows,
+            'local_time_origin': self.local_time_origin,
+            'columns': {},
+        }
+        for name, dtype, path in self.columns:
+            column: Dict[str, Any] = {'dtype': dtype, 'path': path}
+            if name in DICTIONARY_COLUMNS:
+                column['dictionary'] = self.dictionaries[name]
+            if name in constants:
+                column['const'] = constants[name]
+            header['columns'][name] = column
+        tmp_path = os.path.join(self.path, f"{HEADER_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(header, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, HEADER_FILE))
+
+    def close(self):
+        """Fold constant columns into the header and write the final row count"""
+        self.fsync()
+        for f in self._files.values():
+            f.close()
+        constants = {}
+        if self.n_rows:
+            for name, dtype, _ in self.columns:
+                file_path = os.path.join(self.path, f"{name}.bin")
+                values = np.fromfile(file_path, dtype=dtype, count=self.n_rows)
+                first = values[0]
+                if np.issubdtype(values.dtype, np.floating) and np.all(np.isnan(values)):
+                    constants[name] = None
+                elif np.all(values == first):
+                    constants[name] = first.item()
+        self._write_header(constants)
+        for name in constants:
+            os.remove(os.path.join(self.path, f"{name}.bin"))
+
+
+def read_columns(path: str) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    Memory-map a columnar directory
+
+    Args:
+        path: Directory written by ColumnarWriter
+
+    Returns:
+        (header, {column: read-only array}). Constant columns are broadcast
+        views; an interrupted recording is cut to its shortest column.
+    """
+    with open(os.path.join(path, HEADER_FILE), 'r') as f:
+        header = json.load(f)
+
+    specs = header['columns']
+    n_rows = header.get('n_rows', 0)
+    sizes = []
+    for name, spec in specs.items():
+        file_path = os.path.join(path, f"{name}.bin")
+        if 'const' not in spec and os.path.exists(file_path):
+            sizes.append(os.path.getsize(file_path) // np.dtype(spec['dtype']).itemsize)
+    if sizes:
+        n_rows = min(sizes)  # Rows written after the last header update (or cut short by a crash)
+
+    columns = {}
+    for name, spec in specs.items():
+        dtype = np.dtype(spec['dtype'])
+        file_path = os.path.join(path, f"{name}.bin")
+        if 'const' in spec:
+            value = np.nan if spec['const'] is None else spec['const']
+            columns[name] = np.broadcast_to(np.array(value, dtype=dtype), (n_rows,))
+        elif n_rows == 0 or not os.path.exists(file_path):
+            columns[name] = np.zeros(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode='r', shape=(n_rows,))
+    header['n_rows'] = n_rows
+    return header, columns
+
+
+def to_records(header: Dict, columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """Rows as ProcessedSample dicts (the processed.json layout)"""
+    n_rows = header['n_rows']
+    if n_rows == 0:
+        return []
+    specs = header['columns']
+    origin = header.get('local_time_origin') or 0.0
+
+    fields: Dict[str, List] = {}
+    for name, spec in specs.items():
+        values = np.asarray(columns[name])
+        if name in DICTIONARY_COLUMNS:
+            dictionary = spec.get('dictionary', [])
+            fields[name] = [dictionary[code] if code < len(dictionary) else
+                            OTHER_VALUE if code == OTHER_CODE else 'unknown' for code in values.tolist()]
+        elif name in BOOL_COLUMNS:
+            fields[name] = values.astype(bool).tolist()
+        elif name == 'local_time':
+            fields[name] = [datetime.fromtimestamp(origin + offset).isoformat()
+                            for offset in values.astype(np.float64).tolist()]
+        else:
+            # NaN (missing) -> None, as JSON has no NaN
+            fields[name] = [None if value != value else value for value in values.astype(np.float64).tolist()]
+
+    records = [{} for _ in range(n_rows)]
+    for name, spec in specs.items():
+        head, _, tail = spec['path'].partition('.')
+        values = fields[name]
+        if not tail:
+            for record, value in zip(records, values):
+                record[head] = value
+        elif head in VECTOR_FIELDS:
+            index = int(tail)
+            for record, value in zip(records, values):
+                record.setdefault(head, [None] * VECTOR_FIELDS[head])[index] = value
+        else:
+            for record, value in zip(records, values):
+                record.setdefault(head, {})[tail] = value
+
+    for record in records:
+        for head in VECTOR_FIELDS:
+            if head in record and all(v is None for v in record[head]):
+                record[head] = None
+    return records
+
+
+def write_columns(path: str, records: List[Dict]) -> str:
+    """
+    Write processed sample dicts to a new columnar directory in one go
+    (e.g. to convert the processed.json of an older session)
+
+    Returns:
+        The directory path
+    """
+    writer = ColumnarWriter(path)
+    writer.append(records)
+    writer.close()
+    return path
+
+
+if __name__ == "__main__":
+    # Convert older sessions: python session_columns.py sessions/<id> [...]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    for session_path in sys.argv[1:]:
+        json_path = os.path.join(session_path, "processed.json")
+        target = os.path.join(session_path, PROCESSED_DIR)
+        if not os.path.exists(json_path) or os.path.exists(target):
+            logger.info(f"Skipping {session_path} (no processed.json or already converted)")
+            continue
+        with open(json_path, 'r') as f:
+            write_columns(target, json.load(f))
+        size = sum(entry.stat().st_size for entry in os.scandir(target))
+        logger.info(f"{session_path}: {os.path.getsize(json_path)} -> {size} bytes")
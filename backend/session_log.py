@@ -0,0 +1,236 @@
+"""
+Session Log
+Append-only on-disk log of a recording, written by a background thread
+
+SessionRecorder used to keep every processed sample and event of a session
+in Python lists and json.dump them at stop. Memory grew with the session,
+a crash lost everything, and stopping a long session stalled the event loop.
+A SessionLogWriter instead appends one JSON line per record to
+<session>/session.jsonl:
+
+    {"kind": "header", "metadata": {...}}
+    {"kind": "event", ...SessionEvent}
+    {"kind": "footer", "metadata": {...}, "counts": {...}}
+
+Record kinds with a store of their own (processed samples go to the
+columnar store of session_columns, raw sensor chunks to raw_store) are
+handed to that store in batches instead of being written as lines.
+
+Callers only enqueue records (no I/O on the event loop). The writer thread
+drains the queue in batches, flushes every FLUSH_SECONDS and fsyncs every
+FSYNC_SECONDS, so a crash loses at most a few seconds. Memory stays
+constant: the queue is bounded, and records that do not fit are dropped
+and counted. A log without a footer is a session that did not stop cleanly;
+read_session_log() returns everything up to the last complete line.
+"""
+
+from dataclasses import asdict, is_dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SESSION_LOG = "session.jsonl"
+FLUSH_SECONDS = 1.0       # Batch interval (write + flush to the OS)
+FSYNC_SECONDS = 2.0       # Durability interval (fsync to disk)
+LOG_QUEUE_SIZE = 65536    # Records waiting for the writer (minutes of raw sensor chunks)
+
+
+def _json_default(value):
+    """NumPy scalars and arrays in records (e.g. event data)"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode_record(kind: str, record: Any) -> str:
+    """One log line (dataclass or dict record, tagged with its kind)"""
+    fields = asdict(record) if is_dataclass(record) else dict(record)
+    return json.dumps({'kind': kind, **fields}, separators=(',', ':'), default=_json_default) + '\n'
+
+
+class SessionLogWriter:
+    """
+    Background writer of one session log
+    """
+
+    def __init__(self, path: str, flush_seconds: float = FLUSH_SECONDS,
+                 fsync_seconds: float = FSYNC_SECONDS, queue_size: int = LOG_QUEUE_SIZE,
+                 stores: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            path: Log file (created; appended to if it exists)
+            flush_seconds: Batch interval
+            fsync_seconds: fsync interval
+            queue_size: Bound of the record queue
+            stores: kind -> store with append(list of dicts), fsync() and close(),
+                    used by the writer thread for records of that kind
+        """
+        self.path = path
+        self.stores = stores or {}
+        self.flush_seconds = flush_seconds
+        self.fsync_seconds = fsync_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._closed = False
+        self.records_written = 0
+        self.records_dropped = 0
+        self.batches_written = 0
+        self.bytes_written = 0
+        self.last_fsync = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f"session-log-{os.path.basename(os.path.dirname(path))}",
+                                        daemon=True)
+        self._thread.start()
+
+    def append(self, kind: str, record: Any) -> bool:
+        """
+        Queue a record (never blocks)
+
+        Args:
+            kind: Record kind ('processed', 'event', 'raw', ...)
+            record: Dataclass or dict; encoded on the writer thread
+
+        Returns:
+            False if the record was dropped (writer closed or queue full)
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait((kind, record))
+            return True
+        except queue.Full:
+            self.records_dropped += 1
+            if self.records_dropped == 1 or self.records_dropped % 1000 == 0:
+                logger.warning(f"Session log queue full - {self.records_dropped} record(s) dropped ({self.path})")
+            return False
+
+    def close(self, footer: Optional[Dict] = None):
+        """
+        Write the remaining records and the footer, fsync and stop the thread
+
+        Args:
+            footer: Fields of the final 'footer' record (None: no footer)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put((None, footer))
+        self._thread.join()
+
+    def _run(self):
+        done = False
+        dirty = False  # Written but not fsynced yet
+        while not done:
+            batch: List[Tuple[Optional[str], Any]] = []
+            deadline = time.monotonic() + self.flush_seconds
+            try:
+                # Block for the first record, then collect until the batch interval ends
+                batch.append(self._queue.get(timeout=self.flush_seconds))
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or batch[-1][0] is None:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                pass
+
+            lines = []
+            stored: Dict[str, List[Dict]] = {}
+            for kind, record in batch:
+                if kind is None:
+                    done = True
+                    if record is not None:
+                        lines.append(encode_record('footer', record))
+                    continue
+                if kind in self.stores:
+                    stored.setdefault(kind, []).append(asdict(record) if is_dataclass(record) else record)
+                    continue
+                try:
+                    lines.append(encode_record(kind, record))
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Unserializable {kind} record skipped: {e}")
+            try:
+                for kind, records in stored.items():
+                    self.stores[kind].append(records)
+                    self.records_written += len(records)
+                    dirty = True
+                if lines:
+                    text = ''.join(lines)
+                    self._file.write(text)
+                    self._file.flush()
+                    self.records_written += len(lines)
+                    self.bytes_written += len(text)
+                    dirty = True
+                if stored or lines:
+                    self.batches_written += 1
+                if dirty and (done or time.monotonic() - self.last_fsync >= self.fsync_seconds):
+                    for store in self.stores.values():
+                        store.fsync()
+                    os.fsync(self._file.fileno())
+                    self.last_fsync = time.monotonic()
+                    dirty = False
+            except (OSError, ValueError) as e:
+                logger.error(f"Error writing session log {self.path}: {e}")
+        for store in self.stores.values():
+            try:
+                store.close()
+            except OSError as e:
+                logger.error(f"Error closing session store: {e}")
+        self._file.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            'path': self.path,
+            'pending': self._queue.qsize(),
+            'records_written': self.records_written,
+            'records_dropped': self.records_dropped,
+            'batches_written': self.batches_written,
+            'bytes_written': self.bytes_written,
+        }
+
+
+def iter_session_log(path: str) -> Iterator[Dict]:
+    """
+    Records of a session log in order
+
+    A truncated last line (crash mid-write) is skipped.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.endswith('\n'):
+                logger.warning(f"Truncated last record in {path} (line {line_number}) skipped")
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Corrupt record in {path} (line {line_number}) skipped")
+
+
+def read_session_log(path: str, kinds: Tuple[str, ...] = ('processed', 'event')) -> Dict[str, Any]:
+    """
+    Load a session log
+
+    Args:
+        path: Log file
+        kinds: Record kinds to collect (raw samples are large and skipped by default)
+
+    Returns:
+        {'header': dict or None, 'footer': dict or None, <kind>: [records without 'kind']}
+    """
+    result: Dict[str, Any] = {'header': None, 'footer': None, **{kind: [] for kind in kinds}}
+    for record in iter_session_log(path):
+        kind = record.pop('kind', None)
+        if kind in ('header', 'footer'):
+            result[kind] = record
+        elif kind in kinds:
+            result[kind].append(record)
+    return result
@@ -2,11 +2,15 @@
 Session Recording Module
 Records EEG data, band powers, and events for later analysis
 Supports both local storage and cloud upload (Supabase)
+
+Records are streamed to disk while recording: processed samples to a
+columnar store (see session_columns), full-rate raw sensor data to
+memory-mapped files (see raw_store) and events to an append-only log (see
+session_log). Only the metadata and the running summary are kept in memory.
 """
 
 import json
 import os
-import csv
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
@@ -14,6 +18,13 @@ from collections import deque
 import numpy as np
 import logging
 import asyncio
+import sqlite3
+import threading
+
+from raw_store import RAW_DIR, RawStore, read_raw
+from session_catalog import SessionCatalog
+from session_columns import PROCESSED_DIR, ColumnarWriter, read_columns, to_records
+from session_log import SESSION_LOG, SessionLogWriter, read_session_log
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +41,7 @@ class SessionMetadata:
     channels: List[str] = None
     notes: str = ""
     tags: List[str] = None
+    device_id: Optional[str] = None  # Headset the session was recorded from (multi-device setups)
 
     def __post_init__(self):
         if self.channels is None:
@@ -56,6 +68,14 @@ class ProcessedSample:
     signal_quality: float
     heart_rate: float
     hrv_rmssd: float
+    # HRV beyond RMSSD (0 until enough beats; LF/HF needs ~1 min of RR intervals)
+    hrv_sdnn: float = 0.0
+    hrv_pnn50: float = 0.0           # % successive RR differences > 50 ms
+    hrv_sd1: float = 0.0             # Poincare SD1 (ms)
+    hrv_sd2: float = 0.0             # Poincare SD2 (ms)
+    hrv_lf: float = 0.0              # LF power 0.04-0.15 Hz (ms^2)
+    hrv_hf: float = 0.0              # HF power 0.15-0.4 Hz (ms^2)
+    hrv_lf_hf: float = 0.0           # LF/HF ratio (autonomic balance)
     # NEW: Artifact features (continuous 0-1 values, NOT binary flags)
     emg_intensity: float = 0.0       # jaw/face muscle activity (stress/talking)
     forehead_emg: float = 0.0        # cognitive effort indicator
@@ -81,6 +101,94 @@ class SessionEvent:
     data: Optional[Dict] = None
 
 
+class SessionSummary:
+    """
+    Running summary statistics of the processed samples (constant memory)
+
+    add() runs on the event loop and to_dict() in the stop thread, so both hold a lock.
+    """
+
+    BANDS = ('delta', 'theta', 'alpha', 'beta', 'gamma')
+    FEATURES = ('emg_intensity', 'forehead_emg', 'blink_intensity', 'movement_intensity')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.state_counts: Dict[str, int] = {}
+        self.band_sums = {band: 0.0 for band in self.BANDS}
+        self.quality_sum, self.quality_min, self.quality_max = 0.0, None, None
+        self.artifact_count = 0
+        self.talking_count = 0
+        self.hr_count, self.hr_sum, self.hr_min, self.hr_max = 0, 0.0, None, None
+        self.feature_sums = {name: 0.0 for name in self.FEATURES}
+        self.feature_max = {name: 0.0 for name in self.FEATURES}
+        self.data_quality_sum, self.data_quality_min = 0.0, None
+
+    def add(self, sample: ProcessedSample):
+        with self._lock:
+            self._add(sample)
+
+    def _add(self, sample: ProcessedSample):
+        self.count += 1
+        self.state_counts[sample.brain_state] = self.state_counts.get(sample.brain_state, 0) + 1
+        for band in self.BANDS:
+            self.band_sums[band] += sample.band_powers.get(band, 0)
+        quality = sample.signal_quality
+        self.quality_sum += quality
+        self.quality_min = quality if self.quality_min is None else min(self.quality_min, quality)
+        self.quality_max = quality if self.quality_max is None else max(self.quality_max, quality)
+        self.artifact_count += bool(sample.has_artifact)
+        self.talking_count += bool(sample.is_talking)
+        if sample.heart_rate > 0:
+            self.hr_count += 1
+            self.hr_sum += sample.heart_rate
+            self.hr_min = sample.heart_rate if self.hr_min is None else min(self.hr_min, sample.heart_rate)
+            self.hr_max = sample.heart_rate if self.hr_max is None else max(self.hr_max, sample.heart_rate)
+        for name in self.FEATURES:
+            value = getattr(sample, name)
+            self.feature_sums[name] += value
+            self.feature_max[name] = value if self.count == 1 else max(self.feature_max[name], value)
+        self.data_quality_sum += sample.data_quality
+        self.data_quality_min = (sample.data_quality if self.data_quality_min is None
+                                 else min(self.data_quality_min, sample.data_quality))
+
+    def to_dict(self, duration_seconds: float, events_count: int) -> Dict:
+        """Session summary (same layout as summary.json)"""
+        with self._lock:
+            return self._to_dict(duration_seconds, events_count)
+
+    def _to_dict(self, duration_seconds: float, events_count: int) -> Dict:
+        if not self.count:
+            return {}
+        n = self.count
+        return {
+            'duration_seconds': duration_seconds,
+            'total_samples': n,
+            'brain_state_distribution': dict(self.state_counts),
+            'dominant_state': max(self.state_counts, key=self.state_counts.get) if self.state_counts else 'unknown',
+            'average_band_powers': {band: total / n for band, total in self.band_sums.items()},
+            'signal_quality': {
+                'mean': self.quality_sum / n,
+                'min': self.quality_min,
+                'max': self.quality_max,
+            },
+            # Artifact feature summary (continuous 0-1)
+            'artifact_features': {
+                **{name: {'mean': self.feature_sums[name] / n, 'max': self.feature_max[name]}
+                   for name in self.FEATURES},
+                'data_quality': {'mean': self.data_quality_sum / n, 'min': self.data_quality_min},
+            },
+            'artifact_ratio': self.artifact_count / n,
+            'talking_ratio': self.talking_count / n,
+            'heart_rate': {
+                'mean': self.hr_sum / self.hr_count if self.hr_count else 0,
+                'min': self.hr_min if self.hr_count else 0,
+                'max': self.hr_max if self.hr_count else 0,
+            },
+            'events_count': events_count,
+        }
+
+
 class SessionRecorder:
     """
     Records and saves EEG session data
@@ -89,21 +197,33 @@ class SessionRecorder:
     - Raw EEG samples (high frequency, for detailed analysis)
     - Processed samples (1/second, band powers and states)
     - Events (artifacts, markers)
+
+    Processed samples are appended to processed/ (columnar), raw EEG, PPG,
+    ACC and GYRO chunks to raw/ (memory-mapped) and events to session.jsonl,
+    as they arrive; metadata.json and summary.json are written at start and
+    stop.
     """
 
-    def __init__(self, sessions_dir: str = "sessions"):
+    def __init__(self, sessions_dir: str = "sessions", device_id: Optional[str] = None):
+        """
+        Args:
+            sessions_dir: Directory where sessions are saved
+            device_id: Headset this recorder belongs to (appended to session IDs so
+                       concurrent headsets never collide); None for the single-device setup
+        """
         self.sessions_dir = sessions_dir
+        self.device_id = device_id
         self.is_recording = False
         self.current_session: Optional[SessionMetadata] = None
 
-        # Buffers for current session
-        self.raw_samples: List[EEGSample] = []
-        self.processed_samples: List[ProcessedSample] = []
-        self.events: List[SessionEvent] = []
+        # Current session: streamed to disk, only counts and the summary stay in memory
+        self.log: Optional[SessionLogWriter] = None
+        self.summary = SessionSummary()
+        self.counts = {'raw': 0, 'processed': 0, 'event': 0}
 
         # Buffer for real-time processing (don't save every sample)
         self.raw_buffer: deque = deque(maxlen=256 * 60)  # 60 seconds buffer
-        self.save_raw = True  # Can disable to save space
+        self.save_raw = True  # Full-rate raw streams (~1.3 MB/min, can disable to save space)
 
         # Talking detection state
         self.talking_buffer: deque = deque(maxlen=30)  # 30 seconds of talking detection
@@ -111,6 +231,9 @@ class SessionRecorder:
         # Ensure sessions directory exists
         os.makedirs(sessions_dir, exist_ok=True)
 
+        # SQLite index of the sessions for listing (rebuilt from disk on first use)
+        self.catalog = SessionCatalog(sessions_dir)
+
     def start_session(self, notes: str = "", tags: List[str] = None) -> str:
         """
         Start a new recording session
@@ -119,32 +242,47 @@ class SessionRecorder:
             Session ID
         """
         if self.is_recording:
+            # Callers on the event loop stop the previous session in a thread first (see main.py)
             logger.warning("Already recording - stopping previous session")
             self.stop_session()
 
         # Generate session ID
         now = datetime.now()
         session_id = now.strftime("%Y%m%d_%H%M%S")
+        if self.device_id:
+            # Keep IDs filesystem-safe (device IDs are often MAC addresses)
+            suffix = "".join(c for c in self.device_id if c.isalnum() or c in "-_")
+            session_id = f"{session_id}_{suffix}"
 
         self.current_session = SessionMetadata(
             session_id=session_id,
             start_time=now.isoformat(),
             notes=notes,
-            tags=tags or []
+            tags=tags or [],
+            device_id=self.device_id
         )
 
         # Clear buffers
-        self.raw_samples = []
-        self.processed_samples = []
-        self.events = []
+        self.summary = SessionSummary()
+        self.counts = {'raw': 0, 'processed': 0, 'event': 0}
         self.raw_buffer.clear()
         self.talking_buffer.clear()
 
-        self.is_recording = True
-
-        # Create session directory
+        # Create session directory; the metadata is written now so an interrupted session is still listed
         session_path = os.path.join(self.sessions_dir, session_id)
         os.makedirs(session_path, exist_ok=True)
+        self._write_json(os.path.join(session_path, "metadata.json"), asdict(self.current_session))
+        self._index(asdict(self.current_session), status='recording')
+        self.log = SessionLogWriter(
+            os.path.join(session_path, SESSION_LOG),
+            stores={
+                'processed': ColumnarWriter(os.path.join(session_path, PROCESSED_DIR)),
+                **({'raw': RawStore(os.path.join(session_path, RAW_DIR))} if self.save_raw else {}),
+            },
+        )
+        self.log.append('header', {'metadata': asdict(self.current_session)})
+
+        self.is_recording = True
 
         logger.info(f"🔴 Started recording session: {session_id}")
 
@@ -159,8 +297,13 @@ class SessionRecorder:
 
         Returns:
             Path to saved session or None if no session
+
+        Usually runs in a worker thread while the event loop keeps reading
+        is_recording and current_session: readers take current_session into
+        a local once instead of checking and dereferencing it separately.
         """
-        if not self.is_recording or not self.current_session:
+        current = self.current_session
+        if not self.is_recording or current is None:
             logger.warning("No active recording session")
             return None
 
@@ -168,23 +311,23 @@ class SessionRecorder:
 
         # Update metadata
         now = datetime.now()
-        self.current_session.end_time = now.isoformat()
+        current.end_time = now.isoformat()
 
         # Calculate duration
-        start = datetime.fromisoformat(self.current_session.start_time)
-        self.current_session.duration_seconds = (now - start).total_seconds()
+        start = datetime.fromisoformat(current.start_time)
+        current.duration_seconds = (now - start).total_seconds()
 
         # Add stop event
-        self.add_event("session_stop", f"Recording stopped. Duration: {self.current_session.duration_seconds:.1f}s")
+        self.add_event("session_stop", f"Recording stopped. Duration: {current.duration_seconds:.1f}s")
 
         # Save session
         session_path = self._save_session()
 
-        logger.info(f"⏹️ Stopped recording session: {self.current_session.session_id}")
-        logger.info(f"   Duration: {self.current_session.duration_seconds:.1f}s")
-        logger.info(f"   Raw samples: {len(self.raw_samples)}")
-        logger.info(f"   Processed samples: {len(self.processed_samples)}")
-        logger.info(f"   Events: {len(self.events)}")
+        logger.info(f"⏹️ Stopped recording session: {current.session_id}")
+        logger.info(f"   Duration: {current.duration_seconds:.1f}s")
+        logger.info(f"   Raw EEG samples: {self.counts['raw']}")
+        logger.info(f"   Processed samples: {self.counts['processed']}")
+        logger.info(f"   Events: {self.counts['event']}")
         logger.info(f"   Saved to: {session_path}")
 
         # Clear current session
@@ -194,7 +337,7 @@ class SessionRecorder:
 
     def add_raw_sample(self, timestamp: float, channels: List[float]):
         """
-        Add raw EEG sample (called at 256 Hz)
+        Add raw EEG sample (single-sample form of add_raw_chunk)
 
         Args:
             timestamp: LSL timestamp
@@ -205,15 +348,28 @@ class SessionRecorder:
 
         # Always add to buffer for analysis
         self.raw_buffer.append((timestamp, channels))
+        self.add_raw_chunk('eeg', np.asarray([channels], dtype=np.float32), np.asarray([timestamp]))
+
+    def add_raw_chunk(self, stream: str, samples: Optional[np.ndarray], timestamps: Optional[np.ndarray]):
+        """
+        Add a full-rate chunk of one stream (called from the ingest path)
 
-        # Only save raw if enabled (can generate large files)
-        if self.save_raw:
-            sample = EEGSample(
-                timestamp=timestamp,
-                local_time=datetime.now().isoformat(),
-                channels=channels
-            )
-            self.raw_samples.append(sample)
+        The chunk is only queued; the session log thread copies it into the
+        memory-mapped raw store.
+
+        Args:
+            stream: 'eeg', 'ppg', 'acc' or 'gyro'
+            samples: [n_samples, n_channels] chunk or None
+            timestamps: [n_samples] LSL timestamps or None
+        """
+        if not self.is_recording or not self.save_raw or samples is None or timestamps is None:
+            return
+        if len(timestamps) == 0:
+            return
+        log = self.log  # One read: _save_session detaches it from the stop thread
+        if log is not None and log.append('raw', {'stream': stream, 'samples': samples, 'timestamps': timestamps}):
+            if stream == 'eeg':
+                self.counts['raw'] += len(timestamps)
 
     def add_processed_sample(self,
                              timestamp: float,
@@ -222,6 +378,13 @@ class SessionRecorder:
                              signal_quality: float,
                              heart_rate: float,
                              hrv_rmssd: float,
+                             hrv_sdnn: float = 0.0,
+                             hrv_pnn50: float = 0.0,
+                             hrv_sd1: float = 0.0,
+                             hrv_sd2: float = 0.0,
+                             hrv_lf: float = 0.0,
+                             hrv_hf: float = 0.0,
+                             hrv_lf_hf: float = 0.0,
                              # NEW artifact features
                              emg_intensity: float = 0.0,
                              forehead_emg: float = 0.0,
@@ -248,6 +411,13 @@ class SessionRecorder:
             signal_quality=signal_quality,
             heart_rate=heart_rate,
             hrv_rmssd=hrv_rmssd,
+            hrv_sdnn=hrv_sdnn,
+            hrv_pnn50=hrv_pnn50,
+            hrv_sd1=hrv_sd1,
+            hrv_sd2=hrv_sd2,
+            hrv_lf=hrv_lf,
+            hrv_hf=hrv_hf,
+            hrv_lf_hf=hrv_lf_hf,
             emg_intensity=emg_intensity,
             forehead_emg=forehead_emg,
             blink_intensity=blink_intensity,
@@ -259,7 +429,8 @@ class SessionRecorder:
             gyro_data=gyro_data,
             is_talking=is_talking
         )
-        self.processed_samples.append(sample)
+        self._append('processed', sample)
+        self.summary.add(sample)
 
         # Track talking for analysis
         self.talking_buffer.append(is_talking)
@@ -283,7 +454,13 @@ class SessionRecorder:
             description=description,
             data=data
         )
-        self.events.append(event)
+        self._append('event', event)
+
+    def _append(self, kind: str, record):
+        """Queue a record for the session log (written in the background)"""
+        log = self.log  # One read: _save_session detaches it from the stop thread
+        if log is not None and log.append(kind, record):
+            self.counts[kind] += 1
 
     def add_marker(self, label: str, notes: str = ""):
         """
@@ -292,9 +469,18 @@ class SessionRecorder:
         self.add_event("marker", label, {"notes": notes})
         logger.info(f"📌 Marker added: {label}")
 
+    @staticmethod
+    def _write_json(path: str, data):
+        """Write a small JSON file atomically (temp file + rename)"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
     def _save_session(self) -> str:
         """
-        Save session data to disk
+        Finalize the session on disk: drain the log and close it with a footer,
+        then write the final metadata and summary
 
         Returns:
             Path to session directory
@@ -303,143 +489,79 @@ class SessionRecorder:
             return ""
 
         session_path = os.path.join(self.sessions_dir, self.current_session.session_id)
+        metadata = asdict(self.current_session)
+        summary = self._generate_summary()
 
-        # Save metadata
-        metadata_path = os.path.join(session_path, "metadata.json")
-        with open(metadata_path, 'w') as f:
-            json.dump(asdict(self.current_session), f, indent=2)
-
-        # Save processed samples (most important - small file)
-        processed_path = os.path.join(session_path, "processed.json")
-        with open(processed_path, 'w') as f:
-            json.dump([asdict(s) for s in self.processed_samples], f, indent=2)
+        # Detach the writer first: the event loop may still be appending (it reads self.log once)
+        log, self.log = self.log, None
+        if log is not None:
+            log.close(footer={'metadata': metadata, 'counts': dict(self.counts)})
+            if log.records_dropped:
+                logger.warning(f"Session log dropped {log.records_dropped} record(s)")
 
-        # Save events
-        events_path = os.path.join(session_path, "events.json")
-        with open(events_path, 'w') as f:
-            json.dump([asdict(e) for e in self.events], f, indent=2)
-
-        # Save raw EEG as CSV (more efficient for large data)
-        if self.save_raw and self.raw_samples:
-            raw_path = os.path.join(session_path, "eeg_raw.csv")
-            with open(raw_path, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['timestamp', 'local_time', 'TP9', 'AF7', 'AF8', 'TP10'])
-                for sample in self.raw_samples:
-                    writer.writerow([
-                        sample.timestamp,
-                        sample.local_time,
-                        *sample.channels
-                    ])
-
-        # Generate summary
-        summary = self._generate_summary()
-        summary_path = os.path.join(session_path, "summary.json")
-        with open(summary_path, 'w') as f:
-            json.dump(summary, f, indent=2)
+        # Merge onto the metadata on disk (name/notes may have been edited while recording)
+        metadata_path = os.path.join(session_path, "metadata.json")
+        if os.path.exists(metadata_path):
+            try:
+                with open(metadata_path, 'r') as f:
+                    metadata = {**json.load(f), **{k: v for k, v in metadata.items() if k not in ('notes', 'tags')}}
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Error reading session metadata: {e}")
+        self._write_json(metadata_path, metadata)
+        self._write_json(os.path.join(session_path, "summary.json"), summary)
+        self._index(metadata, summary, status='complete')
 
         return session_path
 
     def _generate_summary(self) -> Dict:
         """Generate session summary statistics"""
-        if not self.processed_samples:
-            return {}
-
-        # Calculate statistics
-        brain_states = [s.brain_state for s in self.processed_samples]
-        state_counts = {}
-        for state in brain_states:
-            state_counts[state] = state_counts.get(state, 0) + 1
-
-        # Average band powers
-        avg_band_powers = {}
-        for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']:
-            values = [s.band_powers.get(band, 0) for s in self.processed_samples]
-            avg_band_powers[band] = sum(values) / len(values) if values else 0
-
-        # Signal quality
-        qualities = [s.signal_quality for s in self.processed_samples]
-
-        # Artifact ratio
-        artifact_count = sum(1 for s in self.processed_samples if s.has_artifact)
-
-        # Talking ratio
-        talking_count = sum(1 for s in self.processed_samples if s.is_talking)
+        duration = self.current_session.duration_seconds if self.current_session else 0
+        return self.summary.to_dict(duration, self.counts['event'])
 
-        # Heart rate stats
-        heart_rates = [s.heart_rate for s in self.processed_samples if s.heart_rate > 0]
-
-        # NEW: Artifact feature averages
-        emg_values = [s.emg_intensity for s in self.processed_samples]
-        forehead_values = [s.forehead_emg for s in self.processed_samples]
-        blink_values = [s.blink_intensity for s in self.processed_samples]
-        movement_values = [s.movement_intensity for s in self.processed_samples]
-        quality_values = [s.data_quality for s in self.processed_samples]
-
-        return {
-            'duration_seconds': self.current_session.duration_seconds if self.current_session else 0,
-            'total_samples': len(self.processed_samples),
-            'brain_state_distribution': state_counts,
-            'dominant_state': max(state_counts, key=state_counts.get) if state_counts else 'unknown',
-            'average_band_powers': avg_band_powers,
-            'signal_quality': {
-                'mean': sum(qualities) / len(qualities) if qualities else 0,
-                'min': min(qualities) if qualities else 0,
-                'max': max(qualities) if qualities else 0,
-            },
-            # NEW: Artifact feature summary (continuous 0-1)
-            'artifact_features': {
-                'emg_intensity': {'mean': sum(emg_values) / len(emg_values) if emg_values else 0, 'max': max(emg_values) if emg_values else 0},
-                'forehead_emg': {'mean': sum(forehead_values) / len(forehead_values) if forehead_values else 0, 'max': max(forehead_values) if forehead_values else 0},
-                'blink_intensity': {'mean': sum(blink_values) / len(blink_values) if blink_values else 0, 'max': max(blink_values) if blink_values else 0},
-                'movement_intensity': {'mean': sum(movement_values) / len(movement_values) if movement_values else 0, 'max': max(movement_values) if movement_values else 0},
-                'data_quality': {'mean': sum(quality_values) / len(quality_values) if quality_values else 1.0, 'min': min(quality_values) if quality_values else 1.0},
-            },
-            'artifact_ratio': artifact_count / len(self.processed_samples) if self.processed_samples else 0,
-            'talking_ratio': talking_count / len(self.processed_samples) if self.processed_samples else 0,
-            'heart_rate': {
-                'mean': sum(heart_rates) / len(heart_rates) if heart_rates else 0,
-                'min': min(heart_rates) if heart_rates else 0,
-                'max': max(heart_rates) if heart_rates else 0,
-            },
-            'events_count': len(self.events),
-        }
+    def _index(self, metadata: Dict, summary: Optional[Dict] = None, status: Optional[str] = None):
+        """Update the session catalog (never fails the recording itself)"""
+        try:
+            self.catalog.upsert(metadata, summary, status)
+        except sqlite3.Error as e:
+            logger.error(f"Error updating session catalog for {metadata.get('session_id')}: {e}")
 
     def get_session_status(self) -> Dict:
         """Get current recording status"""
+        current = self.current_session  # May be cleared by stop_session in another thread
         return {
             'is_recording': self.is_recording,
-            'session_id': self.current_session.session_id if self.current_session else None,
+            'session_id': current.session_id if current else None,
             'duration_seconds': (
-                (datetime.now() - datetime.fromisoformat(self.current_session.start_time)).total_seconds()
-                if self.current_session else 0
+                (datetime.now() - datetime.fromisoformat(current.start_time)).total_seconds()
+                if current else 0
             ),
-            'samples_recorded': len(self.processed_samples),
-            'events_count': len(self.events),
+            'samples_recorded': self.counts['processed'],
+            'events_count': self.counts['event'],
+            'log': self.log.get_stats() if self.log is not None else None,
         }
 
     def list_sessions(self) -> List[Dict]:
-        """List all saved sessions"""
-        sessions = []
-
-        if not os.path.exists(self.sessions_dir):
-            return sessions
-
-        for session_id in sorted(os.listdir(self.sessions_dir), reverse=True):
-            session_path = os.path.join(self.sessions_dir, session_id)
-            if not os.path.isdir(session_path):
-                continue
+        """List all saved sessions, newest first (from the catalog)"""
+        sessions, cursor = [], None
+        while True:
+            page = self.catalog.query(limit=500, cursor=cursor)
+            sessions.extend(page['sessions'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return sessions
+
+    def query_sessions(self, **filters) -> Dict[str, Any]:
+        """
+        One page of saved sessions (see SessionCatalog.query for the filters)
 
-            metadata_path = os.path.join(session_path, "metadata.json")
-            if os.path.exists(metadata_path):
-                try:
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-                    sessions.append(metadata)
-                except Exception as e:
-                    logger.error(f"Error loading session {session_id}: {e}")
+        Returns:
+            {'sessions': [...], 'next_cursor': str or None}
+        """
+        return self.catalog.query(**filters)
 
-        return sessions
+    def reindex_sessions(self) -> int:
+        """Rebuild the session catalog from the session folders; returns the number indexed"""
+        return self.catalog.rebuild()
 
     def load_session(self, session_id: str) -> Optional[Dict]:
         """Load a saved session"""
@@ -457,13 +579,24 @@ class SessionRecorder:
             with open(metadata_path, 'r') as f:
                 result['metadata'] = json.load(f)
 
-        # Load processed samples
+        # Load processed samples and events (columnar store and session log, or the JSON files of older sessions)
+        log_path = os.path.join(session_path, SESSION_LOG)
+        if os.path.exists(log_path):
+            log = read_session_log(log_path)
+            result['processed'] = log['processed']
+            result['events'] = log['event']
+            result['complete'] = log['footer'] is not None  # False: recording was interrupted
+            if 'metadata' not in result and log['header'] is not None:
+                result['metadata'] = log['header'].get('metadata')
+
+        columns_path = os.path.join(session_path, PROCESSED_DIR)
         processed_path = os.path.join(session_path, "processed.json")
-        if os.path.exists(processed_path):
+        if os.path.isdir(columns_path):
+            result['processed'] = to_records(*read_columns(columns_path))
+        elif os.path.exists(processed_path):
             with open(processed_path, 'r') as f:
                 result['processed'] = json.load(f)
 
-        # Load events
         events_path = os.path.join(session_path, "events.json")
         if os.path.exists(events_path):
             with open(events_path, 'r') as f:
@@ -475,6 +608,15 @@ class SessionRecorder:
             with open(summary_path, 'r') as f:
                 result['summary'] = json.load(f)
 
+        # Raw recording: stream layout and sample counts only (read the data with raw_store.read_raw)
+        raw_path = os.path.join(session_path, RAW_DIR)
+        if os.path.isdir(raw_path):
+            try:
+                header, _ = read_raw(raw_path)
+                result['raw'] = header['streams']
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Error reading raw recording of {session_id}: {e}")
+
         return result
 
     def update_session_metadata(self, session_id: str, notes: Optional[str] = None, tags: Optional[List[str]] = None, name: Optional[str] = None) -> bool:
@@ -513,6 +655,7 @@ class SessionRecorder:
             # Save updated metadata
             with open(metadata_path, 'w') as f:
                 json.dump(metadata, f, indent=2)
+            self._index(metadata)  # Keeps the catalog status (the session may be recording in any pipeline)
 
             logger.info(f"Updated metadata for session {session_id}")
             return True
@@ -4,17 +4,10 @@ Uses scipy for scientific-grade filtering and numpy for FFT analysis
 """
 
 import numpy as np
-from scipy import signal
-from typing import Dict, List, Tuple
-
-# EEG frequency bands (Hz)
-BANDS = {
-    'delta': (0.5, 4),    # Deep sleep
-    'theta': (4, 8),      # Meditation, creativity
-    'alpha': (8, 13),     # Relaxed, calm
-    'beta': (13, 30),     # Active thinking
-    'gamma': (30, 50),    # Peak focus
-}
+from typing import Dict, List, Optional, Tuple
+
+from streaming_filter import design_eeg_filter, filter_block
+from spectral_context import BANDS, SpectralContext  # EEG frequency bands (Hz)
 
 # Muse 2 sampling rate
 SAMPLE_RATE = 256  # Hz
@@ -28,28 +21,15 @@ class SignalProcessor:
     def __init__(self, sample_rate: int = SAMPLE_RATE):
         self.sample_rate = sample_rate
 
-        # Design Butterworth bandpass filter (0.5-50 Hz)
-        # This removes DC offset and high-frequency noise
-        self.bandpass_sos = signal.butter(
-            N=4,  # 4th order filter
-            Wn=[0.5, 50],  # Passband: 0.5-50 Hz
-            btype='bandpass',
-            fs=sample_rate,
-            output='sos'  # Second-order sections for numerical stability
-        )
-
-        # Design notch filter for 60 Hz powerline noise
-        # iirnotch returns (b, a) coefficients, convert to SOS format
-        b, a = signal.iirnotch(
-            w0=60,  # 60 Hz (US powerline frequency)
-            Q=30,   # Quality factor
-            fs=sample_rate
-        )
-        self.notch_sos = signal.tf2sos(b, a)
+        # Butterworth bandpass (0.5-50 Hz) + 60 Hz notch as one SOS cascade,
+        # designed once per sample rate and shared with the streaming filters
+        self.filter_sos = design_eeg_filter(sample_rate)
 
     def filter_signal(self, data: np.ndarray) -> np.ndarray:
         """
-        Apply bandpass and notch filters to raw EEG data
+        Apply bandpass and notch filters to a standalone block of raw EEG
+
+        Live windows are filtered on arrival (StreamingFilter) and skip this.
 
         Args:
             data: Raw EEG samples (1D array)
@@ -57,13 +37,7 @@ class SignalProcessor:
         Returns:
             Filtered EEG samples
         """
-        # Apply bandpass filter
-        filtered = signal.sosfilt(self.bandpass_sos, data)
-
-        # Apply notch filter for powerline noise
-        filtered = signal.sosfilt(self.notch_sos, filtered)
-
-        return filtered
+        return filter_block(self.filter_sos, data)
 
     def calculate_band_powers(self, data: np.ndarray) -> Dict[str, float]:
         """
@@ -75,40 +49,9 @@ class SignalProcessor:
         Returns:
             Dictionary with band powers as percentages
         """
-        if len(data) < self.sample_rate:
-            # Need at least 1 second of data
-            return {band: 0.0 for band in BANDS.keys()}
-
-        # Use Welch's method for power spectral density estimation
-        # More robust than raw FFT for noisy signals
-        frequencies, psd = signal.welch(
-            data,
-            fs=self.sample_rate,
-            nperseg=min(256, len(data)),  # Window size
-            noverlap=128,  # 50% overlap
-            scaling='density'
-        )
-
-        # Calculate power in each band
-        band_powers = {}
-        for band_name, (low_freq, high_freq) in BANDS.items():
-            # Find frequency bins within this band
-            idx = np.logical_and(frequencies >= low_freq, frequencies <= high_freq)
-
-            # Integrate power spectral density over frequency band
-            # Using trapezoidal integration
-            band_power = np.trapz(psd[idx], frequencies[idx])
-            band_powers[band_name] = band_power
-
-        # Normalize to percentages
-        total_power = sum(band_powers.values())
-        if total_power > 0:
-            band_powers = {
-                band: float((power / total_power) * 100)  # Ensure Python float, not numpy float
-                for band, power in band_powers.items()
-            }
-
-        return band_powers
+        # Welch PSD (1 s Hann segments, 50% overlap) integrated per band,
+        # normalised to percentages; needs at least 1 second of data
+        return SpectralContext(data, self.sample_rate).band_powers()
 
     def detect_artifacts(self, data: np.ndarray, threshold: float = 100) -> bool:
         """
@@ -123,18 +66,23 @@ class SignalProcessor:
         """
         return np.max(np.abs(data)) > threshold
 
-    def process_window(self, data: np.ndarray) -> Dict:
+    def process_window(self, data: np.ndarray, prefiltered: bool = False,
+                       spectral: Optional[SpectralContext] = None) -> Dict:
         """
         Process a window of EEG data and extract features
 
         Args:
-            data: Raw EEG samples (should be at least 1 second)
+            data: EEG samples (should be at least 1 second)
+            prefiltered: True if data is already bandpass/notch filtered
+            spectral: Spectra of the multi-channel window `data` is the channel
+                      average of; band powers are read from it instead of
+                      running another Welch PSD
 
         Returns:
             Dictionary containing filtered data, band powers, and quality metrics
         """
-        # Filter the signal
-        filtered = self.filter_signal(data)
+        # Filter the signal (once - filtered windows are used as-is)
+        filtered = np.asarray(data, dtype=np.float64) if prefiltered else self.filter_signal(data)
 
         # Note: Artifact detection is now done in artifact_detector module
         # This simple check is kept as a fallback
@@ -142,15 +90,21 @@ class SignalProcessor:
 
         # Always calculate band powers (artifact detection happens separately)
         # We'll exclude artifacts in the classification step
-        band_powers = self.calculate_band_powers(filtered)
+        if spectral is not None:
+            band_powers = spectral.band_powers()
+        else:
+            band_powers = self.calculate_band_powers(filtered)
 
-        return {
+        result = {
             'filtered_data': filtered.tolist(),
             'band_powers': band_powers,
             'has_artifact': bool(has_artifact),  # Convert numpy bool to Python bool
             'mean': float(np.mean(filtered)),
             'std': float(np.std(filtered)),
         }
+        if spectral is not None:
+            result['channel_band_powers'] = spectral.channel_band_powers()
+        return result
 
 
 def get_brain_state(band_powers: Dict[str, float], is_meditation: bool = False) -> str:
@@ -0,0 +1,156 @@
+"""
+Spectral Context
+Multi-channel Welch spectra of one analysis window, computed once
+
+Band powers, EMG intensity and 60 Hz interference each used to run their own
+Welch PSD over the same window. A SpectralContext computes the windowed
+segment FFTs of all channels in one batched rfft. Every spectral feature
+then reads from those FFTs:
+
+- per-channel PSD (identical to scipy.signal.welch with the same settings)
+- PSD of the channel average, obtained by averaging the complex FFTs
+  (FFT is linear), so no second pass over the averaged signal is needed
+- per-channel and averaged band powers, EMG ratio and line-noise ratio
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import signal
+
+# EEG frequency bands (Hz), also exported by signal_processor
+BANDS = {
+    'delta': (0.5, 4),    # Deep sleep
+    'theta': (4, 8),      # Meditation, creativity
+    'alpha': (8, 13),     # Relaxed, calm
+    'beta': (13, 30),     # Active thinking
+    'gamma': (30, 50),    # Peak focus
+}
+
+EMG_BAND = (30, 100)       # Jaw/face muscle activity
+LINE_NOISE_FREQ = 60       # US powerline
+LINE_NOISE_SPAN = 5        # Hz either side used as the reference level
+
+
+class SpectralContext:
+    """
+    Welch spectra of one multi-channel window, shared by feature extractors
+    """
+
+    def __init__(self, data: np.ndarray, sample_rate: float, nperseg: Optional[int] = None):
+        """
+        Args:
+            data: Window [n_channels, n_samples] (1D is treated as one channel)
+            sample_rate: Sampling rate (Hz)
+            nperseg: Segment length (default: 1 second, capped at the window),
+                     50% overlap, Hann window, constant detrend (Welch defaults)
+        """
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim == 1:
+            data = data.reshape(1, -1)
+        self.sample_rate = sample_rate
+        self.n_channels, self.n_samples = data.shape
+
+        if self.n_samples == 0:
+            self.frequencies = np.zeros(0)
+            self._fft = np.zeros((self.n_channels, 0, 0), dtype=np.complex128)
+            self._scale = np.zeros(0)
+            self._psd: Optional[np.ndarray] = np.zeros((self.n_channels, 0))
+            self._avg_psd: Optional[np.ndarray] = np.zeros(0)
+            return
+
+        nperseg = min(int(nperseg or sample_rate), self.n_samples)
+        step = nperseg - nperseg // 2
+        window = signal.get_window('hann', nperseg)
+
+        # [n_channels, n_segments, nperseg] strided view, detrended and tapered
+        segments = np.lib.stride_tricks.sliding_window_view(data, nperseg, axis=-1)[:, ::step]
+        segments = (segments - segments.mean(axis=-1, keepdims=True)) * window
+
+        self.nperseg = nperseg
+        self.frequencies = np.fft.rfftfreq(nperseg, 1.0 / sample_rate)
+        self._fft = np.fft.rfft(segments, axis=-1)  # The only FFT of the window
+
+        # Density scaling, one-sided (double all bins except DC and Nyquist)
+        scale = np.full(len(self.frequencies), 2.0 / (sample_rate * np.sum(window ** 2)))
+        scale[0] /= 2.0
+        if nperseg % 2 == 0:
+            scale[-1] /= 2.0
+        self._scale = scale
+        self._psd = None
+        self._avg_psd = None
+
+    @property
+    def psd(self) -> np.ndarray:
+        """Per-channel PSD [n_channels, n_freqs]"""
+        if self._psd is None:
+            self._psd = np.mean(np.abs(self._fft) ** 2, axis=1) * self._scale
+        return self._psd
+
+    @property
+    def average_psd(self) -> np.ndarray:
+        """PSD of the channel-averaged signal [n_freqs] (from the same FFTs)"""
+        if self._avg_psd is None:
+            avg_fft = np.mean(self._fft, axis=0)
+            self._avg_psd = np.mean(np.abs(avg_fft) ** 2, axis=0) * self._scale
+        return self._avg_psd
+
+    def _band_power(self, psd: np.ndarray, low: float, high: float) -> np.ndarray:
+        """Trapezoidal integral of psd (last axis) over low <= f <= high"""
+        idx = np.logical_and(self.frequencies >= low, self.frequencies <= high)
+        if np.count_nonzero(idx) < 2:
+            return np.zeros(psd.shape[:-1]) if psd.ndim > 1 else 0.0
+        return np.trapz(psd[..., idx], self.frequencies[idx], axis=-1)
+
+    def band_powers(self, channel: Optional[int] = None) -> Dict[str, float]:
+        """
+        Relative band powers (% of the summed band power)
+
+        Args:
+            channel: Channel index, or None for the channel average
+
+        Returns:
+            Dict band -> percentage (zeros if there is no power or less than 1 s of data)
+        """
+        if self.n_samples < self.sample_rate:
+            return {band: 0.0 for band in BANDS}
+        psd = self.average_psd if channel is None else self.psd[channel]
+        powers = {band: float(self._band_power(psd, low, high)) for band, (low, high) in BANDS.items()}
+        total = sum(powers.values())
+        if total > 0:
+            powers = {band: float(power / total * 100) for band, power in powers.items()}
+        return powers
+
+    def channel_band_powers(self) -> Dict[str, List[float]]:
+        """Relative band powers per channel: band -> [per-channel percentages]"""
+        if self.n_samples < self.sample_rate:
+            return {band: [0.0] * self.n_channels for band in BANDS}
+        absolute = np.stack([self._band_power(self.psd, low, high) for low, high in BANDS.values()])
+        total = absolute.sum(axis=0)
+        relative = np.divide(absolute * 100, total, out=np.zeros_like(absolute), where=total > 0)
+        return {band: relative[i].tolist() for i, band in enumerate(BANDS)}
+
+    def emg_ratio(self, band: Tuple[float, float] = EMG_BAND) -> float:
+        """Share of total power of the channel average in the EMG band (0-1)"""
+        if len(self.frequencies) < 2:
+            return 0.0
+        psd = self.average_psd
+        total = float(np.trapz(psd, self.frequencies))
+        if total <= 0:
+            return 0.0
+        return float(self._band_power(psd, *band) / total)
+
+    def line_noise_ratio(self, freq: float = LINE_NOISE_FREQ, span: float = LINE_NOISE_SPAN) -> float:
+        """
+        Power at the line frequency relative to its neighbourhood (channel average)
+
+        Returns:
+            PSD at `freq` / mean PSD over freq +- span (>2 suggests interference)
+        """
+        if len(self.frequencies) == 0 or freq > self.frequencies[-1]:
+            return 0.0
+        psd = self.average_psd
+        peak = psd[np.argmin(np.abs(self.frequencies - freq))]
+        around = np.logical_and(self.frequencies >= freq - span, self.frequencies <= freq + span)
+        reference = float(np.mean(psd[around])) if np.any(around) else 0.0
+        return float(peak / reference) if reference > 0 else 0.0
@@ -0,0 +1,182 @@
+"""
+Spectrogram
+Rolling multi-channel time-frequency buffer of the analysis hops
+
+Every analysis window already computes a per-channel Welch PSD of the
+cleaned EEG (SpectralContext), and until now it was discarded after the band
+totals. Spectrogram keeps each hop's PSD as one column in a ring buffer. By
+default that is 0.5-50 Hz at the Welch resolution (1 Hz for 1 s segments)
+over the last 5 minutes. The stored values are dB (10 * log10 PSD), as
+float32.
+
+Columns are published on the spectrogram topic as they arrive (see
+ws_topics); the buffer is also served over REST (/api/spectrogram). Topic
+messages are quantized for the wire:
+
+- uint8:   q = round((dB - db_min) / (db_max - db_min) * 255), with
+           db_min/db_max the range of the message
+- float16: dB as half floats
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+import logging
+
+import numpy as np
+
+from ring_buffer import TimestampedRingBuffer
+
+logger = logging.getLogger(__name__)
+
+SPECTROGRAM_BAND = (0.5, 50.0)     # Hz
+SPECTROGRAM_SECONDS = 300          # Columns kept (at one hop per second)
+SPECTROGRAM_FORMATS = ('uint8', 'float16')
+MIN_POWER = 1e-12                  # Floor before taking dB
+
+
+def quantize(message: Dict, fmt: str = 'uint8') -> Dict:
+    """
+    spectrogram message with its float32 dB data quantized for the wire
+
+    Args:
+        message: Message with float32 dB 'data'
+        fmt: 'uint8' or 'float16'
+    """
+    db = np.asarray(message['data'], dtype=np.float32)
+    if fmt == 'float16':
+        data = db.astype(np.float16)
+        db_min = float(db.min()) if db.size else 0.0
+        db_max = float(db.max()) if db.size else 0.0
+    else:
+        db_min = float(db.min()) if db.size else 0.0
+        db_max = float(db.max()) if db.size else 0.0
+        scale = 255.0 / (db_max - db_min) if db_max > db_min else 0.0
+        data = np.round((db - db_min) * scale).astype(np.uint8)
+    return {**message, 'format': fmt, 'db_min': db_min, 'db_max': db_max, 'data': data}
+
+
+class Spectrogram:
+    """
+    Ring buffer of per-hop multi-channel PSD columns (dB)
+    """
+
+    def __init__(self, n_channels: int = 4, seconds: float = SPECTROGRAM_SECONDS,
+                 hop_seconds: float = 1.0, band: Tuple[float, float] = SPECTROGRAM_BAND):
+        """
+        Args:
+            n_channels: EEG channels
+            seconds: History kept
+            hop_seconds: Time between columns (analysis hop)
+            band: Frequency range kept (Hz)
+        """
+        self.n_channels = n_channels
+        self.hop_seconds = hop_seconds
+        self.band = band
+        self.capacity = max(1, int(round(seconds / hop_seconds)))
+        self.frequencies: Optional[np.ndarray] = None
+        self._bins: Optional[np.ndarray] = None
+        self.columns: Optional[TimestampedRingBuffer] = None  # [n_channels * n_bins] per column
+        self.seq = 0
+
+    @property
+    def n_bins(self) -> int:
+        return len(self.frequencies) if self.frequencies is not None else 0
+
+    def clear(self):
+        if self.columns is not None:
+            self.columns.clear()
+
+    def add(self, spectra, timestamp: float) -> Optional[Dict]:
+        """
+        Append one hop's spectrum
+
+        Args:
+            spectra: SpectralContext of the window (per-channel PSD)
+            timestamp: Window timestamp (LSL clock)
+
+        Returns:
+            spectrogram message with the new column (float32 dB), or None if
+            the spectrum does not fit the buffer
+        """
+        if spectra is None or spectra.n_channels != self.n_channels or len(spectra.frequencies) == 0:
+            return None
+        if self.frequencies is None or len(spectra.frequencies) != len(self._bins):
+            # First column (or a new resolution): fix the frequency grid
+            self._bins = (spectra.frequencies >= self.band[0]) & (spectra.frequencies <= self.band[1])
+            self.frequencies = spectra.frequencies[self._bins]
+            self.columns = TimestampedRingBuffer(self.n_channels * self.n_bins, self.capacity, dtype=np.float32)
+
+        db = 10.0 * np.log10(np.maximum(spectra.psd[:, self._bins], MIN_POWER))
+        self.columns.extend(db.reshape(1, -1), np.array([timestamp]))
+        return self.message(db[None], np.array([timestamp]))
+
+    def latest(self, seconds: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Columns of the last `seconds` (all if None)
+
+        Returns:
+            ([n_columns, n_channels, n_bins] dB, [n_columns] timestamps)
+        """
+        if self.columns is None or len(self.columns) == 0:
+            return np.zeros((0, self.n_channels, self.n_bins), dtype=np.float32), np.zeros(0)
+        n = len(self.columns)
+        if seconds is not None:
+            n = min(n, max(1, int(round(seconds / self.hop_seconds))))
+        values, timestamps = self.columns.latest(n)
+        return values.T.reshape(n, self.n_channels, self.n_bins), np.asarray(timestamps)
+
+    def message(self, db: np.ndarray, timestamps: np.ndarray, history: bool = False) -> Dict:
+        """
+        spectrogram message for columns
+
+        Args:
+            db: [n_columns, n_channels, n_bins] dB
+            timestamps: [n_columns] column timestamps (the first is the message timestamp;
+                        columns are column_seconds apart)
+            history: True for a backfill of the buffer
+        """
+        message = {
+            'type': 'spectrogram',
+            'seq': self.seq,
+            'history': history,
+            'timestamp': float(timestamps[0]) if len(timestamps) else 0.0,
+            'n_columns': int(db.shape[0]),
+            'n_channels': int(db.shape[1]),
+            'n_bins': int(db.shape[2]),
+            'f_min': float(self.frequencies[0]) if self.n_bins else 0.0,
+            'f_step': float(self.frequencies[1] - self.frequencies[0]) if self.n_bins > 1 else 0.0,
+            'column_seconds': self.hop_seconds,
+            'data': np.ascontiguousarray(db, dtype=np.float32).ravel(),
+        }
+        if not history:
+            self.seq += 1
+        return message
+
+    def backfill(self, seconds: Optional[float] = None) -> Optional[Dict]:
+        """The buffered columns as one message (history=True), or None if empty"""
+        db, timestamps = self.latest(seconds)
+        if db.shape[0] == 0:
+            return None
+        # Newest columns that fit one binary frame (uint16 value count)
+        max_columns = max(1, (0xFFFF - 16) // (self.n_channels * self.n_bins))
+        return self.message(db[-max_columns:], timestamps[-max_columns:], history=True)
+
+    def query(self, seconds: Optional[float] = None,
+              channels: Optional[Sequence[int]] = None) -> Dict:
+        """
+        Buffer contents for REST clients (dB, rounded to 0.01)
+
+        Args:
+            seconds: Time span (default: everything buffered)
+            channels: Channel subset (default: all)
+        """
+        db, timestamps = self.latest(seconds)
+        channels = list(range(self.n_channels)) if channels is None else list(channels)
+        return {
+            'frequencies': self.frequencies.tolist() if self.frequencies is not None else [],
+            'timestamps': timestamps.tolist(),
+            'channels': channels,
+            'column_seconds': self.hop_seconds,
+            'unit': 'dB (10*log10 uV^2/Hz)',
+            # [n_columns][n_channels][n_bins]
+            'db': np.round(db[:, channels, :].astype(np.float64), 2).tolist(),
+        }
@@ -1,105 +1,285 @@
 """
 Temporal smoothing for brain state and signal quality
 Prevents rapid fluctuations in classification
+
+Every read is O(1) in the window size: samples go into preallocated arrays
+with running sums, sums of squares and per-state counters that are updated
+when a sample is added and when the oldest one is evicted. Long windows
+(e.g. 30-120 s for meditation) therefore cost the same per tick as short ones.
+
+Two modes:
+- 'window': plain average / mode over the last `window_size` samples
+- 'ema': exponential smoothing with time constant `time_constant` seconds,
+  keyed on the sample timestamps (LSL clock), so irregular window timing
+  does not change the effective smoothing
 """
 
-from collections import deque
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
 
+BANDS = ('delta', 'theta', 'alpha', 'beta', 'gamma')
+
+
+class RunningWindow:
+    """
+    Fixed-size window of value vectors with running sum and sum of squares
+    """
+
+    def __init__(self, n_values: int, capacity: int):
+        """
+        Args:
+            n_values: Values per sample
+            capacity: Samples kept (oldest evicted first)
+        """
+        self.capacity = max(1, capacity)
+        self._data = np.zeros((self.capacity, n_values))
+        self._head = 0
+        self._count = 0
+        self._sum = np.zeros(n_values)
+        self._sum_sq = np.zeros(n_values)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, values: np.ndarray):
+        """Append a sample, evicting the oldest if full"""
+        if self._count == self.capacity:
+            oldest = self._data[self._head]
+            self._sum -= oldest
+            self._sum_sq -= oldest ** 2
+        else:
+            self._count += 1
+        self._data[self._head] = values
+        self._sum += values
+        self._sum_sq += values ** 2
+        self._head = (self._head + 1) % self.capacity
+        if self._head == 0:
+            # Resync once per wrap (amortized O(1)) so float error never accumulates
+            valid = self._data[:self._count]
+            self._sum = valid.sum(axis=0)
+            self._sum_sq = (valid ** 2).sum(axis=0)
+
+    def mean(self) -> np.ndarray:
+        return self._sum / self._count if self._count else np.zeros_like(self._sum)
+
+    def std(self) -> np.ndarray:
+        if not self._count:
+            return np.zeros_like(self._sum)
+        mean = self._sum / self._count
+        return np.sqrt(np.maximum(self._sum_sq / self._count - mean ** 2, 0.0))
+
+
+class ExponentialAverage:
+    """
+    Exponentially weighted mean and variance keyed on sample timestamps
+    """
+
+    def __init__(self, n_values: int, time_constant: float):
+        """
+        Args:
+            n_values: Values per sample
+            time_constant: Smoothing time constant (seconds)
+        """
+        self.time_constant = time_constant
+        self._mean = np.zeros(n_values)
+        self._var = np.zeros(n_values)
+        self._count = 0
+        self._last_time: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def seed(self, values: np.ndarray, count: int = 1):
+        """Start from a baseline worth `count` samples (no timestamp yet)"""
+        self._mean = np.asarray(values, dtype=np.float64).copy()
+        self._var = np.zeros_like(self._mean)
+        self._count = count
+        self._last_time = None
+
+    def weight(self, timestamp: float) -> float:
+        """Weight of a new sample at `timestamp` (1 for the first)"""
+        if self._last_time is None:
+            # First sample; after a seed it counts like one more moving-average sample
+            return 1.0 / (self._count + 1)
+        dt = max(0.0, timestamp - self._last_time)
+        return float(1.0 - np.exp(-dt / self.time_constant))
+
+    def add(self, values: np.ndarray, timestamp: float):
+        weight = self.weight(timestamp)
+        delta = values - self._mean
+        self._mean = self._mean + weight * delta
+        self._var = (1 - weight) * (self._var + weight * delta ** 2)
+        self._last_time = timestamp
+        self._count += 1
+
+    def mean(self) -> np.ndarray:
+        return self._mean.copy()
+
+    def std(self) -> np.ndarray:
+        return np.sqrt(np.maximum(self._var, 0.0))
+
 
 class StateSmoother:
     """
     Smooths brain state and signal quality over time to prevent rapid fluctuations
     """
 
-    def __init__(self, window_size: int = 30):
+    def __init__(self, window_size: int = 30, mode: str = 'window',
+                 time_constant: Optional[float] = None):
         """
         Args:
-            window_size: Number of seconds to average over (default: 30 seconds for stability)
+            window_size: Number of samples to average over (default: 30 seconds at 1 Hz)
+            mode: 'window' (moving average / mode) or 'ema' (exponential, LSL-timestamped)
+            time_constant: EMA time constant in seconds (default: window_size seconds)
         """
+        if mode not in ('window', 'ema'):
+            raise ValueError(f"Unknown smoothing mode: {mode}")
         self.window_size = window_size
-        self.band_power_history: deque = deque(maxlen=window_size)
-        self.signal_quality_history: deque = deque(maxlen=window_size)
-        self.brain_state_history: deque = deque(maxlen=window_size)
-        self.has_artifact_history: deque = deque(maxlen=window_size)
+        self.mode = mode
+        self.time_constant = float(time_constant or window_size)
         self.previous_band_powers: Optional[Dict[str, float]] = None
         self.current_stable_state: Optional[str] = None
         self.state_change_time: float = 0.0
         self.min_state_duration: float = 10.0  # Minimum 10 seconds before state can change
 
+        if mode == 'window':
+            self._band_powers = RunningWindow(len(BANDS), window_size)
+            self._quality = RunningWindow(1, window_size)
+            self._artifact = RunningWindow(1, window_size)
+            self._state_codes = np.zeros(max(1, window_size), dtype=np.int32)
+            self._state_head = 0
+        else:
+            self._band_powers = ExponentialAverage(len(BANDS), self.time_constant)
+            self._quality = ExponentialAverage(1, self.time_constant)
+            self._artifact = ExponentialAverage(1, self.time_constant)
+
+        # Brain state votes: sample counts ('window') or decayed weights ('ema')
+        self._state_names: List[str] = []
+        self._state_index: Dict[str, int] = {}
+        self._state_weights = np.zeros(0)
+        self._state_count = 0
+        self._last_timestamp: Optional[float] = None
+
+    @property
+    def sample_count(self) -> int:
+        """Samples currently smoothed over (capped at window_size in 'window' mode)"""
+        return len(self._quality)
+
+    def _timestamp(self, timestamp: Optional[float]) -> float:
+        return float(timestamp) if timestamp is not None else time.time()
+
+    def _state_code(self, state: str) -> int:
+        code = self._state_index.get(state)
+        if code is None:
+            code = len(self._state_names)
+            self._state_names.append(state)
+            self._state_index[state] = code
+            self._state_weights = np.append(self._state_weights, 0.0)
+        return code
+
+    def _add_state(self, state: str, timestamp: float):
+        code = self._state_code(state)
+        if self.mode == 'window':
+            if self._state_count == len(self._state_codes):
+                self._state_weights[self._state_codes[self._state_head]] -= 1
+            else:
+                self._state_count += 1
+            self._state_codes[self._state_head] = code
+            self._state_head = (self._state_head + 1) % len(self._state_codes)
+            self._state_weights[code] += 1
+        else:
+            # Decay all votes by the elapsed time, add the new one
+            if self._last_timestamp is not None:
+                dt = max(0.0, timestamp - self._last_timestamp)
+                self._state_weights *= np.exp(-dt / self.time_constant)
+            self._state_weights[code] += 1
+            self._state_count += 1
+
+    def _add(self, window, values: np.ndarray, timestamp: float):
+        if self.mode == 'window':
+            window.add(values)
+        else:
+            window.add(values, timestamp)
+
     def add_sample(self, band_powers: Dict[str, float], signal_quality: float,
-                   brain_state: str, has_artifact: bool):
-        """Add a new sample to the smoothing buffer"""
-        self.band_power_history.append(band_powers.copy())
-        self.signal_quality_history.append(signal_quality)
-        self.brain_state_history.append(brain_state)
-        self.has_artifact_history.append(has_artifact)
+                   brain_state: str, has_artifact: bool, timestamp: Optional[float] = None):
+        """
+        Add a new sample to the smoothing buffer
+
+        Args:
+            timestamp: Sample time (LSL clock); wall time if omitted
+        """
+        timestamp = self._timestamp(timestamp)
+        self._add(self._band_powers, np.array([band_powers.get(b, 0.0) for b in BANDS]), timestamp)
+        self._add(self._quality, np.array([signal_quality], dtype=np.float64), timestamp)
+        self._add(self._artifact, np.array([1.0 if has_artifact else 0.0]), timestamp)
+        self._add_state(brain_state, timestamp)
+        self._last_timestamp = timestamp
+
+    def seed(self, band_powers: Dict[str, float], count: int = 1):
+        """
+        Pre-fill the band power history with a baseline (warm start)
+
+        Real samples push the baseline out as they arrive.
+
+        Args:
+            band_powers: Baseline band powers (e.g. from a previous session)
+            count: Number of history slots to fill (any count > 0 sets the EMA start value)
+        """
+        values = np.array([band_powers.get(b, 0.0) for b in BANDS])
+        if self.mode == 'window':
+            for _ in range(max(0, min(count, self.window_size))):
+                self._band_powers.add(values)
+        elif count > 0:
+            self._band_powers.seed(values, count)
+        self.previous_band_powers = dict(band_powers)
 
     def get_smoothed_band_powers(self) -> Optional[Dict[str, float]]:
         """Get averaged band powers over the window"""
-        if len(self.band_power_history) == 0:
+        if len(self._band_powers) == 0:
             return None
-
-        # Average band powers over time
-        avg_powers = {}
-        for band in ['delta', 'theta', 'alpha', 'beta', 'gamma']:
-            values = [bp.get(band, 0) for bp in self.band_power_history if band in bp]
-            if values:
-                avg_powers[band] = float(np.mean(values))
-            else:
-                avg_powers[band] = 0.0
-
-        return avg_powers
+        return {band: float(v) for band, v in zip(BANDS, self._band_powers.mean())}
 
     def get_smoothed_signal_quality(self) -> float:
         """Get averaged signal quality over the window"""
-        if len(self.signal_quality_history) == 0:
+        if len(self._quality) == 0:
             return 0.0
-        return float(np.mean(list(self.signal_quality_history)))
+        return float(self._quality.mean()[0])
 
     def get_smoothed_brain_state(self) -> str:
         """Get most common brain state over the window (mode) with stability check and minimum duration"""
-        import time
-        
-        if len(self.brain_state_history) == 0:
+        total = float(self._state_weights.sum()) if self._state_count else 0.0
+        if total <= 0:
             return 'unknown'
 
-        # Count occurrences of each state
-        state_counts = {}
-        for state in self.brain_state_history:
-            state_counts[state] = state_counts.get(state, 0) + 1
+        # Most common state (counters are kept up to date on add/evict)
+        code = int(np.argmax(self._state_weights))
+        new_state = self._state_names[code]
 
-        if not state_counts:
-            return 'unknown'
-        
-        # Get most common state
-        most_common = max(state_counts.items(), key=lambda x: x[1])
-        new_state, count = most_common
-        
         # Only return state if it appears in at least 70% of samples (more stable)
-        confidence = count / len(self.brain_state_history)
+        confidence = self._state_weights[code] / total
         if confidence < 0.7:
             # If no clear majority, check for artifact states (they take priority)
-            if 'artifact_detected' in state_counts and state_counts['artifact_detected'] > len(self.brain_state_history) * 0.3:
+            if self._state_share('artifact_detected', total) > 0.3:
                 new_state = 'artifact_detected'
-            elif 'low_confidence' in state_counts and state_counts['low_confidence'] > len(self.brain_state_history) * 0.3:
+            elif self._state_share('low_confidence', total) > 0.3:
                 new_state = 'low_confidence'
             elif self.current_stable_state:
                 # Keep current state if no clear new state
                 return self.current_stable_state
-        
-        # Enforce minimum duration before state change
-        current_time = time.time()
+
+        # Enforce minimum duration before state change (on the sample clock)
+        current_time = self._last_timestamp if self._last_timestamp is not None else time.time()
         if self.current_stable_state is None:
             # First state - set it
             self.current_stable_state = new_state
             self.state_change_time = current_time
             return new_state
-        
+
         # Check if state actually changed
         if new_state != self.current_stable_state:
             # State changed - check if enough time has passed
@@ -112,28 +292,30 @@ class StateSmoother:
             else:
                 # Not enough time - keep current state
                 return self.current_stable_state
-        
-        # Same state - update time if needed
+
         return self.current_stable_state
-    
+
+    def _state_share(self, state: str, total: float) -> float:
+        code = self._state_index.get(state)
+        return float(self._state_weights[code] / total) if code is not None else 0.0
+
     def get_previous_band_powers(self) -> Optional[Dict[str, float]]:
         """Get previous band powers for change detection"""
         return self.previous_band_powers
-    
+
     def update_previous_band_powers(self, band_powers: Dict[str, float]):
         """Update previous band powers"""
         self.previous_band_powers = band_powers.copy()
 
     def get_artifact_ratio(self) -> float:
         """Get ratio of samples with artifacts (0-1)"""
-        if len(self.has_artifact_history) == 0:
+        if len(self._artifact) == 0:
             return 0.0
-        return float(np.mean([1 if x else 0 for x in self.has_artifact_history]))
+        return float(self._artifact.mean()[0])
 
     def is_stable(self) -> bool:
         """Check if the signal is stable (low variance in quality)"""
-        if len(self.signal_quality_history) < 3:
+        if len(self._quality) < 3:
             return False
-        quality_std = np.std(list(self.signal_quality_history))
+        quality_std = float(self._quality.std()[0])
         return quality_std < 10  # Low variance = stable
-
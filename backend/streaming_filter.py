@@ -0,0 +1,147 @@
+"""
+Streaming EEG Filters
+Causal bandpass + notch filter bank with carried-over state
+
+The EEG filter cascade (Butterworth 0.5-50 Hz bandpass + 60 Hz notch) is
+designed once per sample rate and shared by every processor. A
+StreamingFilter runs it over each chunk as it arrives. Its per-channel
+sosfilt state carries over between chunks, so each sample is filtered once,
+with no filter design work and no edge transients. Analysis windows then
+read already-filtered samples from a ring buffer.
+"""
+
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from scipy import signal
+
+# Default EEG filter settings (match SignalProcessor / MNEProcessor)
+BANDPASS_LOW = 0.5     # Hz, removes DC offset and drift
+BANDPASS_HIGH = 50.0   # Hz, removes high-frequency noise
+BANDPASS_ORDER = 4
+NOTCH_FREQ = 60.0      # Hz, US powerline frequency
+NOTCH_Q = 30.0
+
+
+@lru_cache(maxsize=None)
+def design_eeg_filter(sample_rate: float,
+                      l_freq: float = BANDPASS_LOW,
+                      h_freq: float = BANDPASS_HIGH,
+                      order: int = BANDPASS_ORDER,
+                      notch_freq: Optional[float] = NOTCH_FREQ,
+                      notch_q: float = NOTCH_Q) -> np.ndarray:
+    """
+    Bandpass + notch cascade as second-order sections (cached per sample rate)
+
+    Args:
+        sample_rate: Sampling rate (Hz)
+        l_freq: Bandpass low edge (Hz)
+        h_freq: Bandpass high edge (Hz), clipped below Nyquist
+        order: Butterworth order
+        notch_freq: Notch frequency (Hz), None or >= Nyquist to skip
+        notch_q: Notch quality factor
+
+    Returns:
+        SOS array [n_sections, 6], shared between callers (do not modify)
+    """
+    nyquist = sample_rate / 2.0
+    h_freq = min(h_freq, nyquist * 0.99)
+    sections = [signal.butter(
+        N=order,
+        Wn=[l_freq, h_freq],
+        btype='bandpass',
+        fs=sample_rate,
+        output='sos'  # Second-order sections for numerical stability
+    )]
+
+    if notch_freq is not None and notch_freq < nyquist:
+        b, a = signal.iirnotch(w0=notch_freq, Q=notch_q, fs=sample_rate)
+        sections.append(signal.tf2sos(b, a))
+
+    return np.vstack(sections)
+
+
+def filter_block(sos: np.ndarray, data: np.ndarray, axis: int = -1) -> np.ndarray:
+    """
+    Filter a standalone block in one pass (no carried-over state)
+
+    The filter starts in steady state for the block's first sample instead of
+    from zero, so a DC offset does not cause a step transient.
+
+    Args:
+        sos: Second-order sections
+        data: Samples, time along `axis`
+        axis: Time axis
+
+    Returns:
+        Filtered samples (same shape)
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if data.shape[axis] == 0:
+        return data.copy()
+    zi = _steady_state(sos, np.take(data, 0, axis=axis), axis, data.ndim)
+    filtered, _ = signal.sosfilt(sos, data, axis=axis, zi=zi)
+    return filtered
+
+
+def _steady_state(sos: np.ndarray, first: np.ndarray, axis: int, ndim: int) -> np.ndarray:
+    """sosfilt initial state for a signal starting at `first` (one value per non-time index)"""
+    unit = signal.sosfilt_zi(sos)  # [n_sections, 2]
+    axis = axis % ndim
+    # zi has the data's shape with the time axis replaced by 2, prefixed by sections
+    zi_shape = [1] * (ndim + 1)
+    zi_shape[0] = unit.shape[0]
+    zi_shape[axis + 1] = 2
+    first = np.expand_dims(np.asarray(first, dtype=np.float64), axis=(0, axis + 1))
+    return unit.reshape(zi_shape) * first
+
+
+class StreamingFilter:
+    """
+    EEG filter cascade applied chunk by chunk with persistent per-channel state
+    """
+
+    def __init__(self, n_channels: int, sample_rate: float, **design_kwargs):
+        """
+        Args:
+            n_channels: Number of channels
+            sample_rate: Sampling rate (Hz)
+            **design_kwargs: Overrides for design_eeg_filter()
+        """
+        self.n_channels = n_channels
+        self.sample_rate = sample_rate
+        self.sos = design_eeg_filter(sample_rate, **design_kwargs)
+        self._zi: Optional[np.ndarray] = None  # [n_sections, 2, n_channels]
+
+    @property
+    def is_primed(self) -> bool:
+        """True once the filter has seen samples (state is carried over)"""
+        return self._zi is not None
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Filter newly arrived samples
+
+        Args:
+            samples: [n_samples, n_channels] chunk (LSL layout)
+
+        Returns:
+            Filtered chunk [n_samples, n_channels]
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim != 2 or samples.shape[1] != self.n_channels:
+            raise ValueError(f"Expected [n, {self.n_channels}] samples, got {samples.shape}")
+        if samples.shape[0] == 0:
+            return samples.copy()
+
+        if self._zi is None:
+            # Start in steady state for the first sample (no DC step transient)
+            self._zi = _steady_state(self.sos, samples[0], axis=0, ndim=2)
+
+        filtered, self._zi = signal.sosfilt(self.sos, samples, axis=0, zi=self._zi)
+        return filtered
+
+    def reset(self):
+        """Forget the filter state (e.g. after a gap in the stream)"""
+        self._zi = None
@@ -14,10 +14,11 @@ allowing us to:
 
 import numpy as np
 from collections import deque
-from typing import Dict, Optional, Tuple, List
-from scipy import signal
+from typing import Dict, Optional
 import logging
 
+from imu_features import IMUFeatureEngine, IMUFeatures
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,9 +44,9 @@ class TalkingDetector:
         """
         self.sample_rate = sample_rate
 
-        # Buffers for temporal analysis
-        self.gyro_buffer: deque = deque(maxlen=sample_rate * 3)  # 3 seconds
-        self.acc_buffer: deque = deque(maxlen=sample_rate * 3)   # 3 seconds
+        # IMU buffers and features (3 seconds) for standalone update() calls;
+        # pipelines pass the features of their shared engine to classify()
+        self.imu_engine = IMUFeatureEngine(sample_rate=sample_rate, buffer_seconds=3.0)
 
         # State tracking
         self.is_talking = False
@@ -72,22 +73,33 @@ class TalkingDetector:
         """
         Update detector with new sensor data
 
+        Standalone use - pipelines share one IMUFeatureEngine and call classify().
+
         Args:
-            gyro_data: Gyroscope [x, y, z] in deg/s
-            acc_data: Accelerometer [x, y, z] in g
+            gyro_data: Gyroscope chunk [n_samples, 3] or single sample [x, y, z] in deg/s
+            acc_data: Accelerometer chunk [n_samples, 3] or single sample [x, y, z] in g
             timestamp: Current timestamp
 
         Returns:
             Detection result dictionary
         """
-        # Add to buffers
-        if gyro_data is not None and len(gyro_data) >= 3:
-            self.gyro_buffer.append(gyro_data)
-        if acc_data is not None and len(acc_data) >= 3:
-            self.acc_buffer.append(acc_data)
+        imu = self.imu_engine.update(acc_data, gyro_data, timestamp)
+        return self.classify(imu, timestamp, is_meditation=is_meditation)
+
+    def classify(self, imu: IMUFeatures, timestamp: float, is_meditation: bool = False) -> Dict:
+        """
+        Update the talking state from the hop's IMU features
+
+        Args:
+            imu: Features of the current hop (IMUFeatureEngine.update)
+            timestamp: Current timestamp
+            is_meditation: Use the stricter meditation threshold
 
+        Returns:
+            Detection result dictionary
+        """
         # Need enough data for analysis
-        if len(self.gyro_buffer) < self.sample_rate:
+        if imu.buffered_gyro < self.sample_rate:
             return {
                 'is_talking': False,
                 'confidence': 0.0,
@@ -96,7 +108,7 @@ class TalkingDetector:
             }
 
         # Detect talking with context-aware threshold
-        detection = self._detect_talking(is_meditation=is_meditation)
+        detection = self._detect_talking(imu, is_meditation=is_meditation)
 
         # Add to history for smoothing
         self.detection_history.append(detection['is_talking'])
@@ -136,7 +148,7 @@ class TalkingDetector:
             'rhythm_score': detection.get('rhythm_score', 0),
         }
 
-    def _detect_talking(self, is_meditation: bool = False) -> Dict:
+    def _detect_talking(self, imu: IMUFeatures, is_meditation: bool = False) -> Dict:
         """
         Core talking detection algorithm
 
@@ -147,35 +159,30 @@ class TalkingDetector:
         4. Breathing pattern filter (for meditation - exclude 0.2-0.5 Hz)
 
         Args:
+            imu: Features of the current hop
             is_meditation: If True, use higher threshold and filter breathing patterns
         """
-        gyro_array = np.array(list(self.gyro_buffer))
-
         # Feature 1: Gyroscope variance (especially Y-axis for jaw)
         # Talking creates rhythmic jaw movement visible in gyroscope
-        gyro_y = gyro_array[:, 1]  # Y-axis (pitch/jaw movement)
-        gyro_variance = np.var(gyro_y)
+        gyro_variance = imu.gyro_y_var
 
         # Feature 2: Speech rhythm detection
-        # Talking has characteristic 2-5 Hz rhythm
-        rhythm_score = self._detect_speech_rhythm(gyro_y)
+        # Talking has characteristic 2-5 Hz rhythm (typical speech has 30-50% power there)
+        rhythm_score = min(1.0, imu.speech_rhythm / self.GYRO_RHYTHM_THRESHOLD)
 
         # Feature 3: Breathing pattern detection (for meditation)
         # Breathing is 0.2-0.5 Hz, speech is 2-5 Hz - filter out breathing
         is_breathing = False
-        if is_meditation and len(gyro_y) >= self.sample_rate * 2:  # Need 2+ seconds
-            breathing_score = self._detect_breathing_pattern(gyro_y)
-            if breathing_score > 0.5:  # Strong breathing pattern detected
+        if is_meditation and imu.buffered_gyro >= self.sample_rate * 2:  # Need 2+ seconds
+            if imu.breathing_score > 0.5:  # Strong breathing pattern detected
                 is_breathing = True
                 # Reduce confidence if it's just breathing
                 rhythm_score *= 0.3  # Heavily penalize if it's breathing rhythm
 
         # Feature 4: Accelerometer micro-movements (if available)
         acc_score = 0.0
-        if len(self.acc_buffer) >= self.sample_rate:
-            acc_array = np.array(list(self.acc_buffer))
-            acc_variance = np.mean(np.var(acc_array, axis=0))
-            acc_score = min(1.0, acc_variance / self.ACC_VARIANCE_THRESHOLD)
+        if imu.buffered_acc >= self.sample_rate:
+            acc_score = min(1.0, imu.acc_axis_var / self.ACC_VARIANCE_THRESHOLD)
 
         # Combine features into confidence score
         # Gyroscope variance is primary indicator
@@ -207,105 +214,6 @@ class TalkingDetector:
             'reason': 'breathing' if is_breathing else ('detected' if is_talking else 'not_detected')
         }
 
-    def _detect_speech_rhythm(self, signal_data: np.ndarray) -> float:
-        """
-        Detect speech rhythm in gyroscope signal
-
-        Speech typically has rhythm at 2-5 Hz (syllable rate)
-
-        Args:
-            signal_data: 1D array of gyroscope data
-
-        Returns:
-            Rhythm score (0-1)
-        """
-        if len(signal_data) < self.sample_rate:
-            return 0.0
-
-        try:
-            # Use Welch's method for power spectral density
-            frequencies, psd = signal.welch(
-                signal_data,
-                fs=self.sample_rate,
-                nperseg=min(self.sample_rate, len(signal_data)),
-                noverlap=self.sample_rate // 2
-            )
-
-            # Find power in speech rhythm range (2-5 Hz)
-            speech_range = np.logical_and(frequencies >= 2, frequencies <= 5)
-            speech_power = np.sum(psd[speech_range])
-
-            # Normalize by total power
-            total_power = np.sum(psd)
-            if total_power > 0:
-                rhythm_ratio = speech_power / total_power
-            else:
-                rhythm_ratio = 0.0
-
-            # Scale to 0-1 (typical speech has 30-50% power in this range)
-            rhythm_score = min(1.0, rhythm_ratio / self.GYRO_RHYTHM_THRESHOLD)
-
-            return rhythm_score
-
-        except Exception as e:
-            logger.debug(f"Error in rhythm detection: {e}")
-            return 0.0
-
-    def _detect_breathing_pattern(self, signal_data: np.ndarray) -> float:
-        """
-        Detect breathing pattern in gyroscope signal
-        
-        Breathing is typically 0.2-0.5 Hz (12-30 breaths per minute)
-        This is much slower than speech (2-5 Hz)
-        
-        Args:
-            signal_data: 1D array of gyroscope data
-            
-        Returns:
-            Breathing pattern score (0-1)
-        """
-        if len(signal_data) < self.sample_rate * 2:  # Need at least 2 seconds
-            return 0.0
-        
-        try:
-            # Use Welch's method for power spectral density
-            frequencies, psd = signal.welch(
-                signal_data,
-                fs=self.sample_rate,
-                nperseg=min(self.sample_rate * 2, len(signal_data)),
-                noverlap=None
-            )
-            
-            # Breathing frequency range: 0.2-0.5 Hz
-            breathing_mask = (frequencies >= 0.2) & (frequencies <= 0.5)
-            breathing_power = np.sum(psd[breathing_mask])
-            
-            # Speech frequency range: 2-5 Hz (for comparison)
-            speech_mask = (frequencies >= 2.0) & (frequencies <= 5.0)
-            speech_power = np.sum(psd[speech_mask])
-            
-            # Total power in relevant range
-            total_power = np.sum(psd[(frequencies >= 0.1) & (frequencies <= 10.0)])
-            
-            if total_power == 0:
-                return 0.0
-            
-            # Breathing score: ratio of breathing power to total power
-            # If breathing power is dominant and speech power is low, it's likely breathing
-            breathing_ratio = breathing_power / total_power
-            speech_ratio = speech_power / total_power
-            
-            # High breathing ratio + low speech ratio = strong breathing pattern
-            if speech_ratio < 0.1:  # Very little speech activity
-                return min(1.0, breathing_ratio * 2.0)  # Amplify breathing score
-            else:
-                # Some speech activity - reduce breathing score
-                return max(0.0, breathing_ratio - speech_ratio)
-                
-        except Exception as e:
-            logger.debug(f"Error in breathing detection: {e}")
-            return 0.0
-
     def get_artifact_correction_factor(self) -> float:
         """
         Get a correction factor for EEG signal processing
@@ -327,8 +235,7 @@ class TalkingDetector:
 
     def reset(self):
         """Reset detector state"""
-        self.gyro_buffer.clear()
-        self.acc_buffer.clear()
+        self.imu_engine.reset()
         self.detection_history.clear()
         self.is_talking = False
         self.talking_confidence = 0.0
@@ -0,0 +1,40 @@
+"""
+Display downsampler
+Backfill span of WaveformDownsampler for widths the bucket size cannot match exactly
+
+Run: python -m pytest test_display_downsampler.py
+"""
+
+import numpy as np
+import pytest
+
+from display_downsampler import DisplayConfig, WaveformDownsampler
+
+SAMPLE_RATE = 256
+
+
+def fed(config: DisplayConfig, seconds: float, chunk: int = 12) -> WaveformDownsampler:
+    downsampler = WaveformDownsampler(config, SAMPLE_RATE)
+    n = int(seconds * SAMPLE_RATE)
+    timestamps = 100.0 + np.arange(n) / SAMPLE_RATE
+    samples = np.sin(np.arange(n) / 10.0)[:, None] * np.arange(1, 5)
+    for start in range(0, n, chunk):
+        downsampler.push(samples[start:start + chunk], timestamps[start:start + chunk])
+    return downsampler
+
+
+@pytest.mark.parametrize('mode', ['minmax', 'lttb'])
+@pytest.mark.parametrize('width, span', [(4000, 2.0), (600, 5.0), (100, 10.0), (7, 0.5)])
+def test_backfill_covers_the_span(mode, width, span):
+    downsampler = fed(DisplayConfig(mode, width, span), seconds=40.0)
+    message = downsampler.backfill()
+    covered = message['n_buckets'] * message['bucket_seconds']
+    assert covered == pytest.approx(span, abs=message['bucket_seconds'])
+    assert message['data'].size == message['n_buckets'] * 4 * 2
+
+
+def test_backfill_before_a_full_span():
+    downsampler = fed(DisplayConfig('minmax', 600, 5.0), seconds=1.0)
+    message = downsampler.backfill()
+    assert message['n_buckets'] * message['bucket_seconds'] == pytest.approx(1.0)
+    assert message['timestamp'] == 100.0
@@ -0,0 +1,89 @@
+"""
+Raw store
+RawStore -> read_raw round trips: growth, truncation at close and recovery of an unclosed store
+
+Run: python -m pytest test_raw_store.py
+"""
+
+import json
+import os
+
+import numpy as np
+
+from raw_store import HEADER_FILE, SAMPLE_DTYPE, TIMESTAMP_DTYPE, RawStore, read_raw
+
+STREAMS = {'eeg': {'n_channels': 4, 'sample_rate': 256}, 'ppg': {'n_channels': 3, 'sample_rate': 64}}
+GROW_SECONDS = 1.0  # 256 EEG / 64 PPG samples per step
+
+
+def chunk(start: int, n: int, n_columns: int):
+    """Samples with one extra column (dropped, like Right AUX) and increasing timestamps"""
+    samples = np.arange(start, start + n, dtype=np.float64)[:, None] * 10 + np.arange(n_columns)
+    timestamps = 5000.0 + np.arange(start, start + n) / 256
+    return samples, timestamps
+
+
+def record(stream: str, start: int, n: int) -> dict:
+    samples, timestamps = chunk(start, n, STREAMS[stream]['n_channels'] + 1)
+    return {'stream': stream, 'samples': samples, 'timestamps': timestamps}
+
+
+def expected(stream: str, n: int):
+    samples, timestamps = chunk(0, n, STREAMS[stream]['n_channels'] + 1)
+    return samples[:, :STREAMS[stream]['n_channels']].astype(SAMPLE_DTYPE), timestamps
+
+
+def test_grows_past_the_preallocation_and_truncates_at_close(tmp_path):
+    store = RawStore(str(tmp_path), STREAMS, grow_seconds=GROW_SECONDS)
+    eeg = store.streams['eeg']
+    assert eeg.capacity == 256
+    assert os.path.getsize(eeg.samples_path) == 256 * 4 * SAMPLE_DTYPE.itemsize
+
+    store.append([record('eeg', 0, 200), record('ppg', 0, 10)])
+    store.append([record('eeg', 200, 100)])  # Past the first step: grows by another one
+    assert eeg.capacity == 512
+    store.append([record('eeg', 300, 700)])  # Larger than a step: grows to fit
+    assert eeg.capacity == 1000
+    store.close()
+
+    n_eeg = 1000
+    assert os.path.getsize(eeg.samples_path) == n_eeg * 4 * SAMPLE_DTYPE.itemsize
+    assert os.path.getsize(eeg.timestamps_path) == n_eeg * TIMESTAMP_DTYPE.itemsize
+    assert os.path.getsize(store.streams['ppg'].timestamps_path) == 10 * TIMESTAMP_DTYPE.itemsize
+
+    header, streams = read_raw(str(tmp_path))
+    assert header['streams']['eeg']['n_samples'] == n_eeg
+    for name, n in (('eeg', n_eeg), ('ppg', 10)):
+        samples, timestamps = streams[name]
+        expected_samples, expected_timestamps = expected(name, n)
+        np.testing.assert_array_equal(samples, expected_samples)
+        np.testing.assert_array_equal(timestamps, expected_timestamps)
+
+
+def test_empty_stream_reads_as_zero_samples(tmp_path):
+    store = RawStore(str(tmp_path), STREAMS, grow_seconds=GROW_SECONDS)
+    store.append([record('eeg', 0, 5)])
+    store.close()
+    _, streams = read_raw(str(tmp_path))
+    assert streams['ppg'][0].shape == (0, 3) and streams['ppg'][1].shape == (0,)
+
+
+def test_unclosed_store_recovers_samples_after_the_header(tmp_path):
+    store = RawStore(str(tmp_path), STREAMS, grow_seconds=GROW_SECONDS)
+    store.append([record('eeg', 0, 100)])
+    store.fsync()                            # Header: 100 samples
+    store.append([record('eeg', 100, 300)])  # Grown and written, header not updated
+    store.streams['eeg'].flush()             # Then the process died (no close)
+
+    with open(tmp_path / HEADER_FILE) as f:
+        assert json.load(f)['streams']['eeg']['n_samples'] == 100
+    assert os.path.getsize(store.streams['eeg'].timestamps_path) == 512 * TIMESTAMP_DTYPE.itemsize
+
+    header, streams = read_raw(str(tmp_path))
+    samples, timestamps = streams['eeg']
+    # Up to the last non-zero timestamp; the zeroed preallocated tail is not data
+    assert header['streams']['eeg']['n_samples'] == 400
+    expected_samples, expected_timestamps = expected('eeg', 400)
+    np.testing.assert_array_equal(samples, expected_samples)
+    np.testing.assert_array_equal(timestamps, expected_timestamps)
+    assert len(streams['ppg'][1]) == 0
@@ -0,0 +1,114 @@
+"""
+Columnar session storage
+ColumnarWriter -> read_columns -> to_records round trips, including recordings that did not close
+
+Run: python -m pytest test_session_columns.py
+"""
+
+import json
+import os
+from dataclasses import asdict
+from datetime import datetime
+
+import numpy as np
+
+from session_columns import (HEADER_FILE, MAX_DICTIONARY, OTHER_CODE, OTHER_VALUE, ColumnarWriter,
+                             read_columns, to_records)
+from session_recorder import ProcessedSample
+
+START = datetime(2025, 11, 26, 18, 16, 12).timestamp()
+
+
+def sample(i: int, **fields) -> dict:
+    values = dict(
+        timestamp=1000.0 + i,
+        local_time=datetime.fromtimestamp(START + i).isoformat(),
+        band_powers={'delta': 1.0 + i, 'theta': 2.0, 'alpha': 3.5, 'beta': 4.0, 'gamma': 0.5},
+        brain_state='relaxed' if i % 2 else 'focused',
+        signal_quality=80.0 + i,
+        heart_rate=60.0 + i,
+        hrv_rmssd=40.0,
+        acc_data=[0.0, 0.25, -1.0 + i],
+    )
+    values.update(fields)
+    return asdict(ProcessedSample(**values))
+
+
+def test_round_trip_folds_constant_columns(tmp_path):
+    records = [sample(i) for i in range(10)]
+    writer = ColumnarWriter(str(tmp_path))
+    writer.append(records[:4])
+    writer.append(records[4:])
+    writer.close()
+
+    header, columns = read_columns(str(tmp_path))
+    assert header['n_rows'] == 10
+    specs = header['columns']
+    # One value for the whole session: a header constant and no data file
+    assert specs['band_theta']['const'] == 2.0
+    assert specs['hrv_lf']['const'] == 0.0
+    assert specs['is_talking']['const'] == 0
+    assert specs['gyro_x']['const'] is None  # All missing
+    for name in ('band_theta', 'hrv_lf', 'is_talking', 'gyro_x'):
+        assert not os.path.exists(tmp_path / f"{name}.bin")
+        assert len(columns[name]) == 10
+    assert 'const' not in specs['band_delta'] and 'const' not in specs['brain_state']
+    assert specs['brain_state']['dictionary'] == ['focused', 'relaxed']
+
+    assert to_records(header, columns) == records
+
+
+def test_interrupted_recording_is_cut_to_the_shortest_column(tmp_path):
+    records = [sample(i) for i in range(6)]
+    writer = ColumnarWriter(str(tmp_path))
+    writer.append(records[:2])  # Header written with the first rows
+    writer.append(records[2:])  # Only flushed, the header still says 2 rows
+    writer.fsync()              # No close: the recording crashed
+
+    # The crash cut one column mid-write
+    path = tmp_path / "heart_rate.bin"
+    os.truncate(path, os.path.getsize(path) - 6)
+
+    with open(tmp_path / HEADER_FILE) as f:
+        stored = json.load(f)
+    assert stored['n_rows'] == 2
+    assert not any('const' in spec for spec in stored['columns'].values())
+
+    header, columns = read_columns(str(tmp_path))
+    assert header['n_rows'] == 4
+    assert all(len(values) == 4 for values in columns.values())
+    assert to_records(header, columns) == records[:4]
+
+
+def test_dictionary_grows_while_recording(tmp_path):
+    writer = ColumnarWriter(str(tmp_path))
+    writer.append([sample(0, brain_state='focused')])
+    writer.append([sample(1, brain_state='drowsy'), sample(2, artifact_type='blink')])
+    writer.fsync()
+
+    # Readable before close: new values reached the header
+    header, columns = read_columns(str(tmp_path))
+    assert header['columns']['brain_state']['dictionary'] == ['focused', 'drowsy']
+    assert header['columns']['artifact_type']['dictionary'] == ['clean', 'blink']
+    records = to_records(header, columns)
+    assert [r['brain_state'] for r in records] == ['focused', 'drowsy', 'focused']
+    assert [r['artifact_type'] for r in records] == ['clean', 'clean', 'blink']
+    writer.close()
+
+
+def test_dictionary_overflow_uses_the_reserved_code(tmp_path):
+    n_values = MAX_DICTIONARY + 5
+    records = [sample(i, artifact_type=f"type_{i}") for i in range(n_values)]
+    writer = ColumnarWriter(str(tmp_path))
+    writer.append(records)
+    writer.close()
+
+    header, columns = read_columns(str(tmp_path))
+    assert len(header['columns']['artifact_type']['dictionary']) == MAX_DICTIONARY
+    codes = np.asarray(columns['artifact_type'])
+    assert codes[MAX_DICTIONARY - 1] == MAX_DICTIONARY - 1
+    assert np.all(codes[MAX_DICTIONARY:] == OTHER_CODE)
+
+    types = [r['artifact_type'] for r in to_records(header, columns)]
+    assert types[MAX_DICTIONARY - 1] == f"type_{MAX_DICTIONARY - 1}"  # The last entry stays intact
+    assert types[MAX_DICTIONARY:] == [OTHER_VALUE] * 5
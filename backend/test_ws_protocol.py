@@ -0,0 +1,164 @@
+"""
+WebSocket binary protocol round trip
+Frames built by BinaryEncoder, parsed back with struct/NumPy the way clients read them
+
+Run: python -m pytest test_ws_protocol.py
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from spectral_context import SpectralContext
+from spectrogram import Spectrogram, quantize
+from ws_protocol import FRAME_HEADER, PROTOCOL_VERSION, SCHEMAS, BinaryEncoder, FrameSchema, dumps
+from ws_topics import select_channels
+
+TIMESTAMP = 1234.5
+
+
+def decode(frame: bytes, schema: dict):
+    """Client-side parse: header, float32 values, optional tail in the schema's dtype"""
+    version, schema_id, count, timestamp = FRAME_HEADER.unpack_from(frame, 0)
+    assert version == PROTOCOL_VERSION
+    assert schema_id == schema['id']
+    fixed = sum(size for _, size in schema['fields'])
+    tail_dtype = {'uint8': np.uint8, 'float16': '<f2'}.get(schema.get('tail'))
+    if tail_dtype is None:
+        values = np.frombuffer(frame, dtype='<f4', offset=FRAME_HEADER.size)
+        assert values.size == count
+        return timestamp, values, None
+    values = np.frombuffer(frame, dtype='<f4', count=fixed, offset=FRAME_HEADER.size)
+    tail = np.frombuffer(frame, dtype=tail_dtype, offset=FRAME_HEADER.size + 4 * fixed)
+    assert fixed + tail.size == count
+    return timestamp, values, tail
+
+
+def encode(message: dict):
+    encoder = BinaryEncoder()
+    hello = encoder.hello()
+    encoded = encoder.encode(message, dumps)
+    assert len(encoded.parts) == 1 and isinstance(encoded.parts[0], bytes)
+    name = f"{message['type']}:{message.get('format')}"
+    return encoded, hello['schemas'][name if name in SCHEMAS else message['type']]
+
+
+def full_message(name: str, fields, tail_size: int = 6) -> dict:
+    """Message with every schema field set to a distinct value"""
+    message_type, _, fmt = name.partition(':')
+    message = {'type': message_type, 'timestamp': TIMESTAMP}
+    if fmt:
+        message['format'] = fmt
+    for i, (path, size) in enumerate(fields):
+        value = np.arange(tail_size, dtype=np.float64) + i if size == 0 else \
+            [i + 0.25 + k for k in range(size)] if size > 1 else i + 0.25
+        head, _, rest = path.partition('.')
+        if rest:
+            message.setdefault(head, {})[rest] = value
+        else:
+            message[head] = value
+    return message
+
+
+def test_every_schema_round_trips():
+    for name, (schema_id, fields, *tail) in SCHEMAS.items():
+        message = full_message(name, fields)
+        encoded, schema = encode(message)
+        timestamp, values, tail_values = decode(encoded.parts[0], schema)
+        assert timestamp == TIMESTAMP
+        fixed = np.float32([i + 0.25 + k for i, (_, size) in enumerate(fields) for k in range(size)])
+        expected_tail = np.arange(6) + len(fields) - 1 if fields[-1][1] == 0 else np.zeros(0)
+        if tail:
+            np.testing.assert_array_equal(values, fixed)
+            np.testing.assert_array_equal(tail_values, expected_tail.astype(tail[0]))
+        else:
+            np.testing.assert_array_equal(values[:fixed.size], fixed)
+            np.testing.assert_array_equal(values[fixed.size:], np.float32(expected_tail))
+        # Numeric fields are in the frame, the rest in the state message
+        state = json.loads(encoded.state)
+        assert state['type'] == f"{message['type']}_state"
+        assert set(state) - {'type', 'format'} == set()
+
+
+def test_absent_fields_are_nan():
+    encoded, schema = encode({'type': 'band_powers', 'timestamp': TIMESTAMP,
+                              'band_powers': {'alpha': 2.0}, 'heart_rate': 61.0,
+                              'hrv_extended': {'lf_hf': 'n/a'}})
+    _, values, _ = decode(encoded.parts[0], schema)
+    paths = [path for path, _ in schema['fields']]
+    assert values[paths.index('band_powers.alpha')] == 2.0
+    assert values[paths.index('heart_rate')] == 61.0
+    assert np.isnan(values[paths.index('hrv_extended.lf_hf')])  # Not numeric
+    assert np.count_nonzero(~np.isnan(values)) == 2
+
+
+def test_channel_subsets_shrink_the_tail():
+    message = {'type': 'eeg_data', 'timestamp': TIMESTAMP, 'heart_rate': 60.0,
+               'data': [10.0, 11.0, 12.0, 13.0]}
+    subset = select_channels(message, (0, 3))
+    encoded, schema = encode(subset)
+    _, values, _ = decode(encoded.parts[0], schema)
+    np.testing.assert_array_equal(values[3:], [10.0, 13.0])
+    assert FRAME_HEADER.unpack_from(encoded.parts[0])[2] == 5
+
+    # No data at all: the size-0 field takes no values
+    encoded, schema = encode({'type': 'eeg_data', 'timestamp': TIMESTAMP, 'heart_rate': 60.0})
+    _, values, _ = decode(encoded.parts[0], schema)
+    assert values.size == 3 and values[0] == 60.0
+
+
+def spectrogram_with(n_columns: int) -> Spectrogram:
+    rng = np.random.default_rng(0)
+    spectra = SpectralContext(rng.standard_normal((4, 512)), 256)
+    spectrogram = Spectrogram(seconds=n_columns)
+    for i in range(n_columns):
+        spectrogram.add(spectra, 100.0 + i)
+    return spectrogram
+
+
+def test_spectrogram_variants():
+    spectrogram = spectrogram_with(3)
+    message = spectrogram.backfill()
+    db = np.asarray(message['data'])
+    for fmt, dtype in (('uint8', np.uint8), ('float16', np.float16)):
+        wire = quantize(select_channels(message, (1, 2)), fmt)
+        encoded, schema = encode(wire)
+        assert schema['tail'] == fmt
+        timestamp, values, tail = decode(encoded.parts[0], schema)
+        assert timestamp == 100.0
+        paths = [path for path, _ in schema['fields']]
+        n_columns, n_channels, n_bins = (int(values[paths.index(p)]) for p in ('n_columns', 'n_channels', 'n_bins'))
+        assert (n_columns, n_channels) == (3, 2)
+        assert tail.dtype == dtype and tail.size == n_columns * n_channels * n_bins
+        expected = db.reshape(3, 4, n_bins)[:, 1:3]
+        db_min, db_max = values[paths.index('db_min')], values[paths.index('db_max')]
+        if fmt == 'uint8':
+            decoded = db_min + tail.astype(np.float32) / 255.0 * (db_max - db_min)
+            step = (db_max - db_min) / 255.0
+            assert np.max(np.abs(decoded.reshape(expected.shape) - expected)) <= step
+        else:
+            np.testing.assert_allclose(tail.reshape(expected.shape), expected, rtol=1e-3, atol=1e-2)
+
+
+def test_spectrogram_backfill_fits_the_count():
+    spectrogram = spectrogram_with(400)
+    values_per_column = spectrogram.n_channels * spectrogram.n_bins
+    assert 400 * values_per_column > 0xFFFF
+    message = spectrogram.backfill()
+    for fmt in ('uint8', 'float16'):
+        encoded, schema = encode(quantize(message, fmt))
+        count = FRAME_HEADER.unpack_from(encoded.parts[0])[2]
+        _, values, tail = decode(encoded.parts[0], schema)
+        n_columns = int(values[1])
+        assert count <= 0xFFFF
+        assert tail.size == n_columns * values_per_column
+        assert n_columns == (0xFFFF - 16) // values_per_column
+    # The newest columns are kept
+    assert message['timestamp'] == 100.0 + 400 - message['n_columns']
+
+
+def test_header_layout():
+    frame = FrameSchema('hrv', 3, SCHEMAS['hrv'][1]).pack({'heart_rate': 70.0})[0]
+    assert struct.calcsize(FRAME_HEADER.format) == 12
+    assert frame.dtype == np.dtype('<f4') and frame.size == len(SCHEMAS['hrv'][1])
@@ -0,0 +1,316 @@
+"""
+Window Analysis Stage
+Runs the per-window DSP off the asyncio event loop
+
+MNE filtering, ICA cleaning, band powers, artifact detection, PPG peak
+detection and talking detection take tens of milliseconds per window. Run
+inline in the stream coroutine they freeze WebSocket sends, pings and the
+copilot socket. This module splits the work into:
+
+- analyze_window(): a stage function that takes one AnalysisWindow and
+  returns WindowFeatures (no event-loop or WebSocket access)
+- AnalysisExecutor: a shared worker pool (size is the knob)
+- AnalysisLane: one per device/pipeline; runs its windows strictly in order
+  on the shared pool and hands results back to the event loop in order
+
+Windows of one lane never overlap, so the stateful detectors they feed stay
+consistent; several headsets (lanes) use several workers in parallel.
+"""
+
+import asyncio
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import logging
+
+from spectral_context import SpectralContext
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AnalysisWindow:
+    """One analysis window, owned by the stage (no views into live buffers)"""
+    timestamp: float                    # LSL timestamp of the newest EEG sample
+    eeg: np.ndarray                     # [n_channels, n_samples] raw EEG
+    eeg_filtered: Optional[np.ndarray] = None  # Same samples, filtered on arrival (streaming filter)
+    acc: Optional[np.ndarray] = None    # [n, 3] ACC samples since the previous window
+    gyro: Optional[np.ndarray] = None   # [n, 3] GYRO samples since the previous window
+    acc_latest: Optional[np.ndarray] = None   # Newest ACC sample [x, y, z]
+    gyro_latest: Optional[np.ndarray] = None  # Newest GYRO sample [x, y, z]
+    apply_ica: bool = False
+    is_meditation: bool = False
+
+
+@dataclass
+class AnalysisStages:
+    """Processors used by analyze_window (the current instances at submit time)"""
+    signal_processor: Any
+    mne_processor: Any
+    artifact_detector: Any
+    hrv_calculator: Any
+    talking_detector: Any
+    imu_engine: Any
+
+
+@dataclass
+class WindowFeatures:
+    """Everything the event loop needs to finish a window"""
+    window: AnalysisWindow
+    bad_channels: List[int]
+    mne_result: Dict
+    result: Dict                        # SignalProcessor output (band_powers, mean, std, ...)
+    artifact_result: Dict
+    hrv_metrics: Dict
+    talking_result: Dict
+    imu: Any = None                     # IMUFeatures of the hop (movement, rhythm, posture)
+    spectra: Any = None                 # SpectralContext of the cleaned window (spectrogram column)
+    elapsed_ms: float = 0.0
+
+
+def analyze_window(window: AnalysisWindow, stages: AnalysisStages) -> WindowFeatures:
+    """
+    Window analysis stage: raw window in, features out
+
+    Safe to run in a worker thread as long as windows of the same pipeline
+    are not analysed concurrently (AnalysisLane guarantees this).
+
+    Args:
+        window: AnalysisWindow with an owned copy of the EEG/IMU data
+        stages: Processors of the pipeline the window belongs to
+
+    Returns:
+        WindowFeatures
+    """
+    start = time.perf_counter()
+    eeg = window.eeg
+
+    # Detect bad channels (extreme values = poor contact)
+    bad_channels = stages.artifact_detector.detect_bad_channels(eeg.T, threshold=200)  # 200μV threshold
+
+    # Exclude bad channels from averaging
+    n_channels = eeg.shape[0]
+    good_channels = [ch for ch in range(n_channels) if ch not in bad_channels]
+    if len(good_channels) == 0:
+        # All channels bad - use all but mark as artifact
+        good_channels = list(range(n_channels))
+    avg_signal = np.mean(eeg[good_channels], axis=0)
+
+    # Process with MNE (applies filters + ICA if fitted)
+    try:
+        mne_result = stages.mne_processor.process_window(
+            eeg, apply_ica=window.apply_ica, filtered=window.eeg_filtered
+        )
+    except Exception as e:
+        logger.error(f"Error in MNE processing: {e}", exc_info=True)
+        # Fallback to basic processing without MNE
+        avg_signal = np.mean(eeg, axis=0)
+        mne_result = {
+            'filtered_data': [avg_signal.tolist()],
+            'quality': {'confidence': 50, 'snr': 0, 'bad_channels': []},
+            'has_artifact': True
+        }
+
+    # Band powers from the cleaned signal
+    clean_spectra = None
+    try:
+        cleaned_data = np.array(mne_result['filtered_data']).T  # Back to [n_channels, n_samples]
+        if cleaned_data.shape[0] > 0 and cleaned_data.shape[1] > 0:
+            avg_cleaned = np.mean(cleaned_data, axis=0)  # Average across channels
+            prefiltered = True  # Already filtered - don't filter a second time
+            # One PSD of the cleaned channels; its channel average gives the band powers
+            clean_spectra = SpectralContext(cleaned_data, stages.signal_processor.sample_rate)
+        else:
+            # Fallback to original signal
+            avg_cleaned = avg_signal
+            prefiltered = False
+        result = stages.signal_processor.process_window(
+            avg_cleaned, prefiltered=prefiltered, spectral=clean_spectra
+        )
+    except Exception as e:
+        logger.error(f"Error processing cleaned data: {e}", exc_info=True)
+        # Fallback to basic processing
+        result = stages.signal_processor.process_window(avg_signal)
+        mne_result = {
+            'quality': {'confidence': 30, 'snr': 0, 'bad_channels': []},
+            'has_artifact': True
+        }
+
+    # IMU features once per hop, shared by the artifact detector, talking
+    # detection and posture
+    imu = stages.imu_engine.update(window.acc, window.gyro, window.timestamp)
+
+    # Artifact detector (context-aware). EMG and 60 Hz features need the raw
+    # (unfiltered) spectrum, so the raw window gets its own single PSD.
+    raw_spectra = SpectralContext(eeg, stages.artifact_detector.eeg_sample_rate)
+    artifact_result = stages.artifact_detector.detect_all(
+        eeg.T,  # [n_samples, n_channels]
+        window.acc,
+        window.gyro,
+        is_meditation=window.is_meditation,
+        spectral=raw_spectra,
+        imu=imu
+    )
+
+    # HRV metrics (PPG peak detection)
+    try:
+        hrv_metrics = stages.hrv_calculator.get_current_metrics()
+    except Exception as e:
+        logger.warning(f"Error calculating HRV: {e}", exc_info=True)
+        hrv_metrics = {'heart_rate': 0, 'hrv_rmssd': 0, 'hrv_sdnn': 0, 'valid': False}
+
+    # Talking detection (gyroscope, context-aware threshold)
+    talking_result = stages.talking_detector.classify(
+        imu, window.timestamp, is_meditation=window.is_meditation
+    )
+
+    return WindowFeatures(
+        window=window,
+        bad_channels=list(bad_channels),
+        mne_result=mne_result,
+        result=result,
+        artifact_result=artifact_result,
+        hrv_metrics=hrv_metrics,
+        talking_result=talking_result,
+        imu=imu,
+        spectra=clean_spectra,
+        elapsed_ms=(time.perf_counter() - start) * 1000
+    )
+
+
+class AnalysisExecutor:
+    """
+    Worker pool shared by all analysis lanes
+    """
+
+    def __init__(self, max_workers: int = 2, name: str = "window-analysis"):
+        """
+        Args:
+            max_workers: Number of worker threads. NumPy/SciPy/MNE release the GIL
+                         in their kernels, so windows of different headsets overlap.
+            name: Worker thread name prefix
+        """
+        self.max_workers = max(1, int(max_workers))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) on the pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, fn, *args)
+
+    def shutdown(self):
+        """Stop the pool (pending windows are dropped)"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class AnalysisLane:
+    """
+    In-order analysis queue for one pipeline (headset)
+
+    Windows are analysed one at a time on the shared executor and their
+    results are delivered to the event loop in submission order. When the
+    lane falls behind, the oldest queued window is dropped.
+    """
+
+    def __init__(self, executor: AnalysisExecutor, stage: Callable = analyze_window,
+                 max_pending: int = 4, name: str = "default"):
+        """
+        Args:
+            executor: Shared AnalysisExecutor
+            stage: Stage function (window, stages) -> features
+            max_pending: Windows queued before the oldest is dropped
+            name: Lane name for logging
+        """
+        self.executor = executor
+        self.stage = stage
+        self.max_pending = max(1, max_pending)
+        self.name = name
+
+        self._queue: List[tuple] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._generation = 0  # Bumped by reset() so in-flight results are discarded
+
+        # Stats
+        self.windows_submitted = 0
+        self.windows_completed = 0
+        self.windows_dropped = 0
+        self.last_elapsed_ms = 0.0
+        self.max_elapsed_ms = 0.0
+
+    def submit(self, window: AnalysisWindow, stages: AnalysisStages,
+               on_result: Callable[[WindowFeatures], Awaitable[None]]):
+        """
+        Queue a window for analysis (returns immediately)
+
+        Args:
+            window: AnalysisWindow to analyse
+            stages: Processors to analyse it with
+            on_result: Coroutine called on the event loop with the WindowFeatures
+        """
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        if len(self._queue) >= self.max_pending:
+            self._queue.pop(0)
+            self.windows_dropped += 1
+            logger.debug(f"Analysis lane '{self.name}' behind - dropped oldest window")
+
+        self._queue.append((self._generation, window, stages, on_result))
+        self.windows_submitted += 1
+        self._wakeup.set()
+
+    async def _run(self):
+        """Consume queued windows one at a time, delivering results in order"""
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            generation, window, stages, on_result = self._queue.pop(0)
+            try:
+                features = await self.executor.run(self.stage, window, stages)
+            except Exception as e:
+                logger.error(f"Window analysis failed: {e}", exc_info=True)
+                continue
+
+            if generation != self._generation:
+                continue  # Lane was reset while this window was in flight
+
+            self.windows_completed += 1
+            elapsed = getattr(features, 'elapsed_ms', 0.0)
+            self.last_elapsed_ms = elapsed
+            self.max_elapsed_ms = max(self.max_elapsed_ms, elapsed)
+
+            try:
+                await on_result(features)
+            except Exception as e:
+                logger.error(f"Error handling window result: {e}", exc_info=True)
+
+    def reset(self):
+        """Drop queued windows and ignore the one in flight (e.g. on reconnect)"""
+        self._queue.clear()
+        self._generation += 1
+
+    def close(self):
+        """Stop the consumer task"""
+        self.reset()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def get_stats(self) -> Dict:
+        """Lane statistics for diagnostics"""
+        return {
+            'workers': self.executor.max_workers,
+            'pending': len(self._queue),
+            'windows_submitted': self.windows_submitted,
+            'windows_completed': self.windows_completed,
+            'windows_dropped': self.windows_dropped,
+            'last_elapsed_ms': round(self.last_elapsed_ms, 2),
+            'max_elapsed_ms': round(self.max_elapsed_ms, 2),
+        }
@@ -0,0 +1,109 @@
+"""
+Analysis Window Scheduler
+Decides when the per-window EEG pipeline should run, counted in samples
+
+The EEG buffer stays full after the first second, so gating the heavy
+processing on "buffer is full" makes it run for every incoming LSL chunk.
+The scheduler instead counts samples and fires once every `hop` samples,
+so the pipeline runs at the rate it claims (e.g. strict 1 Hz, or 4 Hz with
+a 1 s window / 250 ms hop).
+"""
+
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WindowScheduler:
+    """
+    Sample-counting scheduler for overlapping analysis windows
+    """
+
+    def __init__(self, sample_rate: int = 256, window_seconds: float = 1.0, hop_seconds: float = 1.0):
+        """
+        Args:
+            sample_rate: EEG sample rate (Hz)
+            window_seconds: Length of each analysis window (seconds)
+            hop_seconds: Time between consecutive windows (seconds)
+        """
+        if window_seconds <= 0 or hop_seconds <= 0:
+            raise ValueError("window_seconds and hop_seconds must be positive")
+
+        self.sample_rate = sample_rate
+        self.window_size = int(round(window_seconds * sample_rate))
+        self.hop_size = max(1, int(round(hop_seconds * sample_rate)))
+
+        self.samples_seen = 0          # Total samples pushed since reset
+        self.samples_since_window = 0  # Samples since the last window fired
+        self.windows_emitted = 0
+        self.windows_skipped = 0       # Hops coalesced because a chunk spanned several
+        self.last_window_timestamp: Optional[float] = None
+
+    @property
+    def windows_per_second(self) -> float:
+        """Nominal analysis rate (Hz)"""
+        return self.sample_rate / self.hop_size
+
+    def seconds_to_windows(self, seconds: float) -> int:
+        """Convert a duration into a number of analysis windows (at least 1)"""
+        return max(1, int(round(seconds * self.windows_per_second)))
+
+    def push(self, n_samples: int, first_timestamp: float) -> Optional[float]:
+        """
+        Account for newly arrived samples
+
+        Args:
+            n_samples: Number of samples in the chunk
+            first_timestamp: LSL timestamp of the first sample in the chunk
+
+        Returns:
+            LSL timestamp of the newest sample if a window is due, otherwise None
+        """
+        if n_samples <= 0:
+            return None
+
+        self.samples_seen += n_samples
+        self.samples_since_window += n_samples
+
+        # Wait until the first full window is available
+        if self.samples_seen < self.window_size:
+            return None
+
+        # First window fires as soon as the buffer is full
+        if self.windows_emitted == 0:
+            self.samples_since_window = 0
+        elif self.samples_since_window < self.hop_size:
+            return None
+        else:
+            due = self.samples_since_window // self.hop_size
+            if due > 1:
+                # Chunk spanned several hops (e.g. after a stall) - only analyse the latest window
+                self.windows_skipped += due - 1
+                logger.debug(f"Window scheduler coalesced {due - 1} hop(s)")
+            # Keep the remainder so the cadence stays locked to the sample clock
+            self.samples_since_window %= self.hop_size
+
+        self.windows_emitted += 1
+
+        # The window always ends at the newest sample in the buffer
+        self.last_window_timestamp = first_timestamp + (n_samples - 1) / self.sample_rate
+        return self.last_window_timestamp
+
+    def reset(self):
+        """Reset counters (e.g. on reconnect)"""
+        self.samples_seen = 0
+        self.samples_since_window = 0
+        self.windows_emitted = 0
+        self.windows_skipped = 0
+        self.last_window_timestamp = None
+
+    def get_stats(self) -> dict:
+        """Scheduler statistics for diagnostics"""
+        return {
+            'window_size': self.window_size,
+            'hop_size': self.hop_size,
+            'windows_per_second': self.windows_per_second,
+            'windows_emitted': self.windows_emitted,
+            'windows_skipped': self.windows_skipped,
+        }
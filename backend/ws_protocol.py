@@ -0,0 +1,304 @@
+"""
+WebSocket Binary Protocol
+Packed little-endian float32 frames for the /ws stream
+
+JSON clients get every message walked by convert_numpy and re-encoded. The
+band_powers message also repeats its constant keys and strings every tick.
+Clients that connect with /ws?protocol=binary instead get:
+
+- a 'hello' JSON message once at subscribe time, with the protocol version,
+  the frame schemas (numeric field layout per message type) and static
+  metadata (channel names, bands)
+- one binary frame per numeric message: a 12-byte header followed by float32
+  values, copied straight from a NumPy buffer into the frame:
+
+      offset 0  uint8    protocol version
+      offset 1  uint8    schema id (message type)
+      offset 2  uint16   number of float32 values
+      offset 4  float64  timestamp (LSL clock)
+      offset 12 float32[n] values in schema order (NaN = field absent)
+
+  A schema may declare another dtype (uint8, float16) for its trailing
+  variable-length field, which then follows the float32 values; the count
+  includes it.
+
+- the non-numeric rest of a message (brain state, interpretations, flags) as
+  a '<type>_state' JSON message, only when it changed since the last one sent
+  to that client. A binary frame always applies to the last state received.
+
+Messages without a schema are sent as JSON text to binary clients as well.
+"""
+
+import json
+import logging
+import struct
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_JSON = 'json'
+PROTOCOL_BINARY = 'binary'
+PROTOCOLS = (PROTOCOL_JSON, PROTOCOL_BINARY)
+PROTOCOL_VERSION = 1
+
+FRAME_HEADER = struct.Struct('<BBHd')  # version, schema id, value count, timestamp
+
+CHANNEL_NAMES = ['TP9', 'AF7', 'AF8', 'TP10']
+BANDS = ['delta', 'theta', 'alpha', 'beta', 'gamma']
+
+# Numeric layout per message type: (schema id, [(dotted field path, size)][, tail dtype])
+# A size > 1 is a list field (e.g. one value per channel); size 0 is a list
+# of any length and must come last (it takes the rest of the frame). A name
+# 'type:format' is the schema of messages of that type with that 'format'.
+SCHEMAS: Dict[str, Tuple] = {
+    'eeg_data': (1, [
+        ('heart_rate', 1),
+        ('hrv_rmssd', 1),
+        ('hrv_sdnn', 1),
+        ('data', 0),  # Channel subsets send fewer values
+    ]),
+    'band_powers': (2, [
+        *((f'band_powers.{band}', 1) for band in BANDS),
+        ('signal_quality.mean', 1),
+        ('signal_quality.std', 1),
+        ('signal_quality.snr', 1),
+        ('signal_quality.confidence', 1),
+        ('signal_quality.artifact_ratio', 1),
+        ('heart_rate', 1),
+        ('hrv_rmssd', 1),
+        ('hrv_sdnn', 1),
+        ('hrv_extended.pnn50', 1),
+        ('hrv_extended.sd1', 1),
+        ('hrv_extended.sd2', 1),
+        ('hrv_extended.lf', 1),
+        ('hrv_extended.hf', 1),
+        ('hrv_extended.lf_hf', 1),
+        ('hrv_extended.lf_nu', 1),
+        ('talking_confidence', 1),
+        ('talking_duration', 1),
+    ]),
+    'eeg_raw': (4, [
+        ('seq', 1),
+        ('sample_rate', 1),
+        ('n_samples', 1),
+        ('n_channels', 1),
+        ('data', 0),  # Interleaved samples (n_samples * n_channels)
+    ]),
+    'display': (5, [
+        ('seq', 1),
+        ('bucket_seconds', 1),
+        ('n_buckets', 1),
+        ('n_channels', 1),
+        ('data', 0),  # n_buckets * n_channels pairs (see display_downsampler)
+    ]),
+    'spectrogram': (6, [
+        ('seq', 1),
+        ('n_columns', 1),
+        ('n_channels', 1),
+        ('n_bins', 1),
+        ('f_min', 1),
+        ('f_step', 1),
+        ('column_seconds', 1),
+        ('db_min', 1),
+        ('db_max', 1),
+        ('data', 0),  # Quantized dB (see spectrogram)
+    ], 'u1'),
+    'spectrogram:float16': (7, [
+        ('seq', 1),
+        ('n_columns', 1),
+        ('n_channels', 1),
+        ('n_bins', 1),
+        ('f_min', 1),
+        ('f_step', 1),
+        ('column_seconds', 1),
+        ('db_min', 1),
+        ('db_max', 1),
+        ('data', 0),
+    ], '<f2'),
+    'hrv': (3, [
+        ('heart_rate', 1),
+        ('hrv_rmssd', 1),
+        ('hrv_sdnn', 1),
+        ('hrv_extended.pnn50', 1),
+        ('hrv_extended.sd1', 1),
+        ('hrv_extended.sd2', 1),
+        ('hrv_extended.lf', 1),
+        ('hrv_extended.hf', 1),
+        ('hrv_extended.lf_hf', 1),
+        ('hrv_extended.lf_nu', 1),
+    ]),
+}
+
+
+def _lookup(message: dict, path: str):
+    node = message
+    for key in path.split('.'):
+        if not isinstance(node, dict) or key not in node:
+            return None
+        node = node[key]
+    return node
+
+
+def _without(message: dict, paths: List[str]) -> dict:
+    """Copy of message without the given dotted paths (and without emptied sub-dicts)"""
+    by_head: Dict[str, List[str]] = {}
+    for path in paths:
+        head, _, tail = path.partition('.')
+        by_head.setdefault(head, []).append(tail)
+    rest = {}
+    for key, value in message.items():
+        if key not in by_head:
+            rest[key] = value
+            continue
+        tails = [t for t in by_head[key] if t]
+        if tails and isinstance(value, dict):
+            remaining = _without(value, tails)
+            if remaining:
+                rest[key] = remaining
+    return rest
+
+
+class FrameSchema:
+    """
+    Numeric layout of one message type
+    """
+
+    def __init__(self, message_type: str, schema_id: int, fields: List[Tuple[str, int]],
+                 tail_dtype: str = '<f4'):
+        """
+        Args:
+            message_type: Message 'type' the schema applies to
+            schema_id: Id in the frame header (1-255)
+            fields: [(dotted path, size)] in frame order
+            tail_dtype: dtype of a trailing size-0 field ('<f4', 'u1' or '<f2')
+        """
+        self.message_type = message_type
+        self.schema_id = schema_id
+        self.fields = fields
+        self.tail_dtype = np.dtype(tail_dtype)
+        self.size = sum(size for _, size in fields)  # Fixed-size part
+        self.paths = [path for path, _ in fields]
+
+    def describe(self) -> Dict:
+        description = {'id': self.schema_id, 'type': self.message_type,
+                       'fields': [[path, size] for path, size in self.fields]}
+        if self.tail_dtype != np.float32:
+            description['tail'] = {'u1': 'uint8', 'f2': 'float16'}[self.tail_dtype.str[1:]]
+        return description
+
+    def pack(self, message: dict) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Numeric fields of message as float32 values (NaN where absent)
+
+        Returns:
+            (float32 values, trailing field in tail_dtype or None if it is float32 too)
+        """
+        path, size = self.fields[-1]
+        tail = _lookup(message, path) if size == 0 else None
+        if tail is not None and self.tail_dtype != np.float32:
+            values, _ = FrameSchema(self.message_type, self.schema_id, self.fields[:-1]).pack(message)
+            return values, np.asarray(tail).astype(self.tail_dtype).ravel()
+        tail_size = np.size(tail) if tail is not None else 0
+        values = np.full(self.size + tail_size, np.nan, dtype='<f4')
+        offset = 0
+        for path, size in self.fields:
+            size = size or tail_size
+            value = _lookup(message, path)
+            if value is not None and size:
+                try:
+                    values[offset:offset + size] = np.asarray(value, dtype=np.float64).ravel()[:size]
+                except (TypeError, ValueError):
+                    pass  # Not numeric - leave NaN
+            offset += size
+        return values, None
+
+
+def encode_frame(schema_id: int, timestamp: float, values: np.ndarray,
+                 tail: Optional[np.ndarray] = None) -> bytes:
+    """
+    Binary frame: header plus float32 values copied straight from the array buffer
+
+    Args:
+        schema_id: Schema id for the header
+        timestamp: Message timestamp
+        values: Values in schema order (any shape; written flattened, C order)
+        tail: Trailing field in its own dtype (appended after the float32 values)
+    """
+    values = np.ascontiguousarray(values, dtype='<f4').ravel()
+    tail = np.ascontiguousarray(tail).ravel() if tail is not None else np.zeros(0, dtype='u1')
+    frame = bytearray(FRAME_HEADER.size + values.nbytes + tail.nbytes)
+    FRAME_HEADER.pack_into(frame, 0, PROTOCOL_VERSION, schema_id, values.size + tail.size, float(timestamp))
+    frame[FRAME_HEADER.size:FRAME_HEADER.size + values.nbytes] = memoryview(values).cast('B')
+    frame[FRAME_HEADER.size + values.nbytes:] = memoryview(tail).cast('B')
+    return bytes(frame)
+
+
+@dataclass
+class EncodedMessage:
+    """One message encoded for one protocol"""
+    parts: List[Union[str, bytes]]          # Sent in order
+    state_key: Optional[str] = None         # Message type the state belongs to
+    state: Optional[str] = None             # '<type>_state' text, sent only when it changed for the client
+
+
+class BinaryEncoder:
+    """
+    Encodes broadcast messages for binary clients
+
+    Stateless: whether a state message has to be sent is decided per client
+    (see ClientConnection), since clients receive different message subsets.
+    """
+
+    def __init__(self, schemas: Optional[Dict[str, Tuple[int, List[Tuple[str, int]]]]] = None):
+        """
+        Args:
+            schemas: message type -> (schema id, fields) (default: SCHEMAS)
+        """
+        self.schemas = {
+            name: FrameSchema(name.split(':')[0], *spec)
+            for name, spec in (schemas or SCHEMAS).items()
+        }
+
+    def hello(self) -> Dict:
+        """Subscribe-time message with the schemas and static metadata"""
+        return {
+            'type': 'hello',
+            'protocol': PROTOCOL_BINARY,
+            'version': PROTOCOL_VERSION,
+            'schemas': {name: schema.describe() for name, schema in self.schemas.items()},
+            'channel_names': CHANNEL_NAMES,
+            'bands': BANDS,
+        }
+
+    def encode(self, message: dict, to_json) -> EncodedMessage:
+        """
+        Encode one message for binary clients
+
+        Args:
+            message: Broadcast message (JSON-compatible after to_json)
+            to_json: Serializer used for text parts (message -> str)
+
+        Returns:
+            The binary frame with its state text, or the JSON text alone for
+            messages without a schema
+        """
+        message_type = message.get('type')
+        schema = self.schemas.get(f"{message_type}:{message.get('format')}") or self.schemas.get(message_type)
+        if schema is None:
+            return EncodedMessage([to_json(message)])
+
+        state = _without(message, schema.paths + ['type', 'timestamp'])
+        timestamp = message.get('timestamp') or 0.0
+        return EncodedMessage(
+            [encode_frame(schema.schema_id, timestamp, *schema.pack(message))],
+            state_key=message_type,
+            state=to_json({'type': f'{message_type}_state', **state}),
+        )
+
+
+def dumps(message: dict) -> str:
+    """Compact JSON text"""
+    return json.dumps(message, separators=(',', ':'))
@@ -0,0 +1,291 @@
+"""
+WebSocket Topics
+Per-client topic subscriptions for the /ws stream
+
+Clients that never subscribe keep receiving the full eeg_data and
+band_powers messages at the server rate. A client that sends
+
+    {"type": "subscribe", "topics": {"band_powers": {"max_rate": 1},
+                                     "eeg": {"max_rate": 10, "channels": [0, 3]},
+                                     "events": {}}}
+
+switches to topic mode and only receives the topics it asked for:
+
+- eeg          eeg_data {timestamp, data} (latest sample at ~20 Hz, optionally a channel subset)
+- eeg_raw      every EEG sample in batches (see RawEEGBatcher; never decimated)
+- display      min/max or LTTB waveform buckets for a pixel width and time span
+               ({"mode": "minmax"|"lttb", "width": 600, "span": 5}, see display_downsampler)
+- spectrogram  one PSD column per analysis hop, quantized to uint8 or float16
+               ({"format": "uint8"|"float16"}, see spectrogram; never decimated)
+- band_powers  band powers, brain state, signal quality and artifacts
+- hrv          heart rate and HRV metrics with their interpretation
+- posture      posture interpretation
+- events       brain state changes, talking and artifact onsets (never decimated)
+- ica_status   ICA calibration status
+
+The full messages are split into topic messages once per tick, and each
+subscription is decimated server-side to its max_rate (on the message
+timestamps, LSL clock). {"type": "unsubscribe", "topics": ["eeg"]} removes
+topics. The server acknowledges with {"type": "subscribed", "topics": {...}}
+listing the effective subscriptions.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from display_downsampler import DisplayConfig
+from spectrogram import SPECTROGRAM_FORMATS, quantize
+
+logger = logging.getLogger(__name__)
+
+TOPICS = ('eeg', 'eeg_raw', 'display', 'spectrogram', 'band_powers', 'hrv', 'posture', 'events', 'ica_status')
+UNDECIMATED_TOPICS = {'events', 'eeg_raw', 'display', 'spectrogram'}
+CHANNEL_TOPICS = {'eeg', 'eeg_raw', 'display', 'spectrogram'}
+EEG_CHANNELS = 4
+RAW_BATCH_SAMPLES = 64  # Samples per eeg_raw message (250 ms at 256 Hz)
+RATE_TOLERANCE = 0.05  # Fraction of the interval a message may arrive early (timing jitter)
+
+# band_powers keys carried by each topic message
+BAND_POWERS_KEYS = (
+    'band_powers', 'brain_state', 'signal_quality', 'has_artifact', 'artifact_type',
+    'bad_channels', 'artifact_details', 'band_change_interpretation',
+    'is_talking', 'talking_confidence', 'talking_duration', 'is_recording', 'session_id',
+)
+HRV_KEYS = ('heart_rate', 'hrv_rmssd', 'hrv_sdnn', 'hrv_extended', 'hrv_interpretation')
+POSTURE_KEYS = ('posture_interpretation',)
+
+
+@dataclass
+class Subscription:
+    """One topic of one client"""
+    topic: str
+    max_rate: Optional[float] = None            # Messages per second (None = every message)
+    channels: Optional[Tuple[int, ...]] = None  # EEG channel subset (None = all)
+    display: Optional[DisplayConfig] = None     # Display geometry (display topic)
+    format: Optional[str] = None                # Wire format (spectrogram topic)
+    last_sent: Optional[float] = None           # Timestamp of the last message passed
+
+    def accepts(self, message: dict) -> bool:
+        """False for messages of another variant of the topic (display geometry)"""
+        return self.display is None or message.get('config') == self.display.key
+
+    def due(self, timestamp: float) -> bool:
+        """True if a message at `timestamp` passes the rate limit (and marks it sent)"""
+        if self.max_rate is not None and self.last_sent is not None:
+            interval = 1.0 / self.max_rate
+            if 0 <= timestamp - self.last_sent < interval * (1 - RATE_TOLERANCE):
+                return False
+        self.last_sent = timestamp
+        return True
+
+    def describe(self) -> Dict:
+        info: Dict = {'max_rate': self.max_rate}
+        if self.topic in CHANNEL_TOPICS:
+            info['channels'] = list(self.channels) if self.channels is not None else None
+        if self.display is not None:
+            info.update(mode=self.display.mode, width=self.display.width, span=self.display.span)
+        if self.format is not None:
+            info['format'] = self.format
+        return info
+
+
+def parse_subscriptions(topics) -> Dict[str, Subscription]:
+    """
+    Validate the topics of a subscribe command
+
+    Args:
+        topics: {topic: {max_rate, channels}} or a list of topic names
+
+    Raises:
+        ValueError: Unknown topic or invalid options
+    """
+    if isinstance(topics, (list, tuple)):
+        topics = {topic: {} for topic in topics}
+    if not isinstance(topics, dict):
+        raise ValueError("topics must be an object or a list")
+
+    subscriptions = {}
+    for topic, options in topics.items():
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown topic: {topic}")
+        options = options or {}
+        max_rate = options.get('max_rate')
+        if max_rate is not None:
+            max_rate = float(max_rate)
+            if max_rate <= 0:
+                raise ValueError(f"max_rate must be positive: {topic}")
+        if topic in UNDECIMATED_TOPICS:
+            max_rate = None
+        channels = options.get('channels')
+        if channels is not None and topic in CHANNEL_TOPICS:
+            channels = tuple(int(ch) for ch in channels)
+            if not channels or any(ch < 0 or ch >= EEG_CHANNELS for ch in channels):
+                raise ValueError(f"channels must be a non-empty subset of 0-{EEG_CHANNELS - 1}")
+        else:
+            channels = None
+        display = DisplayConfig.parse(options) if topic == 'display' else None
+        fmt = None
+        if topic == 'spectrogram':
+            fmt = options.get('format', SPECTROGRAM_FORMATS[0])
+            if fmt not in SPECTROGRAM_FORMATS:
+                raise ValueError(f"format must be one of {SPECTROGRAM_FORMATS}")
+        subscriptions[topic] = Subscription(topic, max_rate=max_rate, channels=channels, display=display,
+                                            format=fmt)
+    return subscriptions
+
+
+def _pick(message: dict, message_type: str, keys) -> dict:
+    picked = {'type': message_type, 'timestamp': message.get('timestamp')}
+    picked.update({key: message[key] for key in keys if key in message})
+    return picked
+
+
+class TopicRouter:
+    """
+    Splits server messages into topic messages (one router per pipeline session)
+
+    Also derives the events topic from consecutive band_powers ticks.
+    """
+
+    def __init__(self):
+        self._previous: Optional[dict] = None
+
+    def route(self, message: dict) -> List[Tuple[str, dict]]:
+        """[(topic, topic message)] for one server message"""
+        message_type = message.get('type')
+        if message_type == 'eeg_data':
+            return [('eeg', _pick(message, 'eeg_data', ('data',)))]
+        if message_type != 'band_powers':
+            return [(message_type, message)] if message_type in TOPICS else []
+
+        routed = [
+            ('band_powers', _pick(message, 'band_powers', BAND_POWERS_KEYS)),
+            ('hrv', _pick(message, 'hrv', HRV_KEYS)),
+            ('posture', _pick(message, 'posture', POSTURE_KEYS)),
+        ]
+        if 'ica_status' in message:
+            routed.append(('ica_status', {'type': 'ica_status', 'timestamp': message.get('timestamp'),
+                                          **message['ica_status']}))
+        routed.extend(('events', event) for event in self._events(message))
+        self._previous = message
+        return routed
+
+    def _events(self, message: dict) -> List[dict]:
+        previous = self._previous
+        if previous is None:
+            return []
+        timestamp = message.get('timestamp')
+        events = []
+
+        def event(name: str, **details):
+            events.append({'type': 'event', 'event': name, 'timestamp': timestamp, **details})
+
+        if message.get('brain_state') != previous.get('brain_state'):
+            event('brain_state_changed', previous=previous.get('brain_state'), state=message.get('brain_state'))
+        if message.get('is_talking') and not previous.get('is_talking'):
+            event('talking_started', confidence=message.get('talking_confidence', 0.0))
+        elif previous.get('is_talking') and not message.get('is_talking'):
+            event('talking_stopped', duration=previous.get('talking_duration', 0.0))
+        if message.get('has_artifact') and not previous.get('has_artifact'):
+            event('artifact_started', artifact_type=message.get('artifact_type'))
+        elif previous.get('has_artifact') and not message.get('has_artifact'):
+            event('artifact_cleared')
+        return events
+
+    def reset(self):
+        self._previous = None
+
+
+def select_channels(message: dict, channels: Optional[Tuple[int, ...]]) -> dict:
+    """eeg_data / eeg_raw / display / spectrogram message restricted to a channel subset"""
+    if channels is None or 'data' not in message:
+        return message
+    data = message['data']
+    if message.get('type') == 'spectrogram':
+        columns = np.asarray(data).reshape(-1, message['n_channels'], message['n_bins'])
+        return {**message, 'n_channels': len(channels), 'data': columns[:, list(channels)].ravel()}
+    if message.get('type') == 'display':
+        pairs = np.asarray(data).reshape(-1, message['n_channels'], 2)
+        return {**message, 'n_channels': len(channels), 'data': pairs[:, list(channels)].ravel()}
+    if message.get('type') == 'eeg_raw':
+        samples = np.asarray(data).reshape(-1, message['n_channels'])
+        return {**message, 'n_channels': len(channels), 'data': samples[:, list(channels)].ravel()}
+    return {**message, 'data': [data[ch] for ch in channels if ch < len(data)]}
+
+
+def for_subscription(message: dict, subscription: Subscription) -> dict:
+    """Topic message as sent to one subscription (channel subset, spectrogram wire format)"""
+    message = select_channels(message, subscription.channels)
+    if subscription.format is not None and message.get('type') == 'spectrogram':
+        message = quantize(message, subscription.format)
+    return message
+
+
+class RawEEGBatcher:
+    """
+    Cuts the full-rate EEG stream into fixed-size eeg_raw messages
+
+    Each message carries:
+        seq          consecutive batch number (a jump means batches were lost)
+        timestamp    LSL timestamp of the first sample
+        sample_rate  nominal rate (Hz)
+        n_samples    samples in the batch
+        n_channels   channels per sample
+        data         float32 samples, interleaved sample by sample
+                     ([s0 ch0, s0 ch1, ..., s1 ch0, ...])
+    """
+
+    def __init__(self, n_channels: int = EEG_CHANNELS, batch_samples: int = RAW_BATCH_SAMPLES,
+                 sample_rate: float = 256):
+        """
+        Args:
+            n_channels: EEG channels sent (extra columns such as Right AUX are dropped)
+            batch_samples: Samples per message
+            sample_rate: Nominal EEG rate (Hz)
+        """
+        self.n_channels = n_channels
+        self.batch_samples = batch_samples
+        self.sample_rate = sample_rate
+        self._batch = np.zeros((batch_samples, n_channels), dtype=np.float32)
+        self._filled = 0
+        self._start_time = 0.0
+        self.seq = 0
+
+    def reset(self):
+        """Drop the partial batch (e.g. no subscribers); seq keeps counting"""
+        self._filled = 0
+
+    def push(self, samples: np.ndarray, timestamps: np.ndarray) -> List[dict]:
+        """
+        Add a chunk and return the batches it completes
+
+        Args:
+            samples: [n_samples, n_channels] EEG chunk
+            timestamps: [n_samples] LSL timestamps
+        """
+        messages = []
+        samples = samples[:, :self.n_channels]
+        offset = 0
+        while offset < samples.shape[0]:
+            if self._filled == 0:
+                self._start_time = float(timestamps[offset])
+            n = min(self.batch_samples - self._filled, samples.shape[0] - offset)
+            self._batch[self._filled:self._filled + n] = samples[offset:offset + n]
+            self._filled += n
+            offset += n
+            if self._filled == self.batch_samples:
+                messages.append({
+                    'type': 'eeg_raw',
+                    'seq': self.seq,
+                    'timestamp': self._start_time,
+                    'sample_rate': self.sample_rate,
+                    'n_samples': self.batch_samples,
+                    'n_channels': self.n_channels,
+                    'data': self._batch.ravel().copy(),
+                })
+                self.seq += 1
+                self._filled = 0
+        return messages
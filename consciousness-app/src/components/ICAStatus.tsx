@@ -1,8 +1,9 @@
 import { Brain, Loader2 } from 'lucide-react';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
+import type { ICAStatusInfo } from '../hooks/useWebSocket';
 
 interface ICAStatusProps {
-  icaStatus: { fitted: boolean; progress: number } | null;
+  icaStatus: ICAStatusInfo | null;
 }
 
 export const ICAStatus = ({ icaStatus }: ICAStatusProps) => {
@@ -10,7 +11,7 @@ export const ICAStatus = ({ icaStatus }: ICAStatusProps) => {
     return null;
   }
 
-  const { fitted, progress } = icaStatus;
+  const { fitted, progress, state } = icaStatus;
 
   return (
     <Card>
@@ -33,12 +34,23 @@ export const ICAStatus = ({ icaStatus }: ICAStatusProps) => {
             <p className="text-sm text-zinc-600">
               Artifacts are being automatically removed from your signal
             </p>
+            {state === 'recalibrating' && (
+              <p className="text-xs text-zinc-500">
+                Signal changed - collecting data to recalibrate ({progress}%)
+              </p>
+            )}
+            {state === 'refitting' && (
+              <p className="text-xs text-zinc-500 flex items-center gap-1">
+                <Loader2 className="w-3 h-3 animate-spin" />
+                Refitting in the background...
+              </p>
+            )}
           </div>
         ) : (
           <div className="space-y-3">
             <div className="flex items-center gap-2">
               <Loader2 className="w-4 h-4 animate-spin text-blue-600" />
-              <span className="text-sm font-medium">Calibrating ICA...</span>
+              <span className="text-sm font-medium">{state === 'fitting' ? 'Fitting ICA...' : 'Calibrating ICA...'}</span>
             </div>
             <div className="space-y-1">
               <div className="flex justify-between text-xs text-zinc-600">
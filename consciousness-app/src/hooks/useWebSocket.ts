@@ -1,8 +1,10 @@
 import { useState, useCallback, useRef, useEffect } from 'react';
 import { ConnectionStatus } from '../types/muse';
 import type { EEGReading, MuseDeviceInfo } from '../types/muse';
+import { BinaryDecoder } from '../utils/wsProtocol';
 
-const WS_URL = 'ws://localhost:8000/ws';
+// Binary float32 frames (see utils/wsProtocol.ts); use ?protocol=json for plain JSON
+const WS_URL = 'ws://localhost:8000/ws?protocol=binary';
 const API_BASE = 'http://localhost:8000';
 
 const HISTORY_LENGTH = 128; // Keep last 0.5 seconds of data for waveform (reduced for performance)
@@ -16,6 +18,7 @@ interface WebSocketMessage {
   heart_rate?: number;
   hrv_rmssd?: number;
   hrv_sdnn?: number;
+  hrv_extended?: HRVExtended;
   band_powers?: {
     delta: number;
     theta: number;
@@ -40,6 +43,26 @@ interface WebSocketMessage {
   };
 }
 
+export interface HRVExtended {
+  pnn50: number;
+  sd1: number;
+  sd2: number;
+  lf: number;
+  hf: number;
+  lf_hf: number;
+  lf_nu: number;
+  spectral_valid: boolean;
+  autonomic_balance: 'sympathetic' | 'balanced' | 'parasympathetic' | 'unknown';
+}
+
+export interface ICAStatusInfo {
+  fitted: boolean;
+  progress: number;
+  state?: 'calibrating' | 'fitting' | 'ready' | 'recalibrating' | 'refitting';
+  fit_count?: number;
+  reason?: string | null;
+}
+
 interface BandPowers {
   delta: number;
   theta: number;
@@ -59,7 +82,7 @@ export const useWebSocket = () => {
   const [heartRate, setHeartRate] = useState<number>(0);
   const [hrvRmssd, setHrvRmssd] = useState<number>(0);
   const [hrvSdnn, setHrvSdnn] = useState<number>(0);
-  const [icaStatus, setIcaStatus] = useState<{ fitted: boolean; progress: number } | null>(null);
+  const [icaStatus, setIcaStatus] = useState<ICAStatusInfo | null>(null);
   const [artifactInfo, setArtifactInfo] = useState<{
     has_artifact: boolean;
     artifact_type: string;
@@ -76,6 +99,7 @@ export const useWebSocket = () => {
   const shouldReconnect = useRef(true);
   const lastEegUpdateRef = useRef<number>(0);
   const pendingEegDataRef = useRef<EEGReading | null>(null);
+  const decoderRef = useRef(new BinaryDecoder());
 
   const connectWebSocket = useCallback(() => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
@@ -84,7 +108,9 @@ export const useWebSocket = () => {
 
     try {
       const ws = new WebSocket(WS_URL);
+      ws.binaryType = 'arraybuffer';
       wsRef.current = ws;
+      decoderRef.current.reset();
 
       ws.onopen = () => {
         console.log('✅ WebSocket connected');
@@ -106,7 +132,10 @@ export const useWebSocket = () => {
 
       ws.onmessage = (event) => {
         try {
-          const message: WebSocketMessage = JSON.parse(event.data);
+          const message = decoderRef.current.decode(event.data) as WebSocketMessage | null;
+          if (!message) {
+            return; // Protocol metadata (schemas, state updates)
+          }
 
           if (message.type === 'eeg_data' && message.data) {
             const reading: EEGReading = {
@@ -0,0 +1,157 @@
+// Decoder for the backend's binary /ws protocol (see backend/ws_protocol.py)
+//
+// Frame layout (little-endian):
+//   offset 0  uint8    protocol version
+//   offset 1  uint8    schema id
+//   offset 2  uint16   number of float32 values
+//   offset 4  float64  timestamp
+//   offset 12 float32[n] values in schema order (NaN = field absent)
+//
+// Schemas and static metadata arrive once in a 'hello' message; the
+// non-numeric part of each message type arrives as '<type>_state' only when
+// it changes. A frame is merged onto the last state of its type. A field of
+// size 0 is a list that takes the rest of the frame; a schema with a 'tail'
+// dtype (uint8, float16) stores that list after the float32 values.
+
+export const PROTOCOL_VERSION = 1;
+const HEADER_SIZE = 12;
+
+type FieldSpec = [path: string, size: number];
+type TailDtype = 'uint8' | 'float16';
+
+interface FrameSchema {
+  id: number;
+  type?: string;
+  fields: FieldSpec[];
+  tail?: TailDtype;
+}
+
+export interface HelloMessage {
+  type: 'hello';
+  protocol: 'binary';
+  version: number;
+  schemas: Record<string, FrameSchema>;
+  channel_names: string[];
+  bands: string[];
+}
+
+type Message = Record<string, any>;
+
+function setPath(target: Message, path: string, value: unknown) {
+  const keys = path.split('.');
+  let node = target;
+  for (const key of keys.slice(0, -1)) {
+    if (typeof node[key] !== 'object' || node[key] === null) {
+      node[key] = {};
+    }
+    node = node[key];
+  }
+  node[keys[keys.length - 1]] = value;
+}
+
+function mergeState(state: Message | undefined): Message {
+  // Deep enough copy for setPath to add numeric fields without touching the state
+  const message: Message = {};
+  for (const [key, value] of Object.entries(state ?? {})) {
+    message[key] = value && typeof value === 'object' && !Array.isArray(value) ? { ...value } : value;
+  }
+  return message;
+}
+
+function halfToFloat(bits: number): number {
+  const sign = bits & 0x8000 ? -1 : 1;
+  const exponent = (bits >> 10) & 0x1f;
+  const fraction = bits & 0x3ff;
+  if (exponent === 0) {
+    return sign * 2 ** -14 * (fraction / 1024);
+  }
+  if (exponent === 0x1f) {
+    return fraction ? NaN : sign * Infinity;
+  }
+  return sign * 2 ** (exponent - 15) * (1 + fraction / 1024);
+}
+
+function readTail(data: ArrayBuffer, offset: number, size: number, dtype: TailDtype): number[] {
+  if (dtype === 'uint8') {
+    return Array.from(new Uint8Array(data, offset, size));
+  }
+  // float16 values may be unaligned after an odd number of bytes - read through a DataView
+  const view = new DataView(data, offset, size * 2);
+  const values = new Array<number>(size);
+  for (let i = 0; i < size; i++) {
+    values[i] = halfToFloat(view.getUint16(i * 2, true));
+  }
+  return values;
+}
+
+export class BinaryDecoder {
+  private schemas = new Map<number, { type: string; fields: FieldSpec[]; tail?: TailDtype }>();
+  private states = new Map<string, Message>();
+  hello: HelloMessage | null = null;
+
+  reset() {
+    this.schemas.clear();
+    this.states.clear();
+    this.hello = null;
+  }
+
+  /**
+   * Decode one WebSocket payload
+   * @returns The message in the same shape as the JSON protocol, or null for
+   *          protocol-internal messages (hello, state updates)
+   */
+  decode(data: string | ArrayBuffer): Message | null {
+    if (typeof data === 'string') {
+      const message: Message = JSON.parse(data);
+      if (message.type === 'hello') {
+        this.hello = message as HelloMessage;
+        this.schemas.clear();
+        for (const [name, schema] of Object.entries(this.hello.schemas)) {
+          // Names 'type:format' are variants of one message type
+          this.schemas.set(schema.id, { type: schema.type ?? name, fields: schema.fields, tail: schema.tail });
+        }
+        return null;
+      }
+      if (typeof message.type === 'string' && message.type.endsWith('_state')) {
+        const { type, ...state } = message;
+        this.states.set(type.slice(0, -'_state'.length), state);
+        return null;
+      }
+      return message;
+    }
+
+    const view = new DataView(data);
+    const version = view.getUint8(0);
+    if (version !== PROTOCOL_VERSION) {
+      throw new Error(`Unsupported frame version ${version}`);
+    }
+    const schema = this.schemas.get(view.getUint8(1));
+    if (!schema) {
+      return null; // Frame before hello
+    }
+    const count = view.getUint16(2, true);
+    const fixedCount = schema.fields.reduce((total, [, size]) => total + size, 0);
+    const floatCount = schema.tail ? Math.min(fixedCount, count) : count;
+    const values = new Float32Array(data, HEADER_SIZE, floatCount);
+
+    const message = mergeState(this.states.get(schema.type));
+    message.type = schema.type;
+    message.timestamp = view.getFloat64(4, true);
+    let offset = 0;
+    for (const [path, fieldSize] of schema.fields) {
+      // Size 0: list of any length, takes the rest of the frame (e.g. channel subsets)
+      const size = fieldSize === 0 ? count - offset : fieldSize;
+      if (fieldSize === 0 && schema.tail) {
+        setPath(message, path, readTail(data, HEADER_SIZE + 4 * floatCount, size, schema.tail));
+      } else if (fieldSize === 1) {
+        if (!Number.isNaN(values[offset])) {
+          setPath(message, path, values[offset]);
+        }
+      } else if (size > 0 && !Number.isNaN(values[offset])) {
+        setPath(message, path, Array.from(values.subarray(offset, offset + size)));
+      }
+      offset += size;
+    }
+    return message;
+  }
+}